@@ -5,16 +5,9 @@ Adiciona Reply Buttons na etapa boas-vindas
 Botões estilo WhatsApp Business API
 """
 
-import psycopg2
-import json
-
-DB_CONFIG = {
-    'host': 'localhost',
-    'port': 5434,
-    'database': 'conectcrm_db',
-    'user': 'conectcrm',
-    'password': 'conectcrm123'
-}
+from conectcrm_ops.db import conectar
+from conectcrm_ops.historico import HistoricoFluxos
+from conectcrm_ops.patch import aplicar_patches
 
 FLOW_ID = 'ce74c2f3-b5d3-46dd-96f1-5f88339b9061'
 
@@ -67,44 +60,27 @@ DESPEDIDA_CANCELAMENTO = {
 def main():
     try:
         print("🔌 Conectando ao PostgreSQL...")
-        conn = psycopg2.connect(**DB_CONFIG)
-        conn.set_client_encoding('UTF8')
-        cur = conn.cursor()
-        
-        # 1. Buscar estrutura atual
-        print("📋 Buscando estrutura atual do fluxo...")
-        cur.execute("""
-            SELECT estrutura FROM fluxos_triagem WHERE id = %s
-        """, (FLOW_ID,))
-        estrutura_atual = cur.fetchone()[0]
+        conn = conectar()
         
-        # 2. Atualizar etapa boas-vindas
+        # 1. Atualizar etapa boas-vindas
         print("✏️ Atualizando etapa boas-vindas com Reply Buttons...")
-        estrutura_atual['etapas']['boas-vindas'] = BOAS_VINDAS_ATUALIZADA
+        operacoes = [{'op': 'replace', 'path': '/etapas/boas-vindas', 'value': BOAS_VINDAS_ATUALIZADA}]
         
-        # 3. Adicionar etapa de despedida
+        # 2. Adicionar etapa de despedida
         print("➕ Adicionando etapa de despedida...")
-        estrutura_atual['etapas']['despedida-cancelamento'] = DESPEDIDA_CANCELAMENTO
+        operacoes.append({'op': 'add', 'path': '/etapas/despedida-cancelamento', 'value': DESPEDIDA_CANCELAMENTO})
         
-        # 4. Salvar no banco
+        # 3. Salvar no banco (uma transação, só as duas etapas são reescritas)
         print("💾 Salvando no banco de dados...")
-        cur.execute("""
-            UPDATE fluxos_triagem 
-            SET estrutura = %s,
-                versao = versao + 1,
-                updated_at = NOW()
-            WHERE id = %s
-            RETURNING versao, updated_at;
-        """, (json.dumps(estrutura_atual, ensure_ascii=False), FLOW_ID))
-        
-        versao, updated_at = cur.fetchone()
-        conn.commit()
+        versao = aplicar_patches(conn, [{'fluxo_id': FLOW_ID, 'operacoes': operacoes}],
+                                 historico=HistoricoFluxos())[FLOW_ID]
         
         print(f"\n✅ Fluxo atualizado com sucesso!")
         print(f"   Nova versão: {versao}")
-        print(f"   Atualizado em: {updated_at}")
         
-        # 5. Verificar resultado
+        cur = conn.cursor()
+        
+        # 4. Verificar resultado
         print("\n🔍 Verificando etapa boas-vindas...")
         cur.execute("""
             SELECT 
@@ -0,0 +1,33 @@
+import { MigrationInterface, QueryRunner } from 'typeorm';
+
+export class AddTriagemLogsCreatedAtIndex1802877000000 implements MigrationInterface {
+  name = 'AddTriagemLogsCreatedAtIndex1802877000000';
+
+  // CREATE INDEX CONCURRENTLY não roda dentro de transação
+  public transaction = false;
+
+  public async up(queryRunner: QueryRunner): Promise<void> {
+    if (!(await queryRunner.hasTable('triagem_logs'))) {
+      return;
+    }
+
+    // Um CONCURRENTLY interrompido deixa o índice inválido, e o IF NOT EXISTS o manteria
+    const invalido = await queryRunner.query(`
+      SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+      WHERE c.relname = 'idx_triagem_logs_created_id' AND NOT i.indisvalid
+    `);
+    if (invalido.length > 0) {
+      await queryRunner.query(`DROP INDEX CONCURRENTLY IF EXISTS "idx_triagem_logs_created_id"`);
+    }
+
+    // Leitura incremental por marca d'água (created_at, id) usada pelo funil de triagem
+    await queryRunner.query(`
+      CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx_triagem_logs_created_id"
+      ON "triagem_logs" ("created_at", "id")
+    `);
+  }
+
+  public async down(queryRunner: QueryRunner): Promise<void> {
+    await queryRunner.query(`DROP INDEX CONCURRENTLY IF EXISTS "idx_triagem_logs_created_id"`);
+  }
+}
@@ -0,0 +1,33 @@
+import { MigrationInterface, QueryRunner } from 'typeorm';
+
+export class AddSessoesTriagemUpdatedAtIndex1802878000000 implements MigrationInterface {
+  name = 'AddSessoesTriagemUpdatedAtIndex1802878000000';
+
+  // CREATE INDEX CONCURRENTLY não roda dentro de transação
+  public transaction = false;
+
+  public async up(queryRunner: QueryRunner): Promise<void> {
+    if (!(await queryRunner.hasTable('sessoes_triagem'))) {
+      return;
+    }
+
+    // Um CONCURRENTLY interrompido deixa o índice inválido, e o IF NOT EXISTS o manteria
+    const invalido = await queryRunner.query(`
+      SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+      WHERE c.relname = 'idx_sessao_updated_at' AND NOT i.indisvalid
+    `);
+    if (invalido.length > 0) {
+      await queryRunner.query(`DROP INDEX CONCURRENTLY IF EXISTS "idx_sessao_updated_at"`);
+    }
+
+    // Leitura incremental das sessões alteradas (perfil de SLA da triagem)
+    await queryRunner.query(`
+      CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx_sessao_updated_at"
+      ON "sessoes_triagem" ("updated_at")
+    `);
+  }
+
+  public async down(queryRunner: QueryRunner): Promise<void> {
+    await queryRunner.query(`DROP INDEX CONCURRENTLY IF EXISTS "idx_sessao_updated_at"`);
+  }
+}
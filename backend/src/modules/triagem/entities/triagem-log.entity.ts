@@ -17,6 +17,7 @@ export type DirecaoTriagemLog = 'entrada' | 'saida' | 'sistema';
 @Index('idx_triagem_logs_empresa', ['empresaId'])
 @Index('idx_triagem_logs_sessao', ['sessaoId'])
 @Index('idx_triagem_logs_fluxo', ['fluxoId'])
+@Index('idx_triagem_logs_created_id', ['createdAt', 'id'])
 export class TriagemLog {
   @PrimaryGeneratedColumn('uuid')
   id: string;
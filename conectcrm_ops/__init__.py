@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""
+Ferramentas Python de operação do ConectCRM (triagem, diagnóstico e carga)
+
+Os módulos podem ser importados pelos scripts da raiz ou executados
+diretamente com ``python -m conectcrm_ops.<modulo>``.
+"""
@@ -0,0 +1,783 @@
+# -*- coding: utf-8 -*-
+"""
+Cópia anonimizada de um banco (dump de produção restaurado) para benchmarks locais
+
+Os benchmarks usam fixtures pequenas feitas à mão (init-users.sql,
+create-demo-users.sql, test-leads-import.csv), que não têm o desequilíbrio
+entre empresas, o tamanho dos JSONB nem o volume de mensagens de produção.
+Esta ferramenta copia tabela a tabela de um banco de origem para um de
+destino com o mesmo schema (migrations já rodadas), em fluxo:
+
+    COPY (SELECT ...) TO STDOUT  →  troca das colunas pessoais  →  COPY ... FROM STDIN
+
+Uma thread lê o COPY da origem para uma fila limitada (--fila linhas) e a
+principal alimenta o COPY do destino a partir dela: a memória não depende do
+tamanho da tabela, então um banco de 200 GB passa num notebook.
+
+Pseudonimização determinística (HMAC-SHA256 com --chave / ANONIMIZAR_CHAVE):
+o mesmo valor vira sempre o mesmo pseudônimo, em qualquer tabela e em
+qualquer execução com a mesma chave. Assim continuam batendo os joins por
+valor (telefone do contato × contato_telefone do ticket e da sessão, e-mail
+do usuário) e a distribuição de frequências. Os tamanhos são mantidos:
+
+- texto (nomes, mensagens, observações): palavra a palavra, mesmo tamanho,
+  vogal por vogal (acentuada por acentuada), consoante por consoante,
+  dígito por dígito, com a mesma caixa; pontuação e espaços ficam;
+- email: parte local como texto; domínios de provedores públicos ficam,
+  os demais trocam os rótulos menos o sufixo (.com.br);
+- telefone: só os 8 últimos dígitos trocam (DDI, DDD e o 9 ficam), então o
+  mesmo número em formatos diferentes (+55..., 11 9..., com máscara) casa;
+- documento: todos os dígitos, com dígitos verificadores válidos em CPF/CNPJ;
+- hash (senhas, tokens): hexadecimal do HMAC no mesmo tamanho;
+- ip: 10.x.y.z (ou fd00::x no IPv6); nulo: NULL; vazio: '{}' (credenciais);
+- json: percorre o documento e aplica as regras acima pelas chaves
+  (nome, email, telefone, cpf, mensagem, senha, ...); o resto fica.
+
+Colunas em REGRAS; colunas com nome de dado pessoal que não estão lá são
+avisadas no plano.
+
+Amostra por empresa (--amostra fração e/ou --empresa id): as tabelas com
+empresa_id/"empresaId" filtram pela coluna; as demais herdam o filtro pela
+chave estrangeira até uma tabela filtrada; as sem caminho (planos, módulos)
+vão inteiras. O destino é carregado com session_replication_role = replica
+(sem checar FKs durante a carga; precisa de superusuário, normal num banco
+local) e, no fim, cada FK é conferida na ordem pais → filhos: linhas que
+apontam para fora da amostra (referências entre empresas, FKs anuláveis)
+são apagadas, ou têm a FK anulada quando todas as colunas dela aceitam NULL.
+Depois as sequências são acertadas e o destino recebe ANALYZE.
+
+A origem é lida numa única transação REPEATABLE READ READ ONLY (cópia
+consistente); rode contra o dump restaurado ou uma réplica, não contra o
+primário, porque a transação longa segura o vacuum.
+
+Uso:
+    python -m conectcrm_ops.anonimizar planejar --amostra 0.1
+    python -m conectcrm_ops.anonimizar copiar --destino-banco conectcrm_bench --truncar
+    python -m conectcrm_ops.anonimizar copiar --destino-banco conectcrm_bench --amostra 0.05 --empresa <uuid>
+    python -m conectcrm_ops.anonimizar texto --tipo telefone "+55 (11) 98765-4321"
+"""
+
+import argparse
+import codecs
+import functools
+import hashlib
+import hmac
+import io
+import json
+import math
+import os
+import queue
+import re
+import sys
+import threading
+import time
+
+SCHEMA_PADRAO = 'public'
+FILA_PADRAO = 5000
+COLUNAS_EMPRESA = ('empresa_id', 'empresaId')
+TABELA_EMPRESAS = 'empresas'
+TIPOS = ('texto', 'email', 'telefone', 'documento', 'hash', 'ip', 'nulo', 'vazio', 'json')
+
+# tabela: {coluna: tipo}
+REGRAS = {
+    'empresas': {'nome': 'texto', 'slug': 'texto', 'cnpj': 'documento', 'email': 'email', 'telefone': 'telefone',
+                 'endereco': 'texto', 'token_verificacao': 'hash'},
+    'users': {'nome': 'texto', 'email': 'email', 'telefone': 'telefone', 'senha': 'hash', 'avatar_url': 'nulo'},
+    'password_reset_tokens': {'token_hash': 'hash'},
+    'atendentes': {'nome': 'texto', 'email': 'email'},
+    'clientes': {'nome': 'texto', 'email': 'email', 'telefone': 'telefone', 'documento': 'documento',
+                 'endereco': 'texto', 'observacoes': 'texto'},
+    'contatos': {'nome': 'texto', 'email': 'email', 'telefone': 'telefone', 'observacoes': 'texto'},
+    'leads': {'nome': 'texto', 'email': 'email', 'telefone': 'telefone', 'empresa_nome': 'texto',
+              'observacoes': 'texto', 'campos_customizados': 'json'},
+    'fornecedores': {'nome': 'texto', 'email': 'email', 'telefone': 'telefone', 'endereco': 'texto',
+                     'observacoes': 'texto'},
+    'oportunidades': {'nomeContato': 'texto', 'emailContato': 'email', 'telefoneContato': 'telefone',
+                      'descricao': 'texto'},
+    'atividades': {'descricao': 'texto'},
+    'atendimento_tickets': {'contato_nome': 'texto', 'contato_email': 'email', 'contato_telefone': 'telefone',
+                            'contato_foto': 'nulo'},
+    'atendimento_mensagens': {'conteudo': 'texto', 'anexos': 'json'},
+    'atendimento_notas_cliente': {'contato_telefone': 'telefone', 'conteudo': 'texto'},
+    'atendimento_demandas': {'contato_telefone': 'telefone', 'descricao': 'texto'},
+    'atendimento_integracoes_config': {'credenciais': 'vazio'},
+    'sessoes_triagem': {'contato_nome': 'texto', 'contato_email': 'email', 'contato_telefone': 'telefone',
+                        'ip_address': 'ip', 'contexto': 'json', 'historico': 'json'},
+    'triagem_logs': {'mensagem': 'texto', 'payload': 'json', 'contexto_snapshot': 'json', 'metadata': 'json'},
+    'notifications': {'data': 'json'},
+    'propostas': {'cliente': 'json', 'emailDetails': 'json', 'observacoes': 'texto'},
+    'contratos': {'observacoes': 'texto'},
+    'assinaturas_contrato': {'ipAssinatura': 'ip', 'tokenValidacao': 'hash'},
+    'cotacoes': {'observacoes': 'texto'},
+    'faturas': {'observacoes': 'texto'},
+    'pagamentos': {'observacoes': 'texto'},
+    'configuracoes_gateway_pagamento': {'credenciais': 'vazio'},
+    'transacoes_gateway_pagamento': {'payload_envio': 'json', 'payload_resposta': 'json'},
+}
+
+# Nomes de coluna que parecem dado pessoal (para avisar quando faltam em REGRAS)
+PADRAO_SENSIVEL = re.compile(r'(nome|name|e_?mail|telefone|phone|celular|whatsapp|cpf|cnpj|documento|'
+                             r'endereco|senha|password|token|conteudo|mensagem)', re.I)
+
+# Chaves de JSON (minúsculas, só letras) → tipo
+CHAVES_JSON = (
+    (re.compile(r'e?mail'), 'email'),
+    (re.compile(r'(telefone|phone|celular|whatsapp|wa_?id)'), 'telefone'),
+    (re.compile(r'^(cpf|cnpj|cpfcnpj|documento)$'), 'documento'),
+    (re.compile(r'(senha|password|secret|token|apikey)'), 'hash'),
+    (re.compile(r'(nome|name|^empresa$|endereco|mensagem|texto|conteudo|^body$|resposta|content|^text$|'
+                r'message|observac|caption)'), 'texto'),
+)
+
+DOMINIOS_PUBLICOS = {'gmail.com', 'hotmail.com', 'outlook.com', 'live.com', 'yahoo.com', 'yahoo.com.br',
+                     'uol.com.br', 'bol.com.br', 'terra.com.br', 'icloud.com', 'msn.com'}
+SUFIXOS_DOMINIO = {'com', 'br', 'net', 'org', 'gov', 'edu', 'io', 'app'}
+
+VOGAIS = 'aeiou'
+VOGAIS_ACENTUADAS = 'áéíóúâêôãõàü'
+CONSOANTES = 'bcdfghjklmnpqrstvwxz'
+_PALAVRA = re.compile(r'[^\W_]+')
+
+
+# ----------------------------------------------------------------------
+# Pseudonimização
+# ----------------------------------------------------------------------
+
+def _digitos_verificadores(base, pesos):
+    soma = sum(int(d) * p for d, p in zip(base, pesos))
+    resto = soma % 11
+    return '0' if resto < 2 else str(11 - resto)
+
+
+def completar_cpf(nove):
+    d1 = _digitos_verificadores(nove, range(10, 1, -1))
+    return nove + d1 + _digitos_verificadores(nove + d1, range(11, 1, -1))
+
+
+def completar_cnpj(doze):
+    pesos = (5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+    d1 = _digitos_verificadores(doze, pesos)
+    return doze + d1 + _digitos_verificadores(doze + d1, (6,) + pesos)
+
+
+def _trocar_digitos(valor, novos):
+    """Substitui os dígitos de `valor` da direita para a esquerda pelos de `novos` (o resto da máscara fica)."""
+    saida = list(valor)
+    restantes = list(novos)
+    for i in range(len(saida) - 1, -1, -1):
+        if not restantes:
+            break
+        if saida[i].isdigit():
+            saida[i] = restantes.pop()
+    return ''.join(saida)
+
+
+class Pseudonimizador:
+    """
+    Funções determinísticas por tipo (HMAC da chave). As palavras e os
+    valores completos passam por caches LRU de tamanho fixo: a memória não
+    cresce com o volume, só o acerto do cache.
+    """
+
+    def __init__(self, chave, cache=200000):
+        self.chave = chave.encode('utf-8')
+        self.palavra = functools.lru_cache(maxsize=cache)(self._palavra)
+        self.email = functools.lru_cache(maxsize=cache)(self._email)
+        self.telefone = functools.lru_cache(maxsize=cache)(self._telefone)
+
+    def _bytes(self, dominio, valor, tamanho=32):
+        bloco = hmac.new(self.chave, f'{dominio}:{valor}'.encode('utf-8'), hashlib.sha256).digest()
+        saida = bloco
+        while len(saida) < tamanho:
+            bloco = hashlib.sha256(bloco).digest()
+            saida += bloco
+        return saida
+
+    def _palavra(self, palavra):
+        aleatorio = self._bytes('palavra', palavra.lower(), len(palavra))
+        saida = []
+        for c, b in zip(palavra, aleatorio):
+            minuscula = c.lower()
+            if c.isdigit():
+                novo = str(b % 10)
+            elif minuscula in VOGAIS:
+                novo = VOGAIS[b % len(VOGAIS)]
+            elif minuscula in VOGAIS_ACENTUADAS:
+                novo = VOGAIS_ACENTUADAS[b % len(VOGAIS_ACENTUADAS)]
+            elif c.isalpha() and minuscula != 'ç':
+                novo = CONSOANTES[b % len(CONSOANTES)]
+            else:
+                novo = c
+            saida.append(novo.upper() if c.isupper() else novo)
+        return ''.join(saida)
+
+    def texto(self, valor):
+        return _PALAVRA.sub(lambda m: self.palavra(m.group()), valor)
+
+    def _email(self, valor):
+        local, arroba, dominio = valor.rpartition('@')
+        if not arroba:
+            return self.texto(valor)
+        if dominio.lower() not in DOMINIOS_PUBLICOS:
+            rotulos = dominio.split('.')
+            dominio = '.'.join(r if r.lower() in SUFIXOS_DOMINIO else self.texto(r) for r in rotulos)
+        return f'{self.texto(local)}@{dominio}'
+
+    def _telefone(self, valor):
+        digitos = re.sub(r'\D', '', valor)
+        assinante = digitos[-8:]
+        aleatorio = self._bytes('telefone', assinante, len(assinante))[:len(assinante)]
+        return _trocar_digitos(valor, ''.join(str(b % 10) for b in aleatorio))
+
+    def documento(self, valor):
+        digitos = re.sub(r'\D', '', valor)
+        novos = ''.join(str(b % 10) for b in self._bytes('documento', digitos, len(digitos))[:len(digitos)])
+        if len(digitos) == 11:
+            novos = completar_cpf(novos[:9])
+        elif len(digitos) == 14:
+            novos = completar_cnpj(novos[:12])
+        return _trocar_digitos(valor, novos)
+
+    def hash(self, valor):
+        return self._bytes('hash', valor, math.ceil(len(valor) / 2)).hex()[:len(valor)]
+
+    def ip(self, valor):
+        b = self._bytes('ip', valor, 3)
+        if ':' in valor:
+            return f'fd00::{b[0]:02x}{b[1]:02x}:{b[2]:02x}'
+        return f'10.{b[0]}.{b[1]}.{b[2]}'
+
+    def json_valor(self, valor, tipo=None):
+        if isinstance(valor, dict):
+            return {k: self.json_valor(v, tipo_da_chave(k) or tipo) for k, v in valor.items()}
+        if isinstance(valor, list):
+            return [self.json_valor(v, tipo) for v in valor]
+        if isinstance(valor, str) and tipo:
+            return self.aplicar(tipo, valor)
+        return valor
+
+    def aplicar(self, tipo, valor):
+        """Valor novo (texto) para um valor (texto) não nulo da coluna; None vira NULL."""
+        if tipo == 'nulo':
+            return None
+        if tipo == 'vazio':
+            return '{}'
+        if tipo == 'json':
+            return json.dumps(self.json_valor(json.loads(valor)), ensure_ascii=False)
+        return getattr(self, tipo)(valor)
+
+
+def tipo_da_chave(chave):
+    normalizada = re.sub(r'[^a-z_]', '', chave.lower())
+    for padrao, tipo in CHAVES_JSON:
+        if padrao.search(normalizada):
+            return tipo
+    return None
+
+
+# ----------------------------------------------------------------------
+# Formato texto do COPY
+# ----------------------------------------------------------------------
+
+_ESCAPES = {'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t', 'v': '\v', '\\': '\\'}
+_DECODIFICAR = re.compile(r'\\(x[0-9a-fA-F]{1,2}|[0-7]{1,3}|.)')
+_CODIFICAR = re.compile(r'[\\\n\r\t\b\f\v]')
+_CODIGOS = {v: '\\' + k for k, v in _ESCAPES.items()}
+
+
+def _desescapar(m):
+    s = m.group(1)
+    if s[0] == 'x':
+        return chr(int(s[1:], 16))
+    if s[0].isdigit():
+        return chr(int(s, 8))
+    return _ESCAPES.get(s, s)
+
+
+def decodificar_campo(campo):
+    return _DECODIFICAR.sub(_desescapar, campo) if '\\' in campo else campo
+
+
+def codificar_campo(valor):
+    return _CODIFICAR.sub(lambda m: _CODIGOS[m.group()], valor)
+
+
+def transformar_linha(linha, trocas, pseudo):
+    """Linha do COPY (sem o \\n) com as colunas de `trocas` [(índice, tipo)] pseudonimizadas."""
+    campos = linha.split('\t')
+    for indice, tipo in trocas:
+        if campos[indice] == '\\N':
+            continue
+        novo = pseudo.aplicar(tipo, decodificar_campo(campos[indice]))
+        campos[indice] = '\\N' if novo is None else codificar_campo(novo)
+    return '\t'.join(campos)
+
+
+class _Fim:
+    def __init__(self, erro=None):
+        self.erro = erro
+
+
+class _EscritorFila:
+    """Destino do COPY TO: quebra em linhas e põe na fila limitada (bloqueia quando cheia)"""
+
+    def __init__(self, fila, parar):
+        self.fila = fila
+        self.parar = parar
+        self.resto = ''
+        self.decodificador = codecs.getincrementaldecoder('utf-8')()
+
+    def write(self, dados):
+        if isinstance(dados, bytes):
+            dados = self.decodificador.decode(dados)
+        *linhas, self.resto = (self.resto + dados).split('\n')
+        for linha in linhas:
+            while True:
+                if self.parar.is_set():
+                    raise RuntimeError('cópia interrompida pelo destino')
+                try:
+                    self.fila.put(linha, timeout=1)
+                    break
+                except queue.Full:
+                    pass
+        return len(dados)
+
+
+class _LeitorTransformado(io.TextIOBase):
+    """Origem do COPY FROM: tira linhas da fila, pseudonimiza e devolve texto sob demanda"""
+
+    def __init__(self, fila, trocas, pseudo):
+        self.fila = fila
+        self.trocas = trocas
+        self.pseudo = pseudo
+        self.buffer = ''
+        self.terminou = False
+        self.linhas = 0
+        self.bytes = 0
+
+    def readable(self):
+        return True
+
+    def read(self, tamanho=-1):
+        if tamanho is None or tamanho < 0:
+            tamanho = float('inf')
+        pedacos = [self.buffer]
+        juntos = len(self.buffer)
+        while juntos < tamanho and not self.terminou:
+            item = self.fila.get()
+            if isinstance(item, _Fim):
+                self.terminou = True
+                if item.erro is not None:
+                    raise item.erro
+                break
+            linha = transformar_linha(item, self.trocas, self.pseudo) + '\n' if self.trocas else item + '\n'
+            self.linhas += 1
+            self.bytes += len(linha)
+            pedacos.append(linha)
+            juntos += len(linha)
+        dados = ''.join(pedacos)
+        if tamanho == float('inf'):
+            self.buffer = ''
+            return dados
+        dados, self.buffer = dados[:tamanho], dados[tamanho:]
+        return dados
+
+
+def _q(nome):
+    return '"' + nome.replace('"', '""') + '"'
+
+
+def copiar_tabela(origem, destino, schema, tabela, colunas, filtro, trocas, pseudo, tamanho_fila):
+    """COPY origem → pseudonimização → COPY destino com memória limitada; devolve (linhas, bytes)."""
+    lista = ', '.join(_q(c) for c in colunas)
+    consulta = f'SELECT {lista} FROM {_q(schema)}.{_q(tabela)}'
+    if filtro:
+        consulta += f' WHERE {filtro}'
+
+    fila = queue.Queue(maxsize=tamanho_fila)
+    parar = threading.Event()
+
+    def produzir():
+        fim = _Fim()
+        try:
+            with origem.cursor() as cursor:
+                cursor.copy_expert(f'COPY ({consulta}) TO STDOUT', _EscritorFila(fila, parar))
+        except Exception as e:  # repassado para a thread principal
+            fim = _Fim(e)
+        while not parar.is_set():
+            try:
+                fila.put(fim, timeout=1)
+                break
+            except queue.Full:
+                pass
+
+    produtor = threading.Thread(target=produzir, name=f'copy-{tabela}', daemon=True)
+    produtor.start()
+    leitor = _LeitorTransformado(fila, trocas, pseudo)
+    try:
+        with destino.cursor() as cursor:
+            cursor.copy_expert(f'COPY {_q(schema)}.{_q(tabela)} ({lista}) FROM STDIN', leitor, size=65536)
+    except BaseException:
+        parar.set()
+        raise
+    finally:
+        produtor.join()
+    return leitor.linhas, leitor.bytes
+
+
+# ----------------------------------------------------------------------
+# Catálogo, ordem e filtros
+# ----------------------------------------------------------------------
+
+SQL_COLUNAS = """
+    SELECT c.relname, a.attname, a.attnotnull
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+    WHERE n.nspname = %s AND c.relkind IN ('r', 'p') AND NOT c.relispartition
+      AND a.attgenerated = ''
+    ORDER BY c.relname, a.attnum
+"""
+
+SQL_FKS = """
+    SELECT filho.relname, pai.relname, c.conname,
+           array_agg(af.attname ORDER BY k.ordem), array_agg(ap.attname ORDER BY k.ordem),
+           bool_and(NOT af.attnotnull)
+    FROM pg_constraint c
+    JOIN pg_class filho ON filho.oid = c.conrelid
+    JOIN pg_class pai ON pai.oid = c.confrelid
+    JOIN pg_namespace n ON n.oid = filho.relnamespace
+    CROSS JOIN LATERAL unnest(c.conkey, c.confkey) WITH ORDINALITY AS k(coluna_filho, coluna_pai, ordem)
+    JOIN pg_attribute af ON af.attrelid = c.conrelid AND af.attnum = k.coluna_filho
+    JOIN pg_attribute ap ON ap.attrelid = c.confrelid AND ap.attnum = k.coluna_pai
+    WHERE c.contype = 'f' AND n.nspname = %s AND pai.relnamespace = n.oid
+    GROUP BY filho.relname, pai.relname, c.conname
+    ORDER BY filho.relname, c.conname
+"""
+
+SQL_SEQUENCIAS = """
+    SELECT c.relname, a.attname, pg_get_serial_sequence(format('%%I.%%I', n.nspname, c.relname), a.attname)
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+    WHERE n.nspname = %s AND c.relname = ANY(%s)
+      AND pg_get_serial_sequence(format('%%I.%%I', n.nspname, c.relname), a.attname) IS NOT NULL
+"""
+
+
+def ler_catalogo(cursor, schema):
+    """({tabela: [(coluna, not null)]}, [fk]) com fk = (filho, pai, nome, colunas, colunas_pai, anulável)"""
+    cursor.execute(SQL_COLUNAS, (schema,))
+    tabelas = {}
+    for tabela, coluna, not_null in cursor.fetchall():
+        tabelas.setdefault(tabela, []).append((coluna, not_null))
+    cursor.execute(SQL_FKS, (schema,))
+    return tabelas, [tuple(linha) for linha in cursor.fetchall()]
+
+
+def ordenar(tabelas, fks):
+    """Pais antes dos filhos (Kahn); tabelas em ciclo vão no fim, em ordem alfabética."""
+    pais = {t: set() for t in tabelas}
+    for filho, pai, *_ in fks:
+        if filho in pais and pai in pais and filho != pai:
+            pais[filho].add(pai)
+    ordem = []
+    prontas = sorted(t for t, p in pais.items() if not p)
+    while prontas:
+        tabela = prontas.pop(0)
+        ordem.append(tabela)
+        for filho, p in sorted(pais.items()):
+            if tabela in p:
+                p.discard(tabela)
+                if not p and filho not in ordem and filho not in prontas:
+                    prontas.append(filho)
+    em_ciclo = sorted(t for t in tabelas if t not in ordem)
+    return ordem + em_ciclo, em_ciclo
+
+
+def montar_filtros(schema, tabelas, fks, ordem, empresas_sql):
+    """
+    {tabela: condição SQL} da amostra por empresa. Sem amostra, nenhum filtro.
+    Tabela sem coluna de empresa herda o filtro da primeira FK de coluna única
+    para uma tabela já filtrada (de preferência NOT NULL).
+    """
+    if empresas_sql is None:
+        return {}
+    filtros = {}
+    for tabela in ordem:
+        colunas = {c for c, _ in tabelas[tabela]}
+        if tabela == TABELA_EMPRESAS:
+            filtros[tabela] = f'id::text = ANY({empresas_sql})'
+            continue
+        coluna_empresa = next((c for c in COLUNAS_EMPRESA if c in colunas), None)
+        if coluna_empresa:
+            filtros[tabela] = f'{_q(coluna_empresa)}::text = ANY({empresas_sql})'
+            continue
+        candidatas = [fk for fk in fks if fk[0] == tabela and fk[1] in filtros and fk[1] != tabela and len(fk[3]) == 1]
+        candidatas.sort(key=lambda fk: fk[5])
+        if candidatas:
+            _, pai, _, (coluna,), (coluna_pai,), anulavel = candidatas[0]
+            condicao = (f'{_q(coluna)} IN (SELECT {_q(coluna_pai)} FROM {_q(schema)}.{_q(pai)} '
+                        f'WHERE {filtros[pai]})')
+            filtros[tabela] = f'({_q(coluna)} IS NULL OR {condicao})' if anulavel else condicao
+    return filtros
+
+
+def montar_trocas(tabelas):
+    """({tabela: [(coluna, tipo)]}, avisos) a partir de REGRAS e do catálogo"""
+    trocas = {}
+    avisos = []
+    for tabela, regras in REGRAS.items():
+        if tabela not in tabelas:
+            continue
+        colunas = {c for c, _ in tabelas[tabela]}
+        for coluna, tipo in regras.items():
+            if coluna in colunas:
+                trocas.setdefault(tabela, []).append((coluna, tipo))
+            else:
+                avisos.append(f'{tabela}.{coluna}: regra para coluna que não existe')
+    for tabela, colunas in sorted(tabelas.items()):
+        cobertas = REGRAS.get(tabela, {})
+        for coluna, _ in colunas:
+            if coluna not in cobertas and PADRAO_SENSIVEL.search(coluna):
+                avisos.append(f'{tabela}.{coluna}: parece dado pessoal e será copiada como está')
+    return trocas, avisos
+
+
+def sortear_empresas(cursor, schema, fracao, fixas, chave):
+    """Ids (texto) das empresas da amostra: fração sorteada de forma estável pela chave + as fixas."""
+    escolhidas = set(fixas)
+    if fracao:
+        cursor.execute(f'SELECT count(*) FROM {_q(schema)}.{_q(TABELA_EMPRESAS)}')
+        quantidade = math.ceil(cursor.fetchone()[0] * fracao)
+        cursor.execute(
+            f'SELECT id::text FROM {_q(schema)}.{_q(TABELA_EMPRESAS)} ORDER BY md5(id::text || %s) LIMIT %s',
+            (chave, quantidade),
+        )
+        escolhidas.update(linha[0] for linha in cursor.fetchall())
+    return sorted(escolhidas)
+
+
+# ----------------------------------------------------------------------
+# Fechamento no destino
+# ----------------------------------------------------------------------
+
+def limpar_orfaos(cursor, schema, fks, ordem):
+    """Apaga (ou anula a FK de) linhas que apontam para fora da cópia, pais antes dos filhos."""
+    posicao = {t: i for i, t in enumerate(ordem)}
+    resultado = []
+    for filho, pai, nome, colunas, colunas_pai, anulavel in sorted(fks, key=lambda fk: posicao.get(fk[0], 0)):
+        if filho not in posicao or pai not in posicao:
+            continue
+        preenchidas = ' AND '.join(f'f.{_q(c)} IS NOT NULL' for c in colunas)
+        casamento = ' AND '.join(f'p.{_q(cp)} = f.{_q(c)}' for c, cp in zip(colunas, colunas_pai))
+        orfas = (f'{preenchidas} AND NOT EXISTS (SELECT 1 FROM {_q(schema)}.{_q(pai)} p WHERE {casamento})')
+        if anulavel:
+            atribuicoes = ', '.join(f'{_q(c)} = NULL' for c in colunas)
+            cursor.execute(f'UPDATE {_q(schema)}.{_q(filho)} f SET {atribuicoes} WHERE {orfas}')
+            acao = 'anuladas'
+        else:
+            cursor.execute(f'DELETE FROM {_q(schema)}.{_q(filho)} f WHERE {orfas}')
+            acao = 'apagadas'
+        if cursor.rowcount:
+            resultado.append((filho, nome, acao, cursor.rowcount))
+    return resultado
+
+
+def acertar_sequencias(cursor, schema, tabelas):
+    cursor.execute(SQL_SEQUENCIAS, (schema, list(tabelas)))
+    for tabela, coluna, sequencia in cursor.fetchall():
+        cursor.execute(
+            f'SELECT setval(%s, coalesce(max({_q(coluna)}), 1), max({_q(coluna)}) IS NOT NULL) '
+            f'FROM {_q(schema)}.{_q(tabela)}',
+            (sequencia,),
+        )
+
+
+# ----------------------------------------------------------------------
+# Execução
+# ----------------------------------------------------------------------
+
+def planejar(origem, schema, fracao, fixas, chave, pular):
+    with origem.cursor() as cursor:
+        tabelas, fks = ler_catalogo(cursor, schema)
+        for tabela in pular:
+            tabelas.pop(tabela, None)
+        ordem, em_ciclo = ordenar(tabelas, fks)
+        empresas = sortear_empresas(cursor, schema, fracao, fixas, chave) if (fracao or fixas) else None
+        empresas_sql = cursor.mogrify('%s::text[]', (empresas,)).decode('utf-8') if empresas is not None else None
+    filtros = montar_filtros(schema, tabelas, fks, ordem, empresas_sql)
+    trocas, avisos = montar_trocas(tabelas)
+    return {'tabelas': tabelas, 'fks': fks, 'ordem': ordem, 'emCiclo': em_ciclo, 'empresas': empresas,
+            'filtros': filtros, 'trocas': trocas, 'avisos': avisos}
+
+
+def imprimir_plano(plano):
+    empresas = plano['empresas']
+    print(f"📋 {len(plano['ordem'])} tabela(s); "
+          + ('todas as empresas' if empresas is None else f'{len(empresas)} empresa(s) na amostra'))
+    for tabela in plano['ordem']:
+        filtro = plano['filtros'].get(tabela)
+        if empresas is None:
+            escopo = ''
+        elif filtro is None:
+            escopo = '  [inteira]'
+        else:
+            colunas = {c for c, _ in plano['tabelas'][tabela]}
+            diretas = tabela == TABELA_EMPRESAS or any(c in colunas for c in COLUNAS_EMPRESA)
+            escopo = '  [empresa]' if diretas else '  [via FK]'
+        trocas = ', '.join(f'{c}→{t}' for c, t in plano['trocas'].get(tabela, []))
+        print(f"   {tabela}{escopo}" + (f"  ({trocas})" if trocas else ''))
+    if plano['emCiclo']:
+        print(f"   ⚠️  Em ciclo de FKs (copiadas no fim): {', '.join(plano['emCiclo'])}")
+    for aviso in plano['avisos']:
+        print(f"   ⚠️  {aviso}")
+
+
+def copiar(origem, destino, schema, plano, pseudo, truncar, tamanho_fila):
+    tabelas = plano['tabelas']
+    with destino.cursor() as cursor:
+        cursor.execute("SET session_replication_role = replica")
+        cursor.execute(
+            "SELECT c.relname, array_agg(a.attname) FROM pg_class c "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped "
+            "WHERE n.nspname = %s AND c.relkind IN ('r', 'p') AND a.attgenerated = '' GROUP BY c.relname",
+            (schema,),
+        )
+        no_destino = {t: set(c) for t, c in cursor.fetchall()}
+        faltando = [t for t in plano['ordem'] if t not in no_destino]
+        if faltando:
+            raise ValueError(f"tabelas ausentes no destino (rode as migrations): {', '.join(faltando)}")
+        if truncar:
+            cursor.execute('TRUNCATE ' + ', '.join(f'{_q(schema)}.{_q(t)}' for t in plano['ordem']))
+        else:
+            for tabela in plano['ordem']:
+                cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {_q(schema)}.{_q(tabela)})')
+                if cursor.fetchone()[0]:
+                    raise ValueError(f'{tabela} já tem dados no destino; use --truncar')
+    destino.commit()
+
+    total_linhas = total_bytes = 0
+    inicio_geral = time.perf_counter()
+    for tabela in plano['ordem']:
+        colunas = [c for c, _ in tabelas[tabela] if c in no_destino[tabela]]
+        ignoradas = [c for c, _ in tabelas[tabela] if c not in no_destino[tabela]]
+        trocas = [(colunas.index(c), t) for c, t in plano['trocas'].get(tabela, []) if c in colunas]
+        inicio = time.perf_counter()
+        linhas, tamanho = copiar_tabela(origem, destino, schema, tabela, colunas, plano['filtros'].get(tabela),
+                                        trocas, pseudo, tamanho_fila)
+        destino.commit()
+        total_linhas += linhas
+        total_bytes += tamanho
+        decorrido = time.perf_counter() - inicio
+        extra = f"  ⚠️ sem no destino: {', '.join(ignoradas)}" if ignoradas else ''
+        print(f"   ✅ {tabela}: {linhas:,} linha(s), {tamanho / 1048576:.1f} MB em {decorrido:.1f}s{extra}")
+
+    print("🔗 Conferindo FKs...")
+    with destino.cursor() as cursor:
+        orfaos = limpar_orfaos(cursor, schema, plano['fks'], plano['ordem'])
+        acertar_sequencias(cursor, schema, plano['ordem'])
+    destino.commit()
+    for tabela, nome, acao, quantidade in orfaos:
+        print(f"   🧹 {tabela} ({nome}): {quantidade:,} linha(s) {acao}")
+
+    destino.autocommit = True
+    with destino.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    destino.autocommit = False
+    return total_linhas, total_bytes, time.perf_counter() - inicio_geral
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Cópia anonimizada e amostrada por empresa para benchmarks locais')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    def opcoes_origem(p):
+        p.add_argument('--schema', default=SCHEMA_PADRAO)
+        p.add_argument('--chave', default=os.environ.get('ANONIMIZAR_CHAVE'),
+                       help='Chave do HMAC (ou ANONIMIZAR_CHAVE). Mesma chave, mesmos pseudônimos')
+        p.add_argument('--amostra', type=float, help='Fração das empresas copiadas (ex.: 0.1)')
+        p.add_argument('--empresa', action='append', default=[], help='Empresa sempre incluída (pode repetir)')
+        p.add_argument('--pular', action='append', default=[], help='Tabela que não é copiada (pode repetir)')
+
+    p_plano = sub.add_parser('planejar', help='Mostra ordem, filtros e colunas pseudonimizadas (só lê a origem)')
+    opcoes_origem(p_plano)
+
+    p_copiar = sub.add_parser('copiar', help='Copia da origem (DATABASE_*) para o destino')
+    opcoes_origem(p_copiar)
+    p_copiar.add_argument('--destino-host', default=None)
+    p_copiar.add_argument('--destino-porta', type=int, default=None)
+    p_copiar.add_argument('--destino-banco', required=True)
+    p_copiar.add_argument('--destino-usuario', default=None)
+    p_copiar.add_argument('--destino-senha', default=None)
+    p_copiar.add_argument('--truncar', action='store_true', help='Esvazia as tabelas do destino antes')
+    p_copiar.add_argument('--fila', type=int, default=FILA_PADRAO,
+                          help=f'Linhas em trânsito entre origem e destino (padrão: {FILA_PADRAO})')
+
+    p_texto = sub.add_parser('texto', help='Pseudonimiza um valor avulso')
+    p_texto.add_argument('valor')
+    p_texto.add_argument('--tipo', choices=TIPOS, default='texto')
+    p_texto.add_argument('--chave', default=os.environ.get('ANONIMIZAR_CHAVE'))
+    args = parser.parse_args(argv)
+
+    if not args.chave:
+        print("❌ Informe --chave ou ANONIMIZAR_CHAVE")
+        return 1
+    amostra = getattr(args, 'amostra', None)
+    if amostra is not None and not 0 < amostra <= 1:
+        print("❌ --amostra deve estar entre 0 e 1")
+        return 1
+    pseudo = Pseudonimizador(args.chave)
+
+    if args.comando == 'texto':
+        print(pseudo.aplicar(args.tipo, args.valor))
+        return 0
+
+    import psycopg2
+    from conectcrm_ops.db import DB_CONFIG, conectar
+
+    origem = conectar()
+    origem.set_session(isolation_level='REPEATABLE READ', readonly=True)
+    destino = None
+    try:
+        plano = planejar(origem, args.schema, args.amostra, args.empresa, args.chave, args.pular)
+        if args.comando == 'planejar':
+            imprimir_plano(plano)
+            return 0
+
+        config_destino = {
+            'host': args.destino_host or DB_CONFIG['host'],
+            'port': args.destino_porta or DB_CONFIG['port'],
+            'database': args.destino_banco,
+            'user': args.destino_usuario or DB_CONFIG['user'],
+            'password': args.destino_senha or DB_CONFIG['password'],
+        }
+        if all(config_destino[k] == DB_CONFIG[k] for k in ('host', 'port', 'database')):
+            print("❌ Destino igual à origem")
+            return 1
+        imprimir_plano(plano)
+        destino = conectar(**config_destino)
+        print(f"🚚 Copiando para {config_destino['database']}@{config_destino['host']}:{config_destino['port']}...")
+        try:
+            linhas, tamanho, decorrido = copiar(origem, destino, args.schema, plano, pseudo, args.truncar, args.fila)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return 1
+        except psycopg2.errors.InsufficientPrivilege as e:
+            print(f"❌ O destino precisa de superusuário (session_replication_role): {e}")
+            return 1
+        except psycopg2.Error as e:
+            print(f"❌ {e}")
+            return 1
+    finally:
+        origem.close()
+        if destino is not None:
+            destino.close()
+
+    print(f"✅ {linhas:,} linha(s), {tamanho / 1048576:.1f} MB em {decorrido / 60:.1f} min")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Auditoria de visibilidade dos núcleos no bot para todas as empresas
+
+Junta o que verificar-nucleos-bot.py, verificar-departamentos.py e
+verificar-horarios-nucleos.py mostram para uma empresa fixa e classifica cada
+núcleo de cada empresa como visível ou invisível, com os motivos:
+
+- inativo                 (ativo = false)
+- oculto_no_bot           (visivel_no_bot = false)
+- sem_departamento        (nenhum departamento ativo e visível no bot)
+- fora_horario            (fechado pelo horario_funcionamento no instante auditado)
+
+As empresas são divididas em lotes; cada lote é uma consulta executada por um
+worker de um pool de threads, com conexões de um ThreadedConnectionPool.
+
+Uso:
+    python -m conectcrm_ops.auditoria_bot --formato csv --saida auditoria.csv
+    python -m conectcrm_ops.auditoria_bot --workers 16 --lote 200 --formato json
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+from conectcrm_ops.horario import TIMEZONE_PADRAO, avisos_configuracao, verificar_disponibilidade
+
+VISIVEL = 'visivel'
+INVISIVEL = 'invisivel'
+
+SQL_EMPRESAS = "SELECT id FROM empresas ORDER BY id"
+
+SQL_NUCLEOS_LOTE = """
+    WITH deps AS (
+        SELECT
+            d.nucleo_id,
+            COUNT(*) AS total,
+            COUNT(*) FILTER (WHERE d.ativo = true AND d.visivel_no_bot = true) AS visiveis
+        FROM departamentos d
+        WHERE d.empresa_id = ANY(%s::uuid[])
+        GROUP BY d.nucleo_id
+    )
+    SELECT
+        n.empresa_id,
+        n.id,
+        n.nome,
+        n.codigo,
+        n.ativo,
+        n.visivel_no_bot,
+        n.prioridade,
+        n.horario_funcionamento,
+        COALESCE(deps.total, 0) AS departamentos_total,
+        COALESCE(deps.visiveis, 0) AS departamentos_visiveis
+    FROM nucleos_atendimento n
+    LEFT JOIN deps ON deps.nucleo_id = n.id
+    WHERE n.empresa_id = ANY(%s::uuid[])
+    ORDER BY n.empresa_id, n.prioridade ASC, n.nome ASC
+"""
+
+CAMPOS_CSV = [
+    'empresa_id', 'nucleo_id', 'nome', 'codigo', 'status', 'motivos',
+    'departamentos_total', 'departamentos_visiveis', 'horario_motivo', 'avisos',
+]
+
+
+def classificar_nucleo(linha, quando):
+    (empresa_id, nucleo_id, nome, codigo, ativo, visivel_no_bot, prioridade,
+     horario, departamentos_total, departamentos_visiveis) = linha
+
+    motivos = []
+    if not ativo:
+        motivos.append('inativo')
+    if not visivel_no_bot:
+        motivos.append('oculto_no_bot')
+    if not departamentos_visiveis:
+        motivos.append('sem_departamento')
+
+    disponibilidade = verificar_disponibilidade(horario, quando)
+    if not disponibilidade['estaAberto']:
+        motivos.append('fora_horario')
+
+    return {
+        'empresa_id': str(empresa_id),
+        'nucleo_id': str(nucleo_id),
+        'nome': nome,
+        'codigo': codigo,
+        'status': INVISIVEL if motivos else VISIVEL,
+        'motivos': motivos,
+        'departamentos_total': departamentos_total,
+        'departamentos_visiveis': departamentos_visiveis,
+        'horario_motivo': disponibilidade['motivoFechado'],
+        'avisos': avisos_configuracao(horario),
+    }
+
+
+def auditar_lote(pool, empresa_ids, quando):
+    conn = pool.getconn()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(SQL_NUCLEOS_LOTE, (empresa_ids, empresa_ids))
+            linhas = cursor.fetchall()
+        conn.rollback()
+    finally:
+        pool.putconn(conn)
+
+    return [classificar_nucleo(linha, quando) for linha in linhas]
+
+
+def dividir(itens, tamanho):
+    return [itens[i:i + tamanho] for i in range(0, len(itens), tamanho)]
+
+
+def auditar(pool, empresa_ids, quando=None, workers=8, lote=100, progresso=None):
+    """Audita todas as empresas informadas; devolve a lista de núcleos classificados"""
+    quando = quando or datetime.now(timezone.utc)
+    lotes = dividir([str(e) for e in empresa_ids], lote)
+    resultado = []
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futuros = [executor.submit(auditar_lote, pool, ids, quando) for ids in lotes]
+        for concluidos, futuro in enumerate(as_completed(futuros), 1):
+            resultado.extend(futuro.result())
+            if progresso:
+                progresso(concluidos, len(lotes))
+
+    resultado.sort(key=lambda n: (n['empresa_id'], n['nome'] or ''))
+    return resultado
+
+
+def escrever_csv(nucleos, arquivo):
+    escritor = csv.DictWriter(arquivo, fieldnames=CAMPOS_CSV)
+    escritor.writeheader()
+    for nucleo in nucleos:
+        escritor.writerow({
+            **nucleo,
+            'motivos': '|'.join(nucleo['motivos']),
+            'avisos': '|'.join(nucleo['avisos']),
+        })
+
+
+def resumo(nucleos):
+    empresas = {}
+    motivos = {}
+    for nucleo in nucleos:
+        contagem = empresas.setdefault(nucleo['empresa_id'], [0, 0])
+        contagem[0 if nucleo['status'] == VISIVEL else 1] += 1
+        for motivo in nucleo['motivos']:
+            motivos[motivo] = motivos.get(motivo, 0) + 1
+
+    return {
+        'empresas': len(empresas),
+        'empresasSemNucleoVisivel': sum(1 for v, _ in empresas.values() if v == 0),
+        'nucleos': len(nucleos),
+        'visiveis': sum(v for v, _ in empresas.values()),
+        'invisiveis': sum(i for _, i in empresas.values()),
+        'motivos': motivos,
+    }
+
+
+def main(argv=None):
+    from psycopg2.pool import ThreadedConnectionPool
+
+    from conectcrm_ops.db import DB_CONFIG, conectar
+
+    parser = argparse.ArgumentParser(description='Audita a visibilidade dos núcleos no bot em todas as empresas')
+    parser.add_argument('--empresa', action='append', help='Restringe a auditoria a estas empresas')
+    parser.add_argument('--workers', type=int, default=8, help='Consultas em paralelo (padrão: 8)')
+    parser.add_argument('--lote', type=int, default=100, help='Empresas por consulta (padrão: 100)')
+    parser.add_argument('--quando', help=f'Instante auditado em ISO 8601; sem fuso, {TIMEZONE_PADRAO} (padrão: agora)')
+    parser.add_argument('--formato', choices=['json', 'csv'], default='json')
+    parser.add_argument('--saida', help='Arquivo de saída (padrão: stdout)')
+    args = parser.parse_args(argv)
+
+    quando = datetime.fromisoformat(args.quando) if args.quando else datetime.now(timezone.utc)
+    if quando.tzinfo is None:
+        # Como no horario.py: horário sem fuso é o de Brasília, não UTC
+        quando = quando.replace(tzinfo=ZoneInfo(TIMEZONE_PADRAO))
+    inicio = time.perf_counter()
+
+    empresa_ids = args.empresa
+    if not empresa_ids:
+        conn = conectar()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(SQL_EMPRESAS)
+                empresa_ids = [str(linha[0]) for linha in cursor]
+        finally:
+            conn.close()
+
+    print(f"🔎 Auditando {len(empresa_ids)} empresa(s) com {args.workers} worker(s)...", file=sys.stderr)
+
+    pool = ThreadedConnectionPool(1, args.workers, **DB_CONFIG)
+    try:
+        nucleos = auditar(
+            pool, empresa_ids, quando, args.workers, args.lote,
+            progresso=lambda feitos, total: print(f"   lote {feitos}/{total}", file=sys.stderr),
+        )
+    finally:
+        pool.closeall()
+
+    saida = open(args.saida, 'w', encoding='utf-8', newline='') if args.saida else sys.stdout
+    try:
+        if args.formato == 'csv':
+            escrever_csv(nucleos, saida)
+        else:
+            json.dump({'quando': quando.isoformat(), 'resumo': resumo(nucleos), 'nucleos': nucleos},
+                      saida, indent=2, ensure_ascii=False)
+            saida.write('\n')
+    finally:
+        if args.saida:
+            saida.close()
+
+    r = resumo(nucleos)
+    print(f"\n📈 RESUMO ({time.perf_counter() - inicio:.1f}s):", file=sys.stderr)
+    print(f"   ✅ Núcleos visíveis: {r['visiveis']}", file=sys.stderr)
+    print(f"   🚫 Núcleos invisíveis: {r['invisiveis']}", file=sys.stderr)
+    print(f"   ⚠️  Empresas sem nenhum núcleo visível: {r['empresasSemNucleoVisivel']}", file=sys.stderr)
+    for motivo, total in sorted(r['motivos'].items()):
+        print(f"      - {motivo}: {total}", file=sys.stderr)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
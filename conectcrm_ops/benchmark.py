@@ -0,0 +1,480 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark das consultas quentes da triagem, com captura de EXPLAIN
+
+As consultas abaixo são as mesmas que o bot roda a cada mensagem (fluxo padrão,
+findOpcoesParaBot) e as que os scripts da raiz usam para inspecionar núcleos e
+etapas (testar-nucleos-bot.py, verificar-nucleos-bot.py, verificar-botoes.py,
+verificar-mensagem.py).
+
+"semear" cria um schema separado (padrão: bench_triagem) com cópias das tabelas
+reais (CREATE TABLE ... LIKE ... INCLUDING ALL, ou seja, mesmos índices e
+padrões, sem as FKs) e gera empresas sintéticas direto no servidor. Os IDs são
+md5('bench-...')::uuid, então as mesmas empresas existem em qualquer máquina
+que semeie com a mesma escala.
+
+"medir" roda cada consulta com empresas sorteadas, guarda p50/p95/p99 e o
+EXPLAIN (ANALYZE, BUFFERS) e, com --baseline, falha (código 1) quando o p95
+piora além da tolerância ou a forma do plano muda (tipos de nó, tabelas e
+índices usados).
+
+Uso:
+    python -m conectcrm_ops.benchmark semear --empresas 1000 --nucleos 50 --etapas 150
+    python -m conectcrm_ops.benchmark medir --salvar benchmark-baseline.json --planos planos/
+    python -m conectcrm_ops.benchmark medir --baseline benchmark-baseline.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+import uuid
+
+from conectcrm_ops.histograma import Histograma
+from conectcrm_ops.opcoes_bot import montar_consulta
+
+SCHEMA_PADRAO = 'bench_triagem'
+TABELAS = ('nucleos_atendimento', 'departamentos', 'fluxos_triagem')
+PERCENTIS = (50, 95, 99)
+VERSAO_BASELINE = 1
+
+# Colunas lidas pelas consultas que não vêm das migrations (criadas pelo synchronize)
+COLUNAS_EXTRAS = {
+    'nucleos_atendimento': [('visivel_no_bot', 'BOOLEAN DEFAULT TRUE')],
+    'departamentos': [('visivel_no_bot', 'BOOLEAN DEFAULT TRUE'), ('ordem', 'INTEGER DEFAULT 0')],
+}
+
+HORARIO_PADRAO = {
+    dia: {'ativo': True, 'inicio': '08:00', 'fim': '18:00'}
+    for dia in ('segunda', 'terca', 'quarta', 'quinta', 'sexta')
+}
+
+SQL_NUCLEOS = """
+    INSERT INTO nucleos_atendimento (
+        id, empresa_id, nome, descricao, codigo, ativo, visivel_no_bot, prioridade,
+        horario_funcionamento, mensagem_boas_vindas, mensagem_fora_horario
+    )
+    SELECT
+        md5('bench-nucleo-' || e || '-' || n)::uuid,
+        md5('bench-empresa-' || e)::uuid,
+        'Núcleo ' || n,
+        'Núcleo sintético ' || n || ' da empresa ' || e,
+        'N' || n,
+        n %% 10 <> 0,
+        n %% 4 <> 0,
+        n %% 7,
+        %(horario)s::jsonb,
+        'Olá! Você está no núcleo ' || n || '.',
+        'Estamos fora do horário de atendimento.'
+    FROM generate_series(1, %(empresas)s) AS e, generate_series(1, %(nucleos)s) AS n
+"""
+
+SQL_DEPARTAMENTOS = """
+    INSERT INTO departamentos (id, empresa_id, nucleo_id, nome, descricao, ativo, visivel_no_bot, ordem)
+    SELECT
+        md5('bench-departamento-' || e || '-' || n || '-' || d)::uuid,
+        md5('bench-empresa-' || e)::uuid,
+        md5('bench-nucleo-' || e || '-' || n)::uuid,
+        'Departamento ' || d,
+        'Departamento sintético ' || d,
+        d %% 5 <> 0,
+        d %% 3 <> 0,
+        d
+    FROM generate_series(1, %(empresas)s) AS e,
+         generate_series(1, %(nucleos)s) AS n,
+         generate_series(1, %(departamentos)s) AS d
+"""
+
+SQL_FLUXOS = """
+    INSERT INTO fluxos_triagem (
+        id, empresa_id, nome, codigo, ativo, versao, publicado, prioridade, estrutura, published_at
+    )
+    SELECT
+        md5('bench-fluxo-' || e || '-' || f)::uuid,
+        md5('bench-empresa-' || e)::uuid,
+        'Fluxo ' || f,
+        'FLUXO_' || f,
+        true,
+        f,
+        f = 1,
+        CASE WHEN f = 1 THEN 10 ELSE 0 END,
+        %(estrutura)s::jsonb,
+        CASE WHEN f = 1 THEN NOW() - make_interval(days => e %% 30) END
+    FROM generate_series(1, %(empresas)s) AS e, generate_series(1, %(fluxos)s) AS f
+"""
+
+# (nome, origem, sql, parâmetros a partir de (empresa, fluxo))
+CONSULTAS = [
+    (
+        'fluxo_padrao', 'triagem-bot.service.ts (processarMensagemWhatsApp)',
+        """
+            SELECT *
+            FROM fluxos_triagem
+            WHERE empresa_id = %s
+              AND ativo = TRUE
+              AND publicado = TRUE
+              AND %s = ANY(canais)
+            ORDER BY prioridade DESC, published_at DESC, updated_at DESC, created_at DESC
+            LIMIT 1
+        """,
+        lambda empresa, fluxo: (empresa, 'whatsapp'),
+    ),
+    (
+        'opcoes_bot', 'testar-nucleos-bot.py / nucleo.service.ts (findOpcoesParaBot)',
+        montar_consulta(['00000000-0000-0000-0000-000000000000'])[0],
+        lambda empresa, fluxo: montar_consulta([empresa])[1],
+    ),
+    (
+        'nucleos_empresa', 'verificar-nucleos-bot.py',
+        """
+            SELECT id, nome, ativo, visivel_no_bot, prioridade, codigo
+            FROM nucleos_atendimento
+            WHERE empresa_id = %s
+            ORDER BY prioridade ASC, nome ASC
+        """,
+        lambda empresa, fluxo: (empresa,),
+    ),
+    (
+        'botoes_fluxo', 'verificar-botoes.py',
+        """
+            SELECT
+                versao,
+                published_at AT TIME ZONE 'America/Sao_Paulo' AS publicado,
+                estrutura->'etapas'->'boas-vindas' AS boas_vindas,
+                estrutura->'etapas'->'despedida-cancelamento' AS despedida
+            FROM fluxos_triagem
+            WHERE id = %s
+        """,
+        lambda empresa, fluxo: (fluxo,),
+    ),
+    (
+        'mensagem_cliente_existente', 'verificar-mensagem.py',
+        """
+            SELECT estrutura->'etapas'->'boas-vindas'->'metadata'->>'mensagemClienteExistente'
+            FROM fluxos_triagem WHERE id = %s
+        """,
+        lambda empresa, fluxo: (fluxo,),
+    ),
+]
+
+
+def id_sintetico(*partes):
+    """Mesmo valor de md5('bench-...')::uuid no Postgres"""
+    texto = 'bench-' + '-'.join(str(p) for p in partes)
+    return str(uuid.UUID(hashlib.md5(texto.encode('utf-8')).hexdigest()))
+
+
+# ----------------------------------------------------------------------
+# Semeadura
+# ----------------------------------------------------------------------
+
+def montar_estrutura(etapas):
+    """
+    Fluxo padrão v3 acrescido de etapas de menu até somar `etapas`, para que o
+    JSONB tenha o tamanho de um fluxo grande de produção (TOAST incluído).
+    """
+    from conectcrm_ops.fluxos import carregar_estrutura
+
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    estrutura = carregar_estrutura(os.path.join(raiz, 'fluxo-padrao-triagem-v3.json'))
+    todas = estrutura['etapas']
+
+    boas_vindas = todas.setdefault('boas-vindas', {'id': 'boas-vindas', 'tipo': 'menu', 'mensagem': 'Olá!'})
+    boas_vindas.setdefault('metadata', {}).setdefault(
+        'mensagemClienteExistente', 'Olá {{primeiroNome}}, que bom te ver de novo! Como podemos ajudar?'
+    )
+    todas.setdefault('despedida-cancelamento', {
+        'id': 'despedida-cancelamento',
+        'tipo': 'mensagem',
+        'mensagem': '👋 Atendimento cancelado. Até logo!',
+        'metadata': {'finalizarSessao': True},
+    })
+
+    i = 0
+    while len(todas) < etapas:
+        i += 1
+        etapa_id = f'menu-sintetico-{i}'
+        todas[etapa_id] = {
+            'id': etapa_id,
+            'tipo': 'menu',
+            'mensagem': f'Menu sintético {i}: escolha uma das opções abaixo para continuar o atendimento. ' * 3,
+            'opcoes': [
+                {
+                    'id': f'{etapa_id}-{n}',
+                    'valor': str(n),
+                    'texto': f'Opção {n} do menu {i}',
+                    'acao': 'proximo_passo',
+                    'proximaEtapa': f'menu-sintetico-{i + 1}' if n < 4 else 'transferir-atendimento',
+                }
+                for n in range(1, 6)
+            ],
+        }
+    return estrutura
+
+
+def semear(conn, schema, empresas, nucleos, departamentos, fluxos, etapas):
+    from psycopg2 import sql
+    from psycopg2.extras import Json
+
+    parametros = {
+        'empresas': empresas, 'nucleos': nucleos, 'departamentos': departamentos,
+        'fluxos': fluxos, 'etapas': etapas,
+    }
+    estrutura = montar_estrutura(etapas)
+    esquema = sql.Identifier(schema)
+
+    with conn.cursor() as cursor:
+        cursor.execute(sql.SQL('DROP SCHEMA IF EXISTS {} CASCADE').format(esquema))
+        cursor.execute(sql.SQL('CREATE SCHEMA {}').format(esquema))
+        for tabela in TABELAS:
+            cursor.execute(sql.SQL('CREATE TABLE {}.{} (LIKE public.{} INCLUDING ALL)').format(
+                esquema, sql.Identifier(tabela), sql.Identifier(tabela)
+            ))
+            for coluna, tipo in COLUNAS_EXTRAS.get(tabela, []):
+                cursor.execute(sql.SQL('ALTER TABLE {}.{} ADD COLUMN IF NOT EXISTS {} ' + tipo).format(
+                    esquema, sql.Identifier(tabela), sql.Identifier(coluna)
+                ))
+        cursor.execute(sql.SQL('CREATE TABLE {}.semeadura (parametros JSONB NOT NULL)').format(esquema))
+        cursor.execute(sql.SQL('INSERT INTO {}.semeadura VALUES (%s)').format(esquema), (Json(parametros),))
+
+        cursor.execute(sql.SQL('SET LOCAL search_path TO {}').format(esquema))
+        etapas_sql = [
+            ('núcleos', SQL_NUCLEOS, {'horario': Json(HORARIO_PADRAO)}),
+            ('departamentos', SQL_DEPARTAMENTOS, {}),
+            ('fluxos', SQL_FLUXOS, {'estrutura': Json(estrutura)}),
+        ]
+        for nome, consulta, extras in etapas_sql:
+            inicio = time.perf_counter()
+            cursor.execute(consulta, {**parametros, **extras})
+            print(f"   🌱 {cursor.rowcount:,} {nome} em {time.perf_counter() - inicio:.1f}s")
+
+        for tabela in TABELAS:
+            cursor.execute(sql.SQL('ANALYZE {}').format(sql.Identifier(tabela)))
+
+    conn.commit()
+    return parametros
+
+
+def ler_semeadura(cursor, schema):
+    from psycopg2 import sql
+
+    cursor.execute(
+        "SELECT to_regclass(%s)", (f'{schema}.semeadura',)
+    )
+    if cursor.fetchone()[0] is None:
+        return None
+    cursor.execute(sql.SQL('SELECT parametros FROM {}.semeadura').format(sql.Identifier(schema)))
+    return cursor.fetchone()[0]
+
+
+# ----------------------------------------------------------------------
+# Medição
+# ----------------------------------------------------------------------
+
+def forma_plano(no):
+    """Tipos de nó, tabelas e índices do plano, sem custos nem contagens"""
+    partes = [no['Node Type']]
+    if no.get('Join Type') and no['Node Type'].endswith('Join'):
+        partes[0] = f"{no['Join Type']} {no['Node Type']}"
+    for chave in ('Relation Name', 'Index Name', 'CTE Name'):
+        if no.get(chave):
+            partes.append(no[chave])
+    filhos = [forma_plano(f) for f in no.get('Plans') or []]
+    texto = ' '.join(partes)
+    return f"{texto}({', '.join(filhos)})" if filhos else texto
+
+
+def capturar_plano(cursor, consulta, params):
+    cursor.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + consulta, params)
+    plano = cursor.fetchone()[0]
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    raiz = plano[0]['Plan']
+    return plano, {
+        'forma': forma_plano(raiz),
+        'buffersHit': raiz.get('Shared Hit Blocks', 0),
+        'buffersRead': raiz.get('Shared Read Blocks', 0),
+        'execucaoMs': plano[0].get('Execution Time'),
+    }
+
+
+def medir(conn, schema, semeadura, repeticoes, aquecimento, semente, planos=None):
+    from psycopg2 import sql
+
+    rng = random.Random(semente)
+    amostras = [
+        (id_sintetico('empresa', e), id_sintetico('fluxo', e, rng.randint(1, semeadura['fluxos'])))
+        for e in (rng.randint(1, semeadura['empresas']) for _ in range(aquecimento + repeticoes))
+    ]
+    resultados = {}
+
+    with conn.cursor() as cursor:
+        cursor.execute(sql.SQL('SET search_path TO {}').format(sql.Identifier(schema)))
+        conn.commit()
+
+        for nome, origem, consulta, parametros in CONSULTAS:
+            latencia = Histograma()
+            for i, (empresa, fluxo) in enumerate(amostras):
+                params = parametros(empresa, fluxo)
+                inicio = time.perf_counter()
+                cursor.execute(consulta, params)
+                cursor.fetchall()
+                decorrido = (time.perf_counter() - inicio) * 1_000_000
+                if i >= aquecimento:
+                    latencia.registrar(decorrido)
+            conn.rollback()
+
+            plano, resumo = capturar_plano(cursor, consulta, parametros(*amostras[0]))
+            conn.rollback()
+
+            percentis = latencia.percentis(PERCENTIS)
+            resultados[nome] = {
+                'origem': origem,
+                **{f'p{p}Us': percentis[p] for p in PERCENTIS},
+                **resumo,
+                'plano': plano,
+            }
+
+            if planos:
+                os.makedirs(planos, exist_ok=True)
+                with open(os.path.join(planos, f'{nome}.json'), 'w', encoding='utf-8') as arquivo:
+                    json.dump(plano, arquivo, indent=2, ensure_ascii=False)
+
+    return resultados
+
+
+def comparar(resultados, baseline, tolerancia, folga_us):
+    """{consulta: [problemas]} em relação à baseline salva"""
+    problemas = {}
+    for nome, atual in resultados.items():
+        anterior = baseline['consultas'].get(nome)
+        lista = []
+        if anterior is None:
+            lista.append('sem baseline')
+        else:
+            limite = anterior['p95Us'] * (1 + tolerancia) + folga_us
+            if atual['p95Us'] > limite:
+                lista.append(
+                    f"p95 {formatar_us(atual['p95Us'])} > {formatar_us(limite)} "
+                    f"(baseline {formatar_us(anterior['p95Us'])})"
+                )
+            if atual['forma'] != anterior['forma']:
+                lista.append(f"plano mudou: {anterior['forma']} → {atual['forma']}")
+        problemas[nome] = lista
+    return problemas
+
+
+def formatar_us(us):
+    if us is None:
+        return '-'
+    return f'{us / 1000:.2f}ms'
+
+
+def imprimir_resultados(resultados, problemas):
+    print(f"\n{'Consulta':<28} {'p50':>9} {'p95':>9} {'p99':>9} {'hit':>7} {'read':>6}  Situação")
+    for nome, dados in resultados.items():
+        lista = problemas.get(nome) if problemas is not None else None
+        situacao = '-' if lista is None else ('✅' if not lista or lista == ['sem baseline'] else '❌')
+        print(
+            f"{nome:<28} "
+            + ' '.join(f"{formatar_us(dados[f'p{p}Us']):>9}" for p in PERCENTIS)
+            + f" {dados['buffersHit']:>7} {dados['buffersRead']:>6}  {situacao}"
+        )
+        print(f"   {dados['origem']}")
+        print(f"   plano: {dados['forma']}")
+        for problema in lista or []:
+            print(f"   ⚠️  {problema}")
+
+
+def main(argv=None):
+    from conectcrm_ops.db import conectar
+
+    parser = argparse.ArgumentParser(description='Benchmark das consultas quentes da triagem com EXPLAIN')
+    parser.add_argument('--schema', default=SCHEMA_PADRAO, help=f'Schema dos dados sintéticos (padrão: {SCHEMA_PADRAO})')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_semear = sub.add_parser('semear', help='Recria o schema com empresas sintéticas')
+    p_semear.add_argument('--empresas', type=int, default=1000, help='Empresas (padrão: 1000)')
+    p_semear.add_argument('--nucleos', type=int, default=50, help='Núcleos por empresa (padrão: 50)')
+    p_semear.add_argument('--departamentos', type=int, default=3, help='Departamentos por núcleo (padrão: 3)')
+    p_semear.add_argument('--fluxos', type=int, default=3, help='Fluxos por empresa, 1 publicado (padrão: 3)')
+    p_semear.add_argument('--etapas', type=int, default=150, help='Etapas em cada fluxo (padrão: 150)')
+
+    p_medir = sub.add_parser('medir', help='Mede as consultas e compara com a baseline')
+    p_medir.add_argument('--repeticoes', type=int, default=200, help='Execuções medidas por consulta (padrão: 200)')
+    p_medir.add_argument('--aquecimento', type=int, default=20, help='Execuções descartadas antes de medir')
+    p_medir.add_argument('--semente', type=int, default=0, help='Semente do sorteio de empresas')
+    p_medir.add_argument('--baseline', help='JSON de uma medição anterior para comparar')
+    p_medir.add_argument('--salvar', help='Grava esta medição como baseline')
+    p_medir.add_argument('--planos', help='Diretório para os EXPLAIN (ANALYZE, BUFFERS) em JSON')
+    p_medir.add_argument('--tolerancia', type=float, default=0.5,
+                         help='Piora aceita no p95, em fração da baseline (padrão: 0.5)')
+    p_medir.add_argument('--folga-us', type=int, default=200,
+                         help='Folga absoluta no p95 em µs, para consultas muito rápidas (padrão: 200)')
+    p_medir.add_argument('--json', action='store_true', help='Imprime o resultado em JSON')
+    args = parser.parse_args(argv)
+
+    conn = conectar()
+    try:
+        if args.comando == 'semear':
+            print(f"🌱 Semeando {args.empresas} empresa(s) x {args.nucleos} núcleo(s) em '{args.schema}'...")
+            inicio = time.perf_counter()
+            semear(conn, args.schema, args.empresas, args.nucleos, args.departamentos, args.fluxos, args.etapas)
+            print(f"✅ Pronto em {time.perf_counter() - inicio:.1f}s")
+            return 0
+
+        with conn.cursor() as cursor:
+            semeadura = ler_semeadura(cursor, args.schema)
+        if semeadura is None:
+            print(f"❌ Schema '{args.schema}' não foi semeado. Rode o subcomando semear antes.")
+            return 1
+
+        baseline = None
+        if args.baseline:
+            with open(args.baseline, 'r', encoding='utf-8') as arquivo:
+                baseline = json.load(arquivo)
+            if baseline.get('semeadura') != semeadura:
+                print(f"❌ Baseline medida com outra escala: {baseline.get('semeadura')} (atual: {semeadura})")
+                return 1
+
+        if not args.json:
+            print(f"⏱️  {len(CONSULTAS)} consulta(s) x {args.repeticoes} execução(ões) em '{args.schema}' {semeadura}")
+        resultados = medir(
+            conn, args.schema, semeadura, args.repeticoes, args.aquecimento, args.semente, args.planos
+        )
+    finally:
+        conn.close()
+
+    problemas = comparar(resultados, baseline, args.tolerancia, args.folga_us) if baseline else None
+
+    if args.salvar:
+        from conectcrm_ops.historico import gravar_atomico
+
+        gravar_atomico(args.salvar, json.dumps({
+            'versao': VERSAO_BASELINE,
+            'semeadura': semeadura,
+            'consultas': resultados,
+        }, indent=2, ensure_ascii=False))
+
+    if args.json:
+        print(json.dumps({
+            'semeadura': semeadura,
+            'consultas': {n: {k: v for k, v in d.items() if k != 'plano'} for n, d in resultados.items()},
+            'problemas': problemas,
+        }, indent=2, ensure_ascii=False))
+    else:
+        imprimir_resultados(resultados, problemas)
+        if args.salvar:
+            print(f"\n💾 Baseline salva em {args.salvar}")
+
+    regressoes = [n for n, lista in (problemas or {}).items() if lista and lista != ['sem baseline']]
+    if regressoes and not args.json:
+        print(f"\n❌ {len(regressoes)} consulta(s) regrediram: {', '.join(regressoes)}")
+    return 1 if regressoes else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,693 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark da busca global (clientes e tickets) e job de criação dos índices de busca
+
+O BuscaGlobalService.buscarClientes/buscarTickets faz LOWER(coluna) LIKE
+'%termo%' em quatro (clientes) ou três (tickets) colunas, filtra por empresa e
+ordena por created_at DESC LIMIT 10: sem índice que sirva ao LIKE, cada busca
+lê todos os clientes/tickets da empresa.
+
+"semear" cria um schema separado (padrão: bench_busca) com cópias de clientes
+e atendimento_tickets (CREATE TABLE ... LIKE ... INCLUDING ALL, como no
+benchmark) e gera os dados no servidor: nomes e sobrenomes brasileiros com
+acento, e-mails, telefones, documentos e assuntos de ticket. Uma empresa
+concentra --grande dos registros (o tenant grande que sofre com a busca).
+
+"medir" roda o mesmo conjunto de termos sorteados dos dados (nome completo,
+sobrenome, pedaço de palavra, e-mail, telefone, documento, número do ticket,
+palavra sem acento, termo curto e termo inexistente) em cada abordagem:
+
+- atual:    as consultas do serviço, só com os índices que já existem;
+- trgm:     as mesmas consultas (nenhuma mudança no serviço) com índices GIN
+            (empresa_id, lower(coluna) gin_trgm_ops) por coluna (pg_trgm +
+            btree_gin);
+- tsvector: um índice GIN por tabela sobre to_tsvector da configuração
+            conectcrm_busca (portuguese + unaccent) e consulta por prefixo de
+            palavra (@@ to_tsquery 'termo':*); exige mudar a consulta e muda
+            a semântica (palavra, não substring), por isso a concordância;
+- memoria:  índice invertido de trigramas em memória (posições ordenadas por
+            created_at DESC), conferido por substring, mais a leitura das 10
+            linhas por id no banco.
+
+Cada abordagem é medida sozinha (os índices da anterior são removidos).
+Relatório: p50/p99 por tabela, tamanho e tempo de criação dos índices (a
+memória é projetada para todas as empresas a partir da medida) e concordância
+dos 10 resultados com a consulta atual.
+
+"indexar" é o job para produção: cria as extensões e a configuração de busca
+se faltarem e os índices da abordagem com CREATE INDEX CONCURRENTLY
+(lock_timeout curto, autocommit), refaz índices inválidos deixados por uma
+criação concorrente que falhou e, com --reindexar, roda REINDEX INDEX
+CONCURRENTLY (renovação por inchaço). Termina com ANALYZE.
+
+Uso:
+    python -m conectcrm_ops.busca semear --empresas 5 --clientes 300000 --tickets 600000
+    python -m conectcrm_ops.busca medir --consultas 300 --json busca.json
+    python -m conectcrm_ops.busca medir --abordagem atual --abordagem trgm
+    python -m conectcrm_ops.busca indexar --abordagem trgm --simular
+    python -m conectcrm_ops.busca indexar --abordagem trgm --reindexar
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from array import array
+
+from conectcrm_ops.benchmark import formatar_us, id_sintetico, ler_semeadura
+from conectcrm_ops.histograma import Histograma
+
+SCHEMA_PADRAO = 'bench_busca'
+TABELAS = ('clientes', 'atendimento_tickets')
+ABORDAGENS = ('atual', 'trgm', 'tsvector', 'memoria')
+PERCENTIS = (50, 99)
+LIMITE = 10
+CONFIG_BUSCA = 'conectcrm_busca'
+EXTENSOES = {'trgm': ('pg_trgm', 'btree_gin'), 'tsvector': ('unaccent', 'btree_gin')}
+
+# Colunas do LIKE de cada busca, na ordem do serviço
+CAMPOS = {
+    'clientes': ('lower(nome)', 'lower(email)', 'lower(telefone)', 'lower(documento)'),
+    'atendimento_tickets': ('lower(assunto)', 'lower(contato_nome)', 'CAST(numero AS VARCHAR)'),
+}
+
+SQL_ATUAL = {
+    'clientes': """
+        SELECT * FROM clientes
+        WHERE empresa_id = %(empresa)s
+          AND (LOWER(nome) LIKE %(padrao)s OR LOWER(email) LIKE %(padrao)s
+               OR LOWER(telefone) LIKE %(padrao)s OR LOWER(documento) LIKE %(padrao)s)
+        ORDER BY created_at DESC
+        LIMIT 10
+    """,
+    'atendimento_tickets': """
+        SELECT * FROM atendimento_tickets
+        WHERE empresa_id = %(empresa)s
+          AND (LOWER(assunto) LIKE %(padrao)s OR LOWER(contato_nome) LIKE %(padrao)s
+               OR CAST(numero AS VARCHAR) LIKE %(padrao)s)
+        ORDER BY created_at DESC
+        LIMIT 10
+    """,
+}
+
+TSV = {
+    'clientes': (f"to_tsvector('{CONFIG_BUSCA}'::regconfig, coalesce(nome, '') || ' ' || coalesce(email, '') "
+                 f"|| ' ' || coalesce(telefone, '') || ' ' || coalesce(documento, ''))"),
+    'atendimento_tickets': (f"to_tsvector('{CONFIG_BUSCA}'::regconfig, coalesce(assunto, '') || ' ' "
+                            f"|| coalesce(contato_nome, '') || ' ' || coalesce(numero::text, ''))"),
+}
+
+SQL_TSVECTOR = {
+    tabela: f"""
+        SELECT * FROM {tabela}
+        WHERE empresa_id = %(empresa)s
+          AND {expressao} @@ to_tsquery('{CONFIG_BUSCA}', %(consulta)s)
+        ORDER BY created_at DESC
+        LIMIT 10
+    """
+    for tabela, expressao in TSV.items()
+}
+
+SQL_POR_ID = "SELECT * FROM {} WHERE id = ANY(%s::uuid[]) ORDER BY created_at DESC"
+
+SQL_CONFIG_BUSCA = f"""
+    CREATE TEXT SEARCH CONFIGURATION {{esquema}}.{CONFIG_BUSCA} (COPY = pg_catalog.portuguese);
+    ALTER TEXT SEARCH CONFIGURATION {{esquema}}.{CONFIG_BUSCA}
+        ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+"""
+
+_SUFIXO_CAMPO = re.compile(r'\W+')
+
+
+def _nome_indice(tabela, campo, tipo):
+    coluna = _SUFIXO_CAMPO.sub('_', campo.lower().replace('lower', '').replace('cast', '').replace('as varchar', '')).strip('_')
+    return f'IDX_{tabela}_busca_{coluna}_{tipo}'
+
+
+def indices(abordagem):
+    """[(tabela, nome, definição)] de uma abordagem."""
+    if abordagem == 'trgm':
+        return [(tabela, _nome_indice(tabela, campo, 'trgm'), f'USING gin (empresa_id, ({campo}) gin_trgm_ops)')
+                for tabela, campos in CAMPOS.items() for campo in campos]
+    if abordagem == 'tsvector':
+        return [(tabela, f'IDX_{tabela}_busca_tsv', f'USING gin (empresa_id, ({expressao}))')
+                for tabela, expressao in TSV.items()]
+    return []
+
+
+def tsquery(termo):
+    """'joão silva' → "'joão':* & 'silva':*" (só letras e dígitos)."""
+    palavras = re.findall(r'\w+', termo.lower())
+    return ' & '.join(f"'{p}':*" for p in palavras)
+
+
+# ----------------------------------------------------------------------
+# Semeadura
+# ----------------------------------------------------------------------
+
+NOMES = ('João', 'José', 'Maria', 'Ana', 'Antônio', 'Francisco', 'Carlos', 'Paulo', 'Pedro', 'Lucas',
+         'Luíza', 'Marcos', 'Gabriel', 'Rafael', 'Daniel', 'Márcia', 'Fernanda', 'Patrícia', 'Aline',
+         'Sandra', 'Camila', 'Amanda', 'Bruna', 'Júlia', 'Letícia', 'Beatriz', 'Larissa', 'Vitória',
+         'Luana', 'Gustavo', 'Felipe', 'Thiago', 'Rodrigo', 'André', 'Fábio', 'Sérgio', 'Cláudio',
+         'Renato', 'Vinícius', 'Otávio', 'Raimundo', 'Conceição', 'Sebastião', 'Tânia', 'Érica')
+
+SOBRENOMES = ('Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima',
+              'Gomes', 'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Almeida', 'Lopes', 'Soares',
+              'Fernandes', 'Vieira', 'Barbosa', 'Rocha', 'Dias', 'Nascimento', 'Andrade', 'Moreira',
+              'Nunes', 'Marques', 'Machado', 'Mendes', 'Freitas', 'Cardoso', 'Ramos', 'Gonçalves',
+              'Santana', 'Teixeira', 'Araújo', 'Brandão', 'Magalhães', 'Guimarães', 'Assunção')
+
+ASSUNTOS = ('Problema no login', 'Segunda via de boleto', 'Atualização cadastral', 'Dúvida sobre o plano',
+            'Cancelamento de serviço', 'Troca de titularidade', 'Reclamação de atendimento',
+            'Pedido de orçamento', 'Erro na emissão de nota fiscal', 'Instalação agendada',
+            'Lentidão na conexão', 'Solicitação de reembolso', 'Alteração de vencimento',
+            'Cobrança indevida', 'Mudança de endereço', 'Portabilidade de número', 'Visita técnica',
+            'Renegociação de dívida', 'Informações sobre promoção', 'Equipamento com defeito')
+
+DOMINIOS = ('gmail.com', 'hotmail.com', 'outlook.com', 'yahoo.com.br', 'uol.com.br', 'empresa.com.br')
+
+SQL_CLIENTES = """
+    INSERT INTO clientes (id, empresa_id, nome, email, telefone, documento, tipo, status, created_at, updated_at)
+    SELECT md5('bench-cliente-' || %(empresa)s || '-' || i)::uuid, %(empresa_id)s, g.nome,
+           translate(lower(replace(g.nome, ' ', '.')), 'áàâãéêíóôõúüç', 'aaaaeeiooouuc')
+               || i || '@' || (%(dominios)s::text[])[1 + (i %% %(n_dominios)s)],
+           '55' || (11 + (i * 7) %% 89) || '9' || lpad(((random() * 1e8)::bigint)::text, 8, '0'),
+           lpad(((random() * 1e11)::bigint)::text, 11, '0'),
+           'pessoa_fisica', 'cliente', g.criado, g.criado
+    FROM generate_series(1, %(quantidade)s) AS i
+    CROSS JOIN LATERAL (
+        SELECT (%(nomes)s::text[])[1 + floor(random() * %(n_nomes)s)::int + 0 * i] || ' '
+               || (%(sobrenomes)s::text[])[1 + floor(random() * %(n_sobrenomes)s)::int] || ' '
+               || (%(sobrenomes)s::text[])[1 + floor(random() * %(n_sobrenomes)s)::int] AS nome,
+               LOCALTIMESTAMP - random() * interval '3 years' AS criado
+    ) g
+"""
+
+SQL_TICKETS = """
+    INSERT INTO atendimento_tickets (id, empresa_id, numero, assunto, status, prioridade, contato_nome,
+                                     contato_telefone, created_at, updated_at)
+    SELECT md5('bench-ticket-' || %(empresa)s || '-' || i)::uuid, %(empresa_id)s, i,
+           (%(assuntos)s::text[])[1 + floor(random() * %(n_assuntos)s)::int + 0 * i]
+               || CASE WHEN random() < 0.3 THEN ' - protocolo ' || (100000 + i) ELSE '' END,
+           'ENCERRADO', 'MEDIA',
+           (%(nomes)s::text[])[1 + floor(random() * %(n_nomes)s)::int] || ' '
+               || (%(sobrenomes)s::text[])[1 + floor(random() * %(n_sobrenomes)s)::int],
+           '55' || (11 + (i * 7) %% 89) || '9' || lpad(((random() * 1e8)::bigint)::text, 8, '0'),
+           c.criado, c.criado
+    FROM generate_series(1, %(quantidade)s) AS i
+    CROSS JOIN LATERAL (SELECT LOCALTIMESTAMP - random() * interval '3 years' + 0 * i * interval '1 s' AS criado) c
+"""
+
+
+def distribuir(total, empresas, grande):
+    """Registros por empresa: a primeira fica com a fração `grande`, as outras dividem o resto."""
+    if empresas == 1:
+        return [total]
+    primeira = int(total * grande)
+    resto = total - primeira
+    outras = [resto // (empresas - 1)] * (empresas - 1)
+    outras[0] += resto - sum(outras)
+    return [primeira] + outras
+
+
+def semear(conn, schema, empresas, clientes, tickets, grande, semente=0.42):
+    from psycopg2 import sql
+    from psycopg2.extras import Json
+
+    parametros = {'empresas': empresas, 'clientes': clientes, 'tickets': tickets, 'grande': grande}
+    esquema = sql.Identifier(schema)
+    listas = {
+        'nomes': list(NOMES), 'n_nomes': len(NOMES),
+        'sobrenomes': list(SOBRENOMES), 'n_sobrenomes': len(SOBRENOMES),
+        'assuntos': list(ASSUNTOS), 'n_assuntos': len(ASSUNTOS),
+        'dominios': list(DOMINIOS), 'n_dominios': len(DOMINIOS),
+    }
+
+    with conn.cursor() as cursor:
+        cursor.execute(sql.SQL('DROP SCHEMA IF EXISTS {} CASCADE').format(esquema))
+        cursor.execute(sql.SQL('CREATE SCHEMA {}').format(esquema))
+        for tabela in TABELAS:
+            cursor.execute(sql.SQL('CREATE TABLE {}.{} (LIKE public.{} INCLUDING ALL)').format(
+                esquema, sql.Identifier(tabela), sql.Identifier(tabela)
+            ))
+        cursor.execute(sql.SQL('CREATE TABLE {}.semeadura (parametros JSONB NOT NULL)').format(esquema))
+        cursor.execute(sql.SQL('INSERT INTO {}.semeadura VALUES (%s)').format(esquema), (Json(parametros),))
+
+        cursor.execute(sql.SQL('SET LOCAL search_path TO {}, public').format(esquema))
+        cursor.execute('SELECT setseed(%s)', (semente,))
+        for nome, consulta, total in (('clientes', SQL_CLIENTES, clientes), ('tickets', SQL_TICKETS, tickets)):
+            inicio = time.perf_counter()
+            linhas = 0
+            for e, quantidade in enumerate(distribuir(total, empresas, grande), 1):
+                cursor.execute(consulta, {**listas, 'empresa': e, 'empresa_id': id_sintetico('empresa', e),
+                                          'quantidade': quantidade})
+                linhas += cursor.rowcount
+            print(f"   🌱 {linhas:,} {nome} em {time.perf_counter() - inicio:.1f}s")
+
+        for tabela in TABELAS:
+            cursor.execute(sql.SQL('ANALYZE {}').format(sql.Identifier(tabela)))
+
+    conn.commit()
+    return parametros
+
+
+# ----------------------------------------------------------------------
+# Índice invertido em memória
+# ----------------------------------------------------------------------
+
+class IndiceInvertido:
+    """
+    Trigramas → posições (array de uint32) dos documentos, inseridos do mais
+    novo para o mais antigo: percorrer a lista mais curta já dá a ordem do
+    ORDER BY created_at DESC. Os campos ficam separados por \\x00, então um
+    termo nunca casa atravessando dois campos (como o OR de LIKEs).
+    """
+
+    def __init__(self):
+        self.ids = []
+        self.textos = []
+        self.postings = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def adicionar(self, doc_id, campos):
+        posicao = len(self.ids)
+        texto = '\x00'.join('' if c is None else str(c).lower() for c in campos)
+        self.ids.append(doc_id)
+        self.textos.append(texto)
+        for tri in {texto[i:i + 3] for i in range(len(texto) - 2)}:
+            if '\x00' in tri:
+                continue
+            lista = self.postings.get(tri)
+            if lista is None:
+                lista = self.postings[tri] = array('I')
+            lista.append(posicao)
+
+    def buscar(self, termo, limite=LIMITE):
+        termo = termo.lower()
+        trigramas = {termo[i:i + 3] for i in range(len(termo) - 2)}
+        if trigramas:
+            listas = [self.postings.get(t) for t in trigramas]
+            if any(lista is None for lista in listas):
+                return []
+            candidatos = min(listas, key=len)
+        else:
+            candidatos = range(len(self.ids))
+        encontrados = []
+        for posicao in candidatos:
+            if termo in self.textos[posicao]:
+                encontrados.append(self.ids[posicao])
+                if len(encontrados) >= limite:
+                    break
+        return encontrados
+
+    def tamanho_bytes(self):
+        total = sys.getsizeof(self.postings) + sys.getsizeof(self.ids) + sys.getsizeof(self.textos)
+        total += sum(sys.getsizeof(t) + sys.getsizeof(lista) for t, lista in self.postings.items())
+        total += sum(sys.getsizeof(t) for t in self.textos) + sum(sys.getsizeof(i) for i in self.ids)
+        return total
+
+
+SQL_DOCUMENTOS = {
+    'clientes': "SELECT id::text, nome, email, telefone, documento FROM clientes "
+                "WHERE empresa_id = %s ORDER BY created_at DESC",
+    'atendimento_tickets': "SELECT id::text, assunto, contato_nome, numero FROM atendimento_tickets "
+                           "WHERE empresa_id = %s ORDER BY created_at DESC",
+}
+
+
+def construir_indice(conn, tabela, empresa_id):
+    from conectcrm_ops.db import ler_em_fluxo
+
+    indice = IndiceInvertido()
+    for linha in ler_em_fluxo(conn, SQL_DOCUMENTOS[tabela], (empresa_id,), itersize=20000):
+        indice.adicionar(linha[0], linha[1:])
+    return indice
+
+
+# ----------------------------------------------------------------------
+# Medição
+# ----------------------------------------------------------------------
+
+SQL_AMOSTRA = {
+    'clientes': "SELECT nome, email, telefone, documento FROM clientes WHERE empresa_id = %s "
+                "ORDER BY md5(id::text || %s) LIMIT %s",
+    'atendimento_tickets': "SELECT assunto, contato_nome, numero::text FROM atendimento_tickets "
+                           "WHERE empresa_id = %s ORDER BY md5(id::text || %s) LIMIT %s",
+}
+
+SEM_ACENTO = str.maketrans('áàâãéêíóôõúüçÁÀÂÃÉÊÍÓÔÕÚÜÇ', 'aaaaeeiooouucAAAAEEIOOOUUC')
+
+
+def sortear_termos(cursor, tabela, empresa_id, quantidade, semente):
+    """[(categoria, termo)] a partir de linhas reais da empresa."""
+    rng = random.Random(semente)
+    cursor.execute(SQL_AMOSTRA[tabela], (empresa_id, str(semente), quantidade))
+    linhas = cursor.fetchall()
+    termos = []
+    for i, linha in enumerate(linhas):
+        categoria = i % 10
+        if tabela == 'clientes':
+            nome, email, telefone, documento = linha
+            palavras = nome.split()
+            opcoes = [
+                ('nome-completo', nome),
+                ('sobrenome', palavras[-1]),
+                ('pedaco', _pedaco(rng, rng.choice(palavras), 4)),
+                ('email', email.split('@')[0]),
+                ('telefone', (telefone or '')[-6:]),
+                ('documento', (documento or '')[3:9]),
+                ('sem-acento', palavras[0].translate(SEM_ACENTO)),
+                ('curto', _pedaco(rng, palavras[0], 2)),
+                ('inexistente', f'xq{rng.randint(100, 999)}zw'),
+                ('nome-e-sobrenome', f'{palavras[0]} {palavras[1]}'),
+            ]
+        else:
+            assunto, contato, numero = linha
+            palavras = (assunto or '').split() or ['x']
+            opcoes = [
+                ('numero', numero or ''),
+                ('assunto', assunto.split(' - ')[0]),
+                ('palavra', max(palavras, key=len)),
+                ('pedaco', _pedaco(rng, max(palavras, key=len), 4)),
+                ('contato', contato or ''),
+                ('sobrenome', (contato or 'x').split()[-1]),
+                ('sem-acento', max(palavras, key=len).translate(SEM_ACENTO)),
+                ('curto', _pedaco(rng, palavras[0], 2)),
+                ('inexistente', f'xq{rng.randint(100, 999)}zw'),
+                ('protocolo', 'protocolo'),
+            ]
+        termos.append(opcoes[categoria])
+    rng.shuffle(termos)
+    return [(c, t) for c, t in termos if t]
+
+
+def _pedaco(rng, palavra, tamanho):
+    if len(palavra) <= tamanho:
+        return palavra
+    inicio = rng.randint(0, len(palavra) - tamanho)
+    return palavra[inicio:inicio + tamanho]
+
+
+def _buscar_banco(cursor, abordagem, tabela, empresa_id, termo):
+    if abordagem == 'tsvector':
+        consulta = tsquery(termo)
+        if not consulta:
+            return []
+        cursor.execute(SQL_TSVECTOR[tabela], {'empresa': empresa_id, 'consulta': consulta})
+    else:
+        cursor.execute(SQL_ATUAL[tabela], {'empresa': empresa_id, 'padrao': f'%{termo.lower()}%'})
+    return [str(linha[0]) for linha in cursor.fetchall()]
+
+
+def _buscar_memoria(cursor, indice, tabela, termo):
+    ids = indice.buscar(termo)
+    if not ids:
+        return []
+    cursor.execute(SQL_POR_ID.format(tabela), (ids,))
+    return [str(linha[0]) for linha in cursor.fetchall()]
+
+
+def criar_indices(conn, abordagem, schema):
+    """Cria extensões, configuração e índices; devolve {nome: {'criacaoMs', 'tamanhoBytes'}}."""
+    from psycopg2 import sql
+
+    medidas = {}
+    with conn.cursor() as cursor:
+        for extensao in EXTENSOES.get(abordagem, ()):
+            cursor.execute(sql.SQL('CREATE EXTENSION IF NOT EXISTS {}').format(sql.Identifier(extensao)))
+        if abordagem == 'tsvector':
+            cursor.execute(SQL_CONFIG_BUSCA.format(esquema=schema))
+        for tabela, nome, definicao in indices(abordagem):
+            inicio = time.perf_counter()
+            cursor.execute(f'CREATE INDEX "{nome}" ON {schema}.{tabela} {definicao}')
+            criacao = (time.perf_counter() - inicio) * 1000
+            cursor.execute('SELECT pg_relation_size(%s::regclass)', (f'{schema}."{nome}"',))
+            medidas[nome] = {'tabela': tabela, 'criacaoMs': criacao, 'tamanhoBytes': cursor.fetchone()[0]}
+        for tabela in TABELAS:
+            cursor.execute(f'ANALYZE {schema}.{tabela}')
+    conn.commit()
+    return medidas
+
+
+def remover_indices(conn, abordagem, schema):
+    with conn.cursor() as cursor:
+        for _, nome, _ in indices(abordagem):
+            cursor.execute(f'DROP INDEX IF EXISTS {schema}."{nome}"')
+        if abordagem == 'tsvector':
+            cursor.execute(f'DROP TEXT SEARCH CONFIGURATION IF EXISTS {schema}.{CONFIG_BUSCA}')
+    conn.commit()
+
+
+def concordancia(referencia, obtido):
+    if not referencia and not obtido:
+        return 1.0
+    if not referencia:
+        return 0.0
+    return len(set(referencia) & set(obtido)) / len(referencia)
+
+
+def medir(conn, schema, abordagens, consultas, aquecimento, semente, empresa=1):
+    from psycopg2 import sql
+
+    empresa_id = id_sintetico('empresa', empresa)
+    with conn.cursor() as cursor:
+        cursor.execute(sql.SQL('SET search_path TO {}, public').format(sql.Identifier(schema)))
+        cursor.execute('SELECT count(*) FROM clientes')
+        total_linhas = {'clientes': cursor.fetchone()[0]}
+        cursor.execute('SELECT count(*) FROM atendimento_tickets')
+        total_linhas['atendimento_tickets'] = cursor.fetchone()[0]
+        termos = {tabela: sortear_termos(cursor, tabela, empresa_id, consultas + aquecimento, semente)
+                  for tabela in TABELAS}
+    conn.commit()
+
+    referencias = {}
+    resultados = {}
+    for abordagem in abordagens:
+        print(f"   ⏱️  {abordagem}...")
+        indices_medidos = criar_indices(conn, abordagem, schema) if abordagem in ('trgm', 'tsvector') else {}
+        memoria = {}
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(sql.SQL('SET search_path TO {}, public').format(sql.Identifier(schema)))
+                por_tabela = {}
+                for tabela in TABELAS:
+                    indice = None
+                    if abordagem == 'memoria':
+                        inicio = time.perf_counter()
+                        indice = construir_indice(conn, tabela, empresa_id)
+                        construcao = (time.perf_counter() - inicio) * 1000
+                        tamanho = indice.tamanho_bytes()
+                        escala = total_linhas[tabela] / max(1, len(indice))
+                        memoria[tabela] = {'criacaoMs': construcao, 'tamanhoBytes': tamanho,
+                                           'projecaoTodasBytes': int(tamanho * escala),
+                                           'projecaoTodasMs': construcao * escala}
+
+                    latencia = Histograma()
+                    por_categoria = {}
+                    acordos = []
+                    for i, (categoria, termo) in enumerate(termos[tabela]):
+                        inicio = time.perf_counter()
+                        if indice is not None:
+                            ids = _buscar_memoria(cursor, indice, tabela, termo)
+                        else:
+                            ids = _buscar_banco(cursor, abordagem, tabela, empresa_id, termo)
+                        decorrido = (time.perf_counter() - inicio) * 1_000_000
+                        if i < aquecimento:
+                            continue
+                        latencia.registrar(decorrido)
+                        por_categoria.setdefault(categoria, Histograma()).registrar(decorrido)
+                        chave = (tabela, termo)
+                        if abordagem == 'atual':
+                            referencias[chave] = ids
+                        elif chave in referencias:
+                            acordos.append(concordancia(referencias[chave], ids))
+
+                    percentis = latencia.percentis(PERCENTIS)
+                    por_tabela[tabela] = {
+                        **{f'p{p}Us': percentis[p] for p in PERCENTIS},
+                        'categorias': {c: h.percentis((50,))[50] for c, h in sorted(por_categoria.items())},
+                        'concordancia': sum(acordos) / len(acordos) if acordos else None,
+                    }
+            conn.rollback()
+        finally:
+            if abordagem in ('trgm', 'tsvector'):
+                remover_indices(conn, abordagem, schema)
+
+        resultados[abordagem] = {'tabelas': por_tabela, 'indices': indices_medidos, 'memoria': memoria}
+    return resultados
+
+
+def imprimir_resultados(resultados):
+    print(f"\n{'Abordagem':<10} {'Tabela':<20} {'p50':>9} {'p99':>9} {'concord.':>9} {'índice':>10} {'criação':>10}")
+    for abordagem, dados in resultados.items():
+        for tabela, medida in dados['tabelas'].items():
+            if abordagem == 'memoria':
+                m = dados['memoria'].get(tabela, {})
+                tamanho, criacao = m.get('projecaoTodasBytes', 0), m.get('projecaoTodasMs', 0)
+            else:
+                do_tabela = [i for i in dados['indices'].values() if i['tabela'] == tabela]
+                tamanho = sum(i['tamanhoBytes'] for i in do_tabela)
+                criacao = sum(i['criacaoMs'] for i in do_tabela)
+            concord = '-' if medida['concordancia'] is None else f"{medida['concordancia']:.0%}"
+            print(f"{abordagem:<10} {tabela:<20} {formatar_us(medida['p50Us']):>9} {formatar_us(medida['p99Us']):>9} "
+                  f"{concord:>9} {tamanho / 1048576:>8.1f}MB {criacao / 1000:>9.1f}s")
+            print('           ' + ', '.join(f'{c} {formatar_us(v)}' for c, v in medida['categorias'].items()))
+    if 'memoria' in resultados:
+        print("\n   memoria: tamanho e criação projetados para todas as empresas a partir da empresa medida")
+
+
+# ----------------------------------------------------------------------
+# Job de produção
+# ----------------------------------------------------------------------
+
+SQL_INDICE_ESTADO = """
+    SELECT i.indisvalid
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_index i ON i.indexrelid = c.oid
+    WHERE n.nspname = %s AND c.relname = %s
+"""
+
+
+def indexar(conn, abordagem, schema='public', reindexar=False, simular=False, lock_timeout='5s',
+            memoria_manutencao=None):
+    """Garante os índices de busca sem travar escrita; devolve [(nome, ação, ms)]."""
+    def executar(cursor, comando, params=None):
+        if simular:
+            print(f"   {comando};")
+            return
+        cursor.execute(comando, params)
+
+    resultado = []
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT set_config('lock_timeout', %s, false), set_config('statement_timeout', '0', false)",
+                       (lock_timeout,))
+        # O cast '...'::regconfig da expressão do índice é resolvido pelo search_path
+        cursor.execute("SELECT set_config('search_path', %s, false)", (f'{schema}, public',))
+        if memoria_manutencao:
+            cursor.execute("SELECT set_config('maintenance_work_mem', %s, false)", (memoria_manutencao,))
+
+        for extensao in EXTENSOES.get(abordagem, ()):
+            executar(cursor, f'CREATE EXTENSION IF NOT EXISTS "{extensao}"')
+        if abordagem == 'tsvector':
+            cursor.execute("SELECT 1 FROM pg_ts_config c JOIN pg_namespace n ON n.oid = c.cfgnamespace "
+                           "WHERE n.nspname = %s AND c.cfgname = %s", (schema, CONFIG_BUSCA))
+            if cursor.fetchone() is None:
+                for comando in filter(None, (c.strip() for c in SQL_CONFIG_BUSCA.format(esquema=schema).split(';'))):
+                    executar(cursor, comando)
+
+        for tabela, nome, definicao in indices(abordagem):
+            cursor.execute(SQL_INDICE_ESTADO, (schema, nome))
+            estado = cursor.fetchone()
+            inicio = time.perf_counter()
+            if estado is not None and not estado[0]:
+                # Sobra de um CREATE INDEX CONCURRENTLY que falhou: inválido, mas atualizado em toda escrita
+                executar(cursor, f'DROP INDEX CONCURRENTLY IF EXISTS {schema}."{nome}"')
+                estado = None
+                acao = 'recriado (estava inválido)'
+            else:
+                acao = 'criado'
+            if estado is None:
+                executar(cursor, f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{nome}" ON {schema}.{tabela} {definicao}')
+            elif reindexar:
+                executar(cursor, f'REINDEX INDEX CONCURRENTLY {schema}."{nome}"')
+                acao = 'reindexado'
+            else:
+                acao = 'ok'
+            resultado.append((nome, acao, (time.perf_counter() - inicio) * 1000))
+
+        if any(acao != 'ok' for _, acao, _ in resultado):
+            for tabela in sorted({t for t, _, _ in indices(abordagem)}):
+                executar(cursor, f'ANALYZE {schema}.{tabela}')
+    return resultado
+
+
+def main(argv=None):
+    from conectcrm_ops.db import conectar
+
+    parser = argparse.ArgumentParser(description='Benchmark da busca global e job dos índices de busca')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_semear = sub.add_parser('semear', help='Recria o schema com clientes e tickets sintéticos')
+    p_semear.add_argument('--schema', default=SCHEMA_PADRAO)
+    p_semear.add_argument('--empresas', type=int, default=5, help='Empresas (padrão: 5)')
+    p_semear.add_argument('--clientes', type=int, default=300000, help='Clientes no total (padrão: 300000)')
+    p_semear.add_argument('--tickets', type=int, default=600000, help='Tickets no total (padrão: 600000)')
+    p_semear.add_argument('--grande', type=float, default=0.6,
+                          help='Fração dos registros na primeira empresa (padrão: 0.6)')
+
+    p_medir = sub.add_parser('medir', help='Compara as abordagens de busca no schema semeado')
+    p_medir.add_argument('--schema', default=SCHEMA_PADRAO)
+    p_medir.add_argument('--abordagem', action='append', choices=ABORDAGENS,
+                         help='Abordagem a medir (pode repetir; padrão: todas). A concordância usa a atual.')
+    p_medir.add_argument('--consultas', type=int, default=300, help='Termos medidos por tabela (padrão: 300)')
+    p_medir.add_argument('--aquecimento', type=int, default=20)
+    p_medir.add_argument('--semente', type=int, default=0)
+    p_medir.add_argument('--empresa', type=int, default=1, help='Empresa sintética medida (padrão: 1, a grande)')
+    p_medir.add_argument('--json', help='Grava o resultado em JSON')
+
+    p_idx = sub.add_parser('indexar', help='Cria/renova os índices de busca em produção (CONCURRENTLY)')
+    p_idx.add_argument('--abordagem', choices=('trgm', 'tsvector'), default='trgm',
+                       help='trgm serve às consultas atuais sem mudar o serviço (padrão)')
+    p_idx.add_argument('--schema', default='public')
+    p_idx.add_argument('--reindexar', action='store_true', help='REINDEX CONCURRENTLY dos índices já existentes')
+    p_idx.add_argument('--lock-timeout', default='5s')
+    p_idx.add_argument('--memoria', help='maintenance_work_mem da sessão (ex.: 1GB)')
+    p_idx.add_argument('--simular', action='store_true', help='Só mostra os comandos')
+    args = parser.parse_args(argv)
+
+    conn = conectar()
+    try:
+        if args.comando == 'semear':
+            print(f"🌱 Semeando {args.clientes:,} clientes e {args.tickets:,} tickets em {args.empresas} "
+                  f"empresa(s) em '{args.schema}'...")
+            inicio = time.perf_counter()
+            semear(conn, args.schema, args.empresas, args.clientes, args.tickets, args.grande)
+            print(f"✅ Pronto em {time.perf_counter() - inicio:.1f}s")
+            return 0
+
+        if args.comando == 'indexar':
+            import psycopg2
+
+            conn.autocommit = True
+            try:
+                for nome, acao, ms in indexar(conn, args.abordagem, args.schema, args.reindexar, args.simular,
+                                              args.lock_timeout, args.memoria):
+                    print(f"   {'🔎' if args.simular else '✅'} {nome}: {acao} ({ms / 1000:.1f}s)")
+            except psycopg2.errors.LockNotAvailable as e:
+                print(f"❌ Lock não obtido em {args.lock_timeout}; rode de novo fora do pico: {e}")
+                return 1
+            except psycopg2.Error as e:
+                print(f"❌ {e}")
+                return 1
+            return 0
+
+        with conn.cursor() as cursor:
+            semeadura = ler_semeadura(cursor, args.schema)
+        if semeadura is None:
+            print(f"❌ Schema '{args.schema}' não foi semeado. Rode o subcomando semear antes.")
+            return 1
+
+        abordagens = args.abordagem or list(ABORDAGENS)
+        if 'atual' in abordagens:
+            abordagens = ['atual'] + [a for a in abordagens if a != 'atual']
+        print(f"⏱️  {len(abordagens)} abordagem(ns) x {args.consultas} termo(s) por tabela em '{args.schema}' {semeadura}")
+        resultados = medir(conn, args.schema, abordagens, args.consultas, args.aquecimento,
+                           args.semente, args.empresa)
+    finally:
+        conn.close()
+
+    imprimir_resultados(resultados)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'semeadura': semeadura, 'abordagens': resultados}, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultado gravado em {args.json}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,446 @@
+# -*- coding: utf-8 -*-
+"""
+Cache local das estruturas de fluxos, chaveado por (id, versao, md5 da estrutura)
+
+Em vez de baixar o JSONB inteiro de fluxos_triagem a cada execução, as
+ferramentas fazem uma sondagem barata (SELECT id, versao, md5(estrutura::text))
+e só buscam a estrutura das marcas que ainda não estão em disco. versao
+sozinha não serve de chave: FluxoTriagemService.update, restaurarVersao,
+publicar sem criarNovaVersao e o corrigir-duplicacao-botoes.js regravam
+estrutura sem incrementá-la. O md5 é calculado no servidor (só 32 caracteres
+trafegam) e muda com qualquer alteração do conteúdo.
+
+Formato em disco (objetos/<hh>/<sha256>.cfx, endereçado pelo hash canônico da
+estrutura, então fluxos idênticos em várias empresas ocupam um arquivo só):
+
+    cabeçalho   '<4sHHII': b'CFX1', formato, reservado, nº de blocos, tamanho do diretório
+    diretório   por bloco: '<H' tamanho da chave, chave UTF-8, '<QI' deslocamento e tamanho
+    blocos      JSON compactado com zlib: '' é a raiz (estrutura sem as etapas), os demais são etapas
+
+A leitura é feita com mmap e descompacta só as etapas pedidas: consultar a
+etapa boas-vindas de um fluxo de 300 etapas não decodifica as outras 299.
+
+indice.json guarda (id:versao.md5) → hash e o último acesso; acima do limite
+(CONECTCRM_CACHE_FLUXOS_MB, padrão 256) os objetos menos usados recentemente
+são removidos.
+
+Uso:
+    python -m conectcrm_ops.cache_fluxos sincronizar                 (fluxos publicados)
+    python -m conectcrm_ops.cache_fluxos sincronizar --fluxo ce74c2f3-... --todos
+    python -m conectcrm_ops.cache_fluxos mostrar ce74c2f3-... --etapa boas-vindas
+    python -m conectcrm_ops.cache_fluxos status
+    python -m conectcrm_ops.cache_fluxos limpar
+
+Diretório: CONECTCRM_CACHE_FLUXOS (padrão: .cache-fluxos na pasta atual)
+"""
+
+import argparse
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import time
+import zlib
+
+from conectcrm_ops.historico import gravar_atomico, hash_objeto, json_canonico
+
+DIRETORIO_PADRAO = os.environ.get('CONECTCRM_CACHE_FLUXOS', '.cache-fluxos')
+LIMITE_PADRAO_MB = int(os.environ.get('CONECTCRM_CACHE_FLUXOS_MB', '256'))
+
+MAGICO = b'CFX1'
+FORMATO = 1
+CABECALHO = struct.Struct('<4sHHII')
+CHAVE = struct.Struct('<H')
+POSICAO = struct.Struct('<QI')
+RAIZ = ''
+NIVEL_ZLIB = 6
+VERSAO_INDICE = 2
+
+SQL_SONDA = """
+    SELECT id, versao, md5(estrutura::text)
+    FROM fluxos_triagem
+    WHERE true {filtro}
+"""
+
+SQL_ESTRUTURAS = """
+    SELECT id, versao, md5(estrutura::text), estrutura
+    FROM fluxos_triagem
+    WHERE id = ANY(%s::uuid[])
+"""
+
+
+def marca_conteudo(versao, resumo):
+    """Chave de conteúdo de um fluxo: versao (legível) + md5(estrutura::text) do servidor"""
+    return f'{versao}.{resumo}'
+
+
+def _compactar(obj):
+    return zlib.compress(json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), NIVEL_ZLIB)
+
+
+def serializar(estrutura):
+    """Bytes do arquivo .cfx de uma estrutura (ordem das etapas preservada)"""
+    etapas = estrutura.get('etapas') if isinstance(estrutura.get('etapas'), dict) else {}
+    # A raiz guarda a posição de "etapas" para a estrutura voltar com a mesma ordem de chaves
+    raiz = {k: (None if k == 'etapas' else v) for k, v in estrutura.items()}
+    blocos = [(RAIZ, _compactar(raiz))] + [(etapa_id, _compactar(etapa)) for etapa_id, etapa in etapas.items()]
+
+    chaves = [chave.encode('utf-8') for chave, _ in blocos]
+    tamanho_diretorio = sum(CHAVE.size + len(c) + POSICAO.size for c in chaves)
+    deslocamento = CABECALHO.size + tamanho_diretorio
+
+    diretorio = []
+    for chave, (_, dados) in zip(chaves, blocos):
+        diretorio.append(CHAVE.pack(len(chave)) + chave + POSICAO.pack(deslocamento, len(dados)))
+        deslocamento += len(dados)
+
+    return b''.join(
+        [CABECALHO.pack(MAGICO, FORMATO, 0, len(blocos), tamanho_diretorio)]
+        + diretorio
+        + [dados for _, dados in blocos]
+    )
+
+
+class FluxoMapeado:
+    """Leitura de um .cfx via mmap; cada etapa é descompactada só quando pedida"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        with open(caminho, 'rb') as arquivo:
+            self._mapa = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magico, formato, _, quantidade, tamanho = CABECALHO.unpack_from(self._mapa, 0)
+        if magico != MAGICO or formato != FORMATO:
+            self.fechar()
+            raise ValueError(f'{caminho}: arquivo de cache inválido')
+
+        self._blocos = {}
+        posicao = CABECALHO.size
+        for _ in range(quantidade):
+            (tamanho_chave,) = CHAVE.unpack_from(self._mapa, posicao)
+            posicao += CHAVE.size
+            chave = bytes(self._mapa[posicao:posicao + tamanho_chave]).decode('utf-8')
+            posicao += tamanho_chave
+            self._blocos[chave] = POSICAO.unpack_from(self._mapa, posicao)
+            posicao += POSICAO.size
+        self._estrutura = None
+
+    def _ler(self, chave):
+        deslocamento, tamanho = self._blocos[chave]
+        with memoryview(self._mapa)[deslocamento:deslocamento + tamanho] as dados:
+            return json.loads(zlib.decompress(dados))
+
+    def etapas_ids(self):
+        return [chave for chave in self._blocos if chave != RAIZ]
+
+    def etapa(self, etapa_id):
+        """Dicionário da etapa, ou None se ela não existe no fluxo"""
+        if etapa_id == RAIZ or etapa_id not in self._blocos:
+            return None
+        return self._ler(etapa_id)
+
+    def estrutura(self):
+        """
+        Estrutura completa, decodificada uma vez e compartilhada por todos os
+        fluxos com o mesmo conteúdo: quem for alterar deve usar copy.deepcopy.
+        """
+        if self._estrutura is None:
+            raiz = self._ler(RAIZ)
+            etapas = {etapa_id: self._ler(etapa_id) for etapa_id in self.etapas_ids()}
+            if 'etapas' in raiz:
+                raiz['etapas'] = etapas
+            self._estrutura = raiz
+        return self._estrutura
+
+    def fechar(self):
+        if self._mapa is not None:
+            self._mapa.close()
+            self._mapa = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.fechar()
+
+
+class CacheFluxos:
+    """
+    Cache de estruturas em disco. Uso típico:
+
+        cache = CacheFluxos()
+        with conn.cursor() as cursor:
+            fluxos = cache.sincronizar(cursor)       # {id: FluxoMapeado}
+        etapa = fluxos[fluxo_id].etapa('boas-vindas')
+        cache.fechar()                              # também grava o índice
+    """
+
+    def __init__(self, diretorio=None, limite_bytes=None):
+        self.diretorio = diretorio or DIRETORIO_PADRAO
+        self.limite_bytes = LIMITE_PADRAO_MB * 1024 * 1024 if limite_bytes is None else limite_bytes
+        self.acertos = 0
+        self.faltas = 0
+        self.bytes_baixados = 0
+        self._abertos = {}
+        self._alterado = False
+        self._carregar_indice()
+
+    # ------------------------------------------------------------------
+    # Índice
+    # ------------------------------------------------------------------
+
+    @property
+    def _caminho_indice(self):
+        return os.path.join(self.diretorio, 'indice.json')
+
+    def _carregar_indice(self):
+        self.entradas = {}
+        self.objetos = {}
+        try:
+            with open(self._caminho_indice, 'r', encoding='utf-8') as arquivo:
+                dados = json.load(arquivo)
+        except (OSError, ValueError):
+            return
+        if dados.get('versao') == VERSAO_INDICE:
+            self.entradas = dados.get('entradas', {})
+            self.objetos = dados.get('objetos', {})
+
+    def salvar(self):
+        if self._alterado:
+            gravar_atomico(self._caminho_indice, json.dumps({
+                'versao': VERSAO_INDICE,
+                'entradas': self.entradas,
+                'objetos': self.objetos,
+            }, ensure_ascii=False))
+            self._alterado = False
+
+    def _caminho_objeto(self, hash_):
+        return os.path.join(self.diretorio, 'objetos', hash_[:2], f'{hash_}.cfx')
+
+    @staticmethod
+    def _chave(fluxo_id, marca):
+        return f'{fluxo_id}:{marca}'
+
+    # ------------------------------------------------------------------
+    # Leitura e gravação
+    # ------------------------------------------------------------------
+
+    def _abrir(self, hash_):
+        if hash_ not in self._abertos:
+            self._abertos[hash_] = FluxoMapeado(self._caminho_objeto(hash_))
+        return self._abertos[hash_]
+
+    def obter(self, fluxo_id, marca):
+        """FluxoMapeado do fluxo (id, marca), ou None se não está em disco"""
+        entrada = self.entradas.get(self._chave(fluxo_id, marca))
+        if entrada is None:
+            return None
+        try:
+            fluxo = self._abrir(entrada['hash'])
+        except (OSError, ValueError):
+            # Objeto removido por fora ou corrompido: vira uma falta comum
+            self.entradas.pop(self._chave(fluxo_id, marca), None)
+            self._alterado = True
+            return None
+        entrada['acesso'] = time.time()
+        self._alterado = True
+        return fluxo
+
+    def guardar(self, fluxo_id, marca, estrutura):
+        if isinstance(estrutura, str):
+            estrutura = json.loads(estrutura)
+        hash_ = hash_objeto(estrutura)
+        caminho = self._caminho_objeto(hash_)
+        if not os.path.exists(caminho):
+            dados = serializar(estrutura)
+            pasta = os.path.dirname(caminho)
+            os.makedirs(pasta, exist_ok=True)
+            temporario = f'{caminho}.{os.getpid()}.tmp'
+            with open(temporario, 'wb') as arquivo:
+                arquivo.write(dados)
+            os.replace(temporario, caminho)
+        self.objetos[hash_] = os.path.getsize(caminho)
+        self.entradas[self._chave(fluxo_id, marca)] = {'hash': hash_, 'acesso': time.time()}
+        self._alterado = True
+        return self._abrir(hash_)
+
+    # ------------------------------------------------------------------
+    # Banco
+    # ------------------------------------------------------------------
+
+    def sondar(self, cursor, fluxo_ids=None, publicados=True):
+        """{id: marca} atual no banco; só id, versao e o md5 da estrutura trafegam"""
+        filtros, params = [], []
+        if publicados:
+            filtros.append('AND publicado = true')
+        if fluxo_ids is not None:
+            filtros.append('AND id = ANY(%s::uuid[])')
+            params.append([str(f) for f in fluxo_ids])
+        cursor.execute(SQL_SONDA.format(filtro=' '.join(filtros)), params)
+        return {str(fluxo_id): marca_conteudo(versao, resumo) for fluxo_id, versao, resumo in cursor.fetchall()}
+
+    def garantir(self, cursor, marcas):
+        """
+        {id: FluxoMapeado} para os pares {id: marca} vindos de sondar, buscando
+        numa única consulta só as estruturas que faltam no disco.
+        """
+        resultado, faltando = {}, []
+        for fluxo_id, marca in marcas.items():
+            fluxo = self.obter(fluxo_id, marca)
+            if fluxo is None:
+                faltando.append(fluxo_id)
+            else:
+                resultado[fluxo_id] = fluxo
+        self.acertos += len(resultado)
+        self.faltas += len(faltando)
+
+        if faltando:
+            cursor.execute(SQL_ESTRUTURAS, (faltando,))
+            for fluxo_id, versao, resumo, estrutura in cursor.fetchall():
+                fluxo_id = str(fluxo_id)
+                if isinstance(estrutura, str):
+                    estrutura = json.loads(estrutura)
+                self.bytes_baixados += len(json_canonico(estrutura).encode('utf-8'))
+                # Se a estrutura mudou entre a sonda e a busca, guarda a que veio (é a atual)
+                resultado[fluxo_id] = self.guardar(fluxo_id, marca_conteudo(versao, resumo), estrutura)
+                self._descartar_superadas(fluxo_id, marca_conteudo(versao, resumo))
+
+        return resultado
+
+    def sincronizar(self, cursor, fluxo_ids=None, publicados=True):
+        return self.garantir(cursor, self.sondar(cursor, fluxo_ids, publicados))
+
+    def _descartar_superadas(self, fluxo_id, marca):
+        prefixo = f'{fluxo_id}:'
+        for chave in [c for c in self.entradas if c.startswith(prefixo) and c != self._chave(fluxo_id, marca)]:
+            del self.entradas[chave]
+            self._alterado = True
+
+    # ------------------------------------------------------------------
+    # Manutenção
+    # ------------------------------------------------------------------
+
+    def tamanho(self):
+        return sum(self.objetos.values())
+
+    def despejar(self):
+        """Remove objetos sem entrada e, acima do limite, os de acesso mais antigo; retorna quantos saíram"""
+        usados = {}
+        for entrada in self.entradas.values():
+            usados[entrada['hash']] = max(usados.get(entrada['hash'], 0), entrada['acesso'])
+
+        removidos = [h for h in self.objetos if h not in usados]
+        total = sum(self.objetos[h] for h in usados if h in self.objetos)
+        for hash_ in sorted(usados, key=usados.get):
+            if total <= self.limite_bytes:
+                break
+            removidos.append(hash_)
+            total -= self.objetos.get(hash_, 0)
+
+        for hash_ in removidos:
+            fluxo = self._abertos.pop(hash_, None)
+            if fluxo is not None:
+                fluxo.fechar()
+            try:
+                os.unlink(self._caminho_objeto(hash_))
+            except FileNotFoundError:
+                pass
+            self.objetos.pop(hash_, None)
+
+        if removidos:
+            removidos_set = set(removidos)
+            self.entradas = {c: e for c, e in self.entradas.items() if e['hash'] not in removidos_set}
+            self._alterado = True
+        return len(removidos)
+
+    def limpar(self):
+        self.fechar()
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+        self.entradas, self.objetos = {}, {}
+
+    def fechar(self):
+        """Fecha os mmaps, aplica o limite de tamanho e grava o índice"""
+        for fluxo in self._abertos.values():
+            fluxo.fechar()
+        self._abertos = {}
+        if os.path.isdir(self.diretorio):
+            self.despejar()
+            self.salvar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.fechar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Cache local das estruturas de fluxos por (id, versao, md5 da estrutura)')
+    parser.add_argument('--diretorio', default=DIRETORIO_PADRAO, help=f'Pasta do cache (padrão: {DIRETORIO_PADRAO})')
+    parser.add_argument('--limite-mb', type=int, default=LIMITE_PADRAO_MB,
+                        help=f'Tamanho máximo antes de despejar por LRU (padrão: {LIMITE_PADRAO_MB})')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_sinc = sub.add_parser('sincronizar', help='Sonda id/versao/md5 e baixa só o que falta')
+    p_sinc.add_argument('--fluxo', action='append', help='ID do fluxo (pode repetir; padrão: todos)')
+    p_sinc.add_argument('--todos', action='store_true', help='Inclui fluxos não publicados')
+
+    p_mostrar = sub.add_parser('mostrar', help='Imprime a estrutura (ou uma etapa) de um fluxo via cache')
+    p_mostrar.add_argument('fluxo')
+    p_mostrar.add_argument('--etapa', help='Só esta etapa')
+
+    sub.add_parser('status', help='Entradas e tamanho em disco')
+    sub.add_parser('limpar', help='Apaga o cache')
+    args = parser.parse_args(argv)
+
+    cache = CacheFluxos(args.diretorio, args.limite_mb * 1024 * 1024)
+
+    if args.comando == 'status':
+        print(f"📦 {len(cache.entradas)} entrada(s), {len(cache.objetos)} objeto(s), "
+              f"{cache.tamanho() / 1024 / 1024:.1f} MB de {args.limite_mb} MB em {cache.diretorio}")
+        return 0
+
+    if args.comando == 'limpar':
+        cache.limpar()
+        print(f"🗑️  Cache removido: {cache.diretorio}")
+        return 0
+
+    from conectcrm_ops.db import conectar
+
+    inicio = time.perf_counter()
+    conn = conectar()
+    try:
+        with conn.cursor() as cursor:
+            if args.comando == 'sincronizar':
+                fluxos = cache.sincronizar(cursor, args.fluxo, publicados=not args.todos)
+            else:
+                fluxos = cache.sincronizar(cursor, [args.fluxo], publicados=False)
+    finally:
+        conn.close()
+
+    try:
+        if args.comando == 'mostrar':
+            fluxo = fluxos.get(args.fluxo)
+            if fluxo is None:
+                print(f"❌ Fluxo {args.fluxo} não encontrado")
+                return 1
+            dados = fluxo.etapa(args.etapa) if args.etapa else fluxo.estrutura()
+            if dados is None:
+                print(f"❌ Etapa '{args.etapa}' não existe no fluxo")
+                return 1
+            print(json.dumps(dados, indent=2, ensure_ascii=False))
+            return 0
+
+        print(f"✅ {len(fluxos)} fluxo(s): {cache.acertos} do disco, {cache.faltas} baixado(s) "
+              f"({cache.bytes_baixados / 1024:.0f} KB) em {time.perf_counter() - inicio:.2f}s")
+    finally:
+        cache.fechar()
+
+    print(f"📦 {len(cache.entradas)} entrada(s), {cache.tamanho() / 1024 / 1024:.1f} MB em {cache.diretorio}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
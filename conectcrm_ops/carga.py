@@ -0,0 +1,625 @@
+# -*- coding: utf-8 -*-
+"""
+Gerador de carga para o webhook do WhatsApp guiado por um fluxo de triagem
+
+Cada contato sintético conversa com o backend local como um cliente real: o
+SimuladorFluxo acompanha em que etapa a sessão deveria estar, os botões voltam
+com o id que o backend renderiza, opcoes[].valor (button_reply até 3 opções,
+list_reply acima disso; o bot casa só valor/texto/aliases), e as etapas de
+coleta recebem respostas válidas ou, com a probabilidade de --invalidas,
+respostas que o mesmo validador do bot recusa.
+
+O webhook responde 200 antes de processar a mensagem, então a latência medida é
+a do ciclo completo: POST do webhook → chamada do backend para /messages da
+Graph API, interceptada por um stub local. O backend continua com a URL
+https://graph.facebook.com fixa; basta subi-lo apontando o proxy para o stub:
+
+    HTTPS_PROXY=http://127.0.0.1:8099 NO_PROXY=localhost,127.0.0.1 npm run start:dev
+
+Uso:
+    python -m conectcrm_ops.carga fluxo-padrao-triagem-v3.json --empresa <uuid> --contatos 200 --taxa 20
+    python -m conectcrm_ops.carga fluxo.json --empresa <uuid> --nucleos-do-banco --app-secret <segredo>
+    python -m conectcrm_ops.carga fluxo.json --empresa <uuid> --nucleos nucleos.json --invalidas 0.2 --json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import itertools
+import json
+import random
+import sys
+import time
+from urllib.parse import urlsplit
+
+from conectcrm_ops.fluxos import carregar_estrutura
+from conectcrm_ops.histograma import Histograma, formatar_duracao
+from conectcrm_ops.simulador import CONFIRMACOES, EM_ANDAMENTO, ETAPAS_CONFIRMACAO, SimuladorFluxo
+
+ROTA_WEBHOOK = '/api/atendimento/webhooks/whatsapp/{empresa}'
+PERCENTIS = (50, 95, 99)
+LIMITE_BOTOES = 3  # acima disso o bot envia lista (WhatsAppInteractiveService)
+PRIMEIRA_MENSAGEM = 'Oi'
+ETAPA_INICIO = '(início)'
+ETAPA_DESCONHECIDA = '(fora do simulador)'
+
+NOMES = ['Ana', 'Bruno', 'Carla', 'Diego', 'Elisa', 'Fábio', 'Gabriela', 'Heitor', 'Íris', 'João']
+SOBRENOMES = ['Silva', 'Souza', 'Oliveira', 'Pereira', 'Lima', 'Carvalho', 'Gonçalves', 'Araújo']
+EMPRESAS = ['ACME Ltda', 'Padaria Central', 'Tech Sul', 'Mercado Bom Preço', 'Oficina Dois Irmãos']
+DETALHES = [
+    'Preciso de ajuda com a segunda via do boleto',
+    'O sistema não abre desde ontem',
+    'Quero contratar o plano anual',
+    'Minha nota fiscal veio com o CNPJ errado',
+]
+INVALIDAS = ['a', '123', 'email-invalido', 'x@', '!!']
+RESPOSTA_FORA_DO_MENU = 'não sei'
+
+
+# ----------------------------------------------------------------------
+# Conversa sintética
+# ----------------------------------------------------------------------
+
+def candidatos_validos(etapa_id, variavel, validacao, rng, indice):
+    """Respostas plausíveis para a etapa, as mais prováveis primeiro"""
+    nome = rng.choice(NOMES)
+    sobrenome = rng.choice(SOBRENOMES)
+    email = f'carga{indice}@exemplo.com.br'
+    texto = rng.choice(DETALHES)
+    pista = f"{etapa_id} {variavel or ''} {(validacao or {}).get('tipo') or ''}".lower()
+
+    if 'email' in pista:
+        return [email, texto]
+    if 'telefone' in pista:
+        return [f'119{rng.randrange(10 ** 7, 10 ** 8)}', texto]
+    if 'sobrenome' in pista:
+        return [sobrenome, nome, texto]
+    if 'nome' in pista:
+        return [nome, sobrenome, texto]
+    if 'empresa' in pista:
+        return [rng.choice(EMPRESAS), texto]
+    return [texto, f'{nome} {sobrenome}', email]
+
+
+def escolher_resposta(simulador, estrutura, sessao, rng, prob_invalida, indice, opcoes_stub=None):
+    """
+    (texto, interativo, valida) para a etapa atual da sessão.
+
+    interativo é None para texto livre ou {'tipo', 'id', 'title'} para toque em
+    botão/lista; o id é o valor da opção, como o backend envia para a Graph
+    API. Quando o simulador não conhece as opções (menu dinâmico sem núcleos
+    informados, botões SIM/NAO das etapas de confirmação), usa as que o stub
+    viu na última mensagem do bot.
+    """
+    etapa = simulador.etapas.get(sessao.etapa_atual)
+    invalida = rng.random() < prob_invalida
+
+    if etapa is not None and etapa.id in ETAPAS_CONFIRMACAO and sessao.opcoes_atuais is None:
+        if invalida:
+            return 'talvez', None, False
+        if not opcoes_stub:
+            return 'sim', None, True
+        botao_id, titulo = next(((i, t) for i, t in opcoes_stub if i.lower() in CONFIRMACOES), opcoes_stub[0])
+        tipo = 'button_reply' if len(opcoes_stub) <= LIMITE_BOTOES else 'list_reply'
+        return titulo, {'tipo': tipo, 'id': botao_id, 'title': titulo}, True
+
+    if sessao.opcoes_atuais is not None or opcoes_stub:
+        if invalida:
+            return RESPOSTA_FORA_DO_MENU, None, False
+        if sessao.opcoes_atuais is not None:
+            # whatsapp-webhook.service renderiza id: op.valor; sem valor o bot usa a posição
+            opcoes = [
+                (str(o['valor'] if o.get('valor') is not None else i), o.get('texto') or '')
+                for i, o in enumerate(sessao.opcoes_atuais.opcoes, 1)
+            ]
+        else:
+            opcoes = opcoes_stub
+        botao_id, titulo = rng.choice(opcoes)
+        tipo = 'button_reply' if len(opcoes) <= LIMITE_BOTOES else 'list_reply'
+        return titulo, {'tipo': tipo, 'id': botao_id, 'title': titulo}, True
+
+    if etapa is None:
+        return PRIMEIRA_MENSAGEM, None, True
+
+    if etapa.id in ETAPAS_CONFIRMACAO:
+        return ('talvez', None, False) if invalida else ('sim', None, True)
+
+    if not etapa.coleta:
+        return rng.choice(DETALHES), None, True
+
+    validacao = (estrutura['etapas'].get(etapa.id) or {}).get('validacao')
+    if invalida:
+        recusadas = [t for t in INVALIDAS if not etapa.validar(t)['valido']]
+        if recusadas:
+            return rng.choice(recusadas), None, False
+
+    candidatos = candidatos_validos(etapa.id, etapa.variavel, validacao, rng, indice)
+    for candidato in candidatos:
+        if etapa.validar(candidato)['valido']:
+            return candidato, None, True
+    return candidatos[0], None, False
+
+
+def montar_webhook(telefone, nome, texto, interativo, phone_number_id, mensagem_id):
+    """Payload no formato do WhatsApp Cloud API (entry[].changes[].value.messages[])"""
+    mensagem = {
+        'from': telefone,
+        'id': mensagem_id,
+        'timestamp': str(int(time.time())),
+    }
+    if interativo is None:
+        mensagem['type'] = 'text'
+        mensagem['text'] = {'body': texto}
+    else:
+        mensagem['type'] = 'interactive'
+        mensagem['interactive'] = {
+            'type': interativo['tipo'],
+            interativo['tipo']: {'id': interativo['id'], 'title': interativo['title']},
+        }
+
+    return {
+        'object': 'whatsapp_business_account',
+        'entry': [{
+            'id': phone_number_id,
+            'changes': [{
+                'field': 'messages',
+                'value': {
+                    'messaging_product': 'whatsapp',
+                    'metadata': {'display_phone_number': phone_number_id, 'phone_number_id': phone_number_id},
+                    'contacts': [{'profile': {'name': nome}, 'wa_id': telefone}],
+                    'messages': [mensagem],
+                },
+            }],
+        }],
+    }
+
+
+def serializar(payload):
+    """Mesmos bytes de JSON.stringify, que é o que o backend assina"""
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def assinar(corpo, segredo):
+    return 'sha256=' + hmac.new(segredo.encode('utf-8'), corpo, hashlib.sha256).hexdigest()
+
+
+def chave_telefone(telefone):
+    # Os 8 últimos dígitos sobrevivem ao 9º dígito e ao DDI que o backend acrescenta ou remove
+    return ''.join(c for c in str(telefone) if c.isdigit())[-8:]
+
+
+# ----------------------------------------------------------------------
+# HTTP mínimo sobre asyncio (cliente keep-alive e stub da Graph API)
+# ----------------------------------------------------------------------
+
+async def ler_mensagem_http(reader):
+    """(primeira linha, cabeçalhos, corpo) de uma requisição ou resposta HTTP/1.1"""
+    linha = await reader.readline()
+    if not linha:
+        raise ConnectionResetError('conexão encerrada')
+
+    cabecalhos = {}
+    while True:
+        atual = await reader.readline()
+        if atual in (b'\r\n', b'\n', b''):
+            break
+        nome, _, valor = atual.decode('latin-1').partition(':')
+        cabecalhos[nome.strip().lower()] = valor.strip()
+
+    if cabecalhos.get('transfer-encoding', '').lower() == 'chunked':
+        partes = []
+        while True:
+            tamanho = int((await reader.readline()).split(b';')[0].strip() or b'0', 16)
+            if tamanho == 0:
+                await reader.readline()
+                break
+            partes.append(await reader.readexactly(tamanho))
+            await reader.readline()
+        corpo = b''.join(partes)
+    else:
+        corpo = await reader.readexactly(int(cabecalhos.get('content-length') or 0))
+
+    return linha.decode('latin-1').strip(), cabecalhos, corpo
+
+
+class ClienteHttp:
+    """POSTs para uma única origem com até `conexoes` conexões keep-alive"""
+
+    def __init__(self, url, conexoes):
+        partes = urlsplit(url)
+        if partes.scheme != 'http':
+            raise ValueError('O gerador de carga fala apenas http:// (backend local)')
+        self.host = partes.hostname
+        self.porta = partes.port or 80
+        self.caminho = partes.path or '/'
+        self.livres = []
+        self.vagas = asyncio.Semaphore(conexoes)
+
+    async def post(self, corpo, cabecalhos):
+        async with self.vagas:
+            conexao = self.livres.pop() if self.livres else await asyncio.open_connection(self.host, self.porta)
+            reader, writer = conexao
+            linhas = [
+                f'POST {self.caminho} HTTP/1.1',
+                f'Host: {self.host}:{self.porta}',
+                'Content-Type: application/json',
+                f'Content-Length: {len(corpo)}',
+                'Connection: keep-alive',
+            ] + [f'{nome}: {valor}' for nome, valor in cabecalhos.items()]
+            try:
+                writer.write(('\r\n'.join(linhas) + '\r\n\r\n').encode('latin-1') + corpo)
+                await writer.drain()
+                status, resposta, _ = await ler_mensagem_http(reader)
+            except Exception:
+                writer.close()
+                raise
+
+            if resposta.get('connection', '').lower() == 'close':
+                writer.close()
+            else:
+                self.livres.append(conexao)
+            return int(status.split()[1])
+
+    def fechar(self):
+        for _, writer in self.livres:
+            writer.close()
+        self.livres = []
+
+
+class StubGraph:
+    """
+    Responde às chamadas do backend para a Graph API (via HTTPS_PROXY) e entrega
+    cada mensagem enviada ao contato de destino, com o instante de chegada e os
+    botões/linhas da mensagem interativa, se houver.
+    """
+
+    def __init__(self, porta):
+        self.porta = porta
+        self.filas = {}
+        self.recebidas = 0
+        self.sem_destino = 0
+        self.servidor = None
+        self._ids = itertools.count(1)
+
+    async def iniciar(self):
+        self.servidor = await asyncio.start_server(self._atender, '127.0.0.1', self.porta)
+
+    async def parar(self):
+        if self.servidor is not None:
+            self.servidor.close()
+            await self.servidor.wait_closed()
+
+    def registrar(self, telefone):
+        fila = asyncio.Queue()
+        self.filas[chave_telefone(telefone)] = fila
+        return fila
+
+    def remover(self, telefone):
+        self.filas.pop(chave_telefone(telefone), None)
+
+    async def _atender(self, reader, writer):
+        try:
+            while True:
+                try:
+                    _, cabecalhos, corpo = await ler_mensagem_http(reader)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    break
+                chegada = time.perf_counter()
+                resposta = self._processar(corpo, chegada)
+                dados = json.dumps(resposta).encode('utf-8')
+                writer.write(
+                    b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                    + f'Content-Length: {len(dados)}\r\n\r\n'.encode('latin-1') + dados
+                )
+                await writer.drain()
+                if cabecalhos.get('connection', '').lower() == 'close':
+                    break
+        finally:
+            writer.close()
+
+    def _processar(self, corpo, chegada):
+        try:
+            payload = json.loads(corpo or b'{}')
+        except ValueError:
+            payload = {}
+
+        destino = payload.get('to') if isinstance(payload, dict) else None
+        if not destino:
+            # Marcação de leitura, consulta de número etc.
+            return {'success': True}
+
+        self.recebidas += 1
+        fila = self.filas.get(chave_telefone(destino))
+        if fila is None:
+            self.sem_destino += 1
+        else:
+            fila.put_nowait((chegada, extrair_opcoes(payload)))
+
+        return {
+            'messaging_product': 'whatsapp',
+            'contacts': [{'input': destino, 'wa_id': destino}],
+            'messages': [{'id': f'wamid.stub.{next(self._ids)}'}],
+        }
+
+
+def extrair_opcoes(payload):
+    """[(id, título)] dos botões ou linhas de uma mensagem interativa enviada pelo bot"""
+    acao = (payload.get('interactive') or {}).get('action') or {}
+    opcoes = [
+        (b['reply']['id'], b['reply'].get('title') or '')
+        for b in acao.get('buttons') or [] if isinstance(b.get('reply'), dict) and b['reply'].get('id')
+    ]
+    for secao in acao.get('sections') or []:
+        opcoes.extend((r['id'], r.get('title') or '') for r in secao.get('rows') or [] if r.get('id'))
+    return opcoes or None
+
+
+# ----------------------------------------------------------------------
+# Execução
+# ----------------------------------------------------------------------
+
+class Resultados:
+    def __init__(self):
+        self.por_etapa = {}
+        self.status = {}
+        self.enviadas = 0
+        self.invalidas = 0
+        self.divergencias = 0
+        self.duracao = 0.0
+        self.stub_recebidas = 0
+        self.stub_sem_destino = 0
+
+    def etapa(self, etapa_id):
+        if etapa_id not in self.por_etapa:
+            self.por_etapa[etapa_id] = {'latencia': Histograma(), 'enviadas': 0, 'erros': {}}
+        return self.por_etapa[etapa_id]
+
+    def erro(self, etapa_id, tipo):
+        erros = self.etapa(etapa_id)['erros']
+        erros[tipo] = erros.get(tipo, 0) + 1
+
+
+def drenar(fila):
+    ultima = None
+    while not fila.empty():
+        _, opcoes = fila.get_nowait()
+        ultima = opcoes or ultima
+    return ultima
+
+
+async def conversar(indice, args, simulador, estrutura, nucleos, cliente, stub, resultados):
+    rng = random.Random(f'{args.semente}:{indice}')
+    telefone = f'{args.prefixo}{indice:0{13 - len(args.prefixo)}d}'
+    nome = f'{rng.choice(NOMES)} {rng.choice(SOBRENOMES)}'
+    fila = stub.registrar(telefone)
+
+    sessao = simulador.iniciar({'contatoExiste': False, 'telefone': telefone}, nucleos)
+    texto, interativo, etapa_id = PRIMEIRA_MENSAGEM, None, ETAPA_INICIO
+    opcoes_stub = None
+    acompanhando = True
+
+    try:
+        for sequencia in range(args.max_mensagens):
+            payload = montar_webhook(
+                telefone, nome, texto, interativo, args.phone_number_id, f'wamid.carga.{indice}.{sequencia}'
+            )
+            corpo = serializar(payload)
+            cabecalhos = {'x-hub-signature-256': assinar(corpo, args.app_secret)} if args.app_secret else {}
+
+            dados_etapa = resultados.etapa(etapa_id)
+            dados_etapa['enviadas'] += 1
+            resultados.enviadas += 1
+
+            inicio = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(cliente.post(corpo, cabecalhos), args.timeout)
+            except asyncio.TimeoutError:
+                resultados.erro(etapa_id, 'webhook_timeout')
+                return 'erro'
+            except (OSError, ConnectionError, asyncio.IncompleteReadError):
+                resultados.erro(etapa_id, 'conexao')
+                return 'erro'
+            if status != 200:
+                resultados.erro(etapa_id, f'http_{status}')
+                return 'erro'
+
+            try:
+                chegada, opcoes = await asyncio.wait_for(fila.get(), args.timeout)
+            except asyncio.TimeoutError:
+                resultados.erro(etapa_id, 'sem_resposta')
+                return 'erro'
+            dados_etapa['latencia'].registrar((chegada - inicio) * 1000)
+
+            if acompanhando and sessao.status != EM_ANDAMENTO:
+                return sessao.status
+
+            # Tempo de leitura do cliente; as demais mensagens do bot chegam nesse intervalo
+            await asyncio.sleep(rng.uniform(args.pensar * 0.5, args.pensar * 1.5))
+            opcoes_stub = drenar(fila) or opcoes
+
+            if acompanhando:
+                etapa_id = sessao.etapa_atual
+                texto, interativo, valida = escolher_resposta(
+                    simulador, estrutura, sessao, rng, args.invalidas, indice,
+                    None if sessao.opcoes_atuais is not None else opcoes_stub,
+                )
+            elif opcoes_stub:
+                botao_id, titulo = rng.choice(opcoes_stub)
+                tipo = 'button_reply' if len(opcoes_stub) <= LIMITE_BOTOES else 'list_reply'
+                texto, interativo, valida = titulo, {'tipo': tipo, 'id': botao_id, 'title': titulo}, True
+            else:
+                texto, interativo, valida = rng.choice(DETALHES), None, True
+            if not valida:
+                resultados.invalidas += 1
+
+            menu_desconhecido = (interativo is not None and sessao.opcoes_atuais is None
+                                 and sessao.etapa_atual not in ETAPAS_CONFIRMACAO)
+            if not acompanhando or menu_desconhecido:
+                # Menu que o simulador não conhece (núcleos não informados): segue só com o backend
+                acompanhando = False
+                etapa_id = ETAPA_DESCONHECIDA
+                continue
+
+            # O webhook entrega ao bot o id do botão/linha, não o título
+            simulador.responder(sessao, interativo['id'] if interativo else texto, nucleos)
+            if sessao.erro:
+                resultados.divergencias += 1
+                resultados.erro(etapa_id, 'simulador')
+                return 'erro'
+        return 'limite'
+    finally:
+        stub.remover(telefone)
+
+
+async def executar(args, simulador, estrutura, nucleos):
+    resultados = Resultados()
+    stub = StubGraph(args.porta_stub)
+    await stub.iniciar()
+    cliente = ClienteHttp(args.url, args.conexoes)
+    rng = random.Random(args.semente)
+
+    async def contato(indice):
+        status = await conversar(indice, args, simulador, estrutura, nucleos, cliente, stub, resultados)
+        resultados.status[status] = resultados.status.get(status, 0) + 1
+
+    inicio = time.perf_counter()
+    tarefas = []
+    try:
+        for indice in range(args.contatos):
+            tarefas.append(asyncio.ensure_future(contato(indice)))
+            if args.taxa:
+                # Chegadas de Poisson: rajadas e pausas como num pico real
+                await asyncio.sleep(rng.expovariate(args.taxa))
+        await asyncio.gather(*tarefas)
+    finally:
+        cliente.fechar()
+        await stub.parar()
+
+    resultados.duracao = time.perf_counter() - inicio
+    resultados.stub_recebidas = stub.recebidas
+    resultados.stub_sem_destino = stub.sem_destino
+    return resultados
+
+
+def relatorio(resultados):
+    etapas = []
+    for etapa_id, dados in resultados.por_etapa.items():
+        latencia = dados['latencia']
+        percentis = latencia.percentis(PERCENTIS)
+        etapas.append({
+            'etapa': etapa_id,
+            'enviadas': dados['enviadas'],
+            'respondidas': latencia.total,
+            'erros': dict(sorted(dados['erros'].items())),
+            'mediaMs': round(latencia.media()) if latencia.total else None,
+            **{f'p{p}Ms': percentis[p] for p in PERCENTIS},
+            'maximoMs': latencia.maximo,
+        })
+    etapas.sort(key=lambda e: -e['enviadas'])
+
+    geral = Histograma()
+    for dados in resultados.por_etapa.values():
+        geral.juntar(dados['latencia'])
+    percentis = geral.percentis(PERCENTIS)
+
+    return {
+        'duracaoSegundos': round(resultados.duracao, 3),
+        'mensagensEnviadas': resultados.enviadas,
+        'mensagensPorSegundo': round(resultados.enviadas / max(resultados.duracao, 1e-9), 1),
+        'respostasInvalidas': resultados.invalidas,
+        'divergenciasSimulador': resultados.divergencias,
+        'conversas': dict(sorted(resultados.status.items())),
+        'stub': {'recebidas': resultados.stub_recebidas, 'semDestino': resultados.stub_sem_destino},
+        'geral': {f'p{p}Ms': percentis[p] for p in PERCENTIS},
+        'etapas': etapas,
+    }
+
+
+def imprimir_relatorio(dados):
+    print(f"\n📈 {dados['mensagensEnviadas']} mensagem(ns) em {dados['duracaoSegundos']}s "
+          f"({dados['mensagensPorSegundo']} msg/s), {dados['respostasInvalidas']} inválida(s) de propósito")
+    print("💬 Conversas: " + ', '.join(f'{s}={n}' for s, n in dados['conversas'].items()))
+    print(f"🧪 Stub: {dados['stub']['recebidas']} envio(s) do bot, {dados['stub']['semDestino']} sem contato da carga")
+    geral = dados['geral']
+    print("⏱️  Geral: " + '  '.join(f'p{p}={formatar_duracao(geral[f"p{p}Ms"])}' for p in PERCENTIS))
+
+    print(f"\n{'Etapa':<36} {'Env':>6} {'Resp':>6} {'p50':>8} {'p95':>8} {'p99':>8}  Erros")
+    for etapa in dados['etapas']:
+        erros = ', '.join(f'{t}={n}' for t, n in etapa['erros'].items()) or '-'
+        print(
+            f"{etapa['etapa'][:36]:<36} {etapa['enviadas']:>6} {etapa['respondidas']:>6} "
+            + ' '.join(f"{formatar_duracao(etapa[f'p{p}Ms']):>8}" for p in PERCENTIS)
+            + f"  {erros}"
+        )
+
+
+def carregar_nucleos(args):
+    if args.nucleos:
+        with open(args.nucleos, 'r', encoding='utf-8') as arquivo:
+            dados = json.load(arquivo)
+        # Aceita a lista de núcleos ou a saída de "opcoes_bot --json" ({empresa: [...]})
+        return dados.get(args.empresa, []) if isinstance(dados, dict) else dados
+
+    if args.nucleos_do_banco:
+        from conectcrm_ops.db import conectar
+        from conectcrm_ops.opcoes_bot import buscar_opcoes_para_bot
+
+        conn = conectar()
+        try:
+            with conn.cursor() as cursor:
+                return buscar_opcoes_para_bot(cursor, [args.empresa])[args.empresa]
+        finally:
+            conn.close()
+
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Carga de conversas no webhook do WhatsApp, guiada por um fluxo')
+    parser.add_argument('fluxo', help='JSON do fluxo (arquivo exportado ou estrutura)')
+    parser.add_argument('--empresa', required=True, help='ID da empresa do webhook')
+    parser.add_argument('--url', help='URL do webhook (padrão: backend local na rota da empresa)')
+    parser.add_argument('--app-secret', help='Assina os payloads (x-hub-signature-256) com o App Secret da Meta')
+    parser.add_argument('--phone-number-id', default='000000000000000', help='metadata.phone_number_id dos payloads')
+    parser.add_argument('--nucleos', help='JSON com os núcleos do menu (lista ou saída de opcoes_bot --json)')
+    parser.add_argument('--nucleos-do-banco', action='store_true', help='Carrega os núcleos da empresa no banco')
+    parser.add_argument('--contatos', type=int, default=50, help='Conversas a simular (padrão: 50)')
+    parser.add_argument('--taxa', type=float, default=5.0,
+                        help='Novas conversas por segundo, chegadas de Poisson; 0 = todas de uma vez (padrão: 5)')
+    parser.add_argument('--pensar', type=float, default=1.0, help='Segundos médios entre mensagens de um contato')
+    parser.add_argument('--invalidas', type=float, default=0.1, help='Probabilidade de resposta inválida (padrão: 0.1)')
+    parser.add_argument('--max-mensagens', type=int, default=30, help='Limite de mensagens por conversa')
+    parser.add_argument('--timeout', type=float, default=15.0, help='Segundos esperando a resposta do bot')
+    parser.add_argument('--conexoes', type=int, default=50, help='Conexões HTTP simultâneas com o backend')
+    parser.add_argument('--porta-stub', type=int, default=8099, help='Porta do stub da Graph API (padrão: 8099)')
+    parser.add_argument('--prefixo', default='5599900', help='Início dos telefones sintéticos (padrão: 5599900)')
+    parser.add_argument('--semente', type=int, default=0, help='Semente das escolhas aleatórias')
+    parser.add_argument('--json', action='store_true', help='Imprime o relatório em JSON')
+    args = parser.parse_args(argv)
+
+    if len(args.prefixo) >= 13 or len(args.prefixo) + len(str(max(args.contatos - 1, 0))) > 13:
+        parser.error('--prefixo não deixa dígitos suficientes para --contatos telefones de 13 dígitos')
+    args.url = args.url or 'http://localhost:3001' + ROTA_WEBHOOK.format(empresa=args.empresa)
+
+    estrutura = carregar_estrutura(args.fluxo)
+    simulador = SimuladorFluxo(estrutura, renderizar=False)
+    nucleos = carregar_nucleos(args)
+
+    if not args.json:
+        print(f"🚀 {args.contatos} conversa(s) a {args.taxa or '∞'}/s contra {args.url}")
+        print(f"🧪 Stub da Graph API em http://127.0.0.1:{args.porta_stub} (HTTPS_PROXY do backend)")
+
+    resultados = asyncio.run(executar(args, simulador, estrutura, nucleos))
+    dados = relatorio(resultados)
+
+    if args.json:
+        print(json.dumps(dados, indent=2, ensure_ascii=False))
+    else:
+        imprimir_relatorio(dados)
+
+    return 1 if any(e['erros'] for e in dados['etapas']) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,531 @@
+# -*- coding: utf-8 -*-
+"""
+Detecção e reparo de mojibake (UTF-8 decodificado como Latin-1/CP1252)
+
+Substitui o fix-encoding.py, que reinseria à mão o texto de uma etapa de um
+fluxo: varre todas as colunas de texto e JSONB de fluxos_triagem,
+message_templates, atendimento_templates e atendimento_mensagens e conserta
+qualquer string com dupla codificação:
+
+    "SÃ£o Paulo"        → "São Paulo"
+    "Ã©"                → "é"
+    "ðŸ˜Š"              → "😊"
+    "\\ud83d\\ude0a"     → "😊"   (par substituto escapado como texto)
+
+Heurística: texto certo em português também forma UTF-8 válido quando lido
+como bytes ("ATÉ…" são os bytes C9 85, que decodificam para "Ʌ"; "VOCÊ”",
+"SÓ…" idem), então não basta a sequência ser válida. Só entram as marcas
+usuais de dupla codificação: Ã/Â (U+00A0..U+00FF, dois bytes), â (pontuação,
+símbolos e emoji de três bytes) e ð (emoji de quatro bytes) seguidos de um
+caractere que seria byte de continuação. Cada trecho suspeito é convertido de
+volta para os bytes originais e decodificado sequência a sequência, e uma
+sequência só é aceita se o resultado for plausível: U+00A0..U+00FF para dois
+bytes, pontuação geral/símbolos/emoji para três e emoji para quatro. Maiúscula
+acentuada vinda de pontuação do CP1252 ("Ã‰" → "É", mas também "IRMÃ…") só é
+aceita dentro de palavra ou quando o texto tem outra marca inequívoca ("Ã§",
+"â€", "ðŸ"): na dúvida o texto fica como está. O que não forma UTF-8 válido
+fica como estava. Três passadas no máximo (textos codificados duas vezes).
+Sobra de "�" não tem conserto e só é contada. REGRESSAO guarda os casos de
+referência (subcomando conferir).
+
+Escrita: como no telefone corrigir, a leitura é em fluxo (cursor do lado do
+servidor) e cada lote é um UPDATE ... FROM (VALUES ...) com commit próprio,
+lock_timeout curto e conferência do valor antigo (linha alterada no meio do
+caminho não é sobrescrita). Antes do commit, o valor antigo de cada linha
+gravada vai para o diário (JSONL): `reverter` desfaz a partir dele. Em
+fluxos_triagem a versao é incrementada.
+
+Uso:
+    python -m conectcrm_ops.codificacao varrer                      (simulação com diff)
+    python -m conectcrm_ops.codificacao varrer --tabela fluxos_triagem --exemplos 50
+    python -m conectcrm_ops.codificacao reparar --diario reparos.jsonl
+    python -m conectcrm_ops.codificacao reverter reparos.jsonl
+    python -m conectcrm_ops.codificacao texto "SÃ£o Paulo"
+    python -m conectcrm_ops.codificacao conferir
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+# tabela: {coluna: é jsonb}
+ALVOS = {
+    'fluxos_triagem': {'nome': False, 'descricao': False, 'estrutura': True},
+    'message_templates': {'nome': False, 'conteudo': False, 'categoria': False, 'variaveis': False},
+    'atendimento_templates': {'nome': False, 'conteudo': False, 'categoria': False},
+    'atendimento_mensagens': {'conteudo': False, 'anexos': True},
+}
+
+# Tabelas em que o conteúdo alterado precisa de versao nova
+COM_VERSAO = {'fluxos_triagem'}
+
+LOTE_PADRAO = 2000
+LOCK_TIMEOUT = '2s'
+PASSADAS = 3
+
+
+# ----------------------------------------------------------------------
+# Detecção e reparo
+# ----------------------------------------------------------------------
+
+def _mapa_bytes():
+    """Caractere (como aparece no texto estragado) -> byte original"""
+    mapa = {chr(b): b for b in range(0x80, 0x100)}  # Latin-1, inclui os indefinidos do CP1252
+    for b in range(0x80, 0xa0):
+        try:
+            mapa[bytes([b]).decode('cp1252')] = b
+        except UnicodeDecodeError:
+            pass
+    return mapa
+
+
+BYTE_ORIGINAL = _mapa_bytes()
+
+_CONTINUACAO = ''.join(sorted(re.escape(c) for c, b in BYTE_ORIGINAL.items() if b <= 0xbf))
+_TRECHO_CLASSE = ''.join(sorted(re.escape(c) for c in BYTE_ORIGINAL))
+
+# Filtro rápido: só strings que casam aqui passam pelo reparo (Ã/Â, â, ð + continuação)
+SUSPEITA = re.compile(
+    f'[ÂÃâð][{_CONTINUACAO}]'
+    r'|\\u[dD][89abAB][0-9a-fA-F]{2}'
+    '|�'
+)
+# Marcas que texto certo em português não produz: minúscula acentuada (Ã + U+00A0..U+00BF),
+# pontuação de três bytes (â€) e emoji (ðŸ)
+INEQUIVOCA = re.compile('[ÂÃ][\u00a0-\u00bf]|â€|ðŸ')
+TRECHO = re.compile(f'[{_TRECHO_CLASSE}]{{2,}}')
+PAR_ESCAPADO = re.compile(r'\\u([dD][89abAB][0-9a-fA-F]{2})\\u([dD][c-fC-F][0-9a-fA-F]{2})')
+
+# Mesmo filtro no lado do banco (regex do PostgreSQL) para não trafegar as linhas limpas
+FILTRO_SQL = (
+    "[\\u00c2\\u00c3\\u00e2\\u00f0][\\u0080-\\u00bf\\u0152\\u0153\\u0160\\u0161\\u0178\\u017d\\u017e\\u0192"
+    "\\u02c6\\u02dc\\u2013\\u2014\\u2018-\\u201a\\u201c-\\u201e\\u2020-\\u2022\\u2026\\u2030"
+    "\\u2039\\u203a\\u20ac\\u2122]|\\\\u[dD][89abAB]|\\ufffd"
+)
+
+# Resultado aceitável de uma sequência de três bytes: pontuação geral, moedas, ™, setas,
+# símbolos técnicos, dingbats/emoji do BMP e seletores de variação
+FAIXAS_TRES_BYTES = (
+    (0x2000, 0x206f), (0x20a0, 0x20cf), (0x2122, 0x2122), (0x2190, 0x21ff), (0x2300, 0x23ff),
+    (0x2460, 0x27bf), (0x2900, 0x297f), (0x2b00, 0x2bff), (0xfe00, 0xfe0f),
+)
+FAIXAS_QUATRO_BYTES = ((0x1f000, 0x1faff), (0xe0020, 0xe007f))
+
+# Casos de referência do reparo: (entrada, esperado)
+REGRESSAO = (
+    ('SÃ£o Paulo', 'São Paulo'),
+    ('Ã©', 'é'),
+    ('ðŸ˜Š', '😊'),
+    ('\\ud83d\\ude0a', '😊'),
+    ('OlÃ¡! Tudo bem? â€” AÃ‡ÃƒO', 'Olá! Tudo bem? — AÇÃO'),
+    ('ATENÃ‡ÃƒO', 'ATENÇÃO'),
+    ('Ã“timo, JOSÃ‰ jÃ¡ respondeu', 'Ótimo, JOSÉ já respondeu'),
+    ('âœ… Confirmado', '✅ Confirmado'),
+    # Texto certo que também é UTF-8 válido quando lido como bytes: não pode mudar
+    ('ATÉ…', 'ATÉ…'),
+    ('VOCÊ…', 'VOCÊ…'),
+    ('“JOSÉ”', '“JOSÉ”'),
+    ('CAFÉ—PÃO', 'CAFÉ—PÃO'),
+    ('…SÓ…', '…SÓ…'),
+    ('IRMÃ…', 'IRMÃ…'),
+    ('NÃO!!! “SÓ AMANHÔ', 'NÃO!!! “SÓ AMANHÔ'),
+    ('Está ótimo…', 'Está ótimo…'),
+)
+
+
+def _tamanho_sequencia(byte):
+    if 0xc2 <= byte <= 0xdf:
+        return 2
+    if 0xe0 <= byte <= 0xef:
+        return 3
+    if 0xf0 <= byte <= 0xf4:
+        return 4
+    return 0
+
+
+def _plausivel(texto, n):
+    """Se o que saiu de uma sequência de n bytes é o que um texto nosso teria"""
+    cp = ord(texto[0]) if len(texto) == 1 else 0x10000 + ((ord(texto[0]) - 0xd800) << 10)
+    if n == 2:
+        return 0xa0 <= cp <= 0xff
+    faixas = FAIXAS_TRES_BYTES if n == 3 else FAIXAS_QUATRO_BYTES
+    return any(inicio <= cp <= fim for inicio, fim in faixas)
+
+
+def _decodificar_trecho(trecho, seguinte='', confirmado=False):
+    """
+    Trecho suspeito -> bytes originais -> UTF-8, sequência por sequência.
+    `seguinte` é o caractere depois do trecho; `confirmado` diz se o texto
+    tem uma marca inequívoca de dupla codificação.
+    """
+    dados = bytes(BYTE_ORIGINAL[c] for c in trecho)
+    saida, i = [], 0
+    while i < len(dados):
+        n = _tamanho_sequencia(dados[i])
+        if n:
+            # Par substituto em CESU-8 (ED A0..AF xx ED B0..BF xx)
+            cesu = dados[i] == 0xed and len(dados) - i >= 6 and 0xa0 <= dados[i + 1] <= 0xaf
+            if cesu and dados[i + 3] == 0xed:
+                try:
+                    par = dados[i:i + 6].decode('utf-8', 'surrogatepass')
+                    par = par.encode('utf-16-le', 'surrogatepass').decode('utf-16-le')
+                    if _plausivel(par, 4):
+                        saida.append(par)
+                        i += 6
+                        continue
+                except UnicodeError:
+                    pass
+            try:
+                decodificado = dados[i:i + n].decode('utf-8')
+            except UnicodeDecodeError:
+                decodificado = None
+            if decodificado is not None and _plausivel(decodificado, n):
+                # Maiúscula acentuada a partir de pontuação do CP1252 ("Ã‰", "Ã…"): só dentro de palavra
+                ambigua = n == 2 and dados[i + 1] < 0xa0
+                depois = trecho[i + n] if i + n < len(trecho) else seguinte
+                if not ambigua or confirmado or depois.isalpha():
+                    saida.append(decodificado)
+                    i += n
+                    continue
+        saida.append(trecho[i])
+        i += 1
+    return ''.join(saida)
+
+
+def _juntar_par(m):
+    alto, baixo = int(m.group(1), 16), int(m.group(2), 16)
+    return chr(0x10000 + ((alto - 0xd800) << 10) + (baixo - 0xdc00))
+
+
+def reparar_texto(texto):
+    """Texto reparado, ou o próprio texto se não há nada a consertar"""
+    if not texto or not SUSPEITA.search(texto):
+        return texto
+    for _ in range(PASSADAS):
+        confirmado = bool(INEQUIVOCA.search(texto))
+        novo = TRECHO.sub(
+            lambda m: _decodificar_trecho(m.group(), texto[m.end():m.end() + 1], confirmado), texto
+        )
+        novo = PAR_ESCAPADO.sub(_juntar_par, novo)
+        if novo == texto:
+            break
+        texto = novo
+    return texto
+
+
+def irreparavel(texto):
+    return isinstance(texto, str) and '�' in texto
+
+
+def reparar_json(valor):
+    """Aplica reparar_texto em todas as strings (chaves inclusive) de um valor JSON"""
+    if isinstance(valor, str):
+        return reparar_texto(valor)
+    if isinstance(valor, list):
+        return [reparar_json(v) for v in valor]
+    if isinstance(valor, dict):
+        return {reparar_texto(k): reparar_json(v) for k, v in valor.items()}
+    return valor
+
+
+def _strings(valor):
+    if isinstance(valor, str):
+        yield valor
+    elif isinstance(valor, list):
+        for v in valor:
+            yield from _strings(v)
+    elif isinstance(valor, dict):
+        for k, v in valor.items():
+            yield k
+            yield from _strings(v)
+
+
+def diferencas(antigo, novo, contexto=30):
+    """[(trecho_antigo, trecho_novo)] de cada string alterada, com um pouco de contexto"""
+    pares = []
+    for a, b in zip(_strings(antigo), _strings(novo)):
+        if a == b:
+            continue
+        inicio = 0
+        while inicio < min(len(a), len(b)) and a[inicio] == b[inicio]:
+            inicio += 1
+        fim_a, fim_b = len(a), len(b)
+        while fim_a > inicio and fim_b > inicio and a[fim_a - 1] == b[fim_b - 1]:
+            fim_a -= 1
+            fim_b -= 1
+        de = max(0, inicio - contexto)
+        pares.append((
+            a[de:fim_a + contexto].replace('\n', '⏎'),
+            b[de:fim_b + contexto].replace('\n', '⏎'),
+        ))
+    return pares
+
+
+# ----------------------------------------------------------------------
+# Varredura e reparo no banco
+# ----------------------------------------------------------------------
+
+SQL_LER = """
+    SELECT id::text, {colunas}
+    FROM {tabela}
+    WHERE {filtro}
+"""
+
+SQL_REPARAR = """
+    UPDATE {tabela} AS t
+    SET {coluna} = v.novo{tipo}{versao}
+    FROM (VALUES %s) AS v(id, antigo, novo)
+    WHERE t.id = v.id::uuid
+      AND t.{coluna} = v.antigo{tipo}
+    RETURNING t.id::text
+"""
+
+
+def _filtro(colunas, filtrar_no_banco):
+    if not filtrar_no_banco:
+        return 'true'
+    partes = [
+        f"{coluna}{'::text' if jsonb else ''} ~ %(filtro)s"
+        for coluna, jsonb in colunas.items()
+    ]
+    return '(' + ' OR '.join(partes) + ')'
+
+
+def _sql_reparar(tabela, coluna, jsonb):
+    return SQL_REPARAR.format(
+        tabela=tabela,
+        coluna=coluna,
+        tipo='::jsonb' if jsonb else '',
+        versao=', versao = t.versao + 1, updated_at = NOW()' if tabela in COM_VERSAO else '',
+    )
+
+
+class Diario:
+    """JSONL com o valor antigo e o novo de cada célula gravada (append + fsync)"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._arquivo = open(caminho, 'a', encoding='utf-8') if caminho else None
+
+    def anotar(self, registros):
+        if self._arquivo is None:
+            return
+        for registro in registros:
+            self._arquivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+        self._arquivo.flush()
+        os.fsync(self._arquivo.fileno())
+
+    def fechar(self):
+        if self._arquivo is not None:
+            self._arquivo.close()
+
+
+def _serializar(valor, jsonb):
+    return json.dumps(valor, ensure_ascii=False) if jsonb else valor
+
+
+def gravar_lote(tabela, mudancas, diario):
+    """
+    mudancas: [(id, coluna, jsonb, antigo, novo)]. Um UPDATE por coluna, um
+    commit para o lote inteiro, depois de anotar no diário as linhas que o
+    UPDATE realmente alterou. Retorna (gravadas, ocupadas): ocupadas é o
+    lote descartado por lock_timeout (fica para a próxima execução).
+    """
+    import psycopg2
+    from psycopg2.extras import execute_values
+
+    from conectcrm_ops.db import conexao
+
+    por_coluna = {}
+    for id_, coluna, jsonb, antigo, novo in mudancas:
+        por_coluna.setdefault((coluna, jsonb), []).append(
+            (id_, _serializar(antigo, jsonb), _serializar(novo, jsonb)))
+
+    try:
+        with conexao() as escrita:
+            with escrita.cursor() as cursor:
+                cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+                registros = []
+                for (coluna, jsonb), linhas in por_coluna.items():
+                    gravados = set(id_ for (id_,) in execute_values(
+                        cursor, _sql_reparar(tabela, coluna, jsonb), linhas,
+                        page_size=len(linhas), fetch=True))
+                    registros += [
+                        {'tabela': tabela, 'coluna': coluna, 'jsonb': jsonb, 'id': id_,
+                         'antigo': antigo, 'novo': novo}
+                        for id_, antigo, novo in linhas if id_ in gravados
+                    ]
+                diario.anotar(registros)
+    except psycopg2.errors.LockNotAvailable:
+        return 0, len(mudancas)
+    return len(registros), 0
+
+
+def varrer_tabela(tabela, colunas=None, lote=LOTE_PADRAO, aplicar=False, diario=None,
+                  exemplos=10, filtrar_no_banco=True):
+    """
+    Lê a tabela em fluxo, repara as colunas e (com aplicar=True) grava em lotes.
+    Retorna os totais e até `exemplos` diffs.
+    """
+    from conectcrm_ops.db import conexao, ler_em_fluxo
+
+    colunas = {c: j for c, j in ALVOS[tabela].items() if not colunas or c in colunas}
+    diario = diario or Diario(None)
+    totais = {'lidos': 0, 'suspeitos': 0, 'reparados': 0, 'gravados': 0, 'ocupados': 0,
+              'irreparaveis': 0, 'amostras': []}
+    sql = SQL_LER.format(colunas=', '.join(colunas), tabela=tabela, filtro=_filtro(colunas, filtrar_no_banco))
+    params = {'filtro': FILTRO_SQL} if filtrar_no_banco else None
+
+    pendentes = []
+
+    def descarregar():
+        if aplicar and pendentes:
+            gravadas, ocupadas = gravar_lote(tabela, pendentes, diario)
+            totais['gravados'] += gravadas
+            totais['ocupados'] += ocupadas
+        pendentes.clear()
+
+    with conexao() as leitura:
+        for linha in ler_em_fluxo(leitura, sql, params, itersize=lote):
+            totais['lidos'] += 1
+            id_ = linha[0]
+            suspeita = False
+            for (coluna, jsonb), valor in zip(colunas.items(), linha[1:]):
+                if valor is None:
+                    continue
+                if jsonb:
+                    if not any(SUSPEITA.search(s) for s in _strings(valor)):
+                        continue
+                    novo = reparar_json(valor)
+                else:
+                    if not SUSPEITA.search(valor):
+                        continue
+                    novo = reparar_texto(valor)
+                suspeita = True
+                if any(irreparavel(s) for s in _strings(novo)):
+                    totais['irreparaveis'] += 1
+                if novo == valor:
+                    continue
+                totais['reparados'] += 1
+                pendentes.append((id_, coluna, jsonb, valor, novo))
+                if len(totais['amostras']) < exemplos:
+                    totais['amostras'].append((id_, coluna, diferencas(valor, novo)))
+            totais['suspeitos'] += suspeita
+            if len(pendentes) >= lote:
+                descarregar()
+        descarregar()
+    return totais
+
+
+def reverter(caminho, lote=LOTE_PADRAO):
+    """
+    Desfaz as gravações do diário (da última para a primeira). Só volta o
+    valor antigo onde a célula ainda tem o valor reparado. Retorna {tabela: linhas}.
+    """
+    from psycopg2.extras import execute_values
+
+    from conectcrm_ops.db import conexao
+
+    with open(caminho, 'r', encoding='utf-8') as f:
+        registros = [json.loads(linha) for linha in f if linha.strip()]
+
+    revertidas = {}
+    registros.reverse()
+    for i in range(0, len(registros), lote):
+        grupos = {}
+        for r in registros[i:i + lote]:
+            grupos.setdefault((r['tabela'], r['coluna'], r['jsonb']), []).append((r['id'], r['novo'], r['antigo']))
+        with conexao() as escrita:
+            with escrita.cursor() as cursor:
+                cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+                for (tabela, coluna, jsonb), linhas in grupos.items():
+                    if tabela not in ALVOS or coluna not in ALVOS[tabela]:
+                        raise ValueError(f"diário com coluna desconhecida: {tabela}.{coluna}")
+                    retorno = execute_values(cursor, _sql_reparar(tabela, coluna, jsonb), linhas,
+                                             page_size=len(linhas), fetch=True)
+                    revertidas[tabela] = revertidas.get(tabela, 0) + len(retorno)
+    return revertidas
+
+
+def imprimir_totais(tabela, totais, aplicar, segundos):
+    print(f"\n🔤 {tabela} — {segundos:.1f}s")
+    print(f"   Lidos: {totais['lidos']}  |  Suspeitos: {totais['suspeitos']}  |  "
+          f"{'Gravados' if aplicar else 'A reparar'}: {totais['gravados'] if aplicar else totais['reparados']}  |  "
+          f"Irreparáveis (\\ufffd): {totais['irreparaveis']}")
+    if aplicar and totais['ocupados']:
+        print(f"   ⏳ {totais['ocupados']} célula(s) em linhas travadas; rode de novo para pegá-las")
+    for id_, coluna, pares in totais['amostras']:
+        print(f"   📝 {id_} .{coluna}")
+        for antigo, novo in pares[:5]:
+            print(f"      - {antigo}")
+            print(f"      + {novo}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Detecta e repara mojibake nas colunas de texto e JSONB')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    for nome, ajuda in (('varrer', 'Simulação: conta e mostra o diff, sem gravar'),
+                        ('reparar', 'Grava os reparos em lotes')):
+        p = sub.add_parser(nome, help=ajuda)
+        p.add_argument('--tabela', action='append', choices=sorted(ALVOS),
+                       help='Tabela a varrer (pode repetir; padrão: todas)')
+        p.add_argument('--coluna', action='append', help='Limita às colunas (pode repetir)')
+        p.add_argument('--lote', type=int, default=LOTE_PADRAO, help=f'Células por UPDATE/commit (padrão: {LOTE_PADRAO})')
+        p.add_argument('--exemplos', type=int, default=10, help='Diffs mostrados por tabela')
+        p.add_argument('--sem-filtro-sql', action='store_true',
+                       help='Lê todas as linhas (o filtro fica só no Python)')
+        if nome == 'reparar':
+            p.add_argument('--diario', required=True, help='JSONL com os valores antigos (para o reverter)')
+
+    p_rev = sub.add_parser('reverter', help='Desfaz os reparos anotados num diário')
+    p_rev.add_argument('diario')
+    p_rev.add_argument('--lote', type=int, default=LOTE_PADRAO)
+
+    p_txt = sub.add_parser('texto', help='Repara textos avulsos (sem banco)')
+    p_txt.add_argument('textos', nargs='+')
+
+    sub.add_parser('conferir', help='Roda os casos de REGRESSAO do reparo (sem banco)')
+    args = parser.parse_args(argv)
+
+    if args.comando == 'conferir':
+        falhas = [(entrada, esperado, reparar_texto(entrada)) for entrada, esperado in REGRESSAO
+                  if reparar_texto(entrada) != esperado]
+        for entrada, esperado, obtido in falhas:
+            print(f"   ❌ {entrada!r} → {obtido!r} (esperado {esperado!r})")
+        if falhas:
+            return 1
+        print(f"✅ {len(REGRESSAO)} caso(s) conferido(s)")
+        return 0
+
+    if args.comando == 'texto':
+        for texto in args.textos:
+            print(f"   {texto!r} → {reparar_texto(texto)!r}")
+        return 0
+
+    if args.comando == 'reverter':
+        for tabela, linhas in reverter(args.diario, args.lote).items():
+            print(f"↩️  {tabela}: {linhas} célula(s) revertida(s)")
+        return 0
+
+    aplicar = args.comando == 'reparar'
+    diario = Diario(args.diario if aplicar else None)
+    try:
+        for tabela in args.tabela or sorted(ALVOS):
+            inicio = time.perf_counter()
+            totais = varrer_tabela(tabela, args.coluna, args.lote, aplicar, diario,
+                                   args.exemplos, not args.sem_filtro_sql)
+            imprimir_totais(tabela, totais, aplicar, time.perf_counter() - inicio)
+    finally:
+        diario.fechar()
+
+    if not aplicar:
+        print("\n🔎 Simulação: nada foi gravado (use reparar --diario ARQUIVO)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
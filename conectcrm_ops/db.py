@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Acesso ao PostgreSQL para as ferramentas de operação
+
+Usa as mesmas variáveis do backend (DATABASE_HOST, DATABASE_PORT, ...), com os
+padrões do ambiente de desenvolvimento usados pelos scripts da raiz.
+
+- conectar():            conexão avulsa (o chamador fecha)
+- conexao():             conexão emprestada do pool do processo, com commit/rollback
+- ler_em_fluxo():        cursor do lado do servidor para varrer tabelas grandes
+- inserir_em_lote():     execute_values paginado
+- copiar_para_tabela():  COPY FROM STDIN a partir de um iterável de linhas
+- copiar_de_consulta():  COPY (consulta) TO STDOUT para um arquivo
+
+Variáveis extras: DATABASE_POOL_MAX (padrão 8) e DATABASE_CONNECT_TIMEOUT
+(segundos, padrão 10).
+"""
+
+import atexit
+import contextlib
+import csv
+import io
+import itertools
+import os
+import threading
+
+import psycopg2
+
+APPLICATION_NAME = 'conectcrm_ops'
+
+
+def carregar_config():
+    return {
+        'host': os.environ.get('DATABASE_HOST', 'localhost'),
+        'port': int(os.environ.get('DATABASE_PORT', '5434')),
+        'database': os.environ.get('DATABASE_NAME', 'conectcrm_db'),
+        'user': os.environ.get('DATABASE_USERNAME', 'conectcrm'),
+        'password': os.environ.get('DATABASE_PASSWORD', 'conectcrm123'),
+    }
+
+
+DB_CONFIG = carregar_config()
+
+_OPCOES_CONEXAO = {
+    'connect_timeout': int(os.environ.get('DATABASE_CONNECT_TIMEOUT', '10')),
+    'application_name': APPLICATION_NAME,
+}
+
+
+def conectar(**overrides):
+    conn = psycopg2.connect(**{**DB_CONFIG, **_OPCOES_CONEXAO, **overrides})
+    conn.set_client_encoding('UTF8')
+    return conn
+
+
+# ----------------------------------------------------------------------
+# Pool do processo
+# ----------------------------------------------------------------------
+
+_pool = None
+_pool_trava = threading.Lock()
+
+
+def obter_pool():
+    """ThreadedConnectionPool compartilhado pelo processo (criado na primeira chamada)"""
+    global _pool
+    if _pool is None:
+        with _pool_trava:
+            if _pool is None:
+                from psycopg2.pool import ThreadedConnectionPool
+
+                maximo = int(os.environ.get('DATABASE_POOL_MAX', '8'))
+                _pool = ThreadedConnectionPool(1, maximo, **DB_CONFIG, **_OPCOES_CONEXAO)
+    return _pool
+
+
+def fechar_pool():
+    global _pool
+    with _pool_trava:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+atexit.register(fechar_pool)
+
+
+@contextlib.contextmanager
+def conexao():
+    """
+    Empresta uma conexão do pool. Commit ao sair normalmente, rollback em
+    exceção; a conexão volta para o pool (descartada se ficou quebrada).
+    """
+    pool = obter_pool()
+    conn = pool.getconn()
+    conn.set_client_encoding('UTF8')
+    quebrada = False
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            quebrada = True
+        raise
+    finally:
+        pool.putconn(conn, close=quebrada or bool(conn.closed))
+
+
+# ----------------------------------------------------------------------
+# Leitura em fluxo
+# ----------------------------------------------------------------------
+
+_contador_cursores = itertools.count(1)
+
+
+def ler_em_fluxo(conn, sql, params=None, itersize=2000, nome=None):
+    """
+    Gera as linhas de uma consulta com cursor do lado do servidor: só
+    itersize linhas ficam em memória por vez. Precisa de uma transação aberta
+    na conexão (não use com autocommit).
+    """
+    nome = nome or f'{APPLICATION_NAME}_{next(_contador_cursores)}'
+    with conn.cursor(name=nome) as cursor:
+        cursor.itersize = itersize
+        cursor.execute(sql, params)
+        for linha in cursor:
+            yield linha
+
+
+# ----------------------------------------------------------------------
+# Escrita em lote
+# ----------------------------------------------------------------------
+
+def inserir_em_lote(cursor, sql, linhas, pagina=1000, template=None, retornar=False):
+    """
+    execute_values paginado. sql deve ter um único %s no lugar do VALUES:
+        INSERT INTO tabela (a, b) VALUES %s ON CONFLICT DO NOTHING
+    Com retornar=True devolve as linhas do RETURNING de todas as páginas.
+    """
+    from psycopg2.extras import execute_values
+
+    resultado = []
+    linhas = iter(linhas)
+    while True:
+        lote = list(itertools.islice(linhas, pagina))
+        if not lote:
+            break
+        retorno = execute_values(cursor, sql, lote, template=template, page_size=pagina, fetch=retornar)
+        if retornar:
+            resultado.extend(retorno)
+    return resultado if retornar else None
+
+
+class _LinhasCsv(io.TextIOBase):
+    """Arquivo somente leitura que gera CSV sob demanda a partir de um iterável"""
+
+    def __init__(self, linhas):
+        self._linhas = iter(linhas)
+        self._buffer = ''
+        self._saida = io.StringIO()
+        self._escritor = csv.writer(self._saida, lineterminator='\n')
+
+    def readable(self):
+        return True
+
+    def _encher(self, tamanho):
+        while len(self._buffer) < tamanho:
+            lote = list(itertools.islice(self._linhas, 500))
+            if not lote:
+                break
+            self._saida.seek(0)
+            self._saida.truncate()
+            self._escritor.writerows(
+                [['\\N' if v is None else v for v in linha] for linha in lote]
+            )
+            self._buffer += self._saida.getvalue()
+
+    def read(self, tamanho=-1):
+        if tamanho is None or tamanho < 0:
+            self._encher(float('inf'))
+            dados, self._buffer = self._buffer, ''
+            return dados
+        self._encher(tamanho)
+        dados, self._buffer = self._buffer[:tamanho], self._buffer[tamanho:]
+        return dados
+
+
+def copiar_para_tabela(cursor, tabela, colunas, linhas, buffer=65536):
+    """
+    COPY tabela (colunas) FROM STDIN em CSV, lendo as linhas sob demanda
+    (memória constante). None vira NULL.
+    """
+    sql = (
+        f"COPY {tabela} ({', '.join(colunas)}) FROM STDIN "
+        f"WITH (FORMAT csv, NULL '\\N')"
+    )
+    cursor.copy_expert(sql, _LinhasCsv(linhas), size=buffer)
+
+
+def copiar_de_consulta(cursor, sql, arquivo, params=None):
+    """COPY (consulta) TO STDOUT em CSV com cabeçalho, direto para um arquivo aberto"""
+    if params is not None:
+        sql = cursor.mogrify(sql, params).decode('utf-8')
+    cursor.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER true)", arquivo)
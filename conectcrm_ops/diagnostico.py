@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Diagnóstico do bot de uma ou mais empresas em um único processo
+
+Encadeia o que os scripts verificar-*.py fazem separadamente (núcleos e
+departamentos visíveis, horário de funcionamento, estrutura, DTO e mensagens
+dos fluxos publicados), usando conexões do pool de conectcrm_ops.db em vez de
+abrir uma conexão por verificação.
+
+Uso:
+    python -m conectcrm_ops.diagnostico --empresa f47ac10b-58cc-4372-a567-0e02b2c3d479
+    python -m conectcrm_ops.diagnostico --empresa ... --empresa ... --quando 2025-11-10T20:00:00-03:00
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime, timezone
+
+from conectcrm_ops.cache_fluxos import CacheFluxos
+from conectcrm_ops.db import conexao
+from conectcrm_ops.grafo import GrafoFluxo, relatorio_tem_problemas
+from conectcrm_ops.horario import avisos_configuracao, verificar_disponibilidade
+from conectcrm_ops.mensagens import ERRO as ERRO_MENSAGEM, analisar_fluxo
+from conectcrm_ops.opcoes_bot import buscar_opcoes_para_bot
+from conectcrm_ops.validador_dto import AVISO, linha_para_payload, validar_fluxo
+
+SQL_FLUXOS_PUBLICADOS = """
+    SELECT
+        id, nome, descricao, codigo, tipo, canais, palavras_gatilho, horario_ativo,
+        prioridade, ativo, versao, permite_voltar, permite_sair, salvar_historico,
+        tentar_entender_texto_livre
+    FROM fluxos_triagem
+    WHERE empresa_id = ANY(%s::uuid[])
+      AND publicado = true
+    ORDER BY empresa_id, prioridade DESC, nome
+"""
+
+
+def verificar_nucleos(empresa_ids, quando):
+    """Núcleos que aparecem no menu do bot e se estão abertos no instante"""
+    with conexao() as conn:
+        with conn.cursor() as cursor:
+            empresas = buscar_opcoes_para_bot(cursor, empresa_ids)
+
+    achados = []
+    for empresa_id, nucleos in empresas.items():
+        if not nucleos:
+            achados.append((empresa_id, '❌', 'nenhum núcleo ativo e visível no bot'))
+        for nucleo in nucleos:
+            horario = nucleo['horarioFuncionamento']
+            disponibilidade = verificar_disponibilidade(horario, quando)
+            if not nucleo['departamentos']:
+                achados.append((empresa_id, '⚠️ ', f"{nucleo['nome']}: sem departamento visível (vai direto para transferência)"))
+            if not disponibilidade['estaAberto']:
+                achados.append((empresa_id, '🔒', f"{nucleo['nome']}: fechado ({disponibilidade['motivoFechado']})"))
+            for aviso in avisos_configuracao(horario):
+                achados.append((empresa_id, '⚠️ ', f"{nucleo['nome']}: {aviso}"))
+            if disponibilidade['estaAberto'] and nucleo['departamentos']:
+                achados.append((empresa_id, '✅', f"{nucleo['nome']}: visível e aberto ({len(nucleo['departamentos'])} departamento(s))"))
+    return achados
+
+
+def verificar_fluxos(empresa_ids, cache=None):
+    """Grafo, DTO e mensagens de cada fluxo publicado (estruturas via cache local por id/versao/md5)"""
+    achados = []
+    cache = cache or CacheFluxos()
+    with conexao() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(SQL_FLUXOS_PUBLICADOS, ([str(e) for e in empresa_ids],))
+            linhas = cursor.fetchall()
+            fluxos = cache.sincronizar(cursor, [str(linha[0]) for linha in linhas], publicados=False)
+
+    try:
+        for linha in linhas:
+            if str(linha[0]) not in fluxos:
+                continue  # removido entre a listagem e a busca da estrutura
+            # Desempacota pelo SELECT acima (coluna nova quebra aqui em vez de deslocar campos)
+            (fluxo_id, nome_fluxo, descricao, codigo, tipo, canais, palavras, horario_ativo, prioridade,
+             ativo, _versao, permite_voltar, permite_sair, salvar_historico, texto_livre) = linha
+            fluxo_id, payload = linha_para_payload((
+                fluxo_id, nome_fluxo, descricao, codigo, tipo, canais, palavras, horario_ativo, prioridade,
+                ativo, fluxos[str(fluxo_id)].estrutura(), permite_voltar, permite_sair, salvar_historico,
+                texto_livre,
+            ))
+            nome = f"{payload['nome']} ({fluxo_id})"
+
+            erros_dto = [e for e in validar_fluxo(payload) if e['nivel'] != AVISO]
+            if erros_dto:
+                achados.append((nome, '❌', f'{len(erros_dto)} problema(s) de DTO/etapa; primeiro: '
+                                           f"{erros_dto[0]['caminho']}: {erros_dto[0]['mensagem']}"))
+
+            try:
+                relatorio = GrafoFluxo(payload['estrutura']).relatorio()
+            except ValueError as e:
+                achados.append((nome, '❌', f'estrutura inválida: {e}'))
+                continue
+            if relatorio_tem_problemas(relatorio):
+                achados.append((nome, '⚠️ ', f"grafo: etapa inicial {'ok' if relatorio['etapaInicialExiste'] else 'inexistente'}, "
+                                            f"{len(relatorio['inalcancaveis'])} inalcançável(is), "
+                                            f"{len(relatorio['destinosPendentes'])} destino(s) inexistente(s), "
+                                            f"{len(relatorio['ciclosSemSaida'])} ciclo(s) sem saída, "
+                                            f"{len(relatorio['presas'])} etapa(s) presa(s)"))
+
+            erros_mensagem = [p for p in analisar_fluxo(payload['estrutura'], nome) if p['nivel'] == ERRO_MENSAGEM]
+            if erros_mensagem:
+                achados.append((nome, '❌', f'{len(erros_mensagem)} erro(s) de template; primeiro: '
+                                           f"{erros_mensagem[0]['etapa']}: {erros_mensagem[0]['mensagem']}"))
+
+            if not erros_dto and not erros_mensagem and not relatorio_tem_problemas(relatorio):
+                achados.append((nome, '✅', 'fluxo publicado sem problemas'))
+    finally:
+        cache.fechar()
+    return achados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Diagnóstico do bot (núcleos, horários e fluxos publicados)')
+    parser.add_argument('--empresa', action='append', required=True, help='ID da empresa (pode repetir)')
+    parser.add_argument('--quando', help='Instante em ISO 8601 (padrão: agora)')
+    args = parser.parse_args(argv)
+
+    quando = datetime.fromisoformat(args.quando) if args.quando else datetime.now(timezone.utc)
+    inicio = time.perf_counter()
+
+    etapas = [
+        ('🏢 NÚCLEOS E HORÁRIOS', lambda: verificar_nucleos(args.empresa, quando)),
+        ('🔀 FLUXOS PUBLICADOS', lambda: verificar_fluxos(args.empresa)),
+    ]
+
+    falhou = False
+    for titulo, verificar in etapas:
+        print(f"\n{titulo}")
+        print("=" * 80)
+        for origem, icone, texto in verificar():
+            falhou = falhou or icone == '❌'
+            print(f"   {icone} [{origem}] {texto}")
+
+    print(f"\n⏱️  Diagnóstico concluído em {time.perf_counter() - inicio:.2f}s")
+    return 1 if falhou else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,695 @@
+# -*- coding: utf-8 -*-
+"""
+Simulador de eventos discretos das estratégias de distribuição de tickets
+
+Reproduz, sobre as chegadas históricas de uma empresa, as escolhas do
+DistribuicaoAvancadaService (round-robin, menor-carga, skills e hibrido) e do
+AtribuicaoService.selecionarAtendentePorCarga (carga), para comparar as
+estratégias sem trocar nada em produção:
+
+- chegadas: atendimento_tickets no período (data_abertura), com a duração do
+  atendimento medida no histórico (primeira distribuição em distribuicao_log
+  até data_resolucao/data_fechamento) ou sorteada da fila quando falta;
+- elencos: filas_atendentes (ordem de cadastro), distribuicao_config de cada
+  fila (capacidadeMaxima, overflow para a fila de backup), atendente_skills
+  e, para a estratégia carga, os membros das equipes atribuídas ao
+  departamento do ticket (equipe_atribuicoes + atendente_equipes);
+- skills requeridas: as que aparecem no motivo do distribuicao_log;
+- turnos: por padrão, um atendente está disponível nas horas em que teve
+  ticket distribuído ou em atendimento no histórico (--sem-turnos: sempre).
+
+Ticket sem atendente disponível espera na fila (FIFO) e é tentado de novo a
+cada atendimento encerrado e a cada virada de hora. Fila de eventos em heap;
+menor carga e carga usam heaps preguiçosos por grupo de atendentes (entrada
+invalidada por versão), então a escolha não percorre o elenco inteiro.
+
+Métricas por estratégia: espera até a atribuição (p50/p90/p99, % dentro do
+--sla), tickets sem atendente no fim, utilização (carga média / capacidade no
+tempo em turno) e justiça (índice de Jain de tickets por hora em turno). A
+linha "historico" mostra o que aconteceu de fato.
+
+Uso:
+    python -m conectcrm_ops.distribuicao extrair --empresa f47ac10b-... --desde 2025-10-01 --ate 2025-11-01 -o out.json
+    python -m conectcrm_ops.distribuicao simular out.json --sla 300
+    python -m conectcrm_ops.distribuicao gerar --atendentes 500 --dias 30 -o sintetico.json
+"""
+
+import argparse
+import heapq
+import json
+import random
+import re
+import sys
+import time
+from collections import deque
+from datetime import datetime
+
+from conectcrm_ops.histograma import Histograma, formatar_duracao
+
+ESTRATEGIAS = ('round-robin', 'menor-carga', 'skills', 'hibrido', 'carga')
+
+CAPACIDADE_PADRAO = 10   # distribuicao_config.capacidadeMaxima
+TENTATIVAS_FILA = 20     # tickets da espera tentados a cada liberação
+HORA = 3600
+
+# Eventos: no mesmo instante, encerramentos liberam vaga antes das viradas de hora
+FIM, TURNO = 0, 1
+
+MOTIVO_SKILLS = re.compile(r'Skills-based: (.+)$|skills \((.+)\)')
+
+SQL_TICKETS = """
+    SELECT
+        t.id::text,
+        t.fila_id::text,
+        t.departamento_id::text,
+        extract(epoch FROM COALESCE(t.data_abertura, t.created_at)),
+        extract(epoch FROM d.primeira),
+        d.atendente::text,
+        extract(epoch FROM COALESCE(t.data_resolucao, t.data_fechamento)),
+        d.motivo
+    FROM atendimento_tickets t
+    LEFT JOIN LATERAL (
+        SELECT l."timestamp" AS primeira, l."atendenteId" AS atendente, l.motivo
+        FROM distribuicao_log l
+        WHERE l."ticketId" = t.id AND NOT l.realocacao
+        ORDER BY l."timestamp"
+        LIMIT 1
+    ) d ON true
+    WHERE t.empresa_id = %s
+      AND COALESCE(t.data_abertura, t.created_at) >= %s
+      AND COALESCE(t.data_abertura, t.created_at) < %s
+      AND t.fila_id IS NOT NULL
+    ORDER BY 4
+"""
+
+SQL_ATENDENTES = """
+    SELECT id::text, nome, COALESCE(capacidade_maxima, %s)
+    FROM users
+    WHERE empresa_id = %s AND ativo = true
+"""
+
+SQL_FILAS_ATENDENTES = """
+    SELECT fa."filaId"::text, fa."atendenteId"::text, fa.prioridade
+    FROM filas_atendentes fa
+    WHERE fa.empresa_id = %s AND fa.ativo = true
+    ORDER BY fa."createdAt", fa.id
+"""
+
+SQL_CONFIGS = """
+    SELECT "filaId"::text, algoritmo, "capacidadeMaxima", "permitirOverflow", "filaBackupId"::text
+    FROM distribuicao_config
+    WHERE empresa_id = %s AND ativo = true
+"""
+
+SQL_SKILLS = """
+    SELECT "atendenteId"::text, skill, nivel
+    FROM atendente_skills
+    WHERE empresa_id = %s AND ativo = true
+"""
+
+SQL_EQUIPES = """
+    SELECT ea.departamento_id::text, ae.atendente_id::text, min(ea.prioridade)
+    FROM equipe_atribuicoes ea
+    JOIN atendente_equipes ae ON ae.equipe_id = ea.equipe_id
+    WHERE ea.empresa_id = %s AND ea.ativo = true AND ea.departamento_id IS NOT NULL
+    GROUP BY 1, 2
+"""
+
+
+# ----------------------------------------------------------------------
+# Extração (banco -> JSON)
+# ----------------------------------------------------------------------
+
+def skills_do_motivo(motivo):
+    m = MOTIVO_SKILLS.search(motivo or '')
+    if not m:
+        return []
+    return sorted(s.strip() for s in (m.group(1) or m.group(2)).split(',') if s.strip())
+
+
+def extrair(empresa_id, desde, ate):
+    """Monta o conjunto de dados da simulação (ver montar_dados) a partir do banco"""
+    from conectcrm_ops.db import conexao, ler_em_fluxo
+
+    with conexao() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(SQL_ATENDENTES, (CAPACIDADE_PADRAO, empresa_id))
+            atendentes = {a: {'nome': nome or '', 'capacidade': int(cap)} for a, nome, cap in cursor.fetchall()}
+
+            cursor.execute(SQL_CONFIGS, (empresa_id,))
+            configs = {
+                f: {'algoritmo': alg, 'capacidade': cap or CAPACIDADE_PADRAO,
+                    'overflow': bool(overflow), 'backup': backup}
+                for f, alg, cap, overflow, backup in cursor.fetchall()
+            }
+
+            filas = {}
+            cursor.execute(SQL_FILAS_ATENDENTES, (empresa_id,))
+            for fila_id, atendente, prioridade in cursor.fetchall():
+                if atendente in atendentes:
+                    filas.setdefault(fila_id, {'atendentes': [], 'config': configs.get(fila_id, {})})
+                    filas[fila_id]['atendentes'].append([atendente, prioridade if prioridade is not None else 99])
+
+            skills = {}
+            cursor.execute(SQL_SKILLS, (empresa_id,))
+            for atendente, skill, nivel in cursor.fetchall():
+                skills.setdefault(atendente, {})[skill] = nivel or 1
+
+            equipes = {}
+            cursor.execute(SQL_EQUIPES, (empresa_id,))
+            for departamento, atendente, prioridade in cursor.fetchall():
+                if atendente in atendentes:
+                    equipes.setdefault(departamento, []).append([atendente, prioridade or 0])
+
+        tickets = list(ler_em_fluxo(conn, SQL_TICKETS, (empresa_id, desde, ate), itersize=20000))
+
+    return montar_dados(atendentes, filas, skills, equipes, tickets,
+                        datetime.fromisoformat(desde).timestamp(), datetime.fromisoformat(ate).timestamp())
+
+
+def montar_dados(atendentes, filas, skills, equipes, linhas, inicio, fim):
+    """
+    linhas: (id, fila, departamento, chegada, atribuido_em, atendente, encerrado_em, motivo)
+    com tempos em epoch. Duração = encerrado_em - atribuido_em (ou - chegada).
+    Turnos: horas (epoch // 3600) em que cada atendente teve ticket em atendimento.
+    """
+    tickets, turnos = [], {}
+    for id_, fila, departamento, chegada, atribuido, atendente, encerrado, motivo in linhas:
+        chegada = float(chegada)
+        atribuido = float(atribuido) if atribuido is not None else None
+        duracao = None
+        if encerrado is not None and float(encerrado) > (atribuido or chegada):
+            duracao = float(encerrado) - (atribuido or chegada)
+        tickets.append([id_, fila, departamento, chegada, duracao, skills_do_motivo(motivo), atendente, atribuido])
+        if atendente and atribuido is not None:
+            ate = atribuido + (duracao or 0)
+            horas = turnos.setdefault(atendente, set())
+            horas.update(range(int(atribuido // HORA), int(ate // HORA) + 1))
+
+    return {
+        'inicio': inicio,
+        'fim': fim,
+        'atendentes': atendentes,
+        'filas': filas,
+        'skills': skills,
+        'equipes': equipes,
+        'turnos': {a: sorted(h) for a, h in turnos.items()},
+        'tickets': tickets,
+    }
+
+
+def gerar(atendentes=500, filas=10, dias=30, tickets_por_dia=6000, semente=42):
+    """Empresa sintética (para medir o simulador e testar parâmetros sem banco)"""
+    rnd = random.Random(semente)
+    inicio = datetime(2025, 1, 6).timestamp()
+    fim = inicio + dias * 86400
+    ids = [f'atendente-{i:04d}' for i in range(atendentes)]
+    habilidades = ['vendas', 'suporte-tecnico', 'financeiro', 'cobranca', 'ingles']
+
+    dados_atendentes = {a: {'nome': f'Atendente {i}', 'capacidade': rnd.choice((5, 8, 10))} for i, a in enumerate(ids)}
+    dados_filas = {}
+    for f in range(filas):
+        membros = rnd.sample(ids, max(1, atendentes * 2 // filas))
+        dados_filas[f'fila-{f}'] = {
+            'atendentes': [[a, rnd.randint(1, 10)] for a in membros],
+            'config': {'capacidade': CAPACIDADE_PADRAO, 'overflow': f > 0, 'backup': 'fila-0'},
+        }
+    skills = {a: {s: rnd.randint(1, 5) for s in rnd.sample(habilidades, rnd.randint(0, 3))} for a in ids}
+    equipes = {f'departamento-{d}': [[a, rnd.randint(0, 3)] for a in rnd.sample(ids, atendentes // 5)]
+               for d in range(5)}
+
+    # Turnos de 8h em três escalas
+    turnos = {}
+    for i, a in enumerate(ids):
+        entrada = (6, 10, 14)[i % 3]
+        turnos[a] = [int(inicio // HORA) + d * 24 + h for d in range(dias) for h in range(entrada, entrada + 8)]
+
+    tickets, t = [], inicio
+    taxa = tickets_por_dia / 86400
+    while True:
+        hora = (t - inicio) % 86400 / HORA
+        intensidade = 1.8 if 8 <= hora < 20 else 0.2  # movimento concentrado no horário comercial
+        t += rnd.expovariate(taxa * intensidade)
+        if t >= fim:
+            break
+        fila = f'fila-{rnd.randrange(filas)}'
+        requeridas = sorted(rnd.sample(habilidades, 1)) if rnd.random() < 0.3 else []
+        departamento = f'departamento-{rnd.randrange(5)}' if rnd.random() < 0.5 else None
+        tickets.append([f'ticket-{len(tickets)}', fila, departamento, t, rnd.lognormvariate(6.5, 0.8),
+                        requeridas, None, None])
+
+    return {
+        'inicio': inicio, 'fim': fim, 'atendentes': dados_atendentes, 'filas': dados_filas,
+        'skills': skills, 'equipes': equipes, 'turnos': turnos, 'tickets': tickets,
+    }
+
+
+# ----------------------------------------------------------------------
+# Simulação
+# ----------------------------------------------------------------------
+
+class GrupoCarga:
+    """
+    Heap preguiçoso de atendentes por (prefixo, carga, desempate). Cada mudança
+    de carga ou de turno incrementa a versão do atendente; entradas com
+    versão antiga são descartadas quando chegam ao topo.
+    """
+
+    def __init__(self, sim, membros):
+        # membros: [(atendente, prefixo, desempate)]
+        self.sim = sim
+        self.chaves = {a: (prefixo, desempate) for a, prefixo, desempate in membros}
+        self.heap = []
+        for atendente in self.chaves:
+            sim.grupos_do_atendente.setdefault(atendente, []).append(self)
+            self.atualizar(atendente)
+
+    def atualizar(self, atendente):
+        if atendente in self.sim.em_turno:
+            prefixo, desempate = self.chaves[atendente]
+            heapq.heappush(self.heap, (prefixo, self.sim.carga[atendente], desempate,
+                                       self.sim.versao[atendente], atendente))
+
+    def escolher(self, aceitar):
+        adiados, escolhido = [], None
+        while self.heap:
+            entrada = heapq.heappop(self.heap)
+            atendente = entrada[4]
+            if entrada[3] != self.sim.versao[atendente]:
+                continue
+            if aceitar(atendente):
+                escolhido = atendente
+                break
+            adiados.append(entrada)
+        for entrada in adiados:
+            heapq.heappush(self.heap, entrada)
+        return escolhido
+
+
+class Simulacao:
+    def __init__(self, dados, estrategia, usar_turnos=True, semente=42):
+        self.dados = dados
+        self.estrategia = estrategia
+        self.rnd = random.Random(semente)
+        self.atendentes = dados['atendentes']
+        self.filas = dados['filas']
+        self.skills = dados['skills']
+
+        self.carga = {a: 0 for a in self.atendentes}
+        self.carga_fila = {}
+        self.versao = {a: 0 for a in self.atendentes}
+        self.grupos_do_atendente = {}
+        self.ordem = {}
+        for fila_id, fila in self.filas.items():
+            self.ordem[fila_id] = [a for a, _ in fila['atendentes'] if a in self.atendentes]
+
+        # Turnos: hora -> atendentes; sem turnos, todos sempre disponíveis
+        self.usar_turnos = usar_turnos and bool(dados.get('turnos'))
+        self.por_hora = {}
+        if self.usar_turnos:
+            for atendente, horas in dados['turnos'].items():
+                if atendente in self.atendentes:
+                    for h in horas:
+                        self.por_hora.setdefault(h, set()).add(atendente)
+            self.em_turno = set()
+        else:
+            self.em_turno = set(self.atendentes)
+
+        self._escolher = {
+            'round-robin': self._round_robin,
+            'menor-carga': self._menor_carga,
+            'skills': self._skills,
+            'hibrido': self._hibrido,
+            'carga': self._carga,
+        }[estrategia]
+        self.grupos = {}
+        self.rankings = {}
+        self.ultimo_rr = {}
+        self.espera = {f: deque() for f in self.filas}
+        self.duracoes_fila = {}
+        for ticket in dados['tickets']:
+            if ticket[4]:
+                self.duracoes_fila.setdefault(ticket[1], []).append(ticket[4])
+        todas = [d for ds in self.duracoes_fila.values() for d in ds]
+        self.duracoes_todas = todas or [600.0]
+
+        self.eventos = []
+        self.seq = 0
+        self.agora = dados['inicio']
+        self.ocupacao = {a: 0.0 for a in self.atendentes}
+        self.ultima_mudanca = {a: dados['inicio'] for a in self.atendentes}
+        self.tickets_por_atendente = {a: 0 for a in self.atendentes}
+        self.hist_espera = Histograma()
+        self.dentro_sla = 0
+        self.atribuidos = 0
+        self.overflow = 0
+        self.duracao = {}
+
+    # -- eventos ------------------------------------------------------
+
+    def _agendar(self, tempo, tipo, dado):
+        self.seq += 1
+        heapq.heappush(self.eventos, (tempo, tipo, self.seq, dado))
+
+    def _mudar_carga(self, atendente, fila_id, delta):
+        self.ocupacao[atendente] += self.carga[atendente] * (self.agora - self.ultima_mudanca[atendente])
+        self.ultima_mudanca[atendente] = self.agora
+        self.carga[atendente] += delta
+        chave = (atendente, fila_id)
+        self.carga_fila[chave] = self.carga_fila.get(chave, 0) + delta
+        self.versao[atendente] += 1
+        for grupo in self.grupos_do_atendente.get(atendente, ()):
+            grupo.atualizar(atendente)
+
+    def _virar_hora(self, hora):
+        novos = self.por_hora.get(hora, set())
+        for atendente in self.em_turno - novos:
+            self.versao[atendente] += 1
+        entrando = novos - self.em_turno
+        self.em_turno = set(novos)
+        for atendente in entrando:
+            self.versao[atendente] += 1
+            for grupo in self.grupos_do_atendente.get(atendente, ()):
+                grupo.atualizar(atendente)
+        for fila_id in self.espera:
+            self._despachar(fila_id)
+
+    # -- grupos -------------------------------------------------------
+
+    def _grupo(self, chave, membros):
+        """Grupo criado na primeira vez; membros() só é chamado nesse momento"""
+        grupo = self.grupos.get(chave)
+        if grupo is None:
+            grupo = self.grupos[chave] = GrupoCarga(self, membros())
+        return grupo
+
+    def _grupo_fila(self, fila_id):
+        return self._grupo(('fila', fila_id), lambda: [(a, 0, i) for i, a in enumerate(self.ordem[fila_id])])
+
+    def _cabe(self, fila_id):
+        capacidade = self.filas[fila_id].get('config', {}).get('capacidade') or CAPACIDADE_PADRAO
+        return lambda a: self.carga_fila.get((a, fila_id), 0) < capacidade
+
+    # -- estratégias ----------------------------------------------------
+
+    def _round_robin(self, fila_id, _ticket):
+        ordem = self.ordem[fila_id]
+        if not ordem:
+            return None
+        cabe = self._cabe(fila_id)
+        ultimo = self.ultimo_rr.get(fila_id)
+        # Como no serviço: o próximo depois do último, se o último ainda está disponível
+        inicio = 0
+        if ultimo in ordem and ultimo in self.em_turno and cabe(ultimo):
+            inicio = ordem.index(ultimo) + 1
+        for i in range(len(ordem)):
+            atendente = ordem[(inicio + i) % len(ordem)]
+            if atendente in self.em_turno and cabe(atendente):
+                return atendente
+        return None
+
+    def _menor_carga(self, fila_id, _ticket):
+        return self._grupo_fila(fila_id).escolher(self._cabe(fila_id))
+
+    def _skills(self, fila_id, ticket):
+        requeridas = tuple(ticket[5])
+        if not requeridas:
+            return self._menor_carga(fila_id, ticket)
+        chave = (fila_id, requeridas)
+        if chave not in self.rankings:
+            pontuados = []
+            for i, a in enumerate(self.ordem[fila_id]):
+                pontos = sum(self.skills.get(a, {}).get(s, 0) for s in requeridas)
+                if pontos:
+                    pontuados.append((-pontos, i, a))
+            self.rankings[chave] = [a for _, _, a in sorted(pontuados)]
+        cabe = self._cabe(fila_id)
+        for atendente in self.rankings[chave]:
+            if atendente in self.em_turno and cabe(atendente):
+                return atendente
+        return None
+
+    def _hibrido(self, fila_id, ticket):
+        requeridas = tuple(ticket[5])
+        if requeridas:
+            grupo = self._grupo(('skills', fila_id, requeridas), lambda: [
+                (a, 0, i) for i, a in enumerate(self.ordem[fila_id])
+                if any(s in self.skills.get(a, {}) for s in requeridas)
+            ])
+            escolhido = grupo.escolher(self._cabe(fila_id))
+            if escolhido:
+                return escolhido
+        return self._menor_carga(fila_id, ticket)
+
+    def _carga(self, fila_id, ticket):
+        """selecionarAtendentePorCarga: prioridade, carga, nome, id (capacidade do usuário)"""
+        departamento = ticket[2]
+        if departamento and departamento in self.dados.get('equipes', {}):
+            chave = ('equipe', departamento)
+            elenco = self.dados['equipes'][departamento]
+        else:
+            chave = ('carga', fila_id)
+            elenco = self.filas[fila_id]['atendentes']
+        grupo = self._grupo(chave, lambda: [
+            (a, prioridade, ((self.atendentes[a]['nome'] or '').lower(), a))
+            for a, prioridade in elenco if a in self.atendentes
+        ])
+        return grupo.escolher(
+            lambda a: self.carga[a] < self.atendentes[a]['capacidade'])
+
+    # -- ciclo ----------------------------------------------------------
+
+    def _atribuir(self, ticket):
+        fila_id = ticket[1]
+        atendente = self._escolher(fila_id, ticket)
+        transbordou = False
+
+        config = self.filas[fila_id].get('config', {})
+        if atendente is None and config.get('overflow') and config.get('backup') in self.filas:
+            fila_id = config['backup']
+            atendente = self._menor_carga(fila_id, ticket)
+            transbordou = atendente is not None
+            if transbordou:
+                self.overflow += 1
+        if atendente is None:
+            return False
+
+        # O ponteiro do rodízio é da fila que escolheu; transbordo usa menor carga
+        if self.estrategia == 'round-robin' and not transbordou:
+            self.ultimo_rr[fila_id] = atendente
+        espera = self.agora - ticket[3]
+        self.hist_espera.registrar(espera * 1000)
+        self.dentro_sla += espera <= self.sla
+        self.atribuidos += 1
+        self.tickets_por_atendente[atendente] += 1
+        self._mudar_carga(atendente, fila_id, +1)
+        self._agendar(self.agora + self._duracao(ticket), FIM, (atendente, fila_id))
+        return True
+
+    def _duracao(self, ticket):
+        if ticket[4]:
+            return ticket[4]
+        if ticket[0] not in self.duracao:
+            self.duracao[ticket[0]] = self.rnd.choice(self.duracoes_fila.get(ticket[1]) or self.duracoes_todas)
+        return self.duracao[ticket[0]]
+
+    def _despachar(self, fila_id):
+        espera = self.espera[fila_id]
+        falhas = []
+        for _ in range(min(TENTATIVAS_FILA, len(espera))):
+            ticket = espera.popleft()
+            if not self._atribuir(ticket):
+                falhas.append(ticket)
+                if not ticket[5]:
+                    break  # sem skills, o próximo também não encontraria atendente
+        espera.extendleft(reversed(falhas))
+
+    def rodar(self, sla=300):
+        self.sla = sla
+        inicio, fim = self.dados['inicio'], self.dados['fim']
+        if self.usar_turnos:
+            for hora in range(int(inicio // HORA), int(fim // HORA) + 1):
+                self._agendar(hora * HORA, TURNO, hora)
+
+        def processar_ate(limite):
+            while self.eventos and self.eventos[0][0] <= limite:
+                tempo, tipo, _, dado = heapq.heappop(self.eventos)
+                self.agora = max(self.agora, tempo)
+                if tipo == FIM:
+                    atendente, fila_id = dado
+                    self._mudar_carga(atendente, fila_id, -1)
+                    for f in self.filas_do_atendente.get(atendente, ()):
+                        if self.espera[f]:
+                            self._despachar(f)
+                    if self.estrategia == 'carga':
+                        for f, espera in self.espera.items():
+                            if espera:
+                                self._despachar(f)
+                else:
+                    self._virar_hora(dado)
+
+        self.filas_do_atendente = {}
+        for fila_id, ordem in self.ordem.items():
+            for a in ordem:
+                self.filas_do_atendente.setdefault(a, []).append(fila_id)
+
+        for ticket in self.dados['tickets']:
+            if ticket[1] not in self.filas:
+                continue
+            processar_ate(ticket[3])
+            self.agora = max(self.agora, ticket[3])
+            if self.espera[ticket[1]] or not self._atribuir(ticket):
+                self.espera[ticket[1]].append(ticket)
+        processar_ate(fim)
+        for a in self.atendentes:
+            self.ocupacao[a] += self.carga[a] * (fim - self.ultima_mudanca[a])
+        return self.resultado()
+
+    def resultado(self):
+        segundos_turno = {}
+        for atendente in self.atendentes:
+            if self.usar_turnos:
+                segundos_turno[atendente] = len(self.dados['turnos'].get(atendente, ())) * HORA
+            else:
+                segundos_turno[atendente] = self.dados['fim'] - self.dados['inicio']
+        return metricas(
+            self.estrategia, self.hist_espera, self.atribuidos, self.dentro_sla,
+            sum(len(e) for e in self.espera.values()), self.ocupacao, segundos_turno,
+            self.tickets_por_atendente, self.atendentes, self.overflow,
+        )
+
+
+def jain(valores):
+    if not valores or not any(valores):
+        return None
+    return sum(valores) ** 2 / (len(valores) * sum(v * v for v in valores))
+
+
+def metricas(nome, hist_espera, atribuidos, dentro_sla, sem_atendente, ocupacao, segundos_turno,
+             tickets_por_atendente, atendentes, overflow=0):
+    utilizacoes, por_hora = [], []
+    for atendente, turno in segundos_turno.items():
+        if turno <= 0:
+            continue
+        utilizacoes.append(ocupacao.get(atendente, 0) / (atendentes[atendente]['capacidade'] * turno))
+        por_hora.append(tickets_por_atendente.get(atendente, 0) / (turno / HORA))
+    utilizacoes.sort()
+    indice_jain = jain(por_hora)
+    percentis = hist_espera.percentis([50, 90, 99])
+    return {
+        'estrategia': nome,
+        'atribuidos': atribuidos,
+        'semAtendente': sem_atendente,
+        'overflow': overflow,
+        'esperaMs': {'p50': percentis[50], 'p90': percentis[90], 'p99': percentis[99], 'media': hist_espera.media()},
+        'dentroSlaPct': round(100 * dentro_sla / atribuidos, 2) if atribuidos else None,
+        'utilizacao': {
+            'media': round(sum(utilizacoes) / len(utilizacoes), 4) if utilizacoes else None,
+            'p10': round(utilizacoes[len(utilizacoes) // 10], 4) if utilizacoes else None,
+            'p90': round(utilizacoes[len(utilizacoes) * 9 // 10], 4) if utilizacoes else None,
+        },
+        'jain': round(indice_jain, 4) if indice_jain is not None else None,
+    }
+
+
+def historico(dados, sla=300):
+    """Mesmas métricas para o que aconteceu de fato (tickets com distribuição registrada)"""
+    hist, atribuidos, dentro, sem = Histograma(), 0, 0, 0
+    ocupacao, por_atendente = {}, {}
+    for _, fila, _, chegada, duracao, _, atendente, atribuido in dados['tickets']:
+        if atendente is None or atribuido is None or atendente not in dados['atendentes']:
+            sem += 1
+            continue
+        espera = max(0.0, atribuido - chegada)
+        hist.registrar(espera * 1000)
+        dentro += espera <= sla
+        atribuidos += 1
+        por_atendente[atendente] = por_atendente.get(atendente, 0) + 1
+        ocupacao[atendente] = ocupacao.get(atendente, 0) + (duracao or 0)
+    segundos_turno = {a: len(h) * HORA for a, h in dados.get('turnos', {}).items() if a in dados['atendentes']}
+    return metricas('historico', hist, atribuidos, dentro, sem, ocupacao, segundos_turno,
+                    por_atendente, dados['atendentes'])
+
+
+def simular(dados, estrategias=ESTRATEGIAS, sla=300, usar_turnos=True, semente=42):
+    resultados = []
+    if any(t[6] for t in dados['tickets']):
+        resultados.append(historico(dados, sla))
+    for estrategia in estrategias:
+        inicio = time.perf_counter()
+        resultado = Simulacao(dados, estrategia, usar_turnos, semente).rodar(sla)
+        resultado['segundos'] = round(time.perf_counter() - inicio, 2)
+        resultados.append(resultado)
+    return resultados
+
+
+def imprimir_resultados(resultados, sla, dados):
+    print(f"🎫 {len(dados['tickets'])} ticket(s), {len(dados['atendentes'])} atendente(s), "
+          f"{len(dados['filas'])} fila(s)")
+    print(f"\n{'estratégia':<12} {'atribuídos':>10} {'sem atend.':>10} {'p50':>8} {'p90':>8} {'p99':>8} "
+          f"{'≤' + str(sla) + 's':>7} {'util.':>6} {'p10-p90':>11} {'Jain':>6} {'overflow':>8}")
+    for r in resultados:
+        e = r['esperaMs']
+        u = r['utilizacao']
+        faixa = f"{u['p10']:.0%}-{u['p90']:.0%}" if u['p10'] is not None else '-'
+        print(
+            f"{r['estrategia']:<12} {r['atribuidos']:>10} {r['semAtendente']:>10} "
+            f"{formatar_duracao(e['p50']) if e['p50'] is not None else '-':>8} "
+            f"{formatar_duracao(e['p90']) if e['p90'] is not None else '-':>8} "
+            f"{formatar_duracao(e['p99']) if e['p99'] is not None else '-':>8} "
+            f"{str(r['dentroSlaPct']) + '%' if r['dentroSlaPct'] is not None else '-':>7} "
+            f"{format(u['media'], '.0%') if u['media'] is not None else '-':>6} {faixa:>11} "
+            f"{r['jain'] if r['jain'] is not None else '-':>6} {r['overflow']:>8}"
+            + (f"   ({r['segundos']}s)" if 'segundos' in r else '')
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Simula as estratégias de distribuição de tickets')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_ext = sub.add_parser('extrair', help='Lê chegadas e elencos de uma empresa para um JSON')
+    p_ext.add_argument('--empresa', required=True)
+    p_ext.add_argument('--desde', required=True, help='Data inicial (ISO, ex.: 2025-10-01)')
+    p_ext.add_argument('--ate', required=True, help='Data final exclusiva (ISO)')
+    p_ext.add_argument('-o', '--saida', required=True)
+
+    p_ger = sub.add_parser('gerar', help='Gera uma empresa sintética')
+    p_ger.add_argument('--atendentes', type=int, default=500)
+    p_ger.add_argument('--filas', type=int, default=10)
+    p_ger.add_argument('--dias', type=int, default=30)
+    p_ger.add_argument('--tickets-por-dia', type=int, default=6000)
+    p_ger.add_argument('--semente', type=int, default=42)
+    p_ger.add_argument('-o', '--saida', required=True)
+
+    p_sim = sub.add_parser('simular', help='Roda as estratégias sobre um JSON extraído ou gerado')
+    p_sim.add_argument('dados')
+    p_sim.add_argument('--estrategia', action='append', choices=ESTRATEGIAS, help='Pode repetir (padrão: todas)')
+    p_sim.add_argument('--sla', type=int, default=300, help='Espera máxima aceitável em segundos (padrão: 300)')
+    p_sim.add_argument('--sem-turnos', action='store_true', help='Todos os atendentes disponíveis o tempo todo')
+    p_sim.add_argument('--semente', type=int, default=42, help='Sorteio das durações que faltam no histórico')
+    p_sim.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    if args.comando in ('extrair', 'gerar'):
+        if args.comando == 'extrair':
+            dados = extrair(args.empresa, args.desde, args.ate)
+        else:
+            dados = gerar(args.atendentes, args.filas, args.dias, args.tickets_por_dia, args.semente)
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, ensure_ascii=False)
+        print(f"✅ {len(dados['tickets'])} ticket(s) e {len(dados['atendentes'])} atendente(s) em {args.saida}")
+        return 0
+
+    with open(args.dados, 'r', encoding='utf-8') as f:
+        dados = json.load(f)
+    resultados = simular(dados, args.estrategia or ESTRATEGIAS, args.sla, not args.sem_turnos, args.semente)
+    if args.json:
+        print(json.dumps(resultados, ensure_ascii=False, indent=2))
+    else:
+        imprimir_resultados(resultados, args.sla, dados)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
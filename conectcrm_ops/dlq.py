@@ -0,0 +1,874 @@
+# -*- coding: utf-8 -*-
+"""
+Inspeção e reprocessamento em massa das DLQs do atendimento
+
+O endpoint POST /api/atendimento/filas/dlq/reprocessar (dlq-reprocess.service)
+reenfileira no máximo 200 jobs por chamada, sem olhar o erro. Esta ferramenta lê
+a DLQ inteira direto do Redis (ou de um arquivo exportado), agrupa as falhas
+por assinatura e reenfileira o que sobra a uma taxa controlada.
+
+Leitura: ids de wait/paused/delayed/failed de bull:<fila>-dlq e HMGET em
+pipeline (100 mil jobs em segundos). `exportar` grava o mesmo formato em JSONL
+para análise local (--arquivo).
+
+Assinatura do cluster: fila + jobName + errCode + httpStatus + primeira linha
+da mensagem normalizada (uuids, wamids, hashes, números e URLs viram
+marcadores) + primeiro frame da pilha fora de node_modules.
+
+Descartes, além das regras do serviço (payload, jobName, lista de jobNames de
+notifications, dlqAttempt >= 3):
+- duplicados: o queue-metrics grava uma entrada na DLQ a cada tentativa que
+  falha (o Bull emite 'failed' em toda tentativa); fica a mais recente de cada
+  originalJobId e as outras são removidas junto com ela;
+- original ainda em retentativa (hash na fila principal fora de failed) ou
+  concluído depois (hash removido pelo removeOnComplete); --incluir-sem-original
+  reenfileira estes últimos também (ex.: se o failed da fila foi limpo);
+- webhooks-in cuja chave idemp:webhook:whatsapp:<empresa>:<messageId>:<fp>
+  existe (idempotencia-vista). A chave é gravada antes do processar(), então
+  ela só prova que o webhook foi visto: depois de uma falha, a retentativa do
+  Bull encontra a chave, conclui como duplicado e o removeOnComplete apaga o
+  hash. Por isso estes jobs não contam como original-concluido, mesmo sem o
+  original na fila. --liberar-idempotencia reenfileira-os e apaga a chave na
+  mesma transação do reenfileiramento.
+
+`inspecionar` mostra, para cada motivo de descarte, a opção que o reprocessa.
+
+O dlqAttempt é lido de dentro do payload (é lá que o reprocessamento o grava e
+de onde o queue-metrics o copia); o serviço lê do topo do job e nunca barra.
+
+Reprocessamento: balde de tokens com controle AIMD. A cada janela a taxa sobe
+um degrau; se a fila principal passar do teto ou os jobs reenfileirados
+voltarem para a DLQ (dlqAttempt nas entradas novas) acima do limite, a taxa
+cai pela metade e há uma pausa que dobra a cada recuo. Recuos seguidos demais
+interrompem: a causa raiz continua lá. Cada lote é um MULTI que cria os jobs
+na fila principal no formato do Bull 3 (hash + LPUSH em wait, com as
+defaultJobOptions da fila) e tira da DLQ os ids correspondentes. Auditoria em
+JSONL, uma linha por job.
+
+Variáveis: REDIS_URL ou REDIS_HOST/REDIS_PORT/REDIS_PASSWORD (as do backend).
+O pacote redis só é necessário para falar com o Redis.
+
+Uso:
+    python -m conectcrm_ops.dlq exportar --saida dlq.jsonl
+    python -m conectcrm_ops.dlq inspecionar
+    python -m conectcrm_ops.dlq inspecionar --arquivo dlq.jsonl --chaves idemp.txt
+    python -m conectcrm_ops.dlq reprocessar --fila messages-out --cluster 3f9a2c --simular
+    python -m conectcrm_ops.dlq reprocessar --fila webhooks-in --taxa 500 --auditoria dlq.jsonl
+"""
+
+import argparse
+import collections
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime, timezone
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - redis é opcional
+    redis = None
+
+# Espelha o atendimento.module (defaultJobOptions) e o dlq-reprocess.service
+NOTIFICATION_JOB_NAMES = ('send-email', 'send-whatsapp', 'send-sms', 'send-push', 'notify-user')
+
+FILAS = {
+    'webhooks-in': {
+        'job_padrao': 'process-whatsapp-webhook',
+        'opcoes': {'attempts': 5, 'backoff': {'type': 'exponential', 'delay': 1000},
+                   'removeOnComplete': True, 'removeOnFail': False},
+    },
+    'messages-out': {
+        'job_padrao': 'wa-send-text',
+        'opcoes': {'attempts': 5, 'backoff': {'type': 'exponential', 'delay': 1000},
+                   'removeOnComplete': True, 'removeOnFail': False},
+    },
+    'notifications': {
+        'job_padrao': None,
+        'opcoes': {'attempts': 5, 'backoff': {'type': 'exponential', 'delay': 5000},
+                   'removeOnComplete': True, 'removeOnFail': False},
+    },
+}
+
+MAX_DLQ_ATTEMPT = 3
+PREFIXO = 'bull'
+
+LOTE_LEITURA = 1000
+LOTE_PADRAO = 200
+TAXA_PADRAO = 300.0
+JANELA = 1.0
+TETO_FILA = 5000
+MAX_FALHAS = 0.05
+PAUSA_MAX = 60.0
+RECUOS_MAX = 6
+
+# Remove de uma lista vários ids numa passada (LREM por id é O(N) cada)
+LUA_REMOVER_DA_LISTA = """
+local remover = {}
+for i = 1, #ARGV do remover[ARGV[i]] = true end
+local itens = redis.call('LRANGE', KEYS[1], 0, -1)
+local manter = {}
+for _, id in ipairs(itens) do
+  if not remover[id] then manter[#manter + 1] = id end
+end
+if #manter == #itens then return 0 end
+redis.call('DEL', KEYS[1])
+for i = 1, #manter, 5000 do
+  redis.call('RPUSH', KEYS[1], unpack(manter, i, math.min(i + 4999, #manter)))
+end
+return #itens - #manter
+"""
+
+
+def conectar_redis(url=None):
+    if redis is None:
+        raise RuntimeError('pacote redis não instalado (pip install redis)')
+    url = url or os.environ.get('REDIS_URL')
+    if url:
+        return redis.Redis.from_url(url, decode_responses=True)
+    return redis.Redis(host=os.environ.get('REDIS_HOST', 'localhost'),
+                       port=int(os.environ.get('REDIS_PORT', '6379')),
+                       password=os.environ.get('REDIS_PASSWORD') or None,
+                       decode_responses=True)
+
+
+def chave(prefixo, fila, *partes):
+    return ':'.join((prefixo, fila) + tuple(str(p) for p in partes))
+
+
+def json_js(valor):
+    """Serialização equivalente ao JSON.stringify (sem espaços, sem escapar não-ASCII)."""
+    return json.dumps(valor, separators=(',', ':'), ensure_ascii=False)
+
+
+def agora_iso():
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+
+# ----------------------------------------------------------------------
+# Leitura
+# ----------------------------------------------------------------------
+
+def normalizar_job(bruto, fila=None):
+    """Aceita a linha do exportar, o toJSON() de um job do Bull ou só o data."""
+    dados = bruto.get('data')
+    if not isinstance(dados, dict) or ('error' not in dados and 'error' in bruto):
+        dados = bruto
+    return {
+        'fila': bruto.get('fila') or dados.get('queue') or fila,
+        'id': str(bruto.get('id') or dados.get('originalJobId') or ''),
+        'nome': bruto.get('name') or 'dlq',
+        'timestamp': int(bruto.get('timestamp') or 0),
+        'dados': dados,
+    }
+
+
+def ler_arquivo(caminho, filas=None):
+    with open(caminho, encoding='utf-8') as f:
+        conteudo = f.read()
+    if conteudo.lstrip().startswith('['):
+        brutos = json.loads(conteudo)
+    else:
+        brutos = (json.loads(linha) for linha in conteudo.splitlines() if linha.strip())
+    for bruto in brutos:
+        job = normalizar_job(bruto)
+        if not filas or job['fila'] in filas:
+            yield job
+
+
+def ids_da_dlq(r, fila, prefixo=PREFIXO):
+    """Ids da DLQ, mais antigos primeiro (o Bull faz LPUSH em wait)."""
+    dlq = f'{fila}-dlq'
+    pipe = r.pipeline(transaction=False)
+    pipe.lrange(chave(prefixo, dlq, 'wait'), 0, -1)
+    pipe.lrange(chave(prefixo, dlq, 'paused'), 0, -1)
+    pipe.zrange(chave(prefixo, dlq, 'delayed'), 0, -1)
+    pipe.zrange(chave(prefixo, dlq, 'failed'), 0, -1)
+    wait, paused, delayed, failed = pipe.execute()
+    return list(dict.fromkeys(list(reversed(wait)) + list(reversed(paused)) + delayed + failed))
+
+
+def ler_redis(r, filas, prefixo=PREFIXO, lote=LOTE_LEITURA):
+    for fila in filas:
+        dlq = f'{fila}-dlq'
+        ids = ids_da_dlq(r, fila, prefixo)
+        for i in range(0, len(ids), lote):
+            pedaco = ids[i:i + lote]
+            pipe = r.pipeline(transaction=False)
+            for job_id in pedaco:
+                pipe.hmget(chave(prefixo, dlq, job_id), 'name', 'data', 'timestamp')
+            for job_id, (nome, dados, ts) in zip(pedaco, pipe.execute()):
+                if dados is None:
+                    continue  # removido entre a listagem e a leitura
+                try:
+                    dados = json.loads(dados)
+                except ValueError:
+                    dados = {}
+                yield {'fila': fila, 'id': job_id, 'nome': nome, 'timestamp': int(ts or 0),
+                       'dados': dados if isinstance(dados, dict) else {}}
+
+
+def exportar(jobs, caminho):
+    total = 0
+    with open(caminho, 'w', encoding='utf-8') as f:
+        for job in jobs:
+            f.write(json_js({'fila': job['fila'], 'id': job['id'], 'name': job['nome'],
+                             'timestamp': job['timestamp'], 'data': job['dados']}) + '\n')
+            total += 1
+    return total
+
+
+# ----------------------------------------------------------------------
+# Campos do job
+# ----------------------------------------------------------------------
+
+def payload(job):
+    return job['dados'].get('data')
+
+
+def job_name(job):
+    return job['dados'].get('jobName') or FILAS.get(job['fila'], {}).get('job_padrao')
+
+
+def erro(job):
+    return job['dados'].get('error') or {}
+
+
+def falhou_em(job):
+    return erro(job).get('failedAt') or ''
+
+
+def tentativa_dlq(job):
+    corpo = payload(job)
+    interna = corpo.get('dlqAttempt') if isinstance(corpo, dict) else None
+    return int(interna or job['dados'].get('dlqAttempt') or 0)
+
+
+def empresa_id(job):
+    corpo = payload(job)
+    return corpo.get('empresaId') if isinstance(corpo, dict) else None
+
+
+def message_id(corpo):
+    try:
+        return corpo['entry'][0]['changes'][0]['value']['messages'][0]['id']
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+def chave_idempotencia(job):
+    """Mesma chave do webhook-idempotency.service (só webhooks-in do WhatsApp)."""
+    corpo = payload(job)
+    if job['fila'] != 'webhooks-in' or not isinstance(corpo, dict):
+        return None
+    body = corpo.get('body')
+    mid = message_id(body)
+    if mid:
+        impressao = mid
+    else:
+        texto = body if isinstance(body, str) else json_js(body)
+        impressao = hashlib.sha256(texto.encode('utf-8')).hexdigest()
+    return f"idemp:webhook:whatsapp:{corpo.get('empresaId') or 'na'}:{mid or 'no-message-id'}:{impressao}"
+
+
+# ----------------------------------------------------------------------
+# Assinatura das falhas
+# ----------------------------------------------------------------------
+
+MARCADORES = (
+    (re.compile(r'https?://\S+'), '<url>'),
+    (re.compile(r'[\w.+-]+@[\w-]+\.[\w.]+'), '<email>'),
+    (re.compile(r'\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b', re.I), '<uuid>'),
+    (re.compile(r'\bwamid\.[\w=+/-]+'), '<wamid>'),
+    (re.compile(r'\b(?=[0-9a-f]*\d)(?=[0-9a-f]*[a-f])[0-9a-f]{8,}\b', re.I), '<hex>'),
+    (re.compile(r'\d+(?:[.:]\d+)*'), '<n>'),
+)
+
+FRAME = re.compile(r'^\s*at\s+(?:async\s+)?(?:(?P<funcao>.+?)\s+\()?(?P<arquivo>[^()\s]+?)(?::\d+)*\)?\s*$')
+
+
+def normalizar_mensagem(mensagem):
+    texto = (mensagem or '').strip().split('\n', 1)[0][:300]
+    for padrao, marcador in MARCADORES:
+        texto = padrao.sub(marcador, texto)
+    return texto
+
+
+def primeiro_frame(pilhas):
+    """Primeiro frame do código da aplicação na pilha da última tentativa."""
+    if isinstance(pilhas, list):
+        pilhas = pilhas[-1] if pilhas else ''
+    frames = [FRAME.match(linha) for linha in (pilhas or '').splitlines()]
+    frames = [m for m in frames if m]
+    for m in frames:
+        if 'node_modules' not in m.group('arquivo') and not m.group('arquivo').startswith(('node:', '<')):
+            break
+    else:
+        if not frames:
+            return ''
+        m = frames[0]
+    arquivo = re.split(r'[\\/]', m.group('arquivo'))[-1]
+    return f"{m.group('funcao') or '<anônima>'} ({arquivo})"
+
+
+def assinatura(job):
+    e = erro(job)
+    partes = (job['fila'], job_name(job) or '', str(e.get('errCode') or ''),
+              str(e.get('httpStatus') or ''), normalizar_mensagem(e.get('message')),
+              primeiro_frame(job['dados'].get('stacktrace')))
+    return hashlib.sha1('\x1f'.join(partes).encode('utf-8')).hexdigest()[:10], partes
+
+
+class Cluster:
+    def __init__(self, impressao, partes):
+        self.impressao = impressao
+        self.fila, self.job_name, self.err_code, self.http_status, self.mensagem, self.frame = partes
+        self.jobs = 0
+        self.entradas = 0
+        self.empresas = set()
+        self.primeira = None
+        self.ultima = None
+        self.exemplos = []
+        self.motivos = collections.Counter()
+
+    def registrar(self, item):
+        self.jobs += 1
+        self.entradas += 1 + len(item.duplicados)
+        self.motivos[item.motivo or 'reprocessavel'] += 1
+        empresa = empresa_id(item.job)
+        if empresa:
+            self.empresas.add(empresa)
+        quando = falhou_em(item.job)
+        if quando:
+            self.primeira = min(self.primeira or quando, quando)
+            self.ultima = max(self.ultima or quando, quando)
+        if len(self.exemplos) < 3:
+            self.exemplos.append(item.job['id'])
+
+    def para_dict(self):
+        return {'cluster': self.impressao, 'fila': self.fila, 'jobName': self.job_name,
+                'errCode': self.err_code, 'httpStatus': self.http_status, 'mensagem': self.mensagem,
+                'frame': self.frame, 'jobs': self.jobs, 'entradas': self.entradas,
+                'empresas': len(self.empresas), 'primeira': self.primeira, 'ultima': self.ultima,
+                'exemplos': self.exemplos, 'motivos': dict(self.motivos)}
+
+
+# ----------------------------------------------------------------------
+# Classificação
+# ----------------------------------------------------------------------
+
+class Item:
+    """Um job original: a entrada mais recente da DLQ e as de tentativas anteriores."""
+
+    __slots__ = ('job', 'duplicados', 'cluster', 'motivo')
+
+    def __init__(self, job):
+        self.job = job
+        self.duplicados = []
+        self.cluster = None
+        self.motivo = None
+
+    @property
+    def ids_dlq(self):
+        return [self.job['id']] + self.duplicados
+
+
+def agrupar_tentativas(jobs):
+    itens = {}
+    for job in jobs:
+        d = job['dados']
+        original = d.get('originalJobId') or erro(job).get('payloadHash') or f"dlq:{job['id']}"
+        k = (job['fila'], str(original))
+        atual = itens.get(k)
+        if atual is None:
+            itens[k] = Item(job)
+        elif (falhou_em(job), job['timestamp']) > (falhou_em(atual.job), atual.job['timestamp']):
+            atual.duplicados.append(atual.job['id'])
+            atual.job = job
+        else:
+            atual.duplicados.append(job['id'])
+    return list(itens.values())
+
+
+def motivo_regra(job):
+    """As mesmas recusas do dlq-reprocess.service, na mesma ordem."""
+    if not isinstance(payload(job), dict):
+        return 'sem-payload'
+    nome = job_name(job)
+    if not nome:
+        return 'sem-job-name'
+    if job['fila'] == 'notifications' and nome not in NOTIFICATION_JOB_NAMES:
+        return 'job-name-invalido'
+    if tentativa_dlq(job) + 1 > MAX_DLQ_ATTEMPT:
+        return 'max-tentativas'
+    return None
+
+
+def estado_dos_originais(r, itens, prefixo=PREFIXO, lote=LOTE_LEITURA):
+    """'falhou', 'pendente' ou 'sumiu' para o job original de cada item (ou None)."""
+    estados = [None] * len(itens)
+    consultas = [(i, it) for i, it in enumerate(itens) if it.job['dados'].get('originalJobId') is not None]
+    for inicio in range(0, len(consultas), lote):
+        pedaco = consultas[inicio:inicio + lote]
+        pipe = r.pipeline(transaction=False)
+        for _, it in pedaco:
+            original = it.job['dados']['originalJobId']
+            pipe.zscore(chave(prefixo, it.job['fila'], 'failed'), original)
+            pipe.exists(chave(prefixo, it.job['fila'], original))
+        respostas = pipe.execute()
+        for n, (i, _) in enumerate(pedaco):
+            score, existe = respostas[2 * n], respostas[2 * n + 1]
+            estados[i] = 'falhou' if score is not None else ('pendente' if existe else 'sumiu')
+    return estados
+
+
+def chaves_existentes(r, chaves, lote=LOTE_LEITURA):
+    existentes = set()
+    chaves = list(chaves)
+    for i in range(0, len(chaves), lote):
+        pedaco = chaves[i:i + lote]
+        pipe = r.pipeline(transaction=False)
+        for k in pedaco:
+            pipe.exists(k)
+        existentes.update(k for k, existe in zip(pedaco, pipe.execute()) if existe)
+    return existentes
+
+
+# Opção de `reprocessar` que reenfileira cada motivo de descarte (os demais não voltam)
+REPROCESSA_COM = {
+    'original-concluido': '--incluir-sem-original',
+    'idempotencia-vista': '--liberar-idempotencia',
+}
+
+
+def classificar(jobs, r=None, prefixo=PREFIXO, chaves=None, liberar_idempotencia=False,
+                incluir_sem_original=False):
+    """Agrupa tentativas, aplica os descartes e monta os clusters.
+
+    chaves: conjunto de chaves de idempotência conhecidas (modo arquivo); com
+    Redis, são consultadas lá.
+    """
+    itens = agrupar_tentativas(jobs)
+    clusters = {}
+    for item in itens:
+        impressao, partes = assinatura(item.job)
+        item.cluster = impressao
+        item.motivo = motivo_regra(item.job)
+        if impressao not in clusters:
+            clusters[impressao] = Cluster(impressao, partes)
+
+    estados = estado_dos_originais(r, itens, prefixo) if r is not None else [None] * len(itens)
+    for item, estado in zip(itens, estados):
+        if not item.motivo and estado == 'pendente':
+            item.motivo = 'original-em-retentativa'
+
+    # Chave presente = webhook visto, não processado: vale antes do "sumiu" do original
+    por_chave = {}
+    for item in itens:
+        k = None if item.motivo else chave_idempotencia(item.job)
+        if k:
+            por_chave.setdefault(k, []).append(item)
+    if r is not None:
+        vistas = chaves_existentes(r, por_chave)
+    else:
+        vistas = set(por_chave) & (chaves or set())
+    vistos = {id(item) for k in vistas for item in por_chave[k]}
+
+    for item, estado in zip(itens, estados):
+        if item.motivo:
+            continue
+        if id(item) in vistos:
+            if not liberar_idempotencia:
+                item.motivo = 'idempotencia-vista'
+        elif estado == 'sumiu' and not incluir_sem_original:
+            item.motivo = 'original-concluido'
+
+    for item in itens:
+        clusters[item.cluster].registrar(item)
+    return itens, sorted(clusters.values(), key=lambda c: (-c.jobs, c.impressao))
+
+
+def selecionar(itens, clusters=None, err_code=None, job_names=None, desde=None, ate=None, limite=None):
+    selecionados = []
+    for item in itens:
+        if item.motivo:
+            continue
+        if clusters and not any(item.cluster.startswith(c) for c in clusters):
+            continue
+        if err_code and erro(item.job).get('errCode') != err_code:
+            continue
+        if job_names and job_name(item.job) not in job_names:
+            continue
+        quando = falhou_em(item.job)
+        if (desde and quando < desde) or (ate and quando > ate):
+            continue
+        selecionados.append(item)
+        if limite and len(selecionados) >= limite:
+            break
+    return selecionados
+
+
+# ----------------------------------------------------------------------
+# Controle de vazão
+# ----------------------------------------------------------------------
+
+class BaldeTokens:
+    def __init__(self, taxa, rajada, relogio=time.monotonic, dormir=time.sleep):
+        self.taxa = float(taxa)
+        self.rajada = float(rajada)
+        self.tokens = self.rajada
+        self._relogio = relogio
+        self._dormir = dormir
+        self._ultimo = relogio()
+
+    def _repor(self):
+        agora = self._relogio()
+        self.tokens = min(self.rajada, self.tokens + (agora - self._ultimo) * self.taxa)
+        self._ultimo = agora
+
+    def consumir(self, n=1):
+        self._repor()
+        while self.tokens < n:
+            self._dormir((n - self.tokens) / self.taxa)
+            self._repor()
+        self.tokens -= n
+
+    def ajustar(self, taxa):
+        self._repor()
+        self.taxa = float(taxa)
+
+
+class ControleAdaptativo:
+    """Aumento aditivo / redução multiplicativa da taxa do balde.
+
+    observar() recebe, por janela, quantos jobs foram enviados, quantos deles
+    voltaram para a DLQ e o tamanho da fila principal; devolve a pausa (em
+    segundos) antes do próximo lote.
+    """
+
+    def __init__(self, balde, taxa_max, teto_fila=TETO_FILA, max_falhas=MAX_FALHAS,
+                 pausa_max=PAUSA_MAX, recuos_max=RECUOS_MAX):
+        self.balde = balde
+        self.taxa_max = float(taxa_max)
+        self.taxa_min = max(1.0, self.taxa_max / 100)
+        self.degrau = max(1.0, self.taxa_max / 10)
+        self.teto_fila = teto_fila
+        self.max_falhas = max_falhas
+        self.pausa_max = pausa_max
+        self.recuos_max = recuos_max
+        self.pausa = 0.0
+        self.recuos_seguidos = 0
+        self.recuos = 0
+
+    @property
+    def esgotado(self):
+        return self.recuos_seguidos >= self.recuos_max
+
+    def observar(self, enviados, voltaram, fila_principal):
+        falhas_demais = enviados and voltaram > self.max_falhas * enviados
+        if falhas_demais or fila_principal > self.teto_fila:
+            self.balde.ajustar(max(self.taxa_min, self.balde.taxa / 2))
+            self.pausa = min(self.pausa_max, max(1.0, self.pausa * 2))
+            self.recuos_seguidos += 1
+            self.recuos += 1
+            return self.pausa
+        self.balde.ajustar(min(self.taxa_max, self.balde.taxa + self.degrau))
+        self.pausa = 0.0
+        self.recuos_seguidos = 0
+        return 0.0
+
+
+# ----------------------------------------------------------------------
+# Reenfileiramento
+# ----------------------------------------------------------------------
+
+class Reenfileirador:
+    """Cria jobs na fila principal como o Queue.add() do Bull 3 e limpa a DLQ.
+
+    Com simular=True só numera e devolve o que faria.
+    """
+
+    def __init__(self, r, fila, prefixo=PREFIXO, simular=False):
+        self.r = r
+        self.fila = fila
+        self.dlq = f'{fila}-dlq'
+        self.prefixo = prefixo
+        self.simular = simular
+        self.opcoes = FILAS[fila]['opcoes']
+        self._remover_da_lista = None if simular else r.register_script(LUA_REMOVER_DA_LISTA)
+        self._ultimo_id_dlq = None if simular else self._id_dlq()
+        self._simulados = 0
+
+    def _id_dlq(self):
+        return int(self.r.get(chave(self.prefixo, self.dlq, 'id')) or 0)
+
+    def enviar(self, itens, liberar_idempotencia=False):
+        """Devolve [(item, novo_id)] na ordem recebida."""
+        if self.simular:
+            inicio = self._simulados
+            self._simulados += len(itens)
+            return [(item, f'simulado-{inicio + i + 1}') for i, item in enumerate(itens)]
+
+        ultimo = self.r.incrby(chave(self.prefixo, self.fila, 'id'), len(itens))
+        novos = [str(ultimo - len(itens) + i + 1) for i in range(len(itens))]
+        pausada = self.r.exists(chave(self.prefixo, self.fila, 'meta-paused'))
+        destino = chave(self.prefixo, self.fila, 'paused' if pausada else 'wait')
+        agora = int(time.time() * 1000)
+
+        pipe = self.r.pipeline(transaction=True)
+        ids_dlq = []
+        for item, novo in zip(itens, novos):
+            corpo = dict(payload(item.job), dlqAttempt=tentativa_dlq(item.job) + 1)
+            pipe.hset(chave(self.prefixo, self.fila, novo), mapping={
+                'name': job_name(item.job),
+                'data': json_js(corpo),
+                'opts': json_js({**self.opcoes, 'delay': 0, 'timestamp': agora}),
+                'timestamp': agora,
+                'delay': 0,
+                'priority': 0,
+            })
+            pipe.lpush(destino, novo)
+            pipe.publish(chave(self.prefixo, self.fila, 'waiting@null'), novo)
+            if liberar_idempotencia:
+                k = chave_idempotencia(item.job)
+                if k:
+                    pipe.delete(k)
+            ids_dlq.extend(item.ids_dlq)
+
+        for estado in ('wait', 'paused'):
+            self._remover_da_lista(keys=[chave(self.prefixo, self.dlq, estado)], args=ids_dlq, client=pipe)
+        for estado in ('delayed', 'failed'):
+            pipe.zrem(chave(self.prefixo, self.dlq, estado), *ids_dlq)
+        pipe.delete(*(chave(self.prefixo, self.dlq, i) for i in ids_dlq))
+        pipe.delete(*(chave(self.prefixo, self.dlq, i, 'logs') for i in ids_dlq))
+        pipe.execute()
+        return list(zip(itens, novos))
+
+    def fila_principal(self):
+        if self.simular:
+            return 0
+        pipe = self.r.pipeline(transaction=False)
+        pipe.llen(chave(self.prefixo, self.fila, 'wait'))
+        pipe.llen(chave(self.prefixo, self.fila, 'paused'))
+        return sum(pipe.execute())
+
+    def voltaram(self):
+        """Entradas novas na DLQ desde a última chamada que vieram de reprocessamento."""
+        if self.simular:
+            return 0
+        atual = self._id_dlq()
+        novos = range(self._ultimo_id_dlq + 1, atual + 1)
+        self._ultimo_id_dlq = atual
+        if not novos:
+            return 0
+        if len(novos) > LOTE_LEITURA:
+            return len(novos)
+        pipe = self.r.pipeline(transaction=False)
+        for job_id in novos:
+            pipe.hget(chave(self.prefixo, self.dlq, job_id), 'data')
+        return sum(1 for dados in pipe.execute() if dados and '"dlqAttempt"' in dados)
+
+
+class Auditoria:
+    def __init__(self, caminho):
+        self._arquivo = open(caminho, 'a', encoding='utf-8') if caminho else None
+
+    def registrar(self, **campos):
+        if self._arquivo:
+            self._arquivo.write(json_js({'em': agora_iso(), **campos}) + '\n')
+
+    def fechar(self):
+        if self._arquivo:
+            self._arquivo.flush()
+            os.fsync(self._arquivo.fileno())
+            self._arquivo.close()
+            self._arquivo = None
+
+
+def reprocessar(r, fila, itens, auditoria, taxa=TAXA_PADRAO, lote=LOTE_PADRAO, teto_fila=TETO_FILA,
+                max_falhas=MAX_FALHAS, liberar_idempotencia=False, simular=False, prefixo=PREFIXO,
+                relogio=time.monotonic, dormir=time.sleep):
+    escritor = Reenfileirador(r, fila, prefixo, simular)
+    balde = BaldeTokens(max(1.0, taxa / 4), max(lote, taxa), relogio, dormir)
+    controle = ControleAdaptativo(balde, taxa, teto_fila, max_falhas)
+    totais = collections.Counter()
+    inicio = janela_inicio = relogio()
+    enviados_janela = 0
+
+    for i in range(0, len(itens), lote):
+        pedaco = itens[i:i + lote]
+        if not simular:
+            balde.consumir(len(pedaco))
+        for item, novo in escritor.enviar(pedaco, liberar_idempotencia):
+            auditoria.registrar(acao='simulado' if simular else 'reenfileirado', fila=fila,
+                                dlq_id=item.job['id'], novo_id=novo, cluster=item.cluster,
+                                duplicados=item.duplicados, job_name=job_name(item.job),
+                                dlq_attempt=tentativa_dlq(item.job) + 1)
+        totais['reenfileirados'] += len(pedaco)
+        totais['entradas_removidas'] += sum(len(item.ids_dlq) for item in pedaco)
+        enviados_janela += len(pedaco)
+
+        if simular or relogio() - janela_inicio < JANELA:
+            continue
+        voltaram = escritor.voltaram()
+        totais['voltaram'] += voltaram
+        pausa = controle.observar(enviados_janela, voltaram, escritor.fila_principal())
+        enviados_janela, janela_inicio = 0, relogio()
+        if controle.esgotado:
+            totais['interrompido'] = 1
+            auditoria.registrar(acao='interrompido', fila=fila, taxa=balde.taxa, recuos=controle.recuos)
+            break
+        if pausa:
+            print(f"   ⏸️  {fila}: recuo para {balde.taxa:.0f}/s, pausa de {pausa:.0f}s")
+            dormir(pausa)
+
+    totais['recuos'] = controle.recuos
+    totais['segundos'] = relogio() - inicio
+    totais['taxa_final'] = balde.taxa
+    return totais
+
+
+# ----------------------------------------------------------------------
+# Relatórios
+# ----------------------------------------------------------------------
+
+def imprimir_clusters(itens, clusters, exemplos):
+    motivos = collections.Counter(item.motivo or 'reprocessavel' for item in itens)
+    entradas = sum(len(item.ids_dlq) for item in itens)
+    print(f"\n📦 {entradas} entrada(s) na DLQ, {len(itens)} job(s) original(is), {len(clusters)} cluster(s)")
+    for motivo, qtd in motivos.most_common():
+        if motivo == 'reprocessavel':
+            destino = 'reenfileirados por reprocessar'
+        elif REPROCESSA_COM.get(motivo):
+            destino = f'reprocessar {REPROCESSA_COM[motivo]}'
+        else:
+            destino = 'não reprocessáveis'
+        print(f"   {motivo:<26} {qtd:>8}  → {destino}")
+
+    print(f"\n{'cluster':<11}{'jobs':>8}{'entr.':>8}{'emp.':>6}  fila / jobName / errCode / http")
+    for c in clusters[:exemplos]:
+        print(f"{c.impressao:<11}{c.jobs:>8}{c.entradas:>8}{len(c.empresas):>6}  "
+              f"{c.fila} / {c.job_name or '-'} / {c.err_code or '-'} / {c.http_status or '-'}")
+        print(f"{'':<11}↳ {c.mensagem or '(sem mensagem)'}")
+        if c.frame:
+            print(f"{'':<11}  em {c.frame}")
+        print(f"{'':<11}  {c.primeira or '?'} → {c.ultima or '?'}   "
+              + ', '.join(f'{m}={q}' for m, q in c.motivos.most_common()))
+    if len(clusters) > exemplos:
+        print(f"   ... +{len(clusters) - exemplos} cluster(s)")
+
+
+def _ler_chaves(caminho):
+    if not caminho:
+        return None
+    with open(caminho, encoding='utf-8') as f:
+        return {linha.strip() for linha in f if linha.strip()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Inspeção e reprocessamento em massa das DLQs')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    def comuns(p):
+        p.add_argument('--fila', action='append', choices=sorted(FILAS),
+                       help='Fila principal (pode repetir; padrão: todas)')
+        p.add_argument('--redis', help='URL do Redis (padrão: REDIS_URL ou REDIS_HOST/REDIS_PORT)')
+        p.add_argument('--prefixo', default=PREFIXO, help=f'Prefixo das chaves do Bull (padrão: {PREFIXO})')
+
+    p_exp = sub.add_parser('exportar', help='Grava as DLQs em JSONL')
+    comuns(p_exp)
+    p_exp.add_argument('--saida', required=True)
+
+    for nome, ajuda in (('inspecionar', 'Agrupa as falhas e classifica os jobs'),
+                        ('reprocessar', 'Reenfileira os jobs reprocessáveis com controle de vazão')):
+        p = sub.add_parser(nome, help=ajuda)
+        comuns(p)
+        p.add_argument('--incluir-sem-original', action='store_true',
+                       help='Reprocessa também jobs cujo original não está mais na fila principal')
+        p.add_argument('--liberar-idempotencia', action='store_true',
+                       help='Reprocessa webhooks com a chave de idempotência gravada (vistos, não '
+                            'necessariamente processados) e apaga a chave ao reenfileirar')
+        p.add_argument('--arquivo', help='Lê de um arquivo exportado em vez do Redis (reprocessar: só --simular)')
+        p.add_argument('--chaves', help='Chaves idemp:webhook:* conhecidas, uma por linha (modo arquivo)')
+        if nome == 'inspecionar':
+            p.add_argument('--exemplos', type=int, default=20, help='Clusters mostrados')
+            p.add_argument('--json', help='Grava os clusters em JSON')
+            continue
+        p.add_argument('--cluster', action='append', help='Só estes clusters (prefixo; pode repetir)')
+        p.add_argument('--err-code')
+        p.add_argument('--job-name', action='append')
+        p.add_argument('--desde', help='failedAt mínimo (ISO, ex.: 2026-10-01T12:00)')
+        p.add_argument('--ate', help='failedAt máximo (ISO)')
+        p.add_argument('--limite', type=int, help='Máximo de jobs por fila')
+        p.add_argument('--taxa', type=float, default=TAXA_PADRAO, help=f'Jobs/s máximo (padrão: {TAXA_PADRAO:.0f})')
+        p.add_argument('--lote', type=int, default=LOTE_PADRAO, help=f'Jobs por transação (padrão: {LOTE_PADRAO})')
+        p.add_argument('--teto-fila', type=int, default=TETO_FILA,
+                       help=f'Recua se a fila principal passar disso (padrão: {TETO_FILA})')
+        p.add_argument('--max-falhas', type=float, default=MAX_FALHAS,
+                       help=f'Fração dos enviados que pode voltar à DLQ por janela (padrão: {MAX_FALHAS})')
+        p.add_argument('--auditoria', default='dlq-reprocessamento.jsonl', help='JSONL de auditoria (append)')
+        p.add_argument('--simular', action='store_true', help='Classifica e mostra o plano, sem gravar')
+    args = parser.parse_args(argv)
+
+    filas = args.fila or sorted(FILAS)
+    if args.comando == 'reprocessar' and args.arquivo and not args.simular:
+        print("❌ A partir de arquivo, reprocessar só funciona com --simular")
+        return 1
+    r = None
+    if getattr(args, 'arquivo', None) is None:
+        try:
+            r = conectar_redis(args.redis)
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            return 1
+
+    if args.comando == 'exportar':
+        total = exportar(ler_redis(r, filas, args.prefixo), args.saida)
+        print(f"💾 {total} job(s) exportado(s) para {args.saida}")
+        return 0
+
+    inicio = time.perf_counter()
+    jobs = ler_arquivo(args.arquivo, filas) if r is None else ler_redis(r, filas, args.prefixo)
+    itens, clusters = classificar(jobs, r, args.prefixo, _ler_chaves(args.chaves),
+                                  args.liberar_idempotencia, args.incluir_sem_original)
+    print(f"🔎 DLQ lida e classificada em {time.perf_counter() - inicio:.1f}s")
+
+    if args.comando == 'inspecionar':
+        imprimir_clusters(itens, clusters, args.exemplos)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump([c.para_dict() for c in clusters], f, ensure_ascii=False, indent=2)
+            print(f"\n💾 Clusters gravados em {args.json}")
+        return 0
+
+    auditoria = Auditoria(args.auditoria)
+    interrompido = False
+    try:
+        for fila in filas:
+            selecionados = selecionar([it for it in itens if it.job['fila'] == fila], args.cluster,
+                                      args.err_code, args.job_name, args.desde, args.ate, args.limite)
+            if not selecionados:
+                continue
+            print(f"\n🚚 {fila}: {len(selecionados)} job(s) a reenfileirar"
+                  + (f" (~{len(selecionados) / args.taxa:.0f}s a {args.taxa:.0f}/s)" if args.simular else ''))
+            totais = reprocessar(r, fila, selecionados, auditoria, args.taxa, args.lote, args.teto_fila,
+                                 args.max_falhas, args.liberar_idempotencia, args.simular, args.prefixo)
+            print(f"   ✅ {totais['reenfileirados']} reenfileirado(s), {totais['entradas_removidas']} entrada(s) "
+                  f"removida(s) da DLQ, {totais['voltaram']} voltaram, {totais['recuos']} recuo(s), "
+                  f"{totais['segundos']:.1f}s")
+            if totais['interrompido']:
+                print(f"   🛑 {fila}: interrompido após recuos seguidos; a causa raiz parece persistir")
+                interrompido = True
+                break
+    finally:
+        auditoria.fechar()
+
+    if args.simular:
+        print("\n🔎 Simulação: nada foi gravado")
+    return 2 if interrompido else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
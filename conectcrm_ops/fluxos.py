@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Leitura de fluxos de triagem exportados em JSON
+
+Aceita tanto o arquivo completo (como fluxo-padrao-triagem-v3.json, com
+"estrutura" dentro) quanto apenas o conteúdo da coluna estrutura.
+"""
+
+import json
+
+
+def extrair_estrutura(fluxo):
+    """Retorna o dicionário estrutura (etapaInicial + etapas) de um fluxo"""
+    if isinstance(fluxo, str):
+        fluxo = json.loads(fluxo)
+
+    estrutura = fluxo.get('estrutura', fluxo) if isinstance(fluxo, dict) else None
+
+    if isinstance(estrutura, str):
+        estrutura = json.loads(estrutura)
+
+    if not isinstance(estrutura, dict) or not isinstance(estrutura.get('etapas'), dict):
+        raise ValueError('Fluxo sem "estrutura.etapas" válido')
+
+    return estrutura
+
+
+def carregar_estrutura(caminho):
+    with open(caminho, 'r', encoding='utf-8') as arquivo:
+        return extrair_estrutura(json.load(arquivo))
+
+
+def proximas_etapas(etapa):
+    """
+    Lista (origem, destino) de todas as transições declaradas em uma etapa:
+    proximaEtapa, opcoes/opcoesExtras, condicionais e metadata.keywords
+    """
+    if not isinstance(etapa, dict):
+        return []
+
+    destinos = []
+
+    def adicionar(origem, destino):
+        if isinstance(destino, str) and destino.strip():
+            destinos.append((origem, destino.strip()))
+
+    adicionar('proximaEtapa', etapa.get('proximaEtapa'))
+    adicionar('acaoSeVerdadeiro', etapa.get('acaoSeVerdadeiro'))
+    adicionar('acaoSeFalso', etapa.get('acaoSeFalso'))
+
+    for campo in ('opcoes', 'opcoesExtras'):
+        for indice, opcao in enumerate(etapa.get(campo) or []):
+            if not isinstance(opcao, dict):
+                continue
+            adicionar(f'{campo}[{indice}].proximaEtapa', opcao.get('proximaEtapa'))
+            for j, cond in enumerate(opcao.get('proximaEtapaCondicional') or []):
+                if isinstance(cond, dict):
+                    adicionar(f'{campo}[{indice}].proximaEtapaCondicional[{j}]', cond.get('entao'))
+
+    for indice, condicao in enumerate(etapa.get('condicoes') or []):
+        if isinstance(condicao, dict):
+            adicionar(f'condicoes[{indice}].proximaEtapa', condicao.get('proximaEtapa'))
+
+    metadata = etapa.get('metadata') if isinstance(etapa.get('metadata'), dict) else {}
+    adicionar('metadata.proximaEtapaDepartamento', metadata.get('proximaEtapaDepartamento'))
+    adicionar('proximaEtapaDepartamento', etapa.get('proximaEtapaDepartamento'))
+
+    keywords = metadata.get('keywords')
+    if isinstance(keywords, dict):
+        for palavra, destino in keywords.items():
+            adicionar(f'metadata.keywords.{palavra}', destino)
+
+    return destinos
@@ -0,0 +1,421 @@
+# -*- coding: utf-8 -*-
+"""
+Funil das etapas de triagem a partir de triagem_logs (agregação incremental)
+
+Lê os logs em ordem de (created_at, id) com cursor do lado do servidor e
+acumula, por fluxo e etapa: entradas, saídas (com o destino), conclusões,
+abandonos e o tempo de permanência (histograma, para p50/p90/p99). O estado
+fica num arquivo JSON junto com a marca d'água (último created_at/id lido), e
+cada `atualizar` só lê as linhas novas — o relatório não consulta o banco.
+
+Como as linhas de uma sessão se encadeiam:
+- a etapa do log muda           → saída da etapa anterior, entrada na nova
+- transferencia_* / sessao_finalizada  → conclusão na etapa atual
+- sessao_expirada / sessao_cancelada   → abandono na etapa atual
+- sem atividade por --inatividade      → abandono na última etapa vista
+
+Uso:
+    python -m conectcrm_ops.funil atualizar
+    python -m conectcrm_ops.funil relatorio --fluxo fluxo-padrao-triagem-v3
+    python -m conectcrm_ops.funil relatorio --json
+
+Arquivo de estado: CONECTCRM_FUNIL_ESTADO (padrão: .funil-triagem.json)
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from conectcrm_ops.histograma import Histograma, formatar_duracao
+from conectcrm_ops.historico import gravar_atomico
+
+ESTADO_PADRAO = os.environ.get('CONECTCRM_FUNIL_ESTADO', '.funil-triagem.json')
+
+VERSAO_ESTADO = 1
+
+MARCA_INICIAL = ['-infinity', '00000000-0000-0000-0000-000000000000']
+
+CONCLUSAO = {'sessao_finalizada', 'transferencia_nucleo', 'transferencia_atendente'}
+ABANDONO = {'sessao_expirada', 'sessao_cancelada'}
+
+SEM_FLUXO = '-'
+
+# Logs gravados depois de um desfecho (ex.: a resposta da transferência) não
+# reabrem a sessão enquanto ela estiver nesta janela.
+JANELA_ENCERRADAS_MS = 24 * 3600 * 1000
+
+PERCENTIS = (50, 90, 99)
+
+LOTE = 10000
+
+SQL_LIMITE = "SELECT LOCALTIMESTAMP - make_interval(secs => %s)"
+
+SQL_LOGS = """
+    SELECT id, sessao_id, fluxo_id, etapa, tipo, created_at
+    FROM triagem_logs
+    WHERE sessao_id IS NOT NULL
+      AND (created_at, id) > (%s::timestamp, %s::uuid)
+      AND created_at <= %s::timestamp
+    ORDER BY created_at, id
+"""
+
+SQL_NOMES = "SELECT id::text, nome FROM fluxos_triagem WHERE id = ANY(%s::uuid[])"
+
+_EPOCA = datetime(1970, 1, 1)
+_UM_MS = timedelta(milliseconds=1)
+
+
+def _ms(quando):
+    if quando.tzinfo is not None:
+        quando = quando.astimezone(timezone.utc).replace(tzinfo=None)
+    return (quando - _EPOCA) // _UM_MS
+
+
+def _nova_etapa():
+    return {
+        'entradas': 0,
+        'saidas': 0,
+        'concluidas': 0,
+        'abandonos': 0,
+        'destinos': {},
+        'permanencia': Histograma(),
+    }
+
+
+def _novo_fluxo():
+    return {
+        'iniciadas': 0,
+        'concluidas': 0,
+        'abandonadas': 0,
+        'duracao': Histograma(),
+        'etapas': {},
+    }
+
+
+class EstadoFunil:
+    """
+    Agregados + sessões em andamento + marca d'água.
+
+    abertas[sessao_id] = [fluxo_id, etapa, entrou_ms, ultimo_ms, inicio_ms]
+    encerradas[sessao_id] = ms do desfecho
+    """
+
+    def __init__(self):
+        self.marca = list(MARCA_INICIAL)
+        self.fluxos = {}
+        self.nomes = {}
+        self.abertas = {}
+        self.encerradas = {}
+        self.linhas_lidas = 0
+
+    # ------------------------------------------------------------------
+    # Persistência
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def carregar(cls, caminho):
+        estado = cls()
+        if not os.path.exists(caminho):
+            return estado
+        with open(caminho, 'r', encoding='utf-8') as f:
+            dados = json.load(f)
+        if dados.get('versao') != VERSAO_ESTADO:
+            raise ValueError(f'{caminho}: versão de estado {dados.get("versao")} não suportada '
+                             f'(apague o arquivo ou use --refazer)')
+        estado.marca = dados['marca']
+        estado.nomes = dados.get('nomes', {})
+        estado.abertas = dados['abertas']
+        estado.encerradas = dados['encerradas']
+        estado.linhas_lidas = dados.get('linhasLidas', 0)
+        for fluxo_id, fluxo in dados['fluxos'].items():
+            fluxo['duracao'] = Histograma.de_dict(fluxo['duracao'])
+            for etapa in fluxo['etapas'].values():
+                etapa['permanencia'] = Histograma.de_dict(etapa['permanencia'])
+            estado.fluxos[fluxo_id] = fluxo
+        return estado
+
+    def salvar(self, caminho):
+        fluxos = {}
+        for fluxo_id, fluxo in self.fluxos.items():
+            fluxos[fluxo_id] = {
+                **fluxo,
+                'duracao': fluxo['duracao'].para_dict(),
+                'etapas': {
+                    nome: {**etapa, 'permanencia': etapa['permanencia'].para_dict()}
+                    for nome, etapa in fluxo['etapas'].items()
+                },
+            }
+        dados = {
+            'versao': VERSAO_ESTADO,
+            'marca': self.marca,
+            'linhasLidas': self.linhas_lidas,
+            'nomes': self.nomes,
+            'abertas': self.abertas,
+            'encerradas': self.encerradas,
+            'fluxos': fluxos,
+        }
+        gravar_atomico(caminho, json.dumps(dados, ensure_ascii=False, separators=(',', ':')))
+
+    # ------------------------------------------------------------------
+    # Agregação
+    # ------------------------------------------------------------------
+
+    def _etapa(self, fluxo_id, etapa):
+        fluxo = self.fluxos.get(fluxo_id)
+        if fluxo is None:
+            fluxo = self.fluxos[fluxo_id] = _novo_fluxo()
+        dados = fluxo['etapas'].get(etapa)
+        if dados is None:
+            dados = fluxo['etapas'][etapa] = _nova_etapa()
+        return dados
+
+    def _desfecho(self, sessao_id, sessao, agora, concluida):
+        fluxo_id, etapa, entrou, _, inicio = sessao
+        fluxo = self.fluxos.get(fluxo_id)
+        if fluxo is None:
+            fluxo = self.fluxos[fluxo_id] = _novo_fluxo()
+        if concluida:
+            fluxo['concluidas'] += 1
+            fluxo['duracao'].registrar(agora - inicio)
+        else:
+            fluxo['abandonadas'] += 1
+        if etapa is not None:
+            dados = self._etapa(fluxo_id, etapa)
+            if concluida:
+                dados['concluidas'] += 1
+                dados['permanencia'].registrar(agora - entrou)
+            else:
+                dados['abandonos'] += 1
+        del self.abertas[sessao_id]
+        self.encerradas[sessao_id] = agora
+
+    def processar(self, linhas):
+        """linhas: (id, sessao_id, fluxo_id, etapa, tipo, created_at) em ordem de (created_at, id)"""
+        abertas = self.abertas
+        encerradas = self.encerradas
+        ultima = None
+        for ultima in linhas:
+            _, sessao_id, fluxo_id, etapa, tipo, criado = ultima
+            agora = _ms(criado)
+            sessao = abertas.get(sessao_id)
+
+            if sessao is None:
+                encerrada = encerradas.get(sessao_id)
+                if tipo in ABANDONO or tipo in CONCLUSAO:
+                    continue
+                if encerrada is not None:
+                    if agora - encerrada < JANELA_ENCERRADAS_MS and tipo != 'sessao_retomada':
+                        continue
+                    del encerradas[sessao_id]
+                fluxo_id = str(fluxo_id) if fluxo_id else SEM_FLUXO
+                sessao = abertas[sessao_id] = [fluxo_id, etapa, agora, agora, agora]
+                fluxo = self.fluxos.get(fluxo_id)
+                if fluxo is None:
+                    fluxo = self.fluxos[fluxo_id] = _novo_fluxo()
+                fluxo['iniciadas'] += 1
+                if etapa is not None:
+                    self._etapa(fluxo_id, etapa)['entradas'] += 1
+                continue
+
+            if sessao[0] == SEM_FLUXO and fluxo_id:
+                sessao[0] = str(fluxo_id)
+
+            if etapa is not None and etapa != sessao[1]:
+                if sessao[1] is not None:
+                    anterior = self._etapa(sessao[0], sessao[1])
+                    anterior['saidas'] += 1
+                    anterior['destinos'][etapa] = anterior['destinos'].get(etapa, 0) + 1
+                    anterior['permanencia'].registrar(agora - sessao[2])
+                self._etapa(sessao[0], etapa)['entradas'] += 1
+                sessao[1] = etapa
+                sessao[2] = agora
+            sessao[3] = agora
+
+            if tipo in CONCLUSAO:
+                self._desfecho(sessao_id, sessao, agora, concluida=True)
+            elif tipo in ABANDONO:
+                self._desfecho(sessao_id, sessao, agora, concluida=False)
+
+        if ultima is not None:
+            self.marca = [ultima[5].isoformat(), str(ultima[0])]
+
+    def fechar_inativas(self, agora, inatividade_ms):
+        """Abandono para sessões sem log desde agora - inatividade; poda as encerradas antigas"""
+        limite = agora - inatividade_ms
+        inativas = [(s, dados) for s, dados in self.abertas.items() if dados[3] < limite]
+        for sessao_id, sessao in inativas:
+            self._desfecho(sessao_id, sessao, sessao[3], concluida=False)
+        self.encerradas = {
+            s: quando for s, quando in self.encerradas.items()
+            if agora - quando < JANELA_ENCERRADAS_MS
+        }
+        return len(inativas)
+
+
+# ----------------------------------------------------------------------
+# Relatório
+# ----------------------------------------------------------------------
+
+def relatorio(estado, filtro=None):
+    """Lista de fluxos com as etapas ordenadas por entradas (o funil)"""
+    em_andamento = {}
+    for fluxo_id, etapa, *_ in estado.abertas.values():
+        chave = (fluxo_id, etapa)
+        em_andamento[chave] = em_andamento.get(chave, 0) + 1
+
+    fluxos = []
+    for fluxo_id, fluxo in estado.fluxos.items():
+        nome = estado.nomes.get(fluxo_id, fluxo_id)
+        if filtro and filtro != fluxo_id and filtro.lower() not in nome.lower():
+            continue
+        etapas = []
+        for etapa, dados in fluxo['etapas'].items():
+            percentis = dados['permanencia'].percentis(PERCENTIS)
+            etapas.append({
+                'etapa': etapa,
+                'entradas': dados['entradas'],
+                'saidas': dados['saidas'],
+                'concluidas': dados['concluidas'],
+                'abandonos': dados['abandonos'],
+                'emAndamento': em_andamento.get((fluxo_id, etapa), 0),
+                'taxaAbandono': dados['abandonos'] / dados['entradas'] if dados['entradas'] else 0.0,
+                'permanenciaMs': {f'p{p}': v for p, v in percentis.items()},
+                'destinos': dict(sorted(dados['destinos'].items(), key=lambda item: -item[1])),
+            })
+        etapas.sort(key=lambda e: (-e['entradas'], e['etapa']))
+        duracao = fluxo['duracao'].percentis(PERCENTIS)
+        fluxos.append({
+            'fluxoId': fluxo_id,
+            'nome': nome,
+            'iniciadas': fluxo['iniciadas'],
+            'concluidas': fluxo['concluidas'],
+            'abandonadas': fluxo['abandonadas'],
+            'duracaoMs': {f'p{p}': v for p, v in duracao.items()},
+            'etapas': etapas,
+        })
+    fluxos.sort(key=lambda f: -f['iniciadas'])
+    return fluxos
+
+
+def imprimir_relatorio(fluxos, marca):
+    print(f"📍 Marca d'água: {marca[0]}")
+    for fluxo in fluxos:
+        iniciadas = fluxo['iniciadas'] or 1
+        print(f"\n🔀 {fluxo['nome']}")
+        print("=" * 100)
+        print(f"   Sessões: {fluxo['iniciadas']} iniciadas, "
+              f"{fluxo['concluidas']} concluídas ({fluxo['concluidas'] / iniciadas:.1%}), "
+              f"{fluxo['abandonadas']} abandonadas ({fluxo['abandonadas'] / iniciadas:.1%})")
+        duracao = fluxo['duracaoMs']
+        print(f"   Duração até concluir: p50 {formatar_duracao(duracao['p50'])}, "
+              f"p90 {formatar_duracao(duracao['p90'])}, p99 {formatar_duracao(duracao['p99'])}")
+        print()
+        print(f"   {'etapa':<32} {'entr.':>7} {'saídas':>7} {'concl.':>7} {'aband.':>7} {'agora':>6} "
+              f"{'%aband':>7} {'p50':>8} {'p90':>8} {'p99':>8}  principal destino")
+        for etapa in fluxo['etapas']:
+            tempo = etapa['permanenciaMs']
+            destino = next(iter(etapa['destinos'].items()), None)
+            destino = f"{destino[0]} ({destino[1]})" if destino else '-'
+            print(f"   {etapa['etapa'][:32]:<32} {etapa['entradas']:>7} {etapa['saidas']:>7} "
+                  f"{etapa['concluidas']:>7} {etapa['abandonos']:>7} {etapa['emAndamento']:>6} "
+                  f"{etapa['taxaAbandono']:>7.1%} {formatar_duracao(tempo['p50']):>8} "
+                  f"{formatar_duracao(tempo['p90']):>8} {formatar_duracao(tempo['p99']):>8}  {destino}")
+
+
+# ----------------------------------------------------------------------
+# Banco
+# ----------------------------------------------------------------------
+
+def atualizar(conn, estado, caminho, atraso=120, inatividade=1800, checkpoint=100 * LOTE):
+    """
+    Lê os logs novos até LOCALTIMESTAMP - atraso (para não pular linhas de
+    transações que ainda vão confirmar com created_at anterior) e salva o
+    estado a cada `checkpoint` linhas, então uma primeira carga interrompida
+    continua de onde parou.
+    """
+    from conectcrm_ops.db import ler_em_fluxo
+
+    with conn.cursor() as cursor:
+        cursor.execute(SQL_LIMITE, (atraso,))
+        limite = cursor.fetchone()[0]
+
+    lidas = 0
+    lote = []
+    for linha in ler_em_fluxo(conn, SQL_LOGS, (estado.marca[0], estado.marca[1], limite), itersize=LOTE):
+        lote.append(linha)
+        if len(lote) == LOTE:
+            estado.processar(lote)
+            estado.linhas_lidas += LOTE
+            lidas += LOTE
+            lote = []
+            if lidas % checkpoint == 0:
+                estado.salvar(caminho)
+                print(f"   … {lidas} linhas (até {estado.marca[0]})")
+    estado.processar(lote)
+    estado.linhas_lidas += len(lote)
+    lidas += len(lote)
+
+    inativas = estado.fechar_inativas(_ms(limite), inatividade * 1000)
+
+    sem_nome = [f for f in estado.fluxos if f not in estado.nomes and f != SEM_FLUXO]
+    if sem_nome:
+        with conn.cursor() as cursor:
+            cursor.execute(SQL_NOMES, (sem_nome,))
+            estado.nomes.update(dict(cursor.fetchall()))
+
+    estado.salvar(caminho)
+    conn.commit()
+    return lidas, inativas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Funil das etapas de triagem (triagem_logs, incremental)')
+    parser.add_argument('--estado', default=ESTADO_PADRAO, help=f'Arquivo de estado (padrão: {ESTADO_PADRAO})')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p = sub.add_parser('atualizar', help='Lê os logs novos desde a última execução')
+    p.add_argument('--atraso', type=int, default=120,
+                   help='Ignora logs dos últimos N segundos (padrão: 120)')
+    p.add_argument('--inatividade', type=int, default=1800,
+                   help='Segundos sem log para contar abandono (padrão: 1800)')
+    p.add_argument('--refazer', action='store_true', help='Descarta o estado e relê tudo')
+
+    p = sub.add_parser('relatorio', help='Mostra o funil acumulado (não consulta o banco)')
+    p.add_argument('--fluxo', help='ID ou parte do nome do fluxo')
+    p.add_argument('--json', action='store_true')
+
+    args = parser.parse_args(argv)
+
+    if args.comando == 'relatorio':
+        if not os.path.exists(args.estado):
+            print(f"❌ {args.estado} não existe; rode 'atualizar' primeiro")
+            return 1
+        estado = EstadoFunil.carregar(args.estado)
+        fluxos = relatorio(estado, args.fluxo)
+        if args.json:
+            print(json.dumps({'marca': estado.marca, 'fluxos': fluxos}, indent=2, ensure_ascii=False))
+        else:
+            imprimir_relatorio(fluxos, estado.marca)
+        return 0
+
+    from conectcrm_ops.db import conectar
+
+    estado = EstadoFunil() if args.refazer else EstadoFunil.carregar(args.estado)
+    inicio = time.perf_counter()
+    conn = conectar()
+    try:
+        lidas, inativas = atualizar(conn, estado, args.estado, args.atraso, args.inatividade)
+    finally:
+        conn.close()
+
+    print(f"✅ {lidas} log(s) novo(s) em {time.perf_counter() - inicio:.1f}s; "
+          f"{inativas} sessão(ões) encerrada(s) por inatividade; {len(estado.abertas)} em andamento")
+    print(f"📍 Marca d'água: {estado.marca[0]}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+"""
+Grafo compilado de um fluxo de triagem
+
+Transforma estrutura.etapas em listas de adjacência indexadas por inteiro uma
+única vez e responde, em tempo linear no tamanho do fluxo:
+
+- etapas inalcançáveis a partir de etapaInicial
+- destinos pendentes (proximaEtapa apontando para etapa inexistente)
+- ciclos sem saída (componentes fortemente conexos sem aresta para fora e sem etapa final)
+- etapas presas (alcançáveis, mas que nunca chegam a uma etapa final)
+- menor caminho de etapaInicial até cada etapa (árvore de predecessores)
+
+Uso:
+    python -m conectcrm_ops.grafo fluxo-padrao-triagem-v3.json
+    python -m conectcrm_ops.grafo fluxo.json --json
+"""
+
+import argparse
+import json
+import sys
+from collections import deque
+
+from conectcrm_ops.fluxos import carregar_estrutura, extrair_estrutura, proximas_etapas
+
+# Desvios que o backend faz sozinho, fora do que está escrito no JSON
+DESTINOS_IMPLICITOS = {
+    'boas-vindas': [
+        ('menu-nucleos(com departamentos)', 'escolha-departamento'),
+        ('menu-nucleos(sem departamentos)', 'transferir-atendimento'),
+    ],
+    'escolha-departamento': [('fallback(sem departamentos)', 'coleta-nome')],
+    'confirmar-dados-cliente': [('negacao', 'coleta-nome')],
+    'confirmacao-dados': [('negacao', 'coleta-nome')],
+    'verificar-dados-atualizados': [('negacao', 'coleta-nome')],
+}
+ACOES_FINAIS = {'finalizar', 'transferir_nucleo', 'transferir_atendente'}
+
+
+def _etapa_final(etapa_id, etapa, tem_saidas):
+    """Etapas em que a sessão termina (ou termina na próxima resposta)"""
+    metadata = etapa.get('metadata') if isinstance(etapa.get('metadata'), dict) else {}
+    if etapa_id == 'transferir-atendimento' or (etapa.get('tipo') == 'acao' and etapa.get('acao') == 'transferir'):
+        return True
+    if etapa.get('finalizar') or metadata.get('finalizarSessao'):
+        return True
+    if any(isinstance(o, dict) and o.get('acao') in ACOES_FINAIS for o in etapa.get('opcoes') or []):
+        return True
+    return not tem_saidas
+
+
+class GrafoFluxo:
+    """
+    Grafo imutável de um fluxo. Os vértices são inteiros (índice em self.ids);
+    as consultas depois da compilação não voltam a ler o JSON.
+    """
+
+    def __init__(self, estrutura, incluir_implicitos=True):
+        estrutura = extrair_estrutura(estrutura)
+        etapas = {k: v for k, v in estrutura['etapas'].items() if isinstance(v, dict)}
+
+        self.etapa_inicial = estrutura.get('etapaInicial')
+        self.ids = list(etapas)
+        self.indice = {etapa_id: i for i, etapa_id in enumerate(self.ids)}
+        self.sucessores = [[] for _ in self.ids]
+        self.predecessores = [[] for _ in self.ids]
+        self.rotulos = [[] for _ in self.ids]
+        self.pendentes = []
+        self.finais = [False] * len(self.ids)
+
+        for origem_id, etapa in etapas.items():
+            origem = self.indice[origem_id]
+            arestas = proximas_etapas(etapa)
+            if incluir_implicitos:
+                arestas += DESTINOS_IMPLICITOS.get(origem_id, [])
+
+            vistos = set()
+            for campo, destino_id in arestas:
+                destino = self.indice.get(destino_id)
+                if destino is None:
+                    self.pendentes.append((origem_id, campo, destino_id))
+                    continue
+                self.rotulos[origem].append((campo, destino))
+                if destino not in vistos:
+                    vistos.add(destino)
+                    self.sucessores[origem].append(destino)
+                    self.predecessores[destino].append(origem)
+
+            self.finais[origem] = _etapa_final(origem_id, etapa, bool(arestas))
+
+        self._distancias = None
+        self._pais = None
+
+    # ------------------------------------------------------------------
+    # Alcance e menores caminhos (BFS a partir da etapa inicial)
+    # ------------------------------------------------------------------
+
+    def _bfs(self):
+        if self._distancias is not None:
+            return
+
+        n = len(self.ids)
+        self._distancias = [None] * n
+        self._pais = [None] * n
+
+        inicio = self.indice.get(self.etapa_inicial)
+        if inicio is None:
+            return
+
+        self._distancias[inicio] = 0
+        fila = deque([inicio])
+        while fila:
+            atual = fila.popleft()
+            for proximo in self.sucessores[atual]:
+                if self._distancias[proximo] is None:
+                    self._distancias[proximo] = self._distancias[atual] + 1
+                    self._pais[proximo] = atual
+                    fila.append(proximo)
+
+    def distancia(self, etapa_id):
+        self._bfs()
+        return self._distancias[self.indice[etapa_id]]
+
+    def caminho(self, etapa_id):
+        """Menor sequência de etapas de etapaInicial até etapa_id (None se inalcançável)"""
+        self._bfs()
+        atual = self.indice[etapa_id]
+        if self._distancias[atual] is None:
+            return None
+
+        caminho = []
+        while atual is not None:
+            caminho.append(self.ids[atual])
+            atual = self._pais[atual]
+        return caminho[::-1]
+
+    def arvore_caminhos(self):
+        """
+        Árvore de menores caminhos: etapa -> (distância, etapa anterior).
+        Representação linear; use caminho() para expandir uma etapa específica.
+        """
+        self._bfs()
+        return {
+            etapa_id: {
+                'distancia': self._distancias[i],
+                'anterior': self.ids[self._pais[i]] if self._pais[i] is not None else None,
+            }
+            for i, etapa_id in enumerate(self.ids)
+            if self._distancias[i] is not None
+        }
+
+    def inalcancaveis(self):
+        self._bfs()
+        return [self.ids[i] for i, d in enumerate(self._distancias) if d is None]
+
+    # ------------------------------------------------------------------
+    # Ciclos e etapas presas
+    # ------------------------------------------------------------------
+
+    def componentes_fortes(self):
+        """Tarjan iterativo: lista de componentes fortemente conexos (índices)"""
+        n = len(self.ids)
+        indice = [None] * n
+        menor = [0] * n
+        na_pilha = [False] * n
+        pilha = []
+        componentes = []
+        contador = 0
+
+        for raiz in range(n):
+            if indice[raiz] is not None:
+                continue
+
+            trabalho = [(raiz, 0)]
+            while trabalho:
+                v, pos = trabalho.pop()
+                if pos == 0:
+                    indice[v] = menor[v] = contador
+                    contador += 1
+                    pilha.append(v)
+                    na_pilha[v] = True
+
+                sucessores = self.sucessores[v]
+                while pos < len(sucessores):
+                    w = sucessores[pos]
+                    pos += 1
+                    if indice[w] is None:
+                        trabalho.append((v, pos))
+                        trabalho.append((w, 0))
+                        break
+                    if na_pilha[w]:
+                        menor[v] = min(menor[v], indice[w])
+                else:
+                    if menor[v] == indice[v]:
+                        componente = []
+                        while True:
+                            w = pilha.pop()
+                            na_pilha[w] = False
+                            componente.append(w)
+                            if w == v:
+                                break
+                        componentes.append(componente)
+                    if trabalho:
+                        pai = trabalho[-1][0]
+                        menor[pai] = min(menor[pai], menor[v])
+
+        return componentes
+
+    def ciclos_sem_saida(self):
+        """Ciclos alcançáveis dos quais a conversa nunca sai nem termina"""
+        self._bfs()
+        ciclos = []
+        for componente in self.componentes_fortes():
+            membros = set(componente)
+            ciclico = len(componente) > 1 or componente[0] in self.sucessores[componente[0]]
+            if not ciclico or self._distancias[componente[0]] is None:
+                continue
+            if any(self.finais[v] for v in componente):
+                continue
+            if any(w not in membros for v in componente for w in self.sucessores[v]):
+                continue
+            ciclos.append(sorted(self.ids[v] for v in componente))
+        return ciclos
+
+    def presas(self):
+        """Etapas alcançáveis que não têm caminho até nenhuma etapa final"""
+        self._bfs()
+        chega_ao_fim = [False] * len(self.ids)
+        fila = deque(i for i, final in enumerate(self.finais) if final)
+        for i in fila:
+            chega_ao_fim[i] = True
+        while fila:
+            atual = fila.popleft()
+            for anterior in self.predecessores[atual]:
+                if not chega_ao_fim[anterior]:
+                    chega_ao_fim[anterior] = True
+                    fila.append(anterior)
+
+        return [
+            self.ids[i] for i in range(len(self.ids))
+            if self._distancias[i] is not None and not chega_ao_fim[i]
+        ]
+
+    def relatorio(self):
+        return {
+            'etapaInicial': self.etapa_inicial,
+            'etapaInicialExiste': self.etapa_inicial in self.indice,
+            'totalEtapas': len(self.ids),
+            'totalArestas': sum(len(s) for s in self.sucessores),
+            'inalcancaveis': self.inalcancaveis(),
+            'destinosPendentes': [
+                {'origem': origem, 'campo': campo, 'destino': destino}
+                for origem, campo, destino in self.pendentes
+            ],
+            'ciclosSemSaida': self.ciclos_sem_saida(),
+            'presas': self.presas(),
+            'menorCaminho': self.arvore_caminhos(),
+        }
+
+
+def relatorio_tem_problemas(relatorio):
+    return bool(
+        not relatorio['etapaInicialExiste']
+        or relatorio['inalcancaveis']
+        or relatorio['destinosPendentes']
+        or relatorio['ciclosSemSaida']
+        or relatorio['presas']
+    )
+
+
+def imprimir_relatorio(relatorio):
+    print(f"📊 Etapas: {relatorio['totalEtapas']} | Transições: {relatorio['totalArestas']}")
+    print(f"🚩 Etapa inicial: {relatorio['etapaInicial']}"
+          + ("" if relatorio['etapaInicialExiste'] else " ❌ NÃO EXISTE"))
+    print("=" * 80)
+
+    if relatorio['destinosPendentes']:
+        print("\n❌ DESTINOS INEXISTENTES:")
+        for item in relatorio['destinosPendentes']:
+            print(f"   {item['origem']}.{item['campo']} → '{item['destino']}'")
+
+    if relatorio['inalcancaveis']:
+        print("\n⚠️  ETAPAS INALCANÇÁVEIS:")
+        for etapa_id in relatorio['inalcancaveis']:
+            print(f"   - {etapa_id}")
+
+    if relatorio['ciclosSemSaida']:
+        print("\n🔁 CICLOS SEM SAÍDA:")
+        for ciclo in relatorio['ciclosSemSaida']:
+            print(f"   - {' ↔ '.join(ciclo)}")
+
+    if relatorio['presas']:
+        print("\n🪤 ETAPAS QUE NUNCA CHEGAM A UM FIM:")
+        for etapa_id in relatorio['presas']:
+            print(f"   - {etapa_id}")
+
+    print("\n🧭 MENOR CAMINHO A PARTIR DA ETAPA INICIAL:")
+    for etapa_id, no in relatorio['menorCaminho'].items():
+        anterior = f" (via {no['anterior']})" if no['anterior'] else ''
+        print(f"   [{no['distancia']:>2}] {etapa_id}{anterior}")
+
+    if not relatorio_tem_problemas(relatorio):
+        print("\n✅ Nenhum problema estrutural encontrado!")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Analisa a estrutura de um fluxo de triagem')
+    parser.add_argument('fluxo', help='JSON do fluxo (arquivo exportado ou estrutura)')
+    parser.add_argument('--json', action='store_true', help='Imprime o relatório em JSON')
+    parser.add_argument('--sem-implicitos', action='store_true',
+                        help='Ignora os desvios fixos do backend (menu dinâmico, fallback coleta-nome)')
+    args = parser.parse_args(argv)
+
+    grafo = GrafoFluxo(carregar_estrutura(args.fluxo), incluir_implicitos=not args.sem_implicitos)
+    relatorio = grafo.relatorio()
+
+    if args.json:
+        print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+    else:
+        imprimir_relatorio(relatorio)
+
+    return 1 if relatorio_tem_problemas(relatorio) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
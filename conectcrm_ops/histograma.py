@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Histograma log-linear (no estilo HDR) para tempos em milissegundos
+
+Cada potência de 2 é dividida em SUBDIVISOES faixas, então o erro relativo de
+um percentil fica abaixo de 1/SUBDIVISOES (~1,6%) em qualquer escala, de 1 ms
+a dias. A memória é limitada pelo número de faixas usadas (poucas centenas),
+não pelo número de amostras, e dois histogramas se juntam somando contagens —
+o que permite acumular por execução e salvar em JSON.
+"""
+
+SUBDIVISOES = 64
+_BITS = SUBDIVISOES.bit_length()  # 7: valores < 2 * SUBDIVISOES têm faixa exata
+
+
+def indice(valor):
+    valor = max(0, int(valor))
+    if valor < 2 * SUBDIVISOES:
+        return valor
+    deslocamento = valor.bit_length() - _BITS
+    return deslocamento * SUBDIVISOES + (valor >> deslocamento)
+
+
+def limites(i):
+    """(menor, maior) valor que cai na faixa i"""
+    if i < 2 * SUBDIVISOES:
+        return i, i
+    deslocamento = i // SUBDIVISOES - 1
+    mantissa = i % SUBDIVISOES + SUBDIVISOES
+    return mantissa << deslocamento, ((mantissa + 1) << deslocamento) - 1
+
+
+class Histograma:
+    __slots__ = ('contagens', 'total', 'soma', 'minimo', 'maximo')
+
+    def __init__(self):
+        self.contagens = {}
+        self.total = 0
+        self.soma = 0
+        self.minimo = None
+        self.maximo = None
+
+    def registrar(self, valor, vezes=1):
+        valor = max(0, int(valor))
+        i = indice(valor)
+        self.contagens[i] = self.contagens.get(i, 0) + vezes
+        self.total += vezes
+        self.soma += valor * vezes
+        self.minimo = valor if self.minimo is None else min(self.minimo, valor)
+        self.maximo = valor if self.maximo is None else max(self.maximo, valor)
+
+    def juntar(self, outro):
+        for i, n in outro.contagens.items():
+            self.contagens[i] = self.contagens.get(i, 0) + n
+        self.total += outro.total
+        self.soma += outro.soma
+        if outro.minimo is not None:
+            self.minimo = outro.minimo if self.minimo is None else min(self.minimo, outro.minimo)
+            self.maximo = outro.maximo if self.maximo is None else max(self.maximo, outro.maximo)
+        return self
+
+    def media(self):
+        return self.soma / self.total if self.total else None
+
+    def percentis(self, ps):
+        """{p: valor} para p em 0..100, numa única passada pelas faixas"""
+        if not self.total:
+            return {p: None for p in ps}
+        alvos = sorted((max(1, -(-p * self.total // 100)), p) for p in ps)
+        resultado = {}
+        acumulado = 0
+        pendentes = iter(alvos)
+        alvo, p = next(pendentes)
+        for i in sorted(self.contagens):
+            acumulado += self.contagens[i]
+            while acumulado >= alvo:
+                menor, maior = limites(i)
+                resultado[p] = min(max((menor + maior) // 2, self.minimo), self.maximo)
+                proximo = next(pendentes, None)
+                if proximo is None:
+                    return resultado
+                alvo, p = proximo
+        return resultado
+
+    def percentil(self, p):
+        return self.percentis([p])[p]
+
+    def contar_acima(self, valor):
+        """Amostras na faixa de valor ou acima (aproximado na mesma precisão)"""
+        limite = indice(valor)
+        return sum(n for i, n in self.contagens.items() if i >= limite)
+
+    def para_dict(self):
+        return {
+            'contagens': {str(i): n for i, n in sorted(self.contagens.items())},
+            'total': self.total,
+            'soma': self.soma,
+            'minimo': self.minimo,
+            'maximo': self.maximo,
+        }
+
+    @classmethod
+    def de_dict(cls, dados):
+        histograma = cls()
+        if dados:
+            histograma.contagens = {int(i): n for i, n in dados['contagens'].items()}
+            histograma.total = dados['total']
+            histograma.soma = dados['soma']
+            histograma.minimo = dados['minimo']
+            histograma.maximo = dados['maximo']
+        return histograma
+
+
+def formatar_duracao(ms):
+    if ms is None:
+        return '-'
+    if ms < 1000:
+        return f'{ms}ms'
+    segundos = ms / 1000
+    if segundos < 60:
+        return f'{segundos:.1f}s'
+    if segundos < 3600:
+        return f'{segundos / 60:.1f}min'
+    return f'{segundos / 3600:.1f}h'
@@ -0,0 +1,404 @@
+# -*- coding: utf-8 -*-
+"""
+Histórico de versões dos fluxos de triagem (armazenamento em disco)
+
+Cada etapa (e o restante da estrutura, sem as etapas) é gravada uma única vez
+em objetos/<hash>.json, endereçada pelo SHA-256 do JSON canônico. Cada versão
+é uma linha em fluxos/<fluxo_id>.jsonl com os hashes só das etapas que mudaram
+em relação à linha anterior (a lista completa é repetida a cada
+INTERVALO_COMPLETO linhas), então guardar 1.000 versões de um fluxo de 19
+etapas custa basicamente as etapas que mudaram.
+
+Eventos registrados: snapshot, patch, publicar, republicar, despublicar, rollback.
+
+Relação com o histórico do backend: fluxos_triagem também guarda versões em
+historico_versoes (jsonb) numeradas por versao_atual, que o
+FluxoTriagemService.restaurarVersao usa. São dois históricos distintos: aqui
+as versões são as da coluna versao (a da concorrência otimista), e uma
+restauração feita pelo backend só aparece aqui no próximo `capturar`. Para que
+o inverso não aconteça, o rollback desta ferramenta grava no
+historico_versoes, na mesma transação do patch, o mesmo backup "antes de
+restaurar" que o backend gravaria, e incrementa versao_atual como ele.
+
+Uso:
+    python -m conectcrm_ops.historico capturar                       (todos os fluxos do banco)
+    python -m conectcrm_ops.historico listar ce74c2f3-...
+    python -m conectcrm_ops.historico diff ce74c2f3-... 7 9
+    python -m conectcrm_ops.historico rollback ce74c2f3-... 7 [--dry-run]
+
+Diretório: CONECTCRM_HISTORICO_FLUXOS (padrão: .historico-fluxos na pasta atual)
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+DIRETORIO_PADRAO = os.environ.get('CONECTCRM_HISTORICO_FLUXOS', '.historico-fluxos')
+
+INTERVALO_COMPLETO = 50
+
+SQL_FLUXOS = """
+    SELECT id, versao, publicado, estrutura
+    FROM fluxos_triagem
+    {filtro}
+    ORDER BY id
+"""
+
+
+def json_canonico(obj):
+    return json.dumps(obj, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+
+
+def hash_objeto(obj):
+    return hashlib.sha256(json_canonico(obj).encode('utf-8')).hexdigest()
+
+
+def gravar_atomico(caminho, conteudo):
+    pasta = os.path.dirname(os.path.abspath(caminho))
+    os.makedirs(pasta, exist_ok=True)
+    fd, temporario = tempfile.mkstemp(dir=pasta, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(conteudo)
+        os.replace(temporario, caminho)
+    except Exception:
+        if os.path.exists(temporario):
+            os.unlink(temporario)
+        raise
+
+
+class HistoricoFluxos:
+    """Armazenamento de versões; seguro para gravações repetidas (idempotente por conteúdo)"""
+
+    def __init__(self, diretorio=None):
+        self.diretorio = diretorio or DIRETORIO_PADRAO
+        self._objetos = {}
+
+    # ------------------------------------------------------------------
+    # Objetos (etapas e raiz), endereçados por conteúdo
+    # ------------------------------------------------------------------
+
+    def _caminho_objeto(self, hash_):
+        return os.path.join(self.diretorio, 'objetos', hash_[:2], f'{hash_}.json')
+
+    def _guardar_objeto(self, obj):
+        hash_ = hash_objeto(obj)
+        caminho = self._caminho_objeto(hash_)
+        if hash_ not in self._objetos and not os.path.exists(caminho):
+            gravar_atomico(caminho, json_canonico(obj))
+        self._objetos[hash_] = obj
+        return hash_
+
+    def objeto(self, hash_):
+        if hash_ not in self._objetos:
+            with open(self._caminho_objeto(hash_), 'r', encoding='utf-8') as f:
+                self._objetos[hash_] = json.load(f)
+        return self._objetos[hash_]
+
+    # ------------------------------------------------------------------
+    # Versões
+    # ------------------------------------------------------------------
+
+    def _caminho_manifesto(self, fluxo_id):
+        return os.path.join(self.diretorio, 'fluxos', f'{fluxo_id}.jsonl')
+
+    def versoes(self, fluxo_id):
+        """Entradas do manifesto (com o mapa completo de etapas), da mais antiga para a mais recente"""
+        caminho = self._caminho_manifesto(fluxo_id)
+        if not os.path.exists(caminho):
+            return []
+
+        entradas, etapas = [], {}
+        with open(caminho, 'r', encoding='utf-8') as f:
+            for linha in f:
+                if not linha.strip():
+                    continue
+                entrada = json.loads(linha)
+                if 'etapas' in entrada:
+                    etapas = entrada['etapas']
+                else:
+                    removidas = set(entrada.pop('removidas', []))
+                    etapas = {k: v for k, v in etapas.items() if k not in removidas}
+                    etapas.update(entrada.pop('alteradas', {}))
+                    entrada['etapas'] = etapas
+                entradas.append(entrada)
+        return entradas
+
+    def entrada(self, fluxo_id, versao=None):
+        """Última entrada registrada para a versão (ou a última de todas)"""
+        for entrada in reversed(self.versoes(fluxo_id)):
+            if versao is None or entrada['versao'] == int(versao):
+                return entrada
+        return None
+
+    def registrar(self, fluxo_id, versao, estrutura, evento='snapshot', publicado=None, autor=None):
+        """
+        Grava a versão. Um snapshot idêntico ao último registrado (mesma versão e
+        mesmo conteúdo) é ignorado; os demais eventos sempre geram uma linha.
+        """
+        fluxo_id = str(fluxo_id)
+        if isinstance(estrutura, str):
+            estrutura = json.loads(estrutura)
+        estrutura = estrutura or {}
+
+        raiz = {k: v for k, v in estrutura.items() if k != 'etapas'}
+        etapas = {etapa_id: self._guardar_objeto(etapa) for etapa_id, etapa in (estrutura.get('etapas') or {}).items()}
+        hash_raiz = self._guardar_objeto(raiz)
+
+        anteriores = self.versoes(fluxo_id)
+        ultima = anteriores[-1] if anteriores else None
+        if (evento == 'snapshot' and ultima and ultima['versao'] == versao
+                and ultima['raiz'] == hash_raiz and ultima['etapas'] == etapas):
+            return ultima
+
+        entrada = {
+            'versao': versao,
+            'evento': evento,
+            'quando': datetime.now(timezone.utc).isoformat(),
+            'publicado': publicado,
+            'autor': autor,
+            'raiz': hash_raiz,
+        }
+        linha = dict(entrada)
+        if ultima is None or len(anteriores) % INTERVALO_COMPLETO == 0:
+            linha['etapas'] = etapas
+        else:
+            linha['alteradas'] = {k: v for k, v in etapas.items() if ultima['etapas'].get(k) != v}
+            linha['removidas'] = sorted(set(ultima['etapas']) - set(etapas))
+
+        caminho = self._caminho_manifesto(fluxo_id)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        with open(caminho, 'a', encoding='utf-8') as f:
+            f.write(json_canonico(linha) + '\n')
+
+        entrada['etapas'] = etapas
+        return entrada
+
+    def estrutura(self, fluxo_id, versao=None):
+        entrada = self.entrada(fluxo_id, versao)
+        if entrada is None:
+            raise KeyError(f"versão {versao} do fluxo {fluxo_id} não está no histórico")
+        estrutura = dict(self.objeto(entrada['raiz']))
+        estrutura['etapas'] = {etapa_id: self.objeto(h) for etapa_id, h in entrada['etapas'].items()}
+        return estrutura
+
+    # ------------------------------------------------------------------
+    # Diferenças
+    # ------------------------------------------------------------------
+
+    def diff(self, fluxo_id, versao_a, versao_b):
+        """
+        Diferença por etapa entre duas versões. Compara só os hashes; os objetos
+        são lidos apenas para as etapas alteradas (campos que mudaram).
+        """
+        a, b = self.entrada(fluxo_id, versao_a), self.entrada(fluxo_id, versao_b)
+        if a is None or b is None:
+            faltando = versao_a if a is None else versao_b
+            raise KeyError(f"versão {faltando} do fluxo {fluxo_id} não está no histórico")
+        return diff_entradas(self, a, b)
+
+
+def _campos_alterados(antes, depois):
+    return sorted(k for k in set(antes) | set(depois) if antes.get(k) != depois.get(k))
+
+
+def diff_entradas(historico, a, b):
+    etapas_a, etapas_b = a['etapas'], b['etapas']
+    alteradas = {
+        etapa_id: _campos_alterados(historico.objeto(etapas_a[etapa_id]), historico.objeto(h))
+        for etapa_id, h in etapas_b.items()
+        if etapa_id in etapas_a and etapas_a[etapa_id] != h
+    }
+    raiz = []
+    if a['raiz'] != b['raiz']:
+        raiz = _campos_alterados(historico.objeto(a['raiz']), historico.objeto(b['raiz']))
+
+    return {
+        'de': a['versao'],
+        'para': b['versao'],
+        'adicionadas': sorted(set(etapas_b) - set(etapas_a)),
+        'removidas': sorted(set(etapas_a) - set(etapas_b)),
+        'alteradas': alteradas,
+        'raiz': raiz,
+    }
+
+
+def operacoes_rollback(historico, fluxo_id, versao_alvo, estrutura_atual):
+    """Operações de patch que levam a estrutura atual de volta à versão alvo (só etapas alteradas)"""
+    from conectcrm_ops.patch import operacoes_para
+
+    return operacoes_para(estrutura_atual, historico.estrutura(fluxo_id, versao_alvo))
+
+
+def capturar(conn, historico, fluxo_ids=None):
+    """Registra o estado atual dos fluxos do banco; retorna quantos geraram versão nova"""
+    filtro, params = '', ()
+    if fluxo_ids:
+        filtro, params = 'WHERE id = ANY(%s::uuid[])', ([str(f) for f in fluxo_ids],)
+
+    novas = 0
+    with conn.cursor() as cursor:
+        cursor.execute(SQL_FLUXOS.format(filtro=filtro), params)
+        for fluxo_id, versao, publicado, estrutura in cursor:
+            antes = historico.entrada(fluxo_id)
+            if historico.registrar(fluxo_id, versao, estrutura, publicado=publicado) != antes:
+                novas += 1
+    conn.rollback()
+    return novas
+
+
+SQL_BACKUP_BACKEND = """
+    UPDATE fluxos_triagem
+    SET historico_versoes = COALESCE(historico_versoes, '[]'::jsonb) || jsonb_build_array(jsonb_build_object(
+            'numero', versao_atual,
+            'estrutura', estrutura,
+            'timestamp', to_jsonb(NOW()),
+            'autor', %s::text,
+            'descricao', %s::text,
+            'publicada', publicado
+        )),
+        versao_atual = versao_atual + 2
+    WHERE id = %s AND versao = %s
+"""
+
+
+def rollback(conn, historico, fluxo_id, versao_alvo, autor=None):
+    """
+    Volta o fluxo para versao_alvo gravando só as etapas diferentes (patch
+    engine, com checagem de versao). Retorna (nova_versao, operacoes).
+
+    Como o FluxoTriagem.restaurarVersao, guarda a estrutura atual em
+    historico_versoes antes de restaurar (mesma transação do patch: um
+    conflito desfaz os dois).
+    """
+    from conectcrm_ops.patch import aplicar_patches
+
+    fluxo_id = str(fluxo_id)
+    with conn.cursor() as cursor:
+        cursor.execute(SQL_FLUXOS.format(filtro='WHERE id = %s'), (fluxo_id,))
+        linha = cursor.fetchone()
+    conn.rollback()
+    if linha is None:
+        raise KeyError(f"fluxo {fluxo_id} não encontrado")
+
+    _, versao_atual, publicado, estrutura_atual = linha
+    historico.registrar(fluxo_id, versao_atual, estrutura_atual, publicado=publicado)
+
+    operacoes = operacoes_rollback(historico, fluxo_id, versao_alvo, estrutura_atual)
+    if not operacoes:
+        return versao_atual, []
+
+    with conn.cursor() as cursor:
+        cursor.execute(SQL_BACKUP_BACKEND, (
+            autor or 'Sistema',
+            f'Backup antes de restaurar versão {versao_alvo} (conectcrm_ops.historico, coluna versao)',
+            fluxo_id, versao_atual,
+        ))
+    # aplicar_patches faz o commit (ou o rollback) da transação aberta acima
+    nova_versao = aplicar_patches(conn, [{
+        'fluxo_id': fluxo_id,
+        'versao': versao_atual,
+        'operacoes': operacoes,
+    }])[fluxo_id]
+    historico.registrar(fluxo_id, nova_versao, historico.estrutura(fluxo_id, versao_alvo),
+                        evento='rollback', publicado=publicado, autor=autor)
+    return nova_versao, operacoes
+
+
+def imprimir_diff(diff):
+    print(f"🔀 Versão {diff['de']} → {diff['para']}")
+    for etapa_id in diff['adicionadas']:
+        print(f"   ➕ {etapa_id}")
+    for etapa_id in diff['removidas']:
+        print(f"   ➖ {etapa_id}")
+    for etapa_id, campos in diff['alteradas'].items():
+        print(f"   ✏️  {etapa_id}: {', '.join(campos)}")
+    if diff['raiz']:
+        print(f"   ⚙️  estrutura: {', '.join(diff['raiz'])}")
+    if not (diff['adicionadas'] or diff['removidas'] or diff['alteradas'] or diff['raiz']):
+        print("   (sem diferenças)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Histórico de versões dos fluxos de triagem')
+    parser.add_argument('--diretorio', help=f'Pasta do histórico (padrão: {DIRETORIO_PADRAO})')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p = sub.add_parser('capturar', help='Registra o estado atual dos fluxos do banco')
+    p.add_argument('fluxo', nargs='*')
+
+    p = sub.add_parser('listar', help='Lista as versões registradas de um fluxo')
+    p.add_argument('fluxo')
+
+    p = sub.add_parser('diff', help='Diferença por etapa entre duas versões')
+    p.add_argument('fluxo')
+    p.add_argument('de', type=int)
+    p.add_argument('para', type=int)
+    p.add_argument('--json', action='store_true')
+
+    p = sub.add_parser('rollback', help='Volta o fluxo para uma versão registrada')
+    p.add_argument('fluxo')
+    p.add_argument('versao', type=int)
+    p.add_argument('--autor')
+    p.add_argument('--dry-run', action='store_true', help='Só mostra as etapas que seriam reescritas')
+
+    args = parser.parse_args(argv)
+    historico = HistoricoFluxos(args.diretorio)
+
+    if args.comando == 'listar':
+        for entrada in historico.versoes(args.fluxo):
+            publicado = '' if entrada['publicado'] is None else (' 🟢' if entrada['publicado'] else ' ⚪')
+            print(f"   v{entrada['versao']:<4} {entrada['quando'][:19]} {entrada['evento']:<12}"
+                  f" {len(entrada['etapas'])} etapa(s){publicado}")
+        return 0
+
+    if args.comando == 'diff':
+        diff = historico.diff(args.fluxo, args.de, args.para)
+        if args.json:
+            print(json.dumps(diff, indent=2, ensure_ascii=False))
+        else:
+            imprimir_diff(diff)
+        return 0
+
+    from conectcrm_ops.db import conectar
+    from conectcrm_ops.patch import ConflitoVersao
+
+    conn = conectar()
+    try:
+        if args.comando == 'capturar':
+            novas = capturar(conn, historico, args.fluxo)
+            print(f"✅ {novas} versão(ões) nova(s) registrada(s) em {historico.diretorio}")
+            return 0
+
+        if args.dry_run:
+            with conn.cursor() as cursor:
+                cursor.execute(SQL_FLUXOS.format(filtro='WHERE id = %s'), (args.fluxo,))
+                _, versao_atual, _, estrutura_atual = cursor.fetchone()
+            operacoes = operacoes_rollback(historico, args.fluxo, args.versao, estrutura_atual)
+            print(f"🔎 v{versao_atual} → conteúdo da v{args.versao}: {len(operacoes)} operação(ões)")
+            for operacao in operacoes:
+                print(f"   {operacao['op']:<8} /{'/'.join(operacao['path'])}")
+            return 0
+
+        try:
+            nova_versao, operacoes = rollback(conn, historico, args.fluxo, args.versao, args.autor)
+        except ConflitoVersao as e:
+            print(f"❌ Conflito: {e}")
+            return 2
+
+        if not operacoes:
+            print(f"ℹ️  O fluxo já está com o conteúdo da versão {args.versao}")
+        else:
+            print(f"✅ Rollback para o conteúdo da v{args.versao} gravado como v{nova_versao}"
+                  f" ({len(operacoes)} operação(ões))")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+Horário de funcionamento dos núcleos
+
+Segue as regras do HorarioUtil.verificarDisponibilidade (backend/src/modules/triagem/utils/horario.util.ts),
+usado pelo findOpcoesParaBot para marcar um núcleo como disponível:
+
+- horario_funcionamento NULL: sempre aberto
+- chaves segunda..domingo com {inicio, fim}, intervalo fechado em minutos (08:00 até 18:00:59)
+- timezone do próprio JSON (padrão America/Sao_Paulo) e lista de feriados 'YYYY-MM-DD'
+- dia sem configuração (inclusive horario = {}): fechado
+
+Cada horário é compilado uma única vez em intervalos ordenados por minuto da
+semana, então "aberto em T?" e "próxima abertura" custam O(log n). Horários
+idênticos (mesmo JSON) compartilham a mesma compilação.
+
+Uso:
+    python -m conectcrm_ops.horario --empresa f47ac10b-58cc-4372-a567-0e02b2c3d479
+    python -m conectcrm_ops.horario --empresa ... --semana
+"""
+
+import argparse
+import bisect
+import functools
+import json
+import sys
+from datetime import datetime, time as dtime, timedelta, timezone as tz_utc
+from zoneinfo import ZoneInfo
+
+TIMEZONE_PADRAO = 'America/Sao_Paulo'
+
+# Mesma ordem de Date.getDay() no backend (0 = domingo)
+DIAS_SEMANA = ['domingo', 'segunda', 'terca', 'quarta', 'quinta', 'sexta', 'sabado']
+
+# Chaves do tipo HorarioFuncionamento da entidade, ignoradas pelo HorarioUtil
+CHAVES_CURTAS = {'dom', 'seg', 'ter', 'qua', 'qui', 'sex', 'sab'}
+
+MINUTOS_DIA = 24 * 60
+MINUTOS_SEMANA = 7 * MINUTOS_DIA
+
+
+def carregar_horario(horario):
+    if isinstance(horario, str):
+        return json.loads(horario) if horario.strip() else None
+    return horario
+
+
+def avisos_configuracao(horario):
+    """Problemas de formato que fazem o bot tratar o núcleo como fechado"""
+    horario = carregar_horario(horario)
+    avisos = []
+    if not isinstance(horario, dict):
+        return avisos
+    if not horario:
+        avisos.append('horario_funcionamento vazio ({}): o bot considera fechado todos os dias')
+    curtas = sorted(CHAVES_CURTAS & set(horario))
+    if curtas:
+        avisos.append(f"chaves {curtas} não são lidas pelo HorarioUtil (use segunda, terca, ...)")
+    return avisos
+
+
+def _minutos(hhmm):
+    hora, minuto = str(hhmm).split(':')[:2]
+    return int(hora) * 60 + int(minuto)
+
+
+def _dia_semana(data):
+    """0 = domingo, como Date.getDay()"""
+    return (data.weekday() + 1) % 7
+
+
+class HorarioCompilado:
+    """
+    Horário pré-processado em dois vetores ordenados (inícios e fins, em minuto
+    da semana a partir de domingo 00:00, intervalos semiabertos).
+    """
+
+    __slots__ = ('zona', 'feriados', 'inicios', 'fins', 'sempre_aberto', 'por_dia')
+
+    def __init__(self, horario):
+        horario = carregar_horario(horario)
+        self.sempre_aberto = horario is None
+        horario = horario or {}
+
+        try:
+            self.zona = ZoneInfo(horario.get('timezone') or TIMEZONE_PADRAO)
+        except Exception:
+            self.zona = ZoneInfo(TIMEZONE_PADRAO)
+
+        self.feriados = frozenset(horario.get('feriados') or [])
+        self.por_dia = [None] * 7
+
+        intervalos = []
+        for dia, nome in enumerate(DIAS_SEMANA):
+            config = horario.get(nome)
+            if not isinstance(config, dict) or not config.get('inicio') or not config.get('fim'):
+                continue
+            try:
+                inicio, fim = _minutos(config['inicio']), _minutos(config['fim']) + 1
+            except (TypeError, ValueError):
+                continue
+            self.por_dia[dia] = (config['inicio'], config['fim'])
+            if fim > inicio:
+                intervalos.append((dia * MINUTOS_DIA + inicio, dia * MINUTOS_DIA + min(fim, MINUTOS_DIA)))
+
+        intervalos.sort()
+        self.inicios = [i for i, _ in intervalos]
+        self.fins = [f for _, f in intervalos]
+
+    def local(self, quando):
+        if quando.tzinfo is None:
+            quando = quando.replace(tzinfo=tz_utc.utc)
+        return quando.astimezone(self.zona)
+
+    def _aberto_local(self, local):
+        if local.strftime('%Y-%m-%d') in self.feriados:
+            return False
+        minuto = _dia_semana(local) * MINUTOS_DIA + local.hour * 60 + local.minute
+        i = bisect.bisect_right(self.inicios, minuto) - 1
+        return i >= 0 and minuto < self.fins[i]
+
+    def esta_aberto(self, quando):
+        if self.sempre_aberto:
+            return True
+        return self._aberto_local(self.local(quando))
+
+    def verificar(self, quando):
+        """Mesmo formato de retorno do HorarioUtil.verificarDisponibilidade"""
+        if self.sempre_aberto:
+            return {'estaAberto': True, 'motivoFechado': None, 'proximaAbertura': None}
+
+        local = self.local(quando)
+        if local.strftime('%Y-%m-%d') in self.feriados:
+            return {'estaAberto': False, 'motivoFechado': 'Feriado', 'proximaAbertura': self.proxima_abertura(quando)}
+
+        if self._aberto_local(local):
+            return {'estaAberto': True, 'motivoFechado': None, 'proximaAbertura': None}
+
+        dia = _dia_semana(local)
+        if self.por_dia[dia] is None:
+            motivo = f'Fechado {DIAS_SEMANA[dia]}'
+        else:
+            motivo = f'Horário de atendimento: {self.por_dia[dia][0]} às {self.por_dia[dia][1]}'
+        return {'estaAberto': False, 'motivoFechado': motivo, 'proximaAbertura': self.proxima_abertura(quando)}
+
+    def proxima_abertura(self, quando):
+        """Próximo instante (após quando) em que o núcleo abre, pulando feriados"""
+        if self.sempre_aberto or not self.inicios:
+            return None
+
+        local = self.local(quando)
+        semana_inicio = (local - timedelta(days=_dia_semana(local))).date()
+        minuto = _dia_semana(local) * MINUTOS_DIA + local.hour * 60 + local.minute
+        i = bisect.bisect_right(self.inicios, minuto)
+
+        # Limite de busca: 2 anos de semanas cobre qualquer sequência de feriados
+        for _ in range(len(self.inicios) * 106):
+            if i == len(self.inicios):
+                i = 0
+                semana_inicio += timedelta(days=7)
+            inicio = self.inicios[i]
+            dia = semana_inicio + timedelta(days=inicio // MINUTOS_DIA)
+            if dia.isoformat() not in self.feriados:
+                resto = inicio % MINUTOS_DIA
+                return datetime.combine(dia, dtime(resto // 60, resto % 60), tzinfo=self.zona)
+            i += 1
+
+        return None
+
+    def janelas(self, inicio, fim):
+        """Janelas abertas (início, fim) entre dois instantes, em horário local"""
+        if self.sempre_aberto:
+            return [(self.local(inicio), self.local(fim))]
+
+        janelas = []
+        local_inicio, local_fim = self.local(inicio), self.local(fim)
+        dia = local_inicio.date() - timedelta(days=_dia_semana(local_inicio))
+        while dia <= local_fim.date():
+            for a, b in zip(self.inicios, self.fins):
+                data = dia + timedelta(days=a // MINUTOS_DIA)
+                if data.isoformat() in self.feriados:
+                    continue
+                abre = datetime.combine(data, dtime(0, 0), tzinfo=self.zona) + timedelta(minutes=a % MINUTOS_DIA)
+                fecha = abre + timedelta(minutes=b - a)
+                if fecha > local_inicio and abre < local_fim:
+                    janelas.append((max(abre, local_inicio), min(fecha, local_fim)))
+            dia += timedelta(days=7)
+        return janelas
+
+
+@functools.lru_cache(maxsize=65536)
+def _compilar_cache(chave):
+    return HorarioCompilado(json.loads(chave))
+
+
+def compilar(horario):
+    """Compila (com cache) um horario_funcionamento; JSON idênticos reutilizam o resultado"""
+    horario = carregar_horario(horario)
+    return _compilar_cache(json.dumps(horario, sort_keys=True))
+
+
+def verificar_disponibilidade(horario, quando=None):
+    """
+    Retorna {'estaAberto': bool, 'motivoFechado': str|None, 'proximaAbertura': datetime|None}.
+    quando: datetime com fuso (sem fuso é tratado como UTC).
+    """
+    return compilar(horario).verificar(quando or datetime.now(tz_utc.utc))
+
+
+def disponibilidade_em_lote(horarios, instantes):
+    """
+    horarios: {nucleo_id: horario_funcionamento}; instantes: lista de datetimes.
+    Retorna {nucleo_id: [bool por instante]}.
+
+    Os instantes são convertidos para minuto da semana uma vez por fuso horário,
+    e cada núcleo × instante vira uma busca binária.
+    """
+    compilados = {nucleo_id: compilar(h) for nucleo_id, h in horarios.items()}
+    por_zona = {}
+    resultado = {}
+
+    for nucleo_id, compilado in compilados.items():
+        if compilado.sempre_aberto:
+            resultado[nucleo_id] = [True] * len(instantes)
+            continue
+
+        chave = compilado.zona.key
+        if chave not in por_zona:
+            locais = [compilado.local(t) for t in instantes]
+            por_zona[chave] = [
+                (_dia_semana(l) * MINUTOS_DIA + l.hour * 60 + l.minute, l.strftime('%Y-%m-%d'))
+                for l in locais
+            ]
+
+        inicios, fins, feriados = compilado.inicios, compilado.fins, compilado.feriados
+        linha = []
+        for minuto, data in por_zona[chave]:
+            i = bisect.bisect_right(inicios, minuto) - 1
+            linha.append(i >= 0 and minuto < fins[i] and data not in feriados)
+        resultado[nucleo_id] = linha
+
+    return resultado
+
+
+def previsao_semana(horarios, inicio=None):
+    """Janelas de abertura de cada núcleo nos próximos 7 dias a partir de inicio"""
+    inicio = inicio or datetime.now(tz_utc.utc)
+    fim = inicio + timedelta(days=7)
+    return {nucleo_id: compilar(h).janelas(inicio, fim) for nucleo_id, h in horarios.items()}
+
+
+def main(argv=None):
+    from conectcrm_ops.db import conectar
+    from conectcrm_ops.opcoes_bot import buscar_opcoes_para_bot
+
+    parser = argparse.ArgumentParser(description='Verifica se os núcleos do bot estão abertos')
+    parser.add_argument('--empresa', action='append', help='ID da empresa (pode repetir; padrão: todas)')
+    parser.add_argument('--quando', help='Instante em ISO 8601 (padrão: agora)')
+    parser.add_argument('--semana', action='store_true', help='Mostra as janelas de abertura dos próximos 7 dias')
+    args = parser.parse_args(argv)
+
+    quando = datetime.fromisoformat(args.quando) if args.quando else datetime.now(tz_utc.utc)
+    if quando.tzinfo is None:
+        quando = quando.replace(tzinfo=ZoneInfo(TIMEZONE_PADRAO))
+
+    conn = conectar()
+    try:
+        with conn.cursor() as cursor:
+            empresas = buscar_opcoes_para_bot(cursor, args.empresa)
+    finally:
+        conn.close()
+
+    for empresa_id, nucleos in empresas.items():
+        print(f"\n🏢 Empresa {empresa_id}")
+        for nucleo in nucleos:
+            verificacao = verificar_disponibilidade(nucleo['horarioFuncionamento'], quando)
+            if verificacao['estaAberto']:
+                print(f"   ✅ {nucleo['nome']}: ABERTO")
+            else:
+                proxima = verificacao['proximaAbertura']
+                texto_proxima = f" | próxima abertura: {proxima.strftime('%d/%m %H:%M')}" if proxima else ''
+                print(f"   🔒 {nucleo['nome']}: FECHADO ({verificacao['motivoFechado']}){texto_proxima}")
+
+            for aviso in avisos_configuracao(nucleo['horarioFuncionamento']):
+                print(f"      ⚠️  {aviso}")
+
+            if args.semana:
+                for abre, fecha in compilar(nucleo['horarioFuncionamento']).janelas(quando, quando + timedelta(days=7)):
+                    print(f"      📅 {abre.strftime('%a %d/%m %H:%M')} → {fecha.strftime('%H:%M')}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
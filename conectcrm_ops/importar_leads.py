@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+Importação em massa de leads (layout do test-leads-import.csv) via COPY
+
+Mesmas regras do LeadsService.importFromCsv (nome obrigatório, origem fora do
+enum vira 'importacao', responsável pelo e-mail dentro da empresa, score do
+calcularScore), mas:
+
+- lê o CSV em lotes (memória não depende do tamanho do arquivo);
+- resolve responsavel_email com uma única consulta em users;
+- grava o telefone em E.164 (conectcrm_ops.telefone, por lote); números que
+  não são brasileiros válidos ficam como vieram;
+- descarta leads que já existem na empresa (ou repetidos no arquivo) pelo
+  e-mail ou pelo telefone normalizado, usando um conjunto de hashes de 8 bytes
+  carregado uma vez do banco;
+- grava cada lote com COPY e um commit, e anota no checkpoint quantas linhas
+  já foram processadas: rodar de novo continua do lote seguinte.
+
+Uso:
+    python -m conectcrm_ops.importar_leads campanha.csv --empresa f47ac10b-...
+    python -m conectcrm_ops.importar_leads campanha.csv --empresa ... --dry-run
+    python -m conectcrm_ops.importar_leads campanha.csv --empresa ... --erros rejeitados.csv
+"""
+
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import re
+import sys
+import time
+
+from conectcrm_ops.historico import gravar_atomico
+from conectcrm_ops.telefone import normalizar_lote
+
+COLUNAS_CSV = ('nome', 'email', 'telefone', 'empresa_nome', 'origem', 'observacoes', 'responsavel_email')
+
+COLUNAS_LEADS = (
+    'empresa_id', 'nome', 'email', 'telefone', 'empresa_nome', 'status', 'score',
+    'origem', 'observacoes', 'responsavel_id',
+)
+
+# OrigemLead (backend/src/modules/leads/lead.entity.ts)
+ORIGENS = {'formulario', 'importacao', 'api', 'whatsapp', 'manual', 'indicacao', 'outro'}
+ORIGEM_PADRAO = 'importacao'
+STATUS_NOVO = 'novo'
+
+TAMANHOS = {'nome': 255, 'email': 255, 'telefone': 50, 'empresa_nome': 255}
+
+LOTE_PADRAO = 5000
+
+EMAIL_REGEX = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+NAO_DIGITO = re.compile(r'\D+')
+
+SQL_RESPONSAVEIS = "SELECT lower(email), id::text FROM users WHERE empresa_id = %s AND email IS NOT NULL"
+
+SQL_LEADS_EXISTENTES = """
+    SELECT email, telefone
+    FROM leads
+    WHERE empresa_id = %s
+      AND (email IS NOT NULL OR telefone IS NOT NULL)
+"""
+
+
+def _cabecalho(nome):
+    # mesmo transformHeader do importFromCsv
+    return re.sub(r'\s+', '_', nome.strip().lower())
+
+
+def _texto(valor, campo=None):
+    valor = (valor or '').strip()
+    if not valor:
+        return None
+    limite = TAMANHOS.get(campo)
+    return valor[:limite] if limite else valor
+
+
+def normalizar_email(valor):
+    valor = (valor or '').strip().lower()
+    return valor or None
+
+
+def chave_telefone(valor, normalizado):
+    """E.164 quando válido; senão só os dígitos (ainda pega repetições exatas)"""
+    return normalizado or NAO_DIGITO.sub('', valor or '') or None
+
+
+def hash_chave(tipo, valor):
+    """Hash de 8 bytes como int: ~24 bytes por chave no conjunto em vez da string inteira"""
+    return int.from_bytes(hashlib.blake2b(f'{tipo}:{valor}'.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def chaves_lead(email, telefone):
+    """telefone: já passado por chave_telefone"""
+    chaves = []
+    if email:
+        chaves.append(hash_chave('e', email))
+    if telefone:
+        chaves.append(hash_chave('t', telefone))
+    return chaves
+
+
+def calcular_score(lead):
+    """LeadsService.calcularScore para um lead novo"""
+    score = 0
+    if lead['email']:
+        score += 25
+    if lead['telefone']:
+        score += 25
+    if lead['empresa_nome']:
+        score += 20
+    if lead['observacoes'] and len(lead['observacoes']) > 10:
+        score += 15
+    return min(score, 100)
+
+
+def preparar_lote(linhas, empresa_id, responsaveis, vistos):
+    """
+    Converte um lote de dicionários do CSV em tuplas na ordem de COLUNAS_LEADS.
+    Devolve (tuplas, duplicados, erros); erros = [(numero_linha, motivo, linha)].
+    As chaves dos leads aceitos entram em `vistos`.
+    """
+    tuplas = []
+    duplicados = 0
+    erros = []
+    normalizados = normalizar_lote([linha.get('telefone') for _, linha in linhas])
+    for (numero, linha), normalizado in zip(linhas, normalizados):
+        nome = _texto(linha.get('nome'), 'nome')
+        if not nome:
+            erros.append((numero, 'Nome é obrigatório', linha))
+            continue
+
+        email = normalizar_email(linha.get('email'))
+        if email and not EMAIL_REGEX.match(email):
+            erros.append((numero, f'E-mail inválido: {email}', linha))
+            continue
+        if email:
+            email = email[:TAMANHOS['email']]
+        telefone = normalizado or _texto(linha.get('telefone'), 'telefone')
+
+        chaves = chaves_lead(email, chave_telefone(telefone, normalizado))
+        if any(chave in vistos for chave in chaves):
+            duplicados += 1
+            continue
+        vistos.update(chaves)
+
+        origem = (linha.get('origem') or '').strip().lower()
+        lead = {
+            'email': email,
+            'telefone': telefone,
+            'empresa_nome': _texto(linha.get('empresa_nome'), 'empresa_nome'),
+            'observacoes': _texto(linha.get('observacoes')),
+        }
+        tuplas.append((
+            empresa_id,
+            nome,
+            email,
+            telefone,
+            lead['empresa_nome'],
+            STATUS_NOVO,
+            calcular_score(lead),
+            origem if origem in ORIGENS else ORIGEM_PADRAO,
+            lead['observacoes'],
+            responsaveis.get(normalizar_email(linha.get('responsavel_email'))),
+        ))
+    return tuplas, duplicados, erros
+
+
+def ler_csv(caminho, pular=0):
+    """Gera (numero_da_linha, dict) a partir da linha de dados `pular` + 1"""
+    with open(caminho, 'r', encoding='utf-8-sig', newline='') as f:
+        leitor = csv.reader(f)
+        cabecalho = [_cabecalho(c) for c in next(leitor)]
+        faltando = [c for c in ('nome',) if c not in cabecalho]
+        if faltando:
+            raise ValueError(f'{caminho}: coluna obrigatória ausente: {", ".join(faltando)}')
+        for i, valores in enumerate(itertools.islice(leitor, pular, None), start=pular + 2):
+            if not any(v.strip() for v in valores):
+                continue
+            yield i, dict(zip(cabecalho, valores))
+
+
+# ----------------------------------------------------------------------
+# Checkpoint
+# ----------------------------------------------------------------------
+
+def _identidade_arquivo(caminho):
+    info = os.stat(caminho)
+    return {'caminho': os.path.abspath(caminho), 'tamanho': info.st_size, 'modificadoEm': info.st_mtime}
+
+
+def carregar_checkpoint(caminho_checkpoint, caminho_csv, empresa_id):
+    if not os.path.exists(caminho_checkpoint):
+        return None
+    with open(caminho_checkpoint, 'r', encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('arquivo') != _identidade_arquivo(caminho_csv) or checkpoint.get('empresaId') != empresa_id:
+        raise ValueError(f'{caminho_checkpoint} é de outro arquivo/empresa (ou o CSV mudou); '
+                         f'apague o checkpoint para recomeçar')
+    return checkpoint
+
+
+def salvar_checkpoint(caminho_checkpoint, caminho_csv, empresa_id, totais):
+    checkpoint = {'arquivo': _identidade_arquivo(caminho_csv), 'empresaId': empresa_id, **totais}
+    gravar_atomico(caminho_checkpoint, json.dumps(checkpoint, ensure_ascii=False, indent=2))
+
+
+# ----------------------------------------------------------------------
+# Banco
+# ----------------------------------------------------------------------
+
+def carregar_responsaveis(cursor, empresa_id):
+    cursor.execute(SQL_RESPONSAVEIS, (empresa_id,))
+    return dict(cursor.fetchall())
+
+
+def carregar_existentes(conn, empresa_id):
+    from conectcrm_ops.db import ler_em_fluxo
+
+    vistos = set()
+    linhas = ler_em_fluxo(conn, SQL_LEADS_EXISTENTES, (empresa_id,), itersize=20000)
+    while True:
+        bloco = list(itertools.islice(linhas, 20000))
+        if not bloco:
+            break
+        normalizados = normalizar_lote([telefone for _, telefone in bloco])
+        for (email, telefone), normalizado in zip(bloco, normalizados):
+            vistos.update(chaves_lead(normalizar_email(email), chave_telefone(telefone, normalizado)))
+    return vistos
+
+
+def importar(conn, caminho, empresa_id, lote=LOTE_PADRAO, checkpoint=None, dry_run=False, erros_csv=None):
+    from conectcrm_ops.db import copiar_para_tabela
+
+    anterior = None if dry_run or not checkpoint else carregar_checkpoint(checkpoint, caminho, empresa_id)
+    totais = {'linhas': 0, 'importados': 0, 'duplicados': 0, 'erros': 0}
+    if anterior:
+        totais = {chave: anterior[chave] for chave in totais}
+        print(f"↪️  Retomando depois da linha de dados {totais['linhas']}")
+
+    with conn.cursor() as cursor:
+        responsaveis = carregar_responsaveis(cursor, empresa_id)
+    vistos = carregar_existentes(conn, empresa_id)
+    conn.commit()
+    print(f"👥 {len(responsaveis)} responsável(is) | 🔑 {len(vistos)} chave(s) de leads existentes")
+
+    escritor_erros = None
+    arquivo_erros = None
+    if erros_csv:
+        novo = not os.path.exists(erros_csv) or not anterior
+        arquivo_erros = open(erros_csv, 'w' if novo else 'a', encoding='utf-8', newline='')
+        escritor_erros = csv.writer(arquivo_erros)
+        if novo:
+            escritor_erros.writerow(('linha', 'erro') + COLUNAS_CSV)
+
+    linhas = ler_csv(caminho, pular=totais['linhas'])
+    try:
+        while True:
+            bloco = list(itertools.islice(linhas, lote))
+            if not bloco:
+                break
+            tuplas, duplicados, erros = preparar_lote(bloco, empresa_id, responsaveis, vistos)
+
+            if not dry_run and tuplas:
+                with conn.cursor() as cursor:
+                    copiar_para_tabela(cursor, 'leads', COLUNAS_LEADS, tuplas)
+                conn.commit()
+
+            totais['linhas'] = bloco[-1][0] - 1
+            totais['importados'] += len(tuplas)
+            totais['duplicados'] += duplicados
+            totais['erros'] += len(erros)
+            if escritor_erros:
+                for numero, motivo, linha in erros:
+                    escritor_erros.writerow((numero, motivo) + tuple(linha.get(c, '') for c in COLUNAS_CSV))
+                arquivo_erros.flush()
+            if checkpoint and not dry_run:
+                salvar_checkpoint(checkpoint, caminho, empresa_id, totais)
+            print(f"   … linha {bloco[-1][0]}: {totais['importados']} importado(s), "
+                  f"{totais['duplicados']} duplicado(s), {totais['erros']} erro(s)")
+    finally:
+        if arquivo_erros:
+            arquivo_erros.close()
+    return totais
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Importação em massa de leads via COPY')
+    parser.add_argument('arquivo', help='CSV no layout do test-leads-import.csv')
+    parser.add_argument('--empresa', required=True, help='ID da empresa dona dos leads')
+    parser.add_argument('--lote', type=int, default=LOTE_PADRAO, help=f'Linhas por COPY/commit (padrão: {LOTE_PADRAO})')
+    parser.add_argument('--checkpoint', help='Arquivo de checkpoint (padrão: <arquivo>.checkpoint.json)')
+    parser.add_argument('--erros', help='Grava as linhas rejeitadas neste CSV')
+    parser.add_argument('--dry-run', action='store_true', help='Valida e deduplica sem gravar')
+    args = parser.parse_args(argv)
+
+    from conectcrm_ops.db import conectar
+
+    checkpoint = args.checkpoint or f'{args.arquivo}.checkpoint.json'
+    inicio = time.perf_counter()
+    conn = conectar()
+    try:
+        totais = importar(conn, args.arquivo, args.empresa, args.lote, checkpoint, args.dry_run, args.erros)
+    finally:
+        conn.close()
+
+    duracao = time.perf_counter() - inicio
+    print(f"\n{'🔎 Simulação' if args.dry_run else '✅ Importação'} concluída em {duracao:.1f}s")
+    print(f"   Importados: {totais['importados']}")
+    print(f"   Duplicados: {totais['duplicados']}")
+    print(f"   Erros:      {totais['erros']}")
+    return 1 if totais['erros'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
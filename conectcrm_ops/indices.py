@@ -0,0 +1,1170 @@
+# -*- coding: utf-8 -*-
+"""
+Sugestão de índices a partir das consultas que realmente rodam
+
+Lê SQL de três fontes:
+    - arquivos .py (scripts da raiz e conectcrm_ops): strings com SELECT/UPDATE/
+      DELETE, incluindo modelos montados com CONSTANTE.format(filtro='AND ...');
+    - arquivos .sql (comandos separados por ";");
+    - dumps do pg_stat_statements em CSV ou JSON (colunas query, calls e
+      mean_exec_time/total_exec_time), usados como peso de cada consulta.
+
+Cada bloco SELECT (subconsultas e CTEs incluídas) vira uma "forma" por tabela:
+igualdades, predicados constantes (ativo, visivel_no_bot = true...), faixas,
+ORDER BY e operadores JSONB. Cada forma gera candidatos: composto
+(igualdades + ordenação), parcial (WHERE com os predicados constantes), de
+expressão (estrutura->'etapas'->>...) e GIN (@>, ?). Candidatos já cobertos por
+um índice existente (migrations do backend ou, com --medir, o próprio banco) são
+descartados.
+
+Com --medir, cada candidato é criado dentro de uma transação no schema semeado
+pelo benchmark (python -m conectcrm_ops.benchmark semear), as consultas que o
+motivaram rodam com parâmetros sorteados das próprias tabelas antes e depois
+(EXPLAIN ANALYZE), e tudo é desfeito com ROLLBACK. O ranking final vira SQL de
+migration (--sql) ou uma migration TypeORM (--migracao).
+
+Uso:
+    python -m conectcrm_ops.indices
+    python -m conectcrm_ops.indices pg_stat_statements.csv --tabela nucleos_atendimento --tabela departamentos
+    python -m conectcrm_ops.indices --medir --sql indices-sugeridos.sql
+    python -m conectcrm_ops.indices --medir --migracao backend/src/migrations
+"""
+
+import argparse
+import ast
+import csv
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIGRATIONS = os.path.join(RAIZ, 'backend', 'src', 'migrations')
+LIMITE_NOME = 63
+AMOSTRAS = 20
+GANHO_MINIMO = 0.05
+
+TOKEN_REGEX = re.compile(r"""
+      (?P<espaco>\s+)
+    | (?P<comentario>--[^\n]*|/\*.*?\*/)
+    | (?P<texto>'(?:[^']|'')*')
+    | (?P<citado>"(?:[^"]|"")+")
+    | (?P<param>%\(\w+\)s|%s|\$\d+)
+    | (?P<numero>\d+(?:\.\d+)?)
+    | (?P<palavra>[A-Za-z_][\w$]*)
+    | (?P<op>->>|->|\#>>|\#>|@>|<@|\?\||\?&|::|<=|>=|<>|!=|\|\||%%|[=<>?(),.;*+\-/%\[\]:{}])
+    | (?P<outro>.)
+""", re.X | re.S)
+
+COMANDOS = {'SELECT', 'WITH', 'UPDATE', 'DELETE'}
+CLAUSULAS = {
+    'SELECT', 'FROM', 'WHERE', 'HAVING', 'LIMIT', 'OFFSET', 'RETURNING', 'SET', 'WITH',
+    'ON', 'USING', 'UPDATE', 'DELETE', 'FOR', 'WINDOW', 'VALUES',
+}
+MODIFICADORES_JOIN = {'LEFT', 'RIGHT', 'FULL', 'INNER', 'CROSS', 'OUTER', 'NATURAL', 'LATERAL'}
+OPERACOES_CONJUNTO = {'UNION', 'EXCEPT', 'INTERSECT'}
+COMPARACOES = {'=', '<', '>', '<=', '>=', '<>', '!=', '@>', '?', '?|', '?&'}
+OPERADORES_JSON = {'->', '->>', '#>', '#>>'}
+FAIXAS = {'<', '>', '<=', '>='}
+RESERVADAS = CLAUSULAS | MODIFICADORES_JOIN | OPERACOES_CONJUNTO | {
+    'JOIN', 'AS', 'AND', 'OR', 'NOT', 'GROUP', 'ORDER', 'BY', 'ASC', 'DESC', 'NULLS',
+    'FIRST', 'LAST', 'IS', 'NULL', 'IN', 'BETWEEN', 'LIKE', 'ILIKE', 'ANY', 'ALL',
+    'TRUE', 'FALSE', 'CASE', 'WHEN', 'THEN', 'ELSE', 'END', 'DISTINCT', 'INTO',
+}
+
+
+class Token:
+    __slots__ = ('tipo', 'valor', 'param', 'citado')
+
+    def __init__(self, tipo, valor, param=None, citado=False):
+        self.tipo = tipo
+        self.valor = valor
+        self.param = param
+        self.citado = citado
+
+    def palavra(self, *valores):
+        return self.tipo == 'palavra' and not self.citado and self.valor.upper() in valores
+
+    def identificador(self):
+        """Nome como o Postgres resolve: minúsculo, salvo se veio entre aspas ("empresaId")"""
+        return self.valor if self.citado else self.valor.lower()
+
+    def __repr__(self):
+        return self.valor
+
+
+class Grupo(list):
+    """Tokens entre parênteses"""
+
+    def subconsulta(self):
+        return bool(self) and isinstance(self[0], Token) and self[0].palavra('SELECT', 'WITH')
+
+
+# ----------------------------------------------------------------------
+# Fontes de SQL
+# ----------------------------------------------------------------------
+
+class Consulta:
+    """Comando SQL com o peso (chamadas x tempo) e de onde veio"""
+
+    __slots__ = ('sql', 'origem', 'chamadas', 'media_ms', 'estilo')
+
+    def __init__(self, sql, origem, chamadas=1, media_ms=None, estilo='python'):
+        self.sql = sql
+        self.origem = origem
+        self.chamadas = chamadas
+        self.media_ms = media_ms
+        self.estilo = estilo
+
+    @property
+    def peso(self):
+        return self.chamadas * (self.media_ms if self.media_ms is not None else 1.0)
+
+
+def parece_sql(texto):
+    return bool(re.match(r'\s*(?:SELECT|WITH|UPDATE|DELETE)\b', texto, re.I)) and bool(
+        re.search(r'\b(?:FROM|UPDATE)\b', texto, re.I)
+    )
+
+
+def consultas_de_python(caminho):
+    """Strings SQL de um .py, resolvendo NOME.format(chave='...') de constantes do módulo"""
+    with open(caminho, 'r', encoding='utf-8') as arquivo:
+        try:
+            arvore = ast.parse(arquivo.read(), caminho)
+        except SyntaxError:
+            return []
+
+    constantes = {}
+    for no in arvore.body:
+        if isinstance(no, ast.Assign) and isinstance(no.value, ast.Constant) and isinstance(no.value.value, str):
+            for alvo in no.targets:
+                if isinstance(alvo, ast.Name):
+                    constantes[alvo.id] = no.value.value
+
+    textos = []
+    for no in ast.walk(arvore):
+        if isinstance(no, ast.Constant) and isinstance(no.value, str):
+            textos.append(no.value)
+        elif (
+            isinstance(no, ast.Call) and isinstance(no.func, ast.Attribute) and no.func.attr == 'format'
+            and isinstance(no.func.value, ast.Name) and no.func.value.id in constantes
+        ):
+            valores = {
+                k.arg: k.value.value for k in no.keywords
+                if k.arg and isinstance(k.value, ast.Constant) and isinstance(k.value.value, str)
+            }
+            try:
+                textos.append(constantes[no.func.value.id].format(**valores))
+            except (KeyError, IndexError, ValueError):
+                pass
+
+    origem = os.path.relpath(caminho, RAIZ)
+    vistos = set()
+    resultado = []
+    for texto in textos:
+        # Modelos com {placeholder} só entram já formatados
+        if not parece_sql(texto) or re.search(r'\{\w+\}', texto):
+            continue
+        chave = ' '.join(texto.split())
+        if chave not in vistos:
+            vistos.add(chave)
+            resultado.append(Consulta(texto, origem))
+    return resultado
+
+
+def consultas_de_sql(caminho):
+    with open(caminho, 'r', encoding='utf-8') as arquivo:
+        comandos = arquivo.read().split(';')
+    origem = os.path.relpath(caminho, RAIZ)
+    return [Consulta(c, origem, estilo='postgres') for c in comandos if parece_sql(c)]
+
+
+def consultas_de_pg_stat(caminho):
+    """Dump do pg_stat_statements (\\copy ... CSV HEADER ou json_agg)"""
+    if caminho.endswith('.json'):
+        with open(caminho, 'r', encoding='utf-8') as arquivo:
+            linhas = json.load(arquivo)
+    else:
+        with open(caminho, 'r', encoding='utf-8', newline='') as arquivo:
+            linhas = list(csv.DictReader(arquivo))
+
+    origem = os.path.basename(caminho)
+    resultado = []
+    for linha in linhas:
+        texto = linha.get('query') or ''
+        if not parece_sql(texto):
+            continue
+        chamadas = int(float(linha.get('calls') or 1))
+        media = linha.get('mean_exec_time') or linha.get('mean_time')
+        if media in (None, '') and linha.get('total_exec_time') not in (None, ''):
+            media = float(linha['total_exec_time']) / max(chamadas, 1)
+        resultado.append(Consulta(
+            texto, origem, chamadas, float(media) if media not in (None, '') else None, estilo='postgres'
+        ))
+    return resultado
+
+
+def carregar_consultas(caminhos):
+    if not caminhos:
+        caminhos = sorted(glob.glob(os.path.join(RAIZ, '*.py'))) + sorted(
+            glob.glob(os.path.join(RAIZ, 'conectcrm_ops', '*.py'))
+        )
+
+    consultas = []
+    for caminho in caminhos:
+        if os.path.isdir(caminho):
+            consultas.extend(carregar_consultas(sorted(glob.glob(os.path.join(caminho, '*.py')))))
+        elif caminho.endswith('.py'):
+            consultas.extend(consultas_de_python(caminho))
+        elif caminho.endswith('.sql'):
+            consultas.extend(consultas_de_sql(caminho))
+        else:
+            consultas.extend(consultas_de_pg_stat(caminho))
+    return consultas
+
+
+# ----------------------------------------------------------------------
+# Análise
+# ----------------------------------------------------------------------
+
+def tokenizar(sql):
+    """Tokens com a chave de parâmetro de cada placeholder (%s na ordem, $N, %(nome)s)"""
+    tokens = []
+    posicional = 0
+    for match in TOKEN_REGEX.finditer(sql):
+        tipo = match.lastgroup
+        valor = match.group()
+        if tipo in ('espaco', 'comentario'):
+            continue
+        citado = tipo == 'citado'
+        if citado:
+            tipo, valor = 'palavra', valor[1:-1].replace('""', '"')
+        param = None
+        if tipo == 'param':
+            if valor == '%s':
+                posicional += 1
+                param = f'p{posicional}'
+            elif valor.startswith('$'):
+                param = f'p{valor[1:]}'
+            else:
+                param = valor[2:-2]
+        tokens.append(Token(tipo, valor, param, citado))
+    return tokens
+
+
+def agrupar(tokens):
+    raiz = Grupo()
+    pilha = [raiz]
+    for token in tokens:
+        if token.valor == '(':
+            grupo = Grupo()
+            pilha[-1].append(grupo)
+            pilha.append(grupo)
+        elif token.valor == ')':
+            if len(pilha) > 1:
+                pilha.pop()
+        elif token.valor != ';':
+            pilha[-1].append(token)
+    return raiz
+
+
+def texto_de(itens):
+    partes = []
+    for item in itens:
+        if isinstance(item, Grupo):
+            partes.append('(' + texto_de(item) + ')')
+        else:
+            partes.append(item.valor)
+    texto = ' '.join(partes)
+    return re.sub(r'\s*(::|\.)\s*', r'\1', texto).replace('( ', '(').replace(' )', ')').replace(' , ', ', ')
+
+
+def dividir(itens, separador):
+    """Divide no separador de nível superior (',' ou palavra como AND), respeitando BETWEEN x AND y"""
+    partes, atual, entre = [], [], False
+    for item in itens:
+        if isinstance(item, Token):
+            if item.palavra('BETWEEN'):
+                entre = True
+            elif (item.palavra(separador) or item.valor == separador) and not (separador == 'AND' and entre):
+                partes.append(atual)
+                atual = []
+                continue
+            elif item.palavra('AND') and entre:
+                entre = False
+        atual.append(item)
+    partes.append(atual)
+    return [p for p in partes if p]
+
+
+def segmentar(itens):
+    """[(cláusula, itens)] no nível superior de um bloco"""
+    segmentos = []
+    atual, nome = [], None
+    i = 0
+    while i < len(itens):
+        item = itens[i]
+        proximo = itens[i + 1] if i + 1 < len(itens) else None
+        if isinstance(item, Token) and item.tipo == 'palavra':
+            chave = item.valor.upper()
+            if chave in ('GROUP', 'ORDER') and isinstance(proximo, Token) and proximo.palavra('BY'):
+                segmentos.append((nome, atual))
+                nome, atual = f'{chave} BY', []
+                i += 2
+                continue
+            if chave in MODIFICADORES_JOIN or chave == 'JOIN':
+                j = i
+                while j < len(itens) and isinstance(itens[j], Token) and itens[j].palavra(*MODIFICADORES_JOIN):
+                    j += 1
+                if j < len(itens) and isinstance(itens[j], Token) and itens[j].palavra('JOIN'):
+                    segmentos.append((nome, atual))
+                    nome, atual = 'JOIN', []
+                    i = j + 1
+                    continue
+            if chave in OPERACOES_CONJUNTO:
+                segmentos.append((nome, atual))
+                segmentos.append(('CONJUNTO', itens[i + 1:]))
+                return segmentos
+            if chave in CLAUSULAS and not (chave == 'FROM' and nome == 'DELETE' and not atual):
+                segmentos.append((nome, atual))
+                nome, atual = chave, []
+                i += 1
+                continue
+        atual.append(item)
+        i += 1
+    segmentos.append((nome, atual))
+    return [(n, s) for n, s in segmentos if n is not None]
+
+
+def subconsultas(itens):
+    for item in itens:
+        if isinstance(item, Grupo):
+            if item.subconsulta():
+                yield item
+            else:
+                yield from subconsultas(item)
+
+
+class Forma:
+    """O que um bloco pede de uma tabela"""
+
+    def __init__(self, tabela):
+        self.tabela = tabela
+        self.igualdades = []
+        self.constantes = []
+        self.faixas = []
+        self.ordem = []
+        self.gin = []
+        self.parametros = {}
+        self.limite = []
+
+    def adicionar(self, lista, valor):
+        if valor not in lista:
+            lista.append(valor)
+
+    def vazia(self):
+        return not (self.igualdades or self.faixas or self.ordem or self.gin)
+
+
+class Bloco:
+    def __init__(self):
+        self.aliases = {}
+        self.ctes = set()
+        self.formas = {}
+
+    def forma(self, tabela):
+        if tabela not in self.formas:
+            self.formas[tabela] = Forma(tabela)
+        return self.formas[tabela]
+
+    def tabela_unica(self):
+        tabelas = set(self.aliases.values())
+        return next(iter(tabelas)) if len(tabelas) == 1 else None
+
+    def resolver(self, alias):
+        if alias is None:
+            return self.tabela_unica()
+        return self.aliases.get(alias.lower())
+
+
+def ler_referencias(bloco, itens):
+    """FROM/JOIN/UPDATE/USING: tabela [AS] alias, ..."""
+    for parte in dividir(itens, ','):
+        if isinstance(parte[0], Grupo):
+            continue
+        if not (isinstance(parte[0], Token) and parte[0].tipo == 'palavra'):
+            continue
+        nomes = [parte[0].identificador()]
+        k = 1
+        while k + 1 < len(parte) and isinstance(parte[k], Token) and parte[k].valor == '.':
+            nomes.append(parte[k + 1].identificador())
+            k += 2
+        if k < len(parte) and isinstance(parte[k], Grupo):
+            continue  # função (generate_series, unnest...)
+        tabela = nomes[-1]
+        if tabela.lower() in bloco.ctes or tabela.upper() in RESERVADAS:
+            continue
+        if k < len(parte) and isinstance(parte[k], Token) and parte[k].palavra('AS'):
+            k += 1
+        alias = tabela
+        if k < len(parte) and isinstance(parte[k], Token) and parte[k].tipo == 'palavra' \
+                and parte[k].valor.upper() not in RESERVADAS:
+            alias = parte[k].valor.lower()
+        bloco.aliases[alias] = tabela
+        bloco.aliases.setdefault(tabela, tabela)
+
+
+def ler_coluna(itens):
+    """
+    (alias, coluna, expressao) de "col", "a.col", "a.col->'x'->>'y'" ou com
+    ::tipo no fim; expressao é None quando é a coluna pura.
+    """
+    if not itens or not isinstance(itens[0], Token) or itens[0].tipo != 'palavra':
+        return None
+    if not itens[0].citado and itens[0].valor.upper() in RESERVADAS:
+        return None
+
+    alias, coluna, k = None, itens[0].identificador(), 1
+    if k + 1 < len(itens) and isinstance(itens[k], Token) and itens[k].valor == '.':
+        alias, coluna, k = coluna.lower(), itens[k + 1].identificador(), k + 2
+
+    caminho = []
+    while k + 1 < len(itens) and isinstance(itens[k], Token) and itens[k].valor in OPERADORES_JSON:
+        if not isinstance(itens[k + 1], Token) or itens[k + 1].tipo not in ('texto', 'numero'):
+            return None
+        caminho.append(f'{itens[k].valor} {itens[k + 1].valor}')
+        k += 2
+
+    resto = itens[k:]
+    if resto and not (isinstance(resto[0], Token) and resto[0].valor == '::'):
+        return None
+
+    expressao = f"({coluna} {' '.join(caminho)})" if caminho else None
+    return alias, coluna, expressao
+
+
+def parametro_de(itens):
+    """Chave do placeholder em "%s", "%s::uuid", "ANY(%s::uuid[])"; tipo escalar/lista"""
+    if itens and isinstance(itens[0], Token) and itens[0].tipo == 'param':
+        if all(isinstance(i, Token) and (i.valor in ('::', '[', ']') or i.tipo == 'palavra') for i in itens[1:]):
+            return itens[0].param, 'escalar'
+    if len(itens) == 2 and isinstance(itens[0], Token) and itens[0].palavra('ANY') and isinstance(itens[1], Grupo):
+        interno = parametro_de(list(itens[1]))
+        if interno:
+            return interno[0], 'lista'
+    return None
+
+
+def literal(itens):
+    if len(itens) >= 1 and isinstance(itens[0], Token) and (
+        itens[0].tipo in ('texto', 'numero') or itens[0].palavra('TRUE', 'FALSE')
+    ):
+        return all(isinstance(i, Token) and (i.valor == '::' or i.tipo == 'palavra') for i in itens[1:])
+    return False
+
+
+def normalizar_literal(itens):
+    return ' '.join(
+        i.valor.lower() if isinstance(i, Token) and i.palavra('TRUE', 'FALSE') else
+        i.valor.upper() if isinstance(i, Token) and i.palavra('NOT', 'NULL') else texto_de([i])
+        for i in itens
+    ).replace(' :: ', '::')
+
+
+def ler_predicado(bloco, itens):
+    if len(itens) == 1 and isinstance(itens[0], Grupo) and not itens[0].subconsulta():
+        for parte in dividir(list(itens[0]), 'AND'):
+            ler_predicado(bloco, parte)
+        return
+    if any(isinstance(i, Token) and i.palavra('OR') for i in itens):
+        return
+
+    negado = bool(itens) and isinstance(itens[0], Token) and itens[0].palavra('NOT')
+    coluna = ler_coluna(itens[1:] if negado else itens)
+    if coluna and coluna[2] is None:
+        # Coluna booleana sozinha: "AND n.ativo"
+        tabela = bloco.resolver(coluna[0])
+        if tabela:
+            bloco.forma(tabela).adicionar(
+                bloco.forma(tabela).constantes, f"{coluna[1]} = {'false' if negado else 'true'}"
+            )
+        return
+
+    posicao = next((
+        i for i, item in enumerate(itens)
+        if isinstance(item, Token) and (item.valor in COMPARACOES or item.palavra('IS', 'IN', 'BETWEEN'))
+    ), None)
+    if posicao is None:
+        return
+
+    esquerda, operador, direita = itens[:posicao], itens[posicao], itens[posicao + 1:]
+    op = operador.valor.upper()
+
+    # %s = ANY(coluna_array): só para sortear o parâmetro, btree não ajuda
+    if len(esquerda) == 1 and isinstance(esquerda[0], Token) and esquerda[0].tipo == 'param' and op == '=':
+        if len(direita) == 2 and isinstance(direita[0], Token) and direita[0].palavra('ANY') \
+                and isinstance(direita[1], Grupo):
+            interna = ler_coluna(list(direita[1]))
+            tabela = interna and bloco.resolver(interna[0])
+            if tabela:
+                bloco.forma(tabela).parametros[esquerda[0].param] = (interna[1], 'elemento')
+        return
+
+    coluna = ler_coluna(esquerda)
+    if not coluna:
+        return
+    alias, nome, expressao = coluna
+    tabela = bloco.resolver(alias)
+    if not tabela:
+        return
+    forma = bloco.forma(tabela)
+    chave = expressao or nome
+
+    if op == '=':
+        parametro = parametro_de(direita)
+        if parametro:
+            forma.adicionar(forma.igualdades, chave)
+            forma.parametros[parametro[0]] = (chave, parametro[1])
+        elif literal(direita):
+            if expressao:
+                forma.adicionar(forma.igualdades, chave)
+            else:
+                forma.adicionar(forma.constantes, f'{nome} = {normalizar_literal(direita)}')
+        else:
+            outra = ler_coluna(direita)
+            outra_tabela = outra and bloco.resolver(outra[0])
+            if outra_tabela and outra_tabela != tabela:
+                forma.adicionar(forma.igualdades, chave)
+                if outra[2] is None:
+                    bloco.forma(outra_tabela).adicionar(bloco.forma(outra_tabela).igualdades, outra[1])
+    elif op == 'IS':
+        if not expressao:
+            forma.adicionar(forma.constantes, f'{nome} IS {normalizar_literal(direita)}')
+    elif op == 'IN' and direita and isinstance(direita[0], Grupo) and not direita[0].subconsulta():
+        valores = dividir(list(direita[0]), ',')
+        if valores and all(literal(v) for v in valores) and not expressao:
+            forma.adicionar(forma.constantes, f'{nome} IN {texto_de(direita)}')
+        else:
+            forma.adicionar(forma.igualdades, chave)
+    elif op in FAIXAS or op == 'BETWEEN':
+        forma.adicionar(forma.faixas, chave)
+        for parte in dividir(direita, 'AND'):
+            parametro = parametro_de(parte)
+            if parametro:
+                forma.parametros[parametro[0]] = (chave, 'escalar')
+    elif op == '@>' and not expressao:
+        forma.adicionar(forma.gin, (nome, 'jsonb_path_ops'))
+    elif op in ('?', '?|', '?&') and not expressao:
+        forma.adicionar(forma.gin, (nome, None))
+
+
+def ler_ordem(bloco, itens):
+    ordem = []
+    for parte in dividir(itens, ','):
+        desc = any(isinstance(i, Token) and i.palavra('DESC') for i in parte)
+        corte = next((k for k, i in enumerate(parte) if isinstance(i, Token) and i.palavra('ASC', 'DESC', 'NULLS')),
+                     len(parte))
+        coluna = ler_coluna(parte[:corte])
+        tabela = coluna and bloco.resolver(coluna[0])
+        if not tabela:
+            return
+        ordem.append((tabela, coluna[2] or coluna[1], desc))
+
+    # Só ajuda quando toda a ordenação vem da mesma tabela
+    if ordem and len({t for t, _, _ in ordem}) == 1:
+        forma = bloco.forma(ordem[0][0])
+        forma.ordem = [(c, d) for _, c, d in ordem]
+
+
+def analisar_bloco(itens, ctes=None):
+    """Formas de um bloco e de todas as subconsultas dentro dele"""
+    bloco = Bloco()
+    bloco.ctes = set(ctes or ())
+    formas = []
+    segmentos = segmentar(itens)
+
+    for nome, parte in segmentos:
+        if nome == 'WITH':
+            for definicao in dividir(parte, ','):
+                if definicao and isinstance(definicao[0], Token):
+                    bloco.ctes.add(definicao[0].valor.lower())
+        elif nome == 'CONJUNTO':
+            formas.extend(analisar_bloco(parte, bloco.ctes))
+
+    for nome, parte in segmentos:
+        if nome in ('FROM', 'JOIN', 'UPDATE', 'USING', 'DELETE'):
+            ler_referencias(bloco, parte)
+
+    for nome, parte in segmentos:
+        if nome in ('WHERE', 'ON'):
+            for predicado in dividir(parte, 'AND'):
+                ler_predicado(bloco, predicado)
+        elif nome == 'ORDER BY':
+            ler_ordem(bloco, parte)
+        elif nome == 'LIMIT':
+            for item in parte:
+                if isinstance(item, Token) and item.tipo == 'param':
+                    tabela = bloco.tabela_unica()
+                    if tabela:
+                        bloco.forma(tabela).limite.append(item.param)
+
+    for nome, parte in segmentos:
+        if nome != 'CONJUNTO':
+            for sub in subconsultas(parte):
+                formas.extend(analisar_bloco(list(sub), bloco.ctes))
+
+    formas.extend(f for f in bloco.formas.values() if not f.vazia())
+    return formas
+
+
+def analisar(sql):
+    return analisar_bloco(list(agrupar(tokenizar(sql))))
+
+
+# ----------------------------------------------------------------------
+# Candidatos
+# ----------------------------------------------------------------------
+
+def citar(nome):
+    return '"' + nome.replace('"', '""') + '"'
+
+
+def citar_coluna(texto):
+    """Põe aspas na coluna que abre "col DESC", "(col ->> 'x')", "col IS NULL"..."""
+    return re.sub(r'^(\(?)([^\s()]+)', lambda m: m.group(1) + citar(m.group(2)), texto, count=1)
+
+
+class Candidato:
+    def __init__(self, tabela, colunas, predicado=None, metodo='btree'):
+        self.tabela = tabela
+        self.colunas = colunas
+        self.predicado = predicado
+        self.metodo = metodo
+        self.consultas = []
+        self.medicao = None
+
+    @property
+    def chave(self):
+        return (self.tabela, self.metodo, tuple(self.colunas), self.predicado or '')
+
+    @property
+    def tipo(self):
+        if self.metodo == 'gin':
+            return 'gin'
+        if any(c.startswith('(') for c in self.colunas):
+            return 'expressão'
+        if self.predicado:
+            return 'parcial'
+        return 'composto' if len(self.colunas) > 1 else 'simples'
+
+    @property
+    def peso(self):
+        return sum(c.peso for c in self.consultas)
+
+    def nome(self):
+        partes = []
+        for coluna in self.colunas:
+            base = re.sub(r'\W+', '_', coluna.split()[0] if not coluna.startswith('(') else coluna).strip('_')
+            partes.append(base[-24:])
+        sufixo = '_parcial' if self.predicado else ''
+        nome = f"idx_{self.tabela}_{'_'.join(partes)}{sufixo}".lower()
+        if len(nome) > LIMITE_NOME:
+            resumo = hashlib.md5(repr(self.chave).encode('utf-8')).hexdigest()[:8]
+            nome = nome[:LIMITE_NOME - 9] + '_' + resumo
+        return nome
+
+    def sql(self, concorrente=False, nome_tabela=None):
+        colunas = ', '.join(citar_coluna(c) for c in self.colunas)
+        usando = f' USING {self.metodo}' if self.metodo != 'btree' else ''
+        predicado = self.predicado and ' AND '.join(citar_coluna(p) for p in self.predicado.split(' AND '))
+        onde = f' WHERE {predicado}' if predicado else ''
+        concorrentemente = 'CONCURRENTLY ' if concorrente else ''
+        return (
+            f'CREATE INDEX {concorrentemente}IF NOT EXISTS "{self.nome()}" '
+            f'ON "{nome_tabela or self.tabela}"{usando} ({colunas}){onde}'
+        )
+
+
+def candidatos_da_forma(forma):
+    resultado = []
+    ordem = [f'{c} DESC' if d else c for c, d in forma.ordem]
+    chave = list(forma.igualdades) + forma.faixas[:1]
+    if not forma.faixas:
+        chave += [c for c in ordem if c.split()[0] not in forma.igualdades]
+
+    if chave:
+        predicado = ' AND '.join(sorted(forma.constantes)) or None
+        resultado.append(Candidato(forma.tabela, chave, predicado))
+        if forma.constantes:
+            # Alternativa sem WHERE: predicados de igualdade viram colunas após as igualdades
+            constantes = [
+                p.split(' = ')[0] for p in sorted(forma.constantes)
+                if ' = ' in p and p.split(' = ')[0] not in chave
+            ]
+            igualdades = list(forma.igualdades)
+            resultado.append(Candidato(forma.tabela, igualdades + constantes + chave[len(igualdades):]))
+
+    for coluna, classe in forma.gin:
+        resultado.append(Candidato(forma.tabela, [f'{coluna} {classe}' if classe else coluna], metodo='gin'))
+    return resultado
+
+
+def gerar_candidatos(consultas, tabelas=None):
+    candidatos = {}
+    formas_por_consulta = []
+    for consulta in consultas:
+        try:
+            formas = analisar(consulta.sql)
+        except (IndexError, AttributeError):
+            continue
+        formas_por_consulta.append((consulta, formas))
+        for forma in formas:
+            if tabelas and forma.tabela.lower() not in tabelas:
+                continue
+            if forma.tabela.startswith(('pg_', 'information_schema')):
+                continue
+            for candidato in candidatos_da_forma(forma):
+                atual = candidatos.setdefault(candidato.chave, candidato)
+                if consulta not in atual.consultas:
+                    atual.consultas.append(consulta)
+    return list(candidatos.values()), formas_por_consulta
+
+
+# ----------------------------------------------------------------------
+# Índices existentes
+# ----------------------------------------------------------------------
+
+INDICE_REGEX = re.compile(
+    r'CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:CONCURRENTLY\s+)?(?:IF\s+NOT\s+EXISTS\s+)?"?(\w+)"?\s+'
+    r'ON\s+(?:ONLY\s+)?(?:"?\w+"?\.)?"?(\w+)"?\s*(?:USING\s+(\w+)\s*)?\(',
+    re.I,
+)
+DROP_REGEX = re.compile(r'DROP\s+INDEX\s+(?:CONCURRENTLY\s+)?(?:IF\s+EXISTS\s+)?(?:"?\w+"?\.)?"?(\w+)"?', re.I)
+TABLE_INDEX_REGEX = re.compile(
+    r"createIndex\(\s*['\"](\w+)['\"]\s*,\s*new\s+TableIndex\(\s*\{(.*?)\}\s*\)", re.S
+)
+
+
+def normalizar_colunas(texto):
+    colunas = []
+    for parte in dividir(list(agrupar(tokenizar(texto))), ','):
+        colunas.append(re.sub(r'\s+', ' ', texto_de(parte)).replace('"', '').lower().replace(' asc', ''))
+    return colunas
+
+
+def ler_indices_sql(texto):
+    """[(nome, tabela, metodo, colunas, predicado)] dos CREATE INDEX de um texto"""
+    return [indice for _, indice in _indices_sql_com_posicao(texto)]
+
+
+def _indices_sql_com_posicao(texto):
+    indices = []
+    for match in INDICE_REGEX.finditer(texto):
+        profundidade, inicio = 1, match.end()
+        fim = inicio
+        while fim < len(texto) and profundidade:
+            profundidade += {'(': 1, ')': -1}.get(texto[fim], 0)
+            fim += 1
+        colunas = normalizar_colunas(texto[inicio:fim - 1])
+        resto = re.match(r'\s*WHERE\s+(.*?)(?:`|\'\s*\)|;|$)', texto[fim:fim + 500], re.S | re.I)
+        predicado = ' '.join(resto.group(1).split()).replace('"', '').lower() if resto else None
+        indices.append((match.start(), (match.group(1), match.group(2).lower(),
+                                        (match.group(3) or 'btree').lower(), colunas, predicado)))
+    return indices
+
+
+def indices_das_migrations(pasta=MIGRATIONS):
+    """Índices vivos depois de aplicar as migrations em ordem (criados menos removidos)"""
+    indices = {}
+    for caminho in sorted(glob.glob(os.path.join(pasta, '*.ts'))):
+        with open(caminho, 'r', encoding='utf-8', errors='replace') as arquivo:
+            texto = arquivo.read()
+        texto = texto.split('public async down', 1)[0]
+
+        # Na ordem do texto: um up() pode remover um índice inválido e recriá-lo em seguida
+        eventos = [(posicao, nome, (tabela, metodo, colunas, predicado))
+                   for posicao, (nome, tabela, metodo, colunas, predicado) in _indices_sql_com_posicao(texto)]
+        for match in TABLE_INDEX_REGEX.finditer(texto):
+            tabela, corpo = match.groups()
+            nome = re.search(r"name:\s*['\"](\w+)['\"]", corpo)
+            colunas = re.search(r'columnNames:\s*\[([^\]]*)\]', corpo)
+            if nome and colunas:
+                eventos.append((match.start(), nome.group(1), (
+                    tabela.lower(), 'btree', re.findall(r"['\"](\w+)['\"]", colunas.group(1)), None
+                )))
+        eventos += [(match.start(), match.group(1), None) for match in DROP_REGEX.finditer(texto)]
+
+        for _, nome, indice in sorted(eventos, key=lambda e: e[0]):
+            if indice is None:
+                indices.pop(nome.lower(), None)
+            else:
+                indices[nome.lower()] = indice
+    return indices
+
+
+def indices_do_banco(cursor, schema):
+    cursor.execute("""
+        SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = %s
+    """, (schema,))
+    indices = {}
+    for nome, definicao in cursor.fetchall():
+        for _, tabela, metodo, colunas, predicado in ler_indices_sql(definicao):
+            indices[nome.lower()] = (tabela, metodo, colunas, predicado)
+    return indices
+
+
+def coberto_por(candidato, existentes, tabelas_com_pk=True):
+    colunas = [c.lower() for c in candidato.colunas]
+    if tabelas_com_pk and candidato.metodo == 'btree' and colunas[:1] == ['id'] and not candidato.predicado:
+        return 'PRIMARY KEY (id)'
+    predicado = (candidato.predicado or '').lower()
+    for nome, (tabela, metodo, existentes_colunas, existente_predicado) in existentes.items():
+        if tabela != candidato.tabela.lower() or metodo != candidato.metodo:
+            continue
+        if existentes_colunas[:len(colunas)] != colunas:
+            continue
+        if existente_predicado and existente_predicado != predicado:
+            continue
+        return nome
+    return None
+
+
+# ----------------------------------------------------------------------
+# Medição
+# ----------------------------------------------------------------------
+
+def sql_executavel(consulta):
+    """Converte os placeholders para %(pN)s, o formato do psycopg2 com dicionário"""
+    if consulta.estilo == 'postgres':
+        texto = consulta.sql.replace('%', '%%')
+        return re.sub(r'\$(\d+)', r'%(p\1)s', texto)
+
+    contador = iter(range(1, 10 ** 6))
+    return re.sub(r'%s', lambda m: f'%(p{next(contador)})s', consulta.sql)
+
+
+def sortear_parametros(cursor, formas, quantidade):
+    """Lista de dicionários de parâmetros, com valores tirados das próprias tabelas"""
+    conjuntos = [{} for _ in range(quantidade)]
+    for forma in formas:
+        for chave in forma.limite:
+            for conjunto in conjuntos:
+                conjunto[chave] = 10
+        if not forma.parametros:
+            continue
+
+        chaves = list(forma.parametros)
+        selecoes = [
+            f'unnest({citar_coluna(coluna)})' if tipo == 'elemento' else citar_coluna(coluna)
+            for coluna, tipo in forma.parametros.values()
+        ]
+        tabela = citar(forma.tabela)
+        if any(tipo == 'elemento' for _, tipo in forma.parametros.values()):
+            sql = f'SELECT {", ".join(selecoes)} FROM {tabela} LIMIT {quantidade * 50}'
+        else:
+            filtro = ' AND '.join(f'{s} IS NOT NULL' for s in selecoes)
+            sql = f'SELECT {", ".join(selecoes)} FROM {tabela} WHERE {filtro} ORDER BY random() LIMIT {quantidade}'
+        cursor.execute(sql)
+        linhas = cursor.fetchall()
+        if not linhas:
+            return None
+        for i, conjunto in enumerate(conjuntos):
+            linha = linhas[i % len(linhas)]
+            for chave, valor, (_, tipo) in zip(chaves, linha, forma.parametros.values()):
+                conjunto[chave] = [valor] if tipo == 'lista' else valor
+    return conjuntos
+
+
+def tempo_medio(cursor, sql, conjuntos):
+    total = 0.0
+    for parametros in conjuntos:
+        cursor.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + sql, parametros)
+        plano = cursor.fetchone()[0]
+        if isinstance(plano, str):
+            plano = json.loads(plano)
+        total += plano[0]['Execution Time']
+    return total / len(conjuntos)
+
+
+def medir_candidatos(conn, schema, candidatos, formas_por_consulta, amostras):
+    from psycopg2 import sql as psql
+
+    formas_de = {id(c): f for c, f in formas_por_consulta}
+
+    with conn.cursor() as cursor:
+        cursor.execute('SELECT tablename FROM pg_tables WHERE schemaname = %s', (schema,))
+        disponiveis = {t for (t,) in cursor.fetchall()}
+        existentes = indices_do_banco(cursor, schema)
+
+        for candidato in candidatos:
+            if candidato.tabela not in disponiveis:
+                candidato.medicao = {'situacao': f'tabela fora do schema {schema}'}
+                continue
+            cobertura = coberto_por(candidato, existentes, tabelas_com_pk=False)
+            if cobertura:
+                candidato.medicao = {'situacao': f'coberto por {cobertura}'}
+                continue
+
+            cursor.execute(psql.SQL('SET LOCAL search_path TO {}').format(psql.Identifier(schema)))
+            execucoes = []
+            for consulta in candidato.consultas:
+                formas = formas_de.get(id(consulta), [])
+                if any(f.tabela not in disponiveis for f in formas):
+                    continue
+                cursor.execute('SAVEPOINT medicao')
+                try:
+                    conjuntos = sortear_parametros(cursor, formas, amostras)
+                    if conjuntos is None:
+                        cursor.execute('RELEASE SAVEPOINT medicao')
+                        continue
+                    executavel = sql_executavel(consulta)
+                    antes = tempo_medio(cursor, executavel, conjuntos)
+                    cursor.execute('RELEASE SAVEPOINT medicao')
+                except Exception:
+                    # Parâmetro que não veio de coluna (texto livre, intervalo...): não dá para medir
+                    cursor.execute('ROLLBACK TO SAVEPOINT medicao')
+                    continue
+                execucoes.append((consulta, executavel, conjuntos, antes))
+
+            if not execucoes:
+                candidato.medicao = {'situacao': 'sem consulta executável com parâmetros sorteados'}
+                conn.rollback()
+                continue
+
+            inicio = time.perf_counter()
+            try:
+                cursor.execute(candidato.sql())
+                cursor.execute(psql.SQL('ANALYZE {}').format(psql.Identifier(candidato.tabela)))
+            except Exception as erro:
+                conn.rollback()
+                candidato.medicao = {'situacao': f'erro ao criar: {str(erro).strip()}'}
+                continue
+            criacao_ms = (time.perf_counter() - inicio) * 1000
+            cursor.execute('SELECT pg_relation_size(%s::regclass)', (candidato.nome(),))
+            tamanho = cursor.fetchone()[0]
+
+            ganho_total = 0.0
+            detalhes = []
+            for consulta, executavel, conjuntos, antes in execucoes:
+                depois = tempo_medio(cursor, executavel, conjuntos)
+                ganho_total += (antes - depois) * consulta.chamadas
+                detalhes.append({
+                    'origem': consulta.origem, 'antesMs': round(antes, 3), 'depoisMs': round(depois, 3),
+                })
+            conn.rollback()
+
+            antes_total = sum(a * c.chamadas for c, _, _, a in execucoes)
+            candidato.medicao = {
+                'situacao': 'medido',
+                'ganhoMs': round(ganho_total, 3),
+                'ganhoRelativo': round(ganho_total / antes_total, 3) if antes_total else 0.0,
+                'tamanhoBytes': tamanho,
+                'criacaoMs': round(criacao_ms, 1),
+                'consultas': detalhes,
+            }
+
+
+# ----------------------------------------------------------------------
+# Saída
+# ----------------------------------------------------------------------
+
+def ranquear(candidatos, medir):
+    if medir:
+        medidos = [c for c in candidatos if (c.medicao or {}).get('situacao') == 'medido']
+        uteis = [c for c in medidos if c.medicao['ganhoRelativo'] >= GANHO_MINIMO]
+        uteis.sort(key=lambda c: (-c.medicao['ganhoMs'], c.medicao['tamanhoBytes']))
+
+        # Por tabela, descarta quem só repete o ganho de um candidato melhor com as mesmas consultas
+        escolhidos, atendidas = [], set()
+        for candidato in uteis:
+            chave = (candidato.tabela, tuple(sorted(id(c) for c in candidato.consultas)))
+            if chave in atendidas:
+                continue
+            atendidas.add(chave)
+            escolhidos.append(candidato)
+        return escolhidos
+
+    livres = [c for c in candidatos if not (c.medicao or {}).get('situacao', '').startswith('coberto')]
+    return sorted(livres, key=lambda c: (-c.peso, c.tabela, len(c.colunas)))
+
+
+def gerar_sql(ranking):
+    linhas = ['-- Índices sugeridos por conectcrm_ops.indices (maior ganho primeiro)', '']
+    for posicao, candidato in enumerate(ranking, 1):
+        medicao = candidato.medicao or {}
+        if medicao.get('situacao') == 'medido':
+            resumo = (f"ganho {medicao['ganhoMs']:.3f} ms ponderado ({medicao['ganhoRelativo']:.0%}), "
+                      f"{medicao['tamanhoBytes'] / 1024:.0f} KB")
+        else:
+            resumo = f'peso {candidato.peso:g} (não medido)'
+        origens = sorted({c.origem for c in candidato.consultas})
+        linhas.append(f'-- {posicao}. {candidato.tipo}: {resumo}')
+        linhas.append(f"--    consultas: {', '.join(origens)}")
+        linhas.append(candidato.sql(concorrente=True) + ';')
+        linhas.append('')
+    return '\n'.join(linhas)
+
+
+def gerar_migracao(ranking, pasta):
+    carimbo = int(time.time() * 1000)
+    classe = f'AddTriagemSuggestedIndexes{carimbo}'
+    tabelas = sorted({c.tabela for c in ranking})
+
+    corpo = []
+    for tabela in tabelas:
+        corpo.append(f"    if (await queryRunner.hasTable('{tabela}')) {{")
+        for candidato in (c for c in ranking if c.tabela == tabela):
+            origens = ', '.join(sorted({c.origem for c in candidato.consultas}))
+            corpo.append(f'      // {candidato.tipo}: {origens}')
+            corpo.append(f"      await this.removerIndiceInvalido(queryRunner, '{candidato.nome()}');")
+            corpo.append('      await queryRunner.query(`')
+            corpo.append(f'        {candidato.sql(concorrente=True)}')
+            corpo.append('      `);')
+        corpo.append('    }')
+        corpo.append('')
+    if corpo:
+        corpo.pop()
+
+    remocoes = [f'    await queryRunner.query(`DROP INDEX CONCURRENTLY IF EXISTS "{c.nome()}"`);'
+                for c in reversed(ranking)]
+    conteudo = '\n'.join([
+        "import { MigrationInterface, QueryRunner } from 'typeorm';",
+        '',
+        f'export class {classe} implements MigrationInterface {{',
+        f"  name = '{classe}';",
+        '',
+        '  // CREATE INDEX CONCURRENTLY não roda dentro de transação',
+        '  public transaction = false;',
+        '',
+        '  public async up(queryRunner: QueryRunner): Promise<void> {',
+        *corpo,
+        '  }',
+        '',
+        '  public async down(queryRunner: QueryRunner): Promise<void> {',
+        *remocoes,
+        '  }',
+        '',
+        '  // Um CONCURRENTLY interrompido deixa o índice inválido, e o IF NOT EXISTS o manteria',
+        '  private async removerIndiceInvalido(queryRunner: QueryRunner, nome: string): Promise<void> {',
+        '    const invalido = await queryRunner.query(',
+        "      'SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = $1 AND NOT i.indisvalid',",
+        '      [nome],',
+        '    );',
+        '    if (invalido.length > 0) {',
+        '      await queryRunner.query(`DROP INDEX CONCURRENTLY IF EXISTS "${nome}"`);',
+        '    }',
+        '  }',
+        '}',
+        '',
+    ])
+
+    caminho = os.path.join(pasta, f'{carimbo}-AddTriagemSuggestedIndexes.ts')
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        arquivo.write(conteudo)
+    return caminho
+
+
+def imprimir_ranking(ranking, descartados):
+    if not ranking:
+        print("✅ Nenhum índice novo sugerido")
+    for posicao, candidato in enumerate(ranking, 1):
+        medicao = candidato.medicao or {}
+        print(f"\n{posicao}. [{candidato.tipo}] {candidato.sql()}")
+        if medicao.get('situacao') == 'medido':
+            print(f"   ganho {medicao['ganhoMs']:.3f} ms ponderado ({medicao['ganhoRelativo']:.0%}), "
+                  f"{medicao['tamanhoBytes'] / 1024:.0f} KB, criado em {medicao['criacaoMs']:.0f} ms")
+            for detalhe in medicao['consultas']:
+                print(f"   - {detalhe['origem']}: {detalhe['antesMs']:.3f} → {detalhe['depoisMs']:.3f} ms")
+        else:
+            print(f"   peso {candidato.peso:g}; consultas: "
+                  + ', '.join(sorted({c.origem for c in candidato.consultas})))
+
+    if descartados:
+        print(f"\n🗑️  {len(descartados)} candidato(s) descartado(s):")
+        for candidato in descartados:
+            motivo = (candidato.medicao or {}).get('situacao') or 'sem ganho'
+            if motivo == 'medido':
+                motivo = f"ganho de {candidato.medicao['ganhoRelativo']:.0%} (< {GANHO_MINIMO:.0%})"
+            print(f"   - {candidato.tabela} ({', '.join(candidato.colunas)}): {motivo}")
+
+
+def main(argv=None):
+    from conectcrm_ops.benchmark import SCHEMA_PADRAO
+
+    parser = argparse.ArgumentParser(description='Sugere índices a partir das consultas dos scripts e do pg_stat_statements')
+    parser.add_argument('fontes', nargs='*',
+                        help='.py, .sql, diretórios ou dumps do pg_stat_statements (.csv/.json); '
+                             'padrão: scripts da raiz e conectcrm_ops')
+    parser.add_argument('--tabela', action='append', help='Considera só esta tabela (pode repetir)')
+    parser.add_argument('--medir', action='store_true', help='Mede cada candidato no schema semeado (ROLLBACK no fim)')
+    parser.add_argument('--schema', default=SCHEMA_PADRAO, help=f'Schema semeado (padrão: {SCHEMA_PADRAO})')
+    parser.add_argument('--amostras', type=int, default=AMOSTRAS, help='Conjuntos de parâmetros por consulta')
+    parser.add_argument('--sql', help='Grava o SQL ranqueado (CREATE INDEX CONCURRENTLY) neste arquivo')
+    parser.add_argument('--migracao', help='Grava uma migration TypeORM neste diretório')
+    parser.add_argument('--json', action='store_true', help='Imprime o ranking em JSON')
+    args = parser.parse_args(argv)
+
+    consultas = carregar_consultas(args.fontes)
+    tabelas = {t.lower() for t in args.tabela} if args.tabela else None
+    candidatos, formas_por_consulta = gerar_candidatos(consultas, tabelas)
+
+    if not args.json:
+        print(f"🔎 {len(consultas)} consulta(s), {len(candidatos)} candidato(s) de índice")
+
+    existentes = indices_das_migrations()
+    for candidato in candidatos:
+        cobertura = coberto_por(candidato, existentes)
+        if cobertura:
+            candidato.medicao = {'situacao': f'coberto por {cobertura}'}
+
+    if args.medir:
+        from conectcrm_ops.db import conectar
+
+        pendentes = [c for c in candidatos if c.medicao is None]
+        if not args.json:
+            print(f"⏱️  Medindo {len(pendentes)} candidato(s) em '{args.schema}'...")
+        conn = conectar()
+        try:
+            medir_candidatos(conn, args.schema, pendentes, formas_por_consulta, args.amostras)
+        finally:
+            conn.close()
+
+    ranking = ranquear(candidatos, args.medir)
+    descartados = [c for c in candidatos if c not in ranking]
+
+    if args.sql:
+        from conectcrm_ops.historico import gravar_atomico
+
+        gravar_atomico(args.sql, gerar_sql(ranking))
+    if args.migracao and ranking:
+        caminho = gerar_migracao(ranking, args.migracao)
+        if not args.json:
+            print(f"📝 Migration gravada em {caminho}")
+
+    if args.json:
+        print(json.dumps([
+            {
+                'posicao': i,
+                'tabela': c.tabela,
+                'tipo': c.tipo,
+                'sql': c.sql(),
+                'peso': c.peso,
+                'consultas': sorted({q.origem for q in c.consultas}),
+                'medicao': c.medicao,
+            }
+            for i, c in enumerate(ranking, 1)
+        ], indent=2, ensure_ascii=False))
+    else:
+        imprimir_ranking(ranking, descartados)
+        if args.sql:
+            print(f"\n💾 SQL gravado em {args.sql}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
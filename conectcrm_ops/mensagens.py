@@ -0,0 +1,424 @@
+# -*- coding: utf-8 -*-
+"""
+Templates das mensagens dos fluxos: lint e prévia
+
+Cada campo mensagem* da etapa (e de etapa.metadata) é quebrado em tokens e
+compilado uma única vez (cache por texto). O lint aponta:
+
+- bloco-desbalanceado      {{#if}} sem {{/if}}, {{/if}} sobrando, {{else}} fora de bloco
+- chave-malformada         {{var} , {var}} , {{ }} e chaves soltas
+- chave-simples            {var}: funciona no backend, mas o padrão dos fluxos é {{var}}
+- bloco-nao-suportado      {{#if}}/{{#unless}}: substituirVariaveisNaMensagem (flow-engine.ts)
+                           só troca {{var}} e {var}, então o bloco chega literal ao cliente
+- variavel-nao-coletada    nenhuma etapa anterior (em nenhum caminho) coleta a variável
+- variavel-talvez-ausente  só alguns caminhos até a etapa coletam a variável
+
+A prévia tem dois modos: "backend" (o que o cliente recebe hoje) e
+"handlebars" (o que o autor do template quis dizer).
+
+Uso:
+    python -m conectcrm_ops.mensagens fluxo-padrao-triagem-v3.json
+    python -m conectcrm_ops.mensagens --banco
+    python -m conectcrm_ops.mensagens fluxo.json --previa contextos.json --modo handlebars
+"""
+
+import argparse
+import functools
+import json
+import re
+import sys
+import time
+
+from conectcrm_ops.fluxos import extrair_estrutura
+
+ERRO = 'erro'
+AVISO = 'aviso'
+
+TOKEN_REGEX = re.compile(
+    r'\{\{\s*(?P<tag>#if|#unless|#\w+|/if|/unless|/\w+|else)?\s*(?P<nome>[^{}]*?)\s*\}\}'
+    r'|(?P<quebrada>\{\{\s*[A-Za-z_][\w.]*\s*\}(?!\})|\{\s*[A-Za-z_][\w.]*\s*\}\})'
+    r'|\{(?P<simples>[A-Za-z_][\w.]*)\}'
+)
+VARIAVEL_VALIDA = re.compile(r'^[A-Za-z_][\w.]*$')
+SUBSTITUICAO_BACKEND = re.compile(r'\{\{([^{}]+)\}\}|\{([^{}]+)\}')
+
+# Preenchidas pelo backend (não vêm de etapas de coleta)
+VARIAVEIS_SISTEMA = {
+    'telefone', 'nucleo', 'nucleoNome', 'departamentoNome', 'areaTitulo', 'destinoNucleoId',
+    'destinoDepartamentoId', 'atendenteId', 'canalId', 'resumoAtendimento',
+}
+# Preenchidas a partir do contato quando o cliente já é cadastrado
+VARIAVEIS_CONTATO = {'nome', 'primeiroNome', 'sobrenome', 'email', 'empresa', 'cargo'}
+
+TEXTO, VAR, SIMPLES, BLOCO = 'texto', 'var', 'simples', 'bloco'
+
+
+# ----------------------------------------------------------------------
+# Tokenização e compilação
+# ----------------------------------------------------------------------
+
+def _problema(problemas, codigo, nivel, mensagem, inicio, texto):
+    trecho = texto[max(0, inicio - 15):inicio + 25].replace('\n', '⏎')
+    problemas.append({'codigo': codigo, 'nivel': nivel, 'mensagem': mensagem, 'posicao': inicio, 'trecho': trecho})
+
+
+def _chaves_soltas(texto, inicio, fim, problemas, original):
+    trecho = texto[inicio:fim]
+    for match in re.finditer(r'[{}]+', trecho):
+        _problema(problemas, 'chave-malformada', ERRO,
+                  f"'{match.group(0)}' sem par (esperado {{{{variavel}}}})", inicio + match.start(), original)
+
+
+class Template:
+    """Template compilado: árvore de nós, variáveis usadas e problemas de sintaxe"""
+
+    __slots__ = ('texto', 'nos', 'problemas', 'variaveis', 'protegidas', 'tem_blocos', '_partes_backend')
+
+    def __init__(self, texto):
+        self.texto = texto
+        self.problemas = []
+        self.variaveis = set()
+        self.protegidas = set()
+        self.tem_blocos = False
+        self.nos = self._analisar(texto)
+
+        # Modo backend: texto fixo intercalado com variáveis trocadas se existirem no contexto
+        self._partes_backend = list(SUBSTITUICAO_BACKEND.finditer(texto))
+
+    def _analisar(self, texto):
+        raiz = []
+        pilha = [(None, None, raiz, 0)]
+        posicao = 0
+
+        for match in TOKEN_REGEX.finditer(texto):
+            _chaves_soltas(texto, posicao, match.start(), self.problemas, texto)
+            if match.start() > posicao:
+                pilha[-1][2].append((TEXTO, texto[posicao:match.start()]))
+            posicao = match.end()
+
+            tag, nome, simples = match.group('tag'), match.group('nome'), match.group('simples')
+            atual = pilha[-1][2]
+
+            if match.group('quebrada') is not None:
+                _problema(self.problemas, 'chave-malformada', ERRO,
+                          f"'{match.group(0)}' com chaves desiguais (esperado {{{{variavel}}}})", match.start(), texto)
+                atual.append((TEXTO, match.group(0)))
+            elif simples is not None:
+                self.variaveis.add(simples)
+                atual.append((SIMPLES, simples, match.group(0)))
+                _problema(self.problemas, 'chave-simples', AVISO,
+                          f"{{{simples}}} com uma chave só; use {{{{{simples}}}}}", match.start(), texto)
+            elif tag in ('#if', '#unless'):
+                self.tem_blocos = True
+                if not VARIAVEL_VALIDA.match(nome or ''):
+                    _problema(self.problemas, 'chave-malformada', ERRO,
+                              f"{tag} sem variável válida", match.start(), texto)
+                self.variaveis.add(nome)
+                self.protegidas.add(nome)
+                bloco = [BLOCO, tag, nome, [], [], match.group(0)]
+                atual.append(bloco)
+                pilha.append((tag, bloco, bloco[3], match.start()))
+            elif tag == 'else':
+                if pilha[-1][0] is None:
+                    _problema(self.problemas, 'bloco-desbalanceado', ERRO, '{{else}} fora de bloco', match.start(), texto)
+                    atual.append((TEXTO, match.group(0)))
+                else:
+                    pilha[-1] = (pilha[-1][0], pilha[-1][1], pilha[-1][1][4], pilha[-1][3])
+            elif tag in ('/if', '/unless'):
+                if pilha[-1][0] is None:
+                    _problema(self.problemas, 'bloco-desbalanceado', ERRO, f'{{{{{tag}}}}} sem abertura', match.start(), texto)
+                    atual.append((TEXTO, match.group(0)))
+                elif pilha[-1][0] != '#' + tag[1:]:
+                    _problema(self.problemas, 'bloco-desbalanceado', ERRO,
+                              f'{{{{{tag}}}}} fecha um {pilha[-1][0]}', match.start(), texto)
+                    pilha.pop()
+                else:
+                    pilha.pop()
+            elif tag:
+                _problema(self.problemas, 'bloco-nao-suportado', ERRO,
+                          f'helper {tag} não é suportado', match.start(), texto)
+                atual.append((TEXTO, match.group(0)))
+            elif not VARIAVEL_VALIDA.match(nome or ''):
+                _problema(self.problemas, 'chave-malformada', ERRO,
+                          f"'{match.group(0)}' não é uma variável válida", match.start(), texto)
+                atual.append((TEXTO, match.group(0)))
+            else:
+                self.variaveis.add(nome)
+                atual.append((VAR, nome, match.group(0)))
+
+        _chaves_soltas(texto, posicao, len(texto), self.problemas, texto)
+        if posicao < len(texto):
+            pilha[-1][2].append((TEXTO, texto[posicao:]))
+
+        for tag, _, _, inicio in pilha[1:]:
+            _problema(self.problemas, 'bloco-desbalanceado', ERRO, f'{{{{{tag} ...}}}} sem {{{{/{tag[1:]}}}}}', inicio, texto)
+
+        if self.tem_blocos:
+            _problema(self.problemas, 'bloco-nao-suportado', AVISO,
+                      'o FlowEngine não interpreta {{#if}}: o bloco é enviado literalmente ao cliente',
+                      self.texto.find('{{#'), texto)
+
+        return raiz
+
+    # ------------------------------------------------------------------
+    # Renderização
+    # ------------------------------------------------------------------
+
+    def renderizar_backend(self, contexto):
+        """Igual a substituirVariaveisNaMensagem: troca {{var}}/{var} presentes no contexto"""
+        if not self._partes_backend:
+            return self.texto
+        saida, posicao = [], 0
+        for match in self._partes_backend:
+            saida.append(self.texto[posicao:match.start()])
+            chave = match.group(1) if match.group(1) is not None else match.group(2)
+            valor = contexto.get(chave)
+            saida.append(match.group(0) if valor is None else str(valor))
+            posicao = match.end()
+        saida.append(self.texto[posicao:])
+        return ''.join(saida)
+
+    def renderizar_handlebars(self, contexto):
+        """Semântica pretendida: blocos avaliados e variáveis ausentes viram ''"""
+        saida = []
+        _renderizar_nos(self.nos, contexto, saida)
+        return ''.join(saida)
+
+    def renderizar(self, contexto, modo='backend'):
+        if modo == 'handlebars':
+            return self.renderizar_handlebars(contexto)
+        return self.renderizar_backend(contexto)
+
+
+def _verdadeiro(valor):
+    return valor not in (None, '', False, 0) and valor != [] and valor != {}
+
+
+def _renderizar_nos(nos, contexto, saida):
+    for no in nos:
+        tipo = no[0]
+        if tipo == TEXTO:
+            saida.append(no[1])
+        elif tipo in (VAR, SIMPLES):
+            valor = contexto.get(no[1])
+            saida.append('' if valor is None else str(valor))
+        else:
+            _, tag, nome, sim, nao, _ = no
+            condicao = _verdadeiro(contexto.get(nome))
+            if tag == '#unless':
+                condicao = not condicao
+            _renderizar_nos(sim if condicao else nao, contexto, saida)
+
+
+@functools.lru_cache(maxsize=8192)
+def compilar(texto):
+    """Template compilado (com cache; textos iguais em fluxos diferentes compilam uma vez)"""
+    return Template(texto)
+
+
+# ----------------------------------------------------------------------
+# Campos de mensagem de um fluxo
+# ----------------------------------------------------------------------
+
+def campos_mensagem(etapa):
+    """[(campo, texto)] com os campos mensagem* da etapa e de etapa.metadata"""
+    campos = [(k, v) for k, v in etapa.items() if k.startswith('mensagem') and isinstance(v, str)]
+    metadata = etapa.get('metadata')
+    if isinstance(metadata, dict):
+        campos += [(f'metadata.{k}', v) for k, v in metadata.items() if k.startswith('mensagem') and isinstance(v, str)]
+    return campos
+
+
+def variaveis_coletadas(etapa):
+    """Variáveis que a etapa grava no contexto (etapa.variavel e opcoes[].variavel)"""
+    coletadas = set()
+    if isinstance(etapa.get('variavel'), str):
+        coletadas.add(etapa['variavel'])
+    for opcao in etapa.get('opcoes') or []:
+        if isinstance(opcao, dict) and isinstance(opcao.get('variavel'), str):
+            coletadas.add(opcao['variavel'])
+    return coletadas
+
+
+def disponibilidade_variaveis(estrutura):
+    """
+    Para cada etapa: (talvez, certamente) = variáveis coletadas em algum / em
+    todos os caminhos desde etapaInicial até a entrada da etapa.
+    """
+    from conectcrm_ops.grafo import GrafoFluxo
+
+    grafo = GrafoFluxo(estrutura)
+    etapas = estrutura['etapas']
+    coletas = [variaveis_coletadas(etapas[etapa_id]) for etapa_id in grafo.ids]
+    n = len(grafo.ids)
+
+    talvez = [set() for _ in range(n)]
+    certamente = [None] * n
+    inicio = grafo.indice.get(grafo.etapa_inicial)
+    if inicio is None:
+        return grafo, talvez, [set() for _ in range(n)]
+
+    certamente[inicio] = set()
+    fila = [inicio]
+    na_fila = [False] * n
+    na_fila[inicio] = True
+    while fila:
+        atual = fila.pop()
+        na_fila[atual] = False
+        saida_talvez = talvez[atual] | coletas[atual]
+        saida_certa = certamente[atual] | coletas[atual]
+        for proximo in grafo.sucessores[atual]:
+            mudou = False
+            if not saida_talvez <= talvez[proximo]:
+                talvez[proximo] |= saida_talvez
+                mudou = True
+            if proximo == inicio:
+                pass
+            elif certamente[proximo] is None:
+                certamente[proximo] = set(saida_certa)
+                mudou = True
+            elif not certamente[proximo] <= saida_certa:
+                certamente[proximo] &= saida_certa
+                mudou = True
+            if mudou and not na_fila[proximo]:
+                na_fila[proximo] = True
+                fila.append(proximo)
+
+    return grafo, talvez, [c if c is not None else set() for c in certamente]
+
+
+def analisar_fluxo(estrutura, nome=None):
+    """Problemas de todos os campos de mensagem de um fluxo"""
+    estrutura = extrair_estrutura(estrutura)
+    grafo, talvez, certamente = disponibilidade_variaveis(estrutura)
+    alcancaveis = set(grafo.arvore_caminhos())
+    problemas = []
+
+    for etapa_id, etapa in estrutura['etapas'].items():
+        if not isinstance(etapa, dict):
+            continue
+        i = grafo.indice[etapa_id]
+        for campo, texto in campos_mensagem(etapa):
+            template = compilar(texto)
+            base = {'fluxo': nome, 'etapa': etapa_id, 'campo': campo}
+            problemas += [{**base, **p} for p in template.problemas]
+
+            if etapa_id not in alcancaveis:
+                continue
+            for variavel in sorted(template.variaveis):
+                if not VARIAVEL_VALIDA.match(variavel) or variavel in VARIAVEIS_SISTEMA or variavel.startswith('__'):
+                    continue
+                if variavel in certamente[i]:
+                    continue
+                if variavel in talvez[i]:
+                    if variavel not in template.protegidas:
+                        problemas.append({**base, 'codigo': 'variavel-talvez-ausente', 'nivel': AVISO,
+                                          'mensagem': f'{variavel} só é coletada em alguns caminhos até aqui',
+                                          'posicao': None, 'trecho': variavel})
+                elif variavel in VARIAVEIS_CONTATO:
+                    if variavel not in template.protegidas:
+                        problemas.append({**base, 'codigo': 'variavel-talvez-ausente', 'nivel': AVISO,
+                                          'mensagem': f'{variavel} só existe para cliente já cadastrado',
+                                          'posicao': None, 'trecho': variavel})
+                else:
+                    problemas.append({**base, 'codigo': 'variavel-nao-coletada', 'nivel': ERRO,
+                                      'mensagem': f'nenhuma etapa anterior coleta {variavel}',
+                                      'posicao': None, 'trecho': variavel})
+
+    return problemas
+
+
+def renderizar_previas(estrutura, contextos, modo='backend'):
+    """{etapa.campo: [texto renderizado por contexto]}"""
+    estrutura = extrair_estrutura(estrutura)
+    previas = {}
+    for etapa_id, etapa in estrutura['etapas'].items():
+        if not isinstance(etapa, dict):
+            continue
+        for campo, texto in campos_mensagem(etapa):
+            renderizar = compilar(texto).renderizar_handlebars if modo == 'handlebars' else compilar(texto).renderizar_backend
+            previas[f'{etapa_id}.{campo}'] = [renderizar(contexto) for contexto in contextos]
+    return previas
+
+
+# ----------------------------------------------------------------------
+# CLI
+# ----------------------------------------------------------------------
+
+SQL_FLUXOS = "SELECT id, nome, estrutura FROM fluxos_triagem ORDER BY id"
+
+
+def _ler_fluxos(args):
+    if not args.banco:
+        for caminho in args.arquivos:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                yield caminho, json.load(f)
+        return
+
+    from conectcrm_ops.db import conectar
+
+    conn = conectar()
+    try:
+        with conn.cursor(name='mensagens_fluxos') as cursor:
+            cursor.itersize = 100
+            cursor.execute(SQL_FLUXOS)
+            for fluxo_id, nome, estrutura in cursor:
+                yield f'{nome} ({fluxo_id})', estrutura
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Lint e prévia das mensagens dos fluxos de triagem')
+    parser.add_argument('arquivos', nargs='*', help='JSON dos fluxos')
+    parser.add_argument('--banco', action='store_true', help='Analisa todos os fluxos de fluxos_triagem')
+    parser.add_argument('--previa', help='JSON com uma lista de contextos de exemplo')
+    parser.add_argument('--modo', choices=['backend', 'handlebars'], default='backend')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    if not args.arquivos and not args.banco:
+        parser.error('informe arquivos ou --banco')
+
+    contextos = None
+    if args.previa:
+        with open(args.previa, 'r', encoding='utf-8') as f:
+            contextos = json.load(f)
+
+    inicio = time.perf_counter()
+    relatorio = {}
+    erros = 0
+    for nome, fluxo in _ler_fluxos(args):
+        try:
+            problemas = analisar_fluxo(fluxo, nome)
+        except ValueError as e:
+            problemas = [{'fluxo': nome, 'etapa': None, 'campo': None, 'codigo': 'estrutura-invalida',
+                          'nivel': ERRO, 'mensagem': str(e), 'posicao': None, 'trecho': None}]
+        erros += sum(1 for p in problemas if p['nivel'] == ERRO)
+        relatorio[nome] = {'problemas': problemas}
+        if contextos is not None and not any(p['codigo'] == 'estrutura-invalida' for p in problemas):
+            relatorio[nome]['previas'] = renderizar_previas(fluxo, contextos, args.modo)
+
+    if args.json:
+        print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+        return 1 if erros else 0
+
+    for nome, dados in relatorio.items():
+        print(f"\n📋 {nome}")
+        if not dados['problemas']:
+            print("   ✅ Nenhum problema nas mensagens")
+        for p in dados['problemas']:
+            icone = '❌' if p['nivel'] == ERRO else '⚠️ '
+            local = f"{p['etapa']}.{p['campo']}" if p['etapa'] else ''
+            print(f"   {icone} [{p['codigo']}] {local}: {p['mensagem']}")
+        for chave, textos in dados.get('previas', {}).items():
+            print(f"\n   👁️  {chave}")
+            for i, texto in enumerate(textos):
+                print(f"      #{i}: {texto[:200]!r}")
+
+    print(f"\n⏱️  {len(relatorio)} fluxo(s) em {time.perf_counter() - inicio:.2f}s")
+    return 1 if erros else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
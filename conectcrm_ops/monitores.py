@@ -0,0 +1,663 @@
+# -*- coding: utf-8 -*-
+"""
+Simulação (dry run) dos monitores de inatividade e de SLA, todas as empresas de uma vez
+
+O InactivityMonitorService (a cada 5 min) e o SlaMonitorMinimoService (a cada
+SLA_MONITOR_INTERVAL_MS) percorrem as empresas ativas uma a uma com
+runWithTenant: o ciclo cresce com o número de empresas e ninguém vê antes o
+que ele vai fazer. Aqui uma única consulta varre atendimento_tickets de todas
+as empresas ativas, já com a configuração de inatividade que o serviço
+escolheria para cada ticket (a do departamento, senão a global) e os laços de
+configuração que o trariam no lote; a decisão de cada ticket é a mesma do
+código TypeScript:
+
+- inatividade ("servico", padrão): ultima_mensagem_em <= agora - timeout
+  (NULL conta como inativo, como no JS). Como verificarSeJaFoiAvisado()
+  sempre devolve false, com enviar_aviso o ticket é avisado de novo em todo
+  ciclo e nunca fechado; sem enviar_aviso, é fechado. Cada configuração ativa
+  da empresa é um laço que busca até 200 tickets pelo status_aplicaveis dela
+  (sem ORDER BY), então um ticket que casa com k laços recebe k avisos por
+  ciclo. --pretendida avalia o que a configuração descreve (aviso na janela
+  de aviso_minutos_antes, fechamento no timeout);
+- SLA mínimo: prazo por sla_expires_at, sla_target_minutes ou prioridade x
+  severidade; violação com o prazo vencido, alerta a partir de
+  SLA_WARNING_THRESHOLD. Só os SLA_MONITOR_BATCH tickets mais recentes
+  (updated_at) de cada empresa são vistos; CONCLUIDO e CANCELADO entram;
+- sla_configs (regras do SlaService, que hoje nenhum monitor aplica): tempo de
+  resposta até data_primeira_resposta, depois tempo de resolução; config
+  por (prioridade, canal) e, na falta, (prioridade, sem canal). A prioridade
+  do ticket (BAIXA/MEDIA/...) é comparada sem caixa e MEDIA casa com
+  "normal"; o aviso de configuração aponta quando a comparação literal do
+  serviço não acharia nada.
+
+Custo do ciclo por empresa: consultas do laço (configs, lote, findOne da
+config por ticket, save do fechamento) x --ms-consulta, mais envios de
+WhatsApp x --ms-envio e notificações x --ms-notificacao (com o cache de
+resfriamento do SLA vazio, como logo depois de um deploy). Os laços são
+sequenciais, então o total é a soma; passar do intervalo significa ciclos
+sobrepostos (setInterval não espera). --medir N cronometra as consultas do
+lote nas N maiores empresas e usa a mediana no lugar de --ms-consulta.
+
+Empresa com mais fechamentos elegíveis que --limite-fechamentos sai com 🚨
+e o comando termina com código 2 (dá para usar antes de ligar uma
+configuração).
+
+Uso:
+    python -m conectcrm_ops.monitores
+    python -m conectcrm_ops.monitores --daqui 120 --empresa f47ac10b-...
+    python -m conectcrm_ops.monitores --pretendida --limite-fechamentos 500 --saida acoes.jsonl
+    python -m conectcrm_ops.monitores --medir 5 --json custo.json
+"""
+
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from conectcrm_ops.histograma import formatar_duracao
+
+STATUS_CONHECIDOS = ('FILA', 'EM_ATENDIMENTO', 'ENVIO_ATIVO', 'ENCERRADO', 'AGUARDANDO_CLIENTE',
+                     'AGUARDANDO_INTERNO', 'CONCLUIDO', 'CANCELADO')
+STATUS_SEM_SLA = ('ENCERRADO', 'CONCLUIDO', 'CANCELADO')
+
+LOTE_INATIVIDADE = 200
+INTERVALO_INATIVIDADE = 5 * 60
+
+# Mesmos padrões e variáveis do SlaMonitorMinimoService
+LOTE_SLA = int(os.environ.get('SLA_MONITOR_BATCH', '500'))
+INTERVALO_SLA = int(os.environ.get('SLA_MONITOR_INTERVAL_MS', '60000')) / 1000
+LIMIAR_ALERTA = float(os.environ.get('SLA_WARNING_THRESHOLD', '0.7'))
+RESFRIAMENTO = int(os.environ.get('SLA_ALERT_COOLDOWN_MS', str(10 * 60000))) / 1000
+
+BASE_POR_PRIORIDADE = {'URGENTE': 30, 'ALTA': 120, 'MEDIA': 480, 'BAIXA': 960}
+FATOR_SEVERIDADE = {'CRITICA': 0.5, 'ALTA': 0.75, 'MEDIA': 1, 'BAIXA': 1.25}
+
+PRIORIDADES_SLA_CONFIG = ('baixa', 'normal', 'alta', 'urgente')
+CANAIS_SLA_CONFIG = ('whatsapp', 'telegram', 'email', 'sms', 'facebook', 'instagram', 'webchat',
+                     'chat', 'telefone')
+
+MS_CONSULTA = 3.0
+MS_ENVIO = 250.0
+MS_NOTIFICACAO = 150.0
+LIMITE_FECHAMENTOS = 1000
+
+SQL_AGORA = "SELECT LOCALTIMESTAMP"
+
+SQL_EMPRESAS = "SELECT id::text FROM empresas WHERE ativo"
+
+SQL_CONFIGS_INATIVIDADE = """
+    SELECT c.id::text, c.empresa_id::text, c.departamento_id::text, c.timeout_minutos,
+           c.enviar_aviso, c.aviso_minutos_antes, c.status_aplicaveis,
+           d.empresa_id::text AS departamento_empresa
+    FROM atendimento_configuracao_inatividade c
+    JOIN empresas e ON e.id = c.empresa_id AND e.ativo
+    LEFT JOIN departamentos d ON d.id = c.departamento_id
+    WHERE c.ativo
+"""
+
+SQL_SLA_CONFIGS = """
+    SELECT s.id::text, s."empresaId"::text, s.nome, s.prioridade, s.canal,
+           s."tempoRespostaMinutos", s."tempoResolucaoMinutos", s."alertaPercentual"
+    FROM sla_configs s
+    JOIN empresas e ON e.id = s."empresaId" AND e.ativo
+    WHERE s.ativo
+"""
+
+# Uma passada por atendimento_tickets para os dois monitores
+SQL_TICKETS = """
+    WITH cfg AS (
+        SELECT c.id, c.empresa_id, c.departamento_id, c.timeout_minutos, c.enviar_aviso,
+               c.aviso_minutos_antes,
+               CASE WHEN jsonb_typeof(c.status_aplicaveis) = 'array'
+                     AND jsonb_array_length(c.status_aplicaveis) > 0
+                    THEN c.status_aplicaveis END AS status_aplicaveis
+        FROM atendimento_configuracao_inatividade c
+        WHERE c.ativo
+    )
+    SELECT t.id::text, t.empresa_id::text, t.numero, t.status, t.prioridade, t.severity,
+           t.departamento_id::text, t.ultima_mensagem_em, t.created_at, t.data_abertura,
+           t.updated_at, t.sla_target_minutes, t.sla_expires_at, t.data_primeira_resposta,
+           ca.tipo::text,
+           row_number() OVER (PARTITION BY t.empresa_id, t.status = 'ENCERRADO'
+                              ORDER BY t.updated_at DESC),
+           lacos.ids, r.id::text, r.departamento_id IS NOT NULL, r.timeout_minutos,
+           r.enviar_aviso, r.aviso_minutos_antes
+    FROM atendimento_tickets t
+    JOIN empresas e ON e.id = t.empresa_id AND e.ativo
+    LEFT JOIN atendimento_canais ca ON ca.id = t.canal_id
+    LEFT JOIN LATERAL (
+        SELECT array_agg(c.id::text ORDER BY c.id) AS ids
+        FROM cfg c
+        WHERE c.empresa_id = t.empresa_id
+          AND CASE WHEN c.status_aplicaveis IS NOT NULL THEN c.status_aplicaveis ? t.status
+                   ELSE t.status NOT IN ('ENCERRADO', 'CONCLUIDO') END
+    ) lacos ON true
+    LEFT JOIN LATERAL (
+        SELECT c.* FROM cfg c
+        WHERE c.empresa_id = t.empresa_id
+          AND (c.departamento_id = t.departamento_id OR c.departamento_id IS NULL)
+        ORDER BY c.departamento_id IS NULL
+        LIMIT 1
+    ) r ON lacos.ids IS NOT NULL
+    WHERE (t.status <> 'ENCERRADO'
+           OR t.empresa_id IN (SELECT empresa_id FROM cfg WHERE status_aplicaveis ? 'ENCERRADO'))
+      AND (%(empresas)s::uuid[] IS NULL OR t.empresa_id = ANY(%(empresas)s::uuid[]))
+"""
+
+COLUNAS = ('id', 'empresa_id', 'numero', 'status', 'prioridade', 'severity', 'departamento_id',
+           'ultima_mensagem_em', 'created_at', 'data_abertura', 'updated_at', 'sla_target_minutes',
+           'sla_expires_at', 'data_primeira_resposta', 'canal', 'posicao_sla', 'lacos', 'config_id',
+           'config_departamento', 'timeout_minutos', 'enviar_aviso', 'aviso_minutos_antes')
+
+# As consultas de lote que cada serviço faz por empresa (para --medir)
+SQL_LOTE_INATIVIDADE = """
+    SELECT * FROM atendimento_tickets
+    WHERE empresa_id = %s AND status NOT IN ('ENCERRADO', 'CONCLUIDO')
+    LIMIT 200
+"""
+
+SQL_LOTE_SLA = """
+    SELECT * FROM atendimento_tickets
+    WHERE empresa_id = %s AND status <> 'ENCERRADO'
+    ORDER BY updated_at DESC
+    LIMIT %s
+"""
+
+
+def _segundos(delta):
+    return delta.total_seconds()
+
+
+def _arredondar_js(x):
+    """Math.round do JS (meio para cima), não o arredondamento bancário do Python."""
+    return math.floor(x + 0.5)
+
+
+# ----------------------------------------------------------------------
+# Regras (espelho do TypeScript)
+# ----------------------------------------------------------------------
+
+def avaliar_inatividade(ticket, agora, pretendida=False):
+    """None, 'aviso', 'fechamento' ou 'sem-config' para um ticket que algum laço busca."""
+    if not ticket['config_id']:
+        return 'sem-config'
+    timeout = ticket['timeout_minutos'] * 60
+    ultima = ticket['ultima_mensagem_em']
+    inativo = _segundos(agora - ultima) if ultima is not None else None
+
+    if not pretendida:
+        if inativo is not None and inativo < timeout:
+            return None
+        return 'aviso' if ticket['enviar_aviso'] else 'fechamento'
+
+    if inativo is None or inativo >= timeout:
+        return 'fechamento'
+    if ticket['enviar_aviso'] and inativo >= timeout - ticket['aviso_minutos_antes'] * 60:
+        return 'aviso'
+    return None
+
+
+def prazo_sla_minimo(ticket):
+    """(prazo, minutos totais) como no calcularDeadline, ou None."""
+    criado = ticket['created_at'] or ticket['data_abertura'] or ticket['updated_at']
+    if criado is None:
+        return None
+    if ticket['sla_expires_at'] is not None:
+        prazo = ticket['sla_expires_at']
+        return prazo, max(1, _segundos(prazo - criado) / 60)
+    if ticket['sla_target_minutes'] and ticket['sla_target_minutes'] > 0:
+        return criado + timedelta(minutes=ticket['sla_target_minutes']), ticket['sla_target_minutes']
+    prioridade = (ticket['prioridade'] or 'MEDIA').upper()
+    severidade = (ticket['severity'] or 'MEDIA').upper()
+    base = BASE_POR_PRIORIDADE.get(prioridade, BASE_POR_PRIORIDADE['MEDIA'])
+    total = max(1, _arredondar_js(base * FATOR_SEVERIDADE.get(severidade, 1)))
+    return criado + timedelta(minutes=total), total
+
+
+def avaliar_sla_minimo(ticket, agora, limiar=LIMIAR_ALERTA):
+    prazo = prazo_sla_minimo(ticket)
+    if prazo is None:
+        return None
+    restante = _segundos(prazo[0] - agora)
+    total = prazo[1] * 60
+    if total <= 0:
+        return None
+    if restante <= 0:
+        return 'violacao'
+    if 1 - restante / total >= limiar:
+        return 'alerta'
+    return None
+
+
+def prioridade_sla_config(prioridade):
+    p = (prioridade or 'MEDIA').lower()
+    return 'normal' if p == 'media' else p
+
+
+class RegrasSla:
+    """sla_configs indexadas por (empresa, prioridade, canal), com canal None = genérica."""
+
+    def __init__(self, configs):
+        self._por_chave = {}
+        self._empresas = {cfg['empresa_id'] for cfg in configs}
+        for cfg in configs:
+            chave = (cfg['empresa_id'], (cfg['prioridade'] or '').lower(), cfg['canal'] or None)
+            self._por_chave.setdefault(chave, cfg)
+
+    def __bool__(self):
+        return bool(self._por_chave)
+
+    def config(self, ticket):
+        prioridade = prioridade_sla_config(ticket['prioridade'])
+        return (self._por_chave.get((ticket['empresa_id'], prioridade, ticket['canal']))
+                or self._por_chave.get((ticket['empresa_id'], prioridade, None)))
+
+    def avaliar(self, ticket, agora):
+        """'resposta-violada', 'resposta-em-risco', 'resolucao-...', 'sem-config' ou None.
+
+        Empresa sem nenhuma sla_config não entra (None).
+        """
+        if ticket['empresa_id'] not in self._empresas:
+            return None
+        cfg = self.config(ticket)
+        if cfg is None:
+            return 'sem-config'
+        criado = ticket['created_at']
+        if ticket['data_primeira_resposta'] is None:
+            etapa, limite = 'resposta', cfg['tempo_resposta']
+        else:
+            etapa, limite = 'resolucao', cfg['tempo_resolucao']
+        if not limite or criado is None:
+            return None
+        decorrido = math.floor(_segundos(agora - criado) / 60)
+        percentual = math.floor(decorrido / limite * 100)
+        if percentual >= 100:
+            return f'{etapa}-violada'
+        if percentual >= cfg['alerta_percentual']:
+            return f'{etapa}-em-risco'
+        return None
+
+
+# ----------------------------------------------------------------------
+# Avaliação de todas as empresas
+# ----------------------------------------------------------------------
+
+class Empresa:
+    def __init__(self, empresa_id):
+        self.id = empresa_id
+        self.lacos = {}               # config_id -> Counter(candidatos, inativos, buscas)
+        self.inatividade = Counter()  # ação -> tickets
+        self.avisos_por_ciclo = 0     # mensagens (um aviso por laço que traz o ticket)
+        self.sla = Counter()
+        self.sla_fora_do_lote = 0
+        self.sla_fechados_notificados = 0
+        self.regras = Counter()
+        self.tickets = 0
+        self.custo = {}
+
+    def laco(self, config_id):
+        if config_id not in self.lacos:
+            self.lacos[config_id] = Counter()
+        return self.lacos[config_id]
+
+
+def avaliar(linhas, agora, regras_sla=None, pretendida=False, limiar=LIMIAR_ALERTA, lote_sla=LOTE_SLA,
+            empresas=None, saida=None):
+    """Percorre as linhas do SQL_TICKETS uma vez e acumula por empresa."""
+    empresas = empresas if empresas is not None else {}
+    for linha in linhas:
+        t = dict(zip(COLUNAS, linha)) if not isinstance(linha, dict) else linha
+        emp = empresas.get(t['empresa_id'])
+        if emp is None:
+            emp = empresas[t['empresa_id']] = Empresa(t['empresa_id'])
+        emp.tickets += 1
+
+        if t['lacos']:
+            acao = avaliar_inatividade(t, agora, pretendida)
+            # findOne do departamento e, se não achou, o global
+            buscas = 2 if t['departamento_id'] and not t['config_departamento'] else 1
+            for config_id in t['lacos']:
+                contagem = emp.laco(config_id)
+                contagem['candidatos'] += 1
+                contagem['buscas'] += buscas
+                if acao in ('aviso', 'fechamento'):
+                    contagem[acao] += 1
+            if acao:
+                emp.inatividade[acao] += 1
+                if acao == 'aviso':
+                    emp.avisos_por_ciclo += 1 if pretendida else len(t['lacos'])
+                if saida and acao != 'sem-config':
+                    saida.registrar('inatividade', t, acao)
+
+        if t['status'] == 'ENCERRADO':
+            continue
+
+        evento = avaliar_sla_minimo(t, agora, limiar)
+        if evento:
+            if t['posicao_sla'] > lote_sla:
+                emp.sla_fora_do_lote += 1
+            else:
+                emp.sla[evento] += 1
+                if t['status'] in STATUS_SEM_SLA:
+                    emp.sla_fechados_notificados += 1
+                if saida:
+                    saida.registrar('sla-minimo', t, evento)
+
+        if regras_sla and t['status'] not in STATUS_SEM_SLA:
+            resultado = regras_sla.avaliar(t, agora)
+            if resultado:
+                emp.regras[resultado] += 1
+                if saida and resultado != 'sem-config':
+                    saida.registrar('sla-configs', t, resultado)
+    return empresas
+
+
+def projetar_custos(empresas, ids_ativas, configs_por_empresa, ms_consulta=MS_CONSULTA, ms_envio=MS_ENVIO,
+                    ms_notificacao=MS_NOTIFICACAO, intervalo_sla=INTERVALO_SLA,
+                    resfriamento=RESFRIAMENTO, lote_sla=LOTE_SLA):
+    """Custo estimado (ms) de um ciclo de cada monitor em cada empresa ativa.
+
+    O lote de 200 de cada laço não tem ordem: as ações por ciclo são a fração
+    esperada dos candidatos inativos que cabem no lote.
+    """
+    for empresa_id in ids_ativas:
+        if empresa_id not in empresas:
+            empresas[empresa_id] = Empresa(empresa_id)
+
+    for emp in empresas.values():
+        consultas = 1  # configs da empresa
+        envios = 0.0
+        for config_id in configs_por_empresa.get(emp.id, ()):
+            c = emp.lacos.get(config_id, Counter())
+            fracao = min(1.0, LOTE_INATIVIDADE / c['candidatos']) if c['candidatos'] else 0.0
+            fechamentos = c['fechamento'] * fracao
+            consultas += 1 + c['buscas'] * fracao + fechamentos
+            envios += c['aviso'] * fracao + fechamentos
+        ciclo_inatividade = consultas * ms_consulta + envios * ms_envio
+
+        eventos_sla = sum(emp.sla.values())
+        vistos_sla = min(lote_sla, emp.tickets)
+        ciclo_sla = ms_consulta + vistos_sla * ms_consulta / 100 + eventos_sla * ms_notificacao
+        # Com o cache de resfriamento, cada evento que persiste repete a cada max(intervalo, resfriamento)
+        repeticao = max(intervalo_sla, resfriamento)
+
+        emp.custo = {
+            'inatividade_ms': ciclo_inatividade,
+            'inatividade_envios': envios,
+            'sla_ms': ciclo_sla,
+            'sla_notificacoes_hora': eventos_sla * 3600 / repeticao,
+        }
+    return empresas
+
+
+def medir_consultas(conn, empresas, quantas, lote_sla=LOTE_SLA):
+    """Mediana (ms) das consultas de lote dos dois serviços nas maiores empresas."""
+    maiores = sorted(empresas.values(), key=lambda e: -e.tickets)[:quantas]
+    tempos = []
+    with conn.cursor() as cursor:
+        for emp in maiores:
+            for sql, params in ((SQL_LOTE_INATIVIDADE, (emp.id,)), (SQL_LOTE_SLA, (emp.id, lote_sla))):
+                inicio = time.perf_counter()
+                cursor.execute(sql, params)
+                cursor.fetchall()
+                tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos) if tempos else None
+
+
+# ----------------------------------------------------------------------
+# Configurações suspeitas
+# ----------------------------------------------------------------------
+
+def avisos_inatividade(configs):
+    avisos = []
+    globais = Counter(c['empresa_id'] for c in configs if not c['departamento_id'])
+    for empresa_id, qtd in globais.items():
+        if qtd > 1:
+            avisos.append((empresa_id, f'{qtd} configurações globais ativas (o findOne pega qualquer uma)'))
+    for c in configs:
+        rotulo = f"config {c['id'][:8]}" + (f" (depto {c['departamento_id'][:8]})" if c['departamento_id'] else ' (global)')
+        if c['timeout_minutos'] is None or c['timeout_minutos'] <= 0:
+            avisos.append((c['empresa_id'], f'{rotulo}: timeout_minutos {c["timeout_minutos"]}'))
+        elif c['timeout_minutos'] < 15:
+            avisos.append((c['empresa_id'], f'{rotulo}: timeout de {c["timeout_minutos"]} min'))
+        if c['enviar_aviso']:
+            if (c['aviso_minutos_antes'] or 0) >= (c['timeout_minutos'] or 0):
+                avisos.append((c['empresa_id'], f'{rotulo}: aviso_minutos_antes >= timeout_minutos'))
+            avisos.append((c['empresa_id'], f'{rotulo}: enviar_aviso ligado: o serviço reavisa a cada ciclo e não fecha'))
+        status = c['status_aplicaveis']
+        if isinstance(status, list) and status:
+            desconhecidos = sorted(set(status) - set(STATUS_CONHECIDOS))
+            if desconhecidos:
+                avisos.append((c['empresa_id'], f'{rotulo}: status_aplicaveis desconhecidos {desconhecidos}'))
+            if 'ENCERRADO' in status or 'CONCLUIDO' in status:
+                avisos.append((c['empresa_id'], f'{rotulo}: status_aplicaveis inclui ticket já fechado'))
+        if c['departamento_id'] and c['departamento_empresa'] not in (None, c['empresa_id']):
+            avisos.append((c['empresa_id'], f'{rotulo}: departamento de outra empresa'))
+        elif c['departamento_id'] and c['departamento_empresa'] is None:
+            avisos.append((c['empresa_id'], f'{rotulo}: departamento inexistente'))
+    return avisos
+
+
+def avisos_sla_configs(configs):
+    avisos = []
+    chaves = Counter()
+    for c in configs:
+        rotulo = f"sla_config {c['nome']!r}"
+        prioridade = c['prioridade'] or ''
+        chaves[(c['empresa_id'], prioridade.lower(), c['canal'] or None)] += 1
+        if prioridade.lower() not in PRIORIDADES_SLA_CONFIG:
+            avisos.append((c['empresa_id'], f'{rotulo}: prioridade {prioridade!r} desconhecida'))
+        if c['canal'] and c['canal'] not in CANAIS_SLA_CONFIG:
+            avisos.append((c['empresa_id'], f'{rotulo}: canal {c["canal"]!r} não casa com nenhum canal'))
+        if not 0 < (c['alerta_percentual'] or 0) < 100:
+            avisos.append((c['empresa_id'], f'{rotulo}: alertaPercentual {c["alerta_percentual"]}'))
+        if c['tempo_resposta'] > c['tempo_resolucao']:
+            avisos.append((c['empresa_id'], f'{rotulo}: tempo de resposta maior que o de resolução'))
+    for (empresa_id, prioridade, canal), qtd in chaves.items():
+        if qtd > 1:
+            avisos.append((empresa_id, f'{qtd} sla_configs ativas para ({prioridade}, {canal or "todos"})'))
+    literais = [c for c in configs if (c['prioridade'] or '') != (c['prioridade'] or '').upper()]
+    if literais:
+        avisos.append(('*', f'{len(literais)} sla_config(s) com prioridade em minúsculas ou "normal": a busca '
+                            f'literal do SlaService com a prioridade do ticket (MEDIA, ALTA...) não as encontra'))
+    return avisos
+
+
+# ----------------------------------------------------------------------
+# Saída
+# ----------------------------------------------------------------------
+
+class SaidaAcoes:
+    """JSONL com uma linha por ticket e monitor."""
+
+    def __init__(self, caminho):
+        self._arquivo = open(caminho, 'w', encoding='utf-8') if caminho else None
+
+    def __bool__(self):
+        return self._arquivo is not None
+
+    def registrar(self, monitor, ticket, acao):
+        self._arquivo.write(json.dumps({
+            'monitor': monitor, 'acao': acao, 'empresa_id': ticket['empresa_id'],
+            'ticket_id': ticket['id'], 'numero': ticket['numero'], 'status': ticket['status'],
+        }, ensure_ascii=False) + '\n')
+
+    def fechar(self):
+        if self._arquivo:
+            self._arquivo.close()
+
+
+def _ms(ms):
+    return formatar_duracao(ms)
+
+
+def imprimir_resumo(empresas, intervalo_inatividade, intervalo_sla, limite_fechamentos, pretendida, top):
+    total = Counter()
+    for emp in empresas.values():
+        total.update(emp.inatividade)
+        total.update({f'sla-{k}': v for k, v in emp.sla.items()})
+        total.update({f'regra-{k}': v for k, v in emp.regras.items()})
+        total['sla-fora-do-lote'] += emp.sla_fora_do_lote
+        total['sla-fechados'] += emp.sla_fechados_notificados
+        total['avisos-ciclo'] += emp.avisos_por_ciclo
+        total['tickets'] += emp.tickets
+
+    ciclo_inat = sum(e.custo.get('inatividade_ms', 0) for e in empresas.values())
+    ciclo_sla = sum(e.custo.get('sla_ms', 0) for e in empresas.values())
+
+    print(f"\n🏢 {len(empresas)} empresa(s) ativa(s), {total['tickets']} ticket(s) avaliado(s)")
+    print(f"\n💤 Inatividade ({'configuração' if pretendida else 'comportamento do serviço'})")
+    print(f"   fechados:             {total['fechamento']:>8}")
+    print(f"   avisados:             {total['aviso']:>8}   ({total['avisos-ciclo']} mensagem(ns) por ciclo)")
+    print(f"   sem configuração:     {total['sem-config']:>8}")
+    print(f"   ciclo estimado:       {_ms(ciclo_inat):>8}   (intervalo {_ms(intervalo_inatividade * 1000)})")
+
+    print("\n⏱️  SLA mínimo")
+    print(f"   violações:            {total['sla-violacao']:>8}")
+    print(f"   alertas:              {total['sla-alerta']:>8}")
+    print(f"   fora do lote:         {total['sla-fora-do-lote']:>8}   (nunca vistos pelo monitor)")
+    print(f"   concluídos/cancelados:{total['sla-fechados']:>8}   (notificados mesmo fechados)")
+    print(f"   ciclo estimado:       {_ms(ciclo_sla):>8}   (intervalo {_ms(intervalo_sla * 1000)})")
+    notificacoes = sum(e.custo.get('sla_notificacoes_hora', 0) for e in empresas.values())
+    print(f"   notificações/hora:    {notificacoes:>8.0f}")
+
+    regras = {k[len('regra-'):]: v for k, v in total.items() if k.startswith('regra-')}
+    if regras:
+        print("\n📏 Regras de sla_configs")
+        for nome, qtd in sorted(regras.items()):
+            print(f"   {nome:<22}{qtd:>8}")
+
+    for nome, ciclo, intervalo in (('inatividade', ciclo_inat, intervalo_inatividade), ('SLA', ciclo_sla, intervalo_sla)):
+        if ciclo > intervalo * 1000:
+            print(f"\n⚠️  Ciclo de {nome} ({_ms(ciclo)}) maior que o intervalo: ciclos vão se sobrepor")
+
+    print(f"\n{'empresa':<38}{'tickets':>9}{'fecha':>8}{'avisa':>8}{'viola':>8}{'alerta':>8}{'inativ.':>10}{'SLA':>10}")
+    for emp in sorted(empresas.values(), key=lambda e: -(e.custo.get('inatividade_ms', 0) + e.custo.get('sla_ms', 0)))[:top]:
+        print(f"{emp.id:<38}{emp.tickets:>9}{emp.inatividade['fechamento']:>8}{emp.inatividade['aviso']:>8}"
+              f"{emp.sla['violacao']:>8}{emp.sla['alerta']:>8}{_ms(emp.custo.get('inatividade_ms', 0)):>10}"
+              f"{_ms(emp.custo.get('sla_ms', 0)):>10}")
+
+    excessos = [e for e in empresas.values() if e.inatividade['fechamento'] > limite_fechamentos]
+    for emp in sorted(excessos, key=lambda e: -e.inatividade['fechamento']):
+        print(f"🚨 {emp.id}: {emp.inatividade['fechamento']} ticket(s) seriam fechados (limite {limite_fechamentos})")
+    return excessos
+
+
+def imprimir_avisos(avisos, limite=50):
+    if not avisos:
+        return
+    print(f"\n⚠️  {len(avisos)} aviso(s) de configuração")
+    for empresa_id, texto in avisos[:limite]:
+        print(f"   {empresa_id[:8]}  {texto}")
+    if len(avisos) > limite:
+        print(f"   ... +{len(avisos) - limite}")
+
+
+def para_dict(empresas):
+    return [{
+        'empresa_id': e.id,
+        'tickets': e.tickets,
+        'inatividade': dict(e.inatividade),
+        'avisos_por_ciclo': e.avisos_por_ciclo,
+        'lacos': {k: dict(v) for k, v in e.lacos.items()},
+        'sla_minimo': dict(e.sla),
+        'sla_fora_do_lote': e.sla_fora_do_lote,
+        'sla_fechados_notificados': e.sla_fechados_notificados,
+        'sla_configs': dict(e.regras),
+        'custo': e.custo,
+    } for e in empresas.values()]
+
+
+# ----------------------------------------------------------------------
+# CLI
+# ----------------------------------------------------------------------
+
+def carregar(conn, empresas_filtro):
+    with conn.cursor() as cursor:
+        cursor.execute(SQL_AGORA)
+        agora = cursor.fetchone()[0]
+        cursor.execute(SQL_EMPRESAS)
+        ativas = [r[0] for r in cursor.fetchall()]
+        cursor.execute(SQL_CONFIGS_INATIVIDADE)
+        configs = [dict(zip(('id', 'empresa_id', 'departamento_id', 'timeout_minutos', 'enviar_aviso',
+                             'aviso_minutos_antes', 'status_aplicaveis', 'departamento_empresa'), r))
+                   for r in cursor.fetchall()]
+        cursor.execute(SQL_SLA_CONFIGS)
+        sla_configs = [dict(zip(('id', 'empresa_id', 'nome', 'prioridade', 'canal', 'tempo_resposta',
+                                 'tempo_resolucao', 'alerta_percentual'), r))
+                       for r in cursor.fetchall()]
+    if empresas_filtro:
+        ativas = [e for e in ativas if e in empresas_filtro]
+        configs = [c for c in configs if c['empresa_id'] in empresas_filtro]
+        sla_configs = [c for c in sla_configs if c['empresa_id'] in empresas_filtro]
+    return agora, ativas, configs, sla_configs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Simulação dos monitores de inatividade e SLA em todas as empresas')
+    parser.add_argument('--empresa', action='append', help='Limita às empresas (pode repetir)')
+    parser.add_argument('--daqui', type=float, default=0, help='Avalia daqui a N minutos (padrão: agora)')
+    parser.add_argument('--pretendida', action='store_true',
+                        help='Inatividade pelo que a configuração descreve, não pelo que o serviço faz hoje')
+    parser.add_argument('--limiar', type=float, default=LIMIAR_ALERTA, help='SLA_WARNING_THRESHOLD')
+    parser.add_argument('--lote-sla', type=int, default=LOTE_SLA, help='SLA_MONITOR_BATCH')
+    parser.add_argument('--intervalo-sla', type=float, default=INTERVALO_SLA, help='Segundos entre ciclos do SLA')
+    parser.add_argument('--ms-consulta', type=float, default=MS_CONSULTA)
+    parser.add_argument('--ms-envio', type=float, default=MS_ENVIO, help='Envio de WhatsApp (aviso/fechamento)')
+    parser.add_argument('--ms-notificacao', type=float, default=MS_NOTIFICACAO)
+    parser.add_argument('--medir', type=int, default=0,
+                        help='Cronometra as consultas de lote nas N maiores empresas e usa a mediana')
+    parser.add_argument('--limite-fechamentos', type=int, default=LIMITE_FECHAMENTOS,
+                        help=f'Fechamentos por empresa que disparam o alerta (padrão: {LIMITE_FECHAMENTOS})')
+    parser.add_argument('--top', type=int, default=20, help='Empresas listadas')
+    parser.add_argument('--saida', help='JSONL com as ações por ticket')
+    parser.add_argument('--json', help='Grava o resultado por empresa em JSON')
+    args = parser.parse_args(argv)
+
+    from conectcrm_ops.db import conexao, ler_em_fluxo
+
+    filtro = set(args.empresa or ())
+    saida = SaidaAcoes(args.saida)
+    inicio = time.perf_counter()
+    try:
+        with conexao() as conn:
+            agora, ativas, configs, sla_configs = carregar(conn, filtro)
+            agora += timedelta(minutes=args.daqui)
+            regras = RegrasSla(sla_configs)
+            empresas = avaliar(ler_em_fluxo(conn, SQL_TICKETS, {'empresas': sorted(filtro) or None}, itersize=20000),
+                               agora, regras, args.pretendida, args.limiar, args.lote_sla, saida=saida)
+            ms_consulta = args.ms_consulta
+            if args.medir:
+                medido = medir_consultas(conn, empresas, args.medir, args.lote_sla)
+                if medido is not None:
+                    print(f"📐 Consulta de lote: mediana {medido:.1f} ms em {args.medir} empresa(s)")
+                    ms_consulta = medido
+    finally:
+        saida.fechar()
+
+    print(f"🔎 Avaliação em {time.perf_counter() - inicio:.1f}s (referência: {agora:%Y-%m-%d %H:%M})")
+
+    configs_por_empresa = defaultdict(list)
+    for c in configs:
+        configs_por_empresa[c['empresa_id']].append(c['id'])
+    projetar_custos(empresas, ativas, configs_por_empresa, ms_consulta, args.ms_envio, args.ms_notificacao,
+                    args.intervalo_sla, RESFRIAMENTO, args.lote_sla)
+
+    excessos = imprimir_resumo(empresas, INTERVALO_INATIVIDADE, args.intervalo_sla, args.limite_fechamentos,
+                               args.pretendida, args.top)
+    imprimir_avisos(avisos_inatividade(configs) + avisos_sla_configs(sla_configs))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(para_dict(empresas), f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Resultado gravado em {args.json}")
+    return 2 if excessos else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
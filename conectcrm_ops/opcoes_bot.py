@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Simulação em lote do findOpcoesParaBot (nucleo.service.ts)
+
+Busca os núcleos visíveis no bot e os departamentos visíveis de cada um em uma
+única consulta (departamentos agregados por núcleo em um CTE), para uma
+empresa, para uma lista de empresas ou para todas de uma vez.
+
+Uso:
+    python -m conectcrm_ops.opcoes_bot --empresa f47ac10b-58cc-4372-a567-0e02b2c3d479
+    python -m conectcrm_ops.opcoes_bot --todas --json
+"""
+
+import argparse
+import json
+import sys
+
+SQL_OPCOES_BOT = """
+    WITH deps AS (
+        SELECT
+            d.nucleo_id,
+            json_agg(
+                json_build_object(
+                    'id', d.id,
+                    'nome', d.nome,
+                    'descricao', d.descricao,
+                    'cor', d.cor,
+                    'icone', d.icone
+                )
+                ORDER BY d.ordem ASC, d.nome ASC
+            ) AS departamentos
+        FROM departamentos d
+        WHERE d.ativo = true
+          AND d.visivel_no_bot = true
+          {filtro_departamentos}
+        GROUP BY d.nucleo_id
+    )
+    SELECT
+        n.empresa_id,
+        n.id,
+        n.nome,
+        n.descricao,
+        n.cor,
+        n.icone,
+        n.prioridade,
+        n.horario_funcionamento,
+        n.timezone,
+        n.mensagem_boas_vindas,
+        n.mensagem_fora_horario,
+        n.atendentes_ids::text[] AS atendentes_ids,  -- uuid[] chega como string sem register_uuid()
+        COALESCE(deps.departamentos, '[]'::json) AS departamentos
+    FROM nucleos_atendimento n
+    LEFT JOIN deps ON deps.nucleo_id = n.id
+    WHERE n.ativo = true
+      AND n.visivel_no_bot = true
+      {filtro_nucleos}
+    ORDER BY n.empresa_id, n.prioridade ASC, n.nome ASC
+"""
+
+
+def montar_consulta(empresa_ids=None):
+    """SQL + parâmetros; empresa_ids=None consulta todas as empresas"""
+    if empresa_ids is None:
+        return SQL_OPCOES_BOT.format(filtro_departamentos='', filtro_nucleos=''), ()
+
+    sql = SQL_OPCOES_BOT.format(
+        filtro_departamentos='AND d.empresa_id = ANY(%s::uuid[])',
+        filtro_nucleos='AND n.empresa_id = ANY(%s::uuid[])',
+    )
+    ids = [str(e) for e in empresa_ids]
+    return sql, (ids, ids)
+
+
+def linha_para_nucleo(linha):
+    (empresa_id, nucleo_id, nome, descricao, cor, icone, prioridade, horario,
+     timezone, boas_vindas, fora_horario, atendentes, departamentos) = linha
+
+    if isinstance(horario, str):
+        horario = json.loads(horario) if horario else None
+    if isinstance(departamentos, str):
+        departamentos = json.loads(departamentos)
+
+    return str(empresa_id), {
+        'id': str(nucleo_id),
+        'nome': nome,
+        'descricao': descricao,
+        'cor': cor,
+        'icone': icone,
+        'prioridade': prioridade,
+        'mensagemBoasVindas': boas_vindas,
+        'mensagemForaHorario': fora_horario,
+        'horarioFuncionamento': horario,
+        'timezone': timezone,
+        'atendentesIds': [str(a) for a in (atendentes or [])],
+        'departamentos': departamentos or [],
+    }
+
+
+def buscar_opcoes_para_bot(cursor, empresa_ids=None, exigir_departamentos=False):
+    """
+    Retorna {empresa_id: [núcleo, ...]} na ordem do menu do bot.
+
+    exigir_departamentos=True reproduz a regra antiga (núcleo só aparece com
+    pelo menos um departamento visível), usada no testar-nucleos-bot.py.
+    """
+    sql, params = montar_consulta(empresa_ids)
+    cursor.execute(sql, params)
+
+    resultado = {str(e): [] for e in (empresa_ids or [])}
+    for linha in cursor:
+        empresa_id, nucleo = linha_para_nucleo(linha)
+        if exigir_departamentos and not nucleo['departamentos']:
+            continue
+        resultado.setdefault(empresa_id, []).append(nucleo)
+
+    return resultado
+
+
+def main(argv=None):
+    from conectcrm_ops.db import conectar
+
+    parser = argparse.ArgumentParser(description='Simula findOpcoesParaBot para uma ou várias empresas')
+    parser.add_argument('--empresa', action='append', help='ID da empresa (pode repetir)')
+    parser.add_argument('--todas', action='store_true', help='Consulta todas as empresas')
+    parser.add_argument('--exigir-departamentos', action='store_true',
+                        help='Oculta núcleos sem departamento visível (regra legada)')
+    parser.add_argument('--json', action='store_true', help='Imprime o resultado em JSON')
+    args = parser.parse_args(argv)
+
+    if not args.todas and not args.empresa:
+        parser.error('informe --empresa ou --todas')
+
+    conn = conectar()
+    try:
+        with conn.cursor() as cursor:
+            resultado = buscar_opcoes_para_bot(
+                cursor, None if args.todas else args.empresa, args.exigir_departamentos
+            )
+    finally:
+        conn.close()
+
+    if args.json:
+        print(json.dumps(resultado, indent=2, ensure_ascii=False, default=str))
+        return 0
+
+    for empresa_id, nucleos in resultado.items():
+        print(f"🏢 Empresa {empresa_id}: {len(nucleos)} núcleo(s) no bot")
+        for i, nucleo in enumerate(nucleos, 1):
+            print(f"   {i}. {nucleo['nome']} ({len(nucleo['departamentos'])} departamento(s))")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+"""
+Patches atômicos na estrutura dos fluxos de triagem
+
+Operações no estilo JSON Patch (RFC 6902), com caminhos relativos a
+fluxos_triagem.estrutura:
+
+    {"op": "replace", "path": "/etapas/boas-vindas/opcoes", "value": [...]}
+    {"op": "add",     "path": "/etapas/despedida-cancelamento", "value": {...}}
+    {"op": "add",     "path": "/etapas/menu/opcoes/-", "value": {...}}
+    {"op": "remove",  "path": "/etapas/etapa-antiga"}
+    {"op": "test",    "path": "/etapaInicial", "value": "boas-vindas"}
+
+As operações viram uma única expressão aninhada de jsonb_set / jsonb_insert /
+#- (o PostgreSQL só reescreve os trechos tocados, não a estrutura montada no
+Python), e os "test" viram condições do WHERE. Fluxos que recebem o mesmo
+patch são atualizados por um único UPDATE ... FROM (VALUES ...).
+
+Diferenças em relação à RFC: todo "test" é avaliado contra a estrutura de
+antes do patch, em qualquer posição da lista (no SQL e em memória). Como na
+RFC, "replace" exige que o alvo exista e "add" exige que o pai exista: se
+nenhuma operação anterior os criou, a existência vira outra condição do WHERE;
+caminho removido antes no mesmo patch é rejeitado já na validação.
+
+Concorrência otimista: cada alvo pode informar a versao que o operador leu.
+Se outro patch tiver incrementado a versao (ou um "test" falhar), nada é
+gravado e ConflitoVersao é levantada.
+
+Uso:
+    python -m conectcrm_ops.patch patch.json --fluxo ce74c2f3-... --versao 12
+    python -m conectcrm_ops.patch lote.json --dry-run
+"""
+
+import argparse
+import json
+import sys
+
+OPERACOES = ('add', 'replace', 'remove', 'test')
+
+
+class ConflitoVersao(Exception):
+    """Algum fluxo mudou desde a leitura (versao diferente ou test falhou)"""
+
+    def __init__(self, fluxo_ids):
+        self.fluxo_ids = list(fluxo_ids)
+        super().__init__(f"fluxo(s) alterado(s) por outra operação: {', '.join(self.fluxo_ids)}")
+
+
+def ler_caminho(path):
+    """'/etapas/boas-vindas' ou ['etapas', 'boas-vindas'] -> ['etapas', 'boas-vindas']"""
+    if isinstance(path, (list, tuple)):
+        return [str(p) for p in path]
+    if not isinstance(path, str) or not path.startswith('/'):
+        raise ValueError(f"caminho inválido: {path!r} (use JSON Pointer, ex.: /etapas/boas-vindas)")
+    return [p.replace('~1', '/').replace('~0', '~') for p in path[1:].split('/')]
+
+
+def _indice_array(segmento):
+    return segmento == '-' or segmento.lstrip('-').isdigit()
+
+
+def normalizar_operacoes(operacoes):
+    """Valida e converte as operações para tuplas (op, caminho, valor)"""
+    normalizadas = []
+    for i, operacao in enumerate(operacoes):
+        op = operacao.get('op')
+        if op not in OPERACOES:
+            raise ValueError(f"operação {i}: op {op!r} não suportada (use {', '.join(OPERACOES)})")
+        caminho = ler_caminho(operacao.get('path'))
+        if not caminho or caminho == ['']:
+            raise ValueError(f"operação {i}: não é possível alterar a raiz da estrutura")
+        if op != 'remove' and 'value' not in operacao:
+            raise ValueError(f"operação {i}: '{op}' exige 'value'")
+        normalizadas.append((op, caminho, operacao.get('value')))
+    return normalizadas
+
+
+def _cobre(prefixo, caminho):
+    return caminho[:len(prefixo)] == prefixo
+
+
+def reduzir_operacoes(operacoes):
+    """
+    Remove escritas que uma operação posterior sobrescreve por inteiro
+    (mesmo caminho ou caminho pai). Caminhos com índice de array ficam como
+    estão, já que inserções deslocam as posições seguintes.
+    """
+    resultado = []
+    for i, (op, caminho, valor) in enumerate(operacoes):
+        if op != 'test' and not any(_indice_array(s) for s in caminho):
+            sobrescrita = any(
+                op_depois in ('replace', 'remove') or (op_depois == 'add' and not _indice_array(caminho_depois[-1]))
+                for op_depois, caminho_depois, _ in operacoes[i + 1:]
+                if not any(_indice_array(s) for s in caminho_depois) and _cobre(caminho_depois, caminho)
+            )
+            if sobrescrita:
+                continue
+        resultado.append((op, caminho, valor))
+    return resultado
+
+
+def _resolver(documento, caminho):
+    """(True, valor) se o caminho existe no documento, senão (False, None)"""
+    atual = documento
+    try:
+        for segmento in caminho:
+            if isinstance(atual, list):
+                atual = atual[int(segmento)]
+            elif isinstance(atual, dict):
+                atual = atual[segmento]
+            else:
+                return False, None
+    except (KeyError, IndexError, ValueError):
+        return False, None
+    return True, atual
+
+
+def caminhos_exigidos(operacoes):
+    """
+    Caminhos que precisam existir na estrutura original: o alvo de cada
+    "replace" e o pai de cada "add", quando nenhuma operação anterior do patch
+    os escreveu. Levanta ValueError quando o caminho foi removido antes ou não
+    está no valor gravado por uma operação anterior.
+    """
+    exigidos = []
+    for i, (op, caminho, _) in enumerate(operacoes):
+        if op == 'replace':
+            alvo, descricao = caminho, f"replace em {'/'.join(caminho)}"
+        elif op == 'add' and len(caminho) > 1:
+            alvo, descricao = caminho[:-1], f"add em {'/'.join(caminho)} sem {'/'.join(caminho[:-1])}"
+        else:
+            continue
+        for op_antes, caminho_antes, valor_antes in reversed(operacoes[:i]):
+            if op_antes == 'test' or not _cobre(caminho_antes, alvo):
+                continue
+            if op_antes == 'remove':
+                raise ValueError(f"operação {i}: {descricao} (removido antes no mesmo patch)")
+            if op_antes == 'add' and _indice_array(caminho_antes[-1]):
+                break  # inserção em array: posições deslocadas, sem como conferir
+            if not _resolver(valor_antes, alvo[len(caminho_antes):])[0]:
+                raise ValueError(f"operação {i}: {descricao} (inexistente no valor gravado antes)")
+            break
+        else:
+            exigidos.append(alvo)
+    return exigidos
+
+
+def compilar(operacoes, coluna='estrutura'):
+    """
+    Retorna (expressao_sql, params_expressao, condicao_sql, params_condicao).
+    Os valores e caminhos vão como parâmetros; nada do patch é interpolado no SQL.
+    """
+    normalizadas = normalizar_operacoes(operacoes)
+    condicoes, params_condicao = [], []
+    for caminho in caminhos_exigidos(normalizadas):
+        condicoes.append(f"{coluna} #> %s::text[] IS NOT NULL")
+        params_condicao.append(caminho)
+
+    expressao, params = coluna, []
+    for op, caminho, valor in reduzir_operacoes(normalizadas):
+        if op == 'test':
+            condicoes.append(f"{coluna} #> %s::text[] = %s::jsonb")
+            params_condicao += [caminho, json.dumps(valor, ensure_ascii=False)]
+        elif op == 'remove':
+            expressao = f"({expressao} #- %s::text[])"
+            params = params + [caminho]
+        elif op == 'add' and _indice_array(caminho[-1]):
+            # Inserção em array: '-' acrescenta no fim
+            if caminho[-1] == '-':
+                caminho, depois = caminho[:-1] + ['-1'], True
+            else:
+                depois = False
+            expressao = f"jsonb_insert({expressao}, %s::text[], %s::jsonb, {'true' if depois else 'false'})"
+            params = params + [caminho, json.dumps(valor, ensure_ascii=False)]
+        else:
+            # replace pode ter absorvido um add anterior (reduzir_operacoes): o alvo já
+            # foi conferido, então cria como o add faria; em array, posição fixa
+            criar = 'true' if op == 'add' or not any(_indice_array(s) for s in caminho) else 'false'
+            expressao = f"jsonb_set({expressao}, %s::text[], %s::jsonb, {criar})"
+            params = params + [caminho, json.dumps(valor, ensure_ascii=False)]
+
+    return expressao, params, ' AND '.join(condicoes), params_condicao
+
+
+def aplicar_em_memoria(estrutura, operacoes):
+    """
+    Mesma semântica do SQL compilado, sobre um dict (usado no rollout): "test",
+    alvos de "replace" e pais de "add" conferidos na estrutura original, antes
+    de qualquer escrita. Caminho intermediário inexistente nunca é criado.
+    """
+    operacoes = normalizar_operacoes(operacoes)
+    for caminho in caminhos_exigidos(operacoes):
+        if not _resolver(estrutura, caminho)[0]:
+            raise ConflitoVersao(['(em memória)'])
+    for op, caminho, valor in operacoes:
+        if op == 'test' and _resolver(estrutura, caminho) != (True, valor):
+            raise ConflitoVersao(['(em memória)'])
+
+    estrutura = json.loads(json.dumps(estrutura))
+    for op, caminho, valor in operacoes:
+        if op == 'test':
+            continue
+        pai = estrutura
+        try:
+            for segmento in caminho[:-1]:
+                pai = pai[int(segmento)] if isinstance(pai, list) else pai[segmento]
+        except (KeyError, IndexError, ValueError, TypeError):
+            if op == 'remove':
+                continue
+            raise ConflitoVersao(['(em memória)'])
+        chave = caminho[-1]
+
+        if op == 'remove':
+            if isinstance(pai, list):
+                pai.pop(int(chave))
+            else:
+                pai.pop(chave, None)
+        elif isinstance(pai, list):
+            if chave == '-':
+                pai.append(valor)
+            elif op == 'add':
+                pai.insert(int(chave), valor)
+            elif -len(pai) <= int(chave) < len(pai):
+                pai[int(chave)] = valor
+        elif op == 'add' or chave in pai:
+            # jsonb_set sem create_missing: replace em alvo ausente não cria
+            pai[chave] = valor
+    return estrutura
+
+
+def operacoes_para(antes, depois):
+    """Operações por etapa que transformam a estrutura antes em depois"""
+    operacoes = []
+    if not (isinstance(antes.get('etapas'), dict) and isinstance(depois.get('etapas'), dict)):
+        etapas_antes = etapas_depois = {}  # "etapas" inteiro entra no laço das chaves
+    else:
+        etapas_antes, etapas_depois = antes['etapas'], depois['etapas']
+
+    for chave in sorted(set(antes) | set(depois)):
+        if chave == 'etapas' and isinstance(antes.get('etapas'), dict) and isinstance(depois.get('etapas'), dict):
+            continue
+        if chave not in depois:
+            operacoes.append({'op': 'remove', 'path': [chave]})
+        elif chave not in antes or antes[chave] != depois[chave]:
+            op = 'replace' if chave in antes else 'add'
+            operacoes.append({'op': op, 'path': [chave], 'value': depois[chave]})
+
+    for etapa_id in etapas_antes:
+        if etapa_id not in etapas_depois:
+            operacoes.append({'op': 'remove', 'path': ['etapas', etapa_id]})
+    for etapa_id, etapa in etapas_depois.items():
+        if etapas_antes.get(etapa_id) != etapa:
+            op = 'replace' if etapa_id in etapas_antes else 'add'
+            operacoes.append({'op': op, 'path': ['etapas', etapa_id], 'value': etapa})
+
+    return operacoes
+
+
+LOTE_UPDATE = 500
+
+
+def montar_update(operacoes, alvos, publicar=False, retornar_estrutura=False):
+    """
+    UPDATE único para todos os alvos [(fluxo_id, versao_esperada|None)] que
+    recebem as mesmas operações. Retorna (sql, params).
+    """
+    expressao, params, condicao, params_condicao = compilar(operacoes, coluna='f.estrutura')
+    valores = ', '.join(['(%s::uuid, %s::integer)'] * len(alvos))
+    sql = f"""
+        UPDATE fluxos_triagem f
+        SET estrutura = {expressao},
+            versao = f.versao + 1,
+            updated_at = NOW(){', published_at = NOW()' if publicar else ''}
+        FROM (VALUES {valores}) AS alvo(id, versao)
+        WHERE f.id = alvo.id
+          AND (alvo.versao IS NULL OR f.versao = alvo.versao)
+          {('AND ' + condicao) if condicao else ''}
+        RETURNING f.id, f.versao{', f.publicado, f.estrutura' if retornar_estrutura else ''}
+    """
+    return sql, params + [v for alvo in alvos for v in alvo] + params_condicao
+
+
+def _agrupar(patches):
+    grupos = {}
+    for patch in patches:
+        chave = json.dumps(patch['operacoes'], sort_keys=True, ensure_ascii=False)
+        grupos.setdefault(chave, []).append((str(patch['fluxo_id']), patch.get('versao')))
+    return grupos
+
+
+SQL_TRAVAR = """
+    SELECT id, versao, publicado, estrutura
+    FROM fluxos_triagem
+    WHERE id = ANY(%s::uuid[])
+    FOR UPDATE
+"""
+
+
+def aplicar_patches(conn, patches, publicar=False, historico=None):
+    """
+    Aplica [{'fluxo_id', 'versao' (opcional), 'operacoes'}] em uma única transação.
+    Retorna {fluxo_id: nova_versao}; em conflito desfaz tudo e levanta ConflitoVersao.
+
+    historico: HistoricoFluxos opcional; recebe o estado anterior e o novo de
+    cada fluxo (só depois do commit).
+    """
+    novas_versoes = {}
+    registros = []
+    try:
+        with conn.cursor() as cursor:
+            if historico is not None:
+                cursor.execute(SQL_TRAVAR, ([str(p['fluxo_id']) for p in patches],))
+                registros += [(linha, 'snapshot') for linha in cursor.fetchall()]
+
+            for chave, alvos in _agrupar(patches).items():
+                operacoes = json.loads(chave)
+                for i in range(0, len(alvos), LOTE_UPDATE):
+                    lote = alvos[i:i + LOTE_UPDATE]
+                    cursor.execute(*montar_update(operacoes, lote, publicar, historico is not None))
+                    linhas = cursor.fetchall()
+                    atualizados = {str(linha[0]): linha[1] for linha in linhas}
+
+                    faltando = [fluxo_id for fluxo_id, _ in lote if fluxo_id not in atualizados]
+                    if faltando:
+                        raise ConflitoVersao(faltando)
+                    novas_versoes.update(atualizados)
+                    if historico is not None:
+                        registros += [((f, v, pub, est), 'patch') for f, v, pub, est in linhas]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    for (fluxo_id, versao, publicado, estrutura), evento in registros:
+        historico.registrar(fluxo_id, versao, estrutura, evento=evento, publicado=publicado)
+
+    return novas_versoes
+
+
+def ler_patches(dados, fluxo_ids=None, versao=None):
+    """Aceita uma lista de operações (aplicada em --fluxo) ou uma lista de patches"""
+    if isinstance(dados, dict):
+        dados = dados.get('patches', [dados])
+    if dados and all('op' in item for item in dados):
+        if not fluxo_ids:
+            raise ValueError('arquivo com operações soltas exige --fluxo')
+        return [{'fluxo_id': f, 'versao': versao, 'operacoes': dados} for f in fluxo_ids]
+    return dados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Aplica patches JSON na estrutura de fluxos de triagem')
+    parser.add_argument('arquivo', help='JSON com operações ou com [{fluxo_id, versao, operacoes}]')
+    parser.add_argument('--fluxo', action='append', help='Fluxo alvo das operações (pode repetir)')
+    parser.add_argument('--versao', type=int, help='Versão esperada (concorrência otimista)')
+    parser.add_argument('--publicar', action='store_true', help='Atualiza published_at junto')
+    parser.add_argument('--dry-run', action='store_true', help='Mostra o SQL compilado sem gravar')
+    parser.add_argument('--sem-historico', action='store_true', help='Não registra as versões no histórico em disco')
+    args = parser.parse_args(argv)
+
+    with open(args.arquivo, 'r', encoding='utf-8') as f:
+        patches = ler_patches(json.load(f), args.fluxo, args.versao)
+
+    if args.dry_run:
+        for chave, alvos in _agrupar(patches).items():
+            sql, params = montar_update(json.loads(chave), alvos, args.publicar)
+            print(f"📝 {len(alvos)} fluxo(s): {', '.join(f for f, _ in alvos)}")
+            print(sql)
+            print(f"   params: {json.dumps(params, ensure_ascii=False)[:500]}")
+        return 0
+
+    from conectcrm_ops.db import conectar
+    from conectcrm_ops.historico import HistoricoFluxos
+
+    historico = None if args.sem_historico else HistoricoFluxos()
+    conn = conectar()
+    try:
+        novas_versoes = aplicar_patches(conn, patches, args.publicar, historico)
+    except ConflitoVersao as e:
+        print(f"❌ Conflito: {e}")
+        print("   Nada foi gravado. Leia a versão atual e gere o patch novamente.")
+        return 2
+    finally:
+        conn.close()
+
+    for fluxo_id, versao in novas_versoes.items():
+        print(f"✅ {fluxo_id}: nova versão {versao}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
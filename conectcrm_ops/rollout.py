@@ -0,0 +1,538 @@
+# -*- coding: utf-8 -*-
+"""
+Rollout do fluxo padrão (template) para todas as empresas
+
+O template (ex.: fluxo-padrao-triagem-v3.json) é renderizado por empresa com:
+- o nome da empresa no lugar da marca do template (--marca) nos textos das etapas;
+- os núcleos habilitados em etapas['boas-vindas'].nucleosMenu (o FlowEngine
+  filtra o menu dinâmico por essa lista); aceita ids ou nomes de núcleo;
+- sobrescritas de mensagem ({"etapa-id": "texto"} ou {"/caminho": valor}) e
+  operações JSON Patch soltas, aplicadas com patch.aplicar_em_memoria.
+
+Arquivo de parâmetros (--parametros), todos os campos opcionais:
+    {"padrao":   {"mensagens": {...}},
+     "empresas": {"<empresa_id>": {"nome": "...", "nucleos": [...],
+                                   "mensagens": {...}, "operacoes": [...]}}}
+
+Cada fluxo gravado leva estrutura.metadata.template = {nome, hash, parametros}
+(hash do template e hash dos parâmetros efetivos da empresa). A sonda lê só
+esse trecho de todas as empresas em uma consulta, e quem já está no par
+(hash, parametros) é pulado sem renderizar. Na escrita, as linhas vão por
+COPY para uma tabela temporária e dois comandos set-based fazem o upsert
+(UPDATE ... FROM para quem tem o fluxo com --codigo, INSERT ... SELECT para
+quem não tem), com IS DISTINCT FROM na estrutura: linha igual nunca é
+reescrita nem tem a versao incrementada.
+
+Ondas: as empresas são ordenadas por md5(empresa_id), ordem estável entre
+execuções, e --ondas 1,10,50,100 são percentuais acumulados. --ate-onda
+para depois da onda indicada; rodar de novo com a próxima onda continua de
+onde parou, já que as empresas atualizadas são puladas.
+
+Uso:
+    python -m conectcrm_ops.rollout planejar fluxo-padrao-triagem-v3.json --parametros params.json
+    python -m conectcrm_ops.rollout aplicar fluxo-padrao-triagem-v3.json --ondas 1,10,100 --ate-onda 1
+    python -m conectcrm_ops.rollout status --codigo padrao-triagem
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import time
+
+from conectcrm_ops.historico import hash_objeto, json_canonico
+from conectcrm_ops.patch import ConflitoVersao, aplicar_em_memoria
+
+CODIGO_PADRAO = 'padrao-triagem'
+MARCA_PADRAO = 'ConectCRM'
+ONDAS_PADRAO = '1,10,50,100'
+LOTE = 500
+ETAPA_NUCLEOS = 'boas-vindas'
+
+UUID_REGEX = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', re.IGNORECASE)
+
+SQL_SONDA = """
+    SELECT
+        e.id,
+        e.nome,
+        f.id,
+        f.versao,
+        f.estrutura->'metadata'->'template'
+    FROM empresas e
+    LEFT JOIN LATERAL (
+        SELECT id, versao, estrutura
+        FROM fluxos_triagem
+        WHERE empresa_id = e.id AND codigo = %s
+        ORDER BY updated_at DESC
+        LIMIT 1
+    ) f ON true
+    {filtro}
+"""
+
+SQL_NUCLEOS = """
+    SELECT empresa_id, id, nome
+    FROM nucleos_atendimento
+    WHERE empresa_id = ANY(%s::uuid[])
+"""
+
+SQL_TEMPORARIA = """
+    CREATE TEMP TABLE rollout_fluxos (
+        empresa_id uuid,
+        fluxo_id uuid,
+        versao integer,
+        estrutura jsonb
+    ) ON COMMIT DROP
+"""
+
+SQL_ATUALIZAR = """
+    UPDATE fluxos_triagem f
+    SET estrutura = r.estrutura,
+        versao = f.versao + 1,
+        updated_at = NOW(){publicar}
+    FROM rollout_fluxos r
+    WHERE f.id = r.fluxo_id
+      AND f.versao = r.versao
+      AND f.estrutura IS DISTINCT FROM r.estrutura
+    RETURNING f.id
+"""
+
+SQL_INSERIR = """
+    INSERT INTO fluxos_triagem (empresa_id, nome, descricao, codigo, tipo, ativo, publicado, estrutura, published_at)
+    SELECT r.empresa_id, %s, %s, %s, %s, %s, %s, r.estrutura, CASE WHEN %s THEN NOW() END
+    FROM rollout_fluxos r
+    WHERE r.fluxo_id IS NULL
+    RETURNING id
+"""
+
+SQL_STATUS = """
+    SELECT
+        f.estrutura->'metadata'->'template'->>'hash' AS hash,
+        f.estrutura->'metadata'->'template'->>'nome' AS nome,
+        count(*) AS fluxos,
+        count(DISTINCT f.empresa_id) AS empresas,
+        count(*) FILTER (WHERE f.publicado) AS publicados
+    FROM fluxos_triagem f
+    WHERE f.codigo = %s
+    GROUP BY 1, 2
+    ORDER BY 4 DESC
+"""
+
+SQL_SEM_FLUXO = """
+    SELECT count(*)
+    FROM empresas e
+    WHERE NOT EXISTS (SELECT 1 FROM fluxos_triagem f WHERE f.empresa_id = e.id AND f.codigo = %s)
+"""
+
+
+# ----------------------------------------------------------------------
+# Template e parâmetros
+# ----------------------------------------------------------------------
+
+class Template:
+    """Payload do template (campos do fluxo + estrutura) e o hash da estrutura"""
+
+    def __init__(self, payload, nome_arquivo):
+        if 'estrutura' not in payload:
+            payload = {'estrutura': payload}
+        self.estrutura = payload['estrutura']
+        self.nome = (payload.get('nome') or os.path.splitext(nome_arquivo)[0])[:100]
+        self.descricao = payload.get('descricao')
+        self.tipo = payload.get('tipo') or 'arvore_decisao'
+        self.ativo = payload.get('ativo', True)
+        self.publicado = bool(payload.get('publicado'))
+        self.arquivo = nome_arquivo
+        self.hash = hash_objeto(self.estrutura)
+        self._json = json.dumps(self.estrutura, ensure_ascii=False)
+
+    @classmethod
+    def ler(cls, caminho):
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return cls(json.load(f), os.path.basename(caminho))
+
+    def copia(self):
+        # json.loads do texto já serializado é bem mais rápido que copy.deepcopy
+        return json.loads(self._json)
+
+
+def ler_parametros(caminho):
+    if not caminho:
+        return {'padrao': {}, 'empresas': {}}
+    with open(caminho, 'r', encoding='utf-8') as f:
+        dados = json.load(f)
+    return {
+        'padrao': dados.get('padrao') or {},
+        'empresas': {str(k).lower(): v for k, v in (dados.get('empresas') or {}).items()},
+    }
+
+
+def parametros_da_empresa(parametros, empresa_id, nome_empresa):
+    """Parâmetros efetivos: padrão + os da empresa (mensagens mescladas por chave)"""
+    padrao = parametros['padrao']
+    proprios = parametros['empresas'].get(str(empresa_id).lower(), {})
+    mensagens = dict(padrao.get('mensagens') or {})
+    mensagens.update(proprios.get('mensagens') or {})
+    return {
+        'nome': proprios.get('nome') or padrao.get('nome') or nome_empresa,
+        'nucleos': proprios.get('nucleos', padrao.get('nucleos')),
+        'mensagens': mensagens,
+        'operacoes': (padrao.get('operacoes') or []) + (proprios.get('operacoes') or []),
+    }
+
+
+def _trocar_marca(valor, marca, nome):
+    if isinstance(valor, str):
+        return valor.replace(marca, nome)
+    if isinstance(valor, list):
+        return [_trocar_marca(v, marca, nome) for v in valor]
+    if isinstance(valor, dict):
+        return {k: _trocar_marca(v, marca, nome) for k, v in valor.items()}
+    return valor
+
+
+def operacoes_de_mensagens(mensagens, etapas):
+    """
+    {"etapa-id": "texto"} -> add em /etapas/<id>/mensagem; chaves com / são
+    caminhos. Etapa que o template não tem é erro (id digitado errado no
+    params.json), não uma etapa nova.
+    """
+    operacoes = []
+    for chave, valor in mensagens.items():
+        if chave.startswith('/'):
+            caminho = chave
+        elif chave in etapas:
+            caminho = ['etapas', chave, 'mensagem']
+        else:
+            raise ValueError(f'mensagens: etapa "{chave}" não existe no template')
+        operacoes.append({'op': 'add', 'path': caminho, 'value': valor})
+    return operacoes
+
+
+def renderizar(template, parametros, marca=MARCA_PADRAO, nucleos_ids=None):
+    """Estrutura da empresa, com metadata.template preenchido"""
+    estrutura = template.copia()
+    if marca and parametros['nome'] and parametros['nome'] != marca:
+        estrutura['etapas'] = _trocar_marca(estrutura.get('etapas') or {}, marca, parametros['nome'])
+
+    if nucleos_ids is not None and ETAPA_NUCLEOS in estrutura.get('etapas', {}):
+        estrutura['etapas'][ETAPA_NUCLEOS]['nucleosMenu'] = nucleos_ids
+
+    operacoes = operacoes_de_mensagens(parametros['mensagens'], estrutura.get('etapas') or {})
+    operacoes += parametros['operacoes']
+    if operacoes:
+        try:
+            estrutura = aplicar_em_memoria(estrutura, operacoes)
+        except ConflitoVersao:
+            raise ValueError('operações: "test" falhou ou caminho inexistente no template renderizado')
+
+    metadata = estrutura.get('metadata')
+    if not isinstance(metadata, dict):
+        metadata = estrutura['metadata'] = {}
+    metadata['template'] = {
+        'nome': template.arquivo,
+        'hash': template.hash,
+        'parametros': hash_objeto(parametros),
+    }
+    return estrutura
+
+
+def resolver_nucleos(nucleos, nucleos_da_empresa):
+    """
+    Ids ou nomes (sem diferenciar maiúsculas) -> lista de ids.
+    nucleos_da_empresa: {nome_minusculo: id}. Levanta ValueError com os não encontrados.
+    """
+    ids, faltando = [], []
+    ids_da_empresa = set(nucleos_da_empresa.values())
+    for nucleo in nucleos:
+        if UUID_REGEX.match(str(nucleo)) and str(nucleo).lower() in ids_da_empresa:
+            ids.append(str(nucleo).lower())
+        elif str(nucleo).strip().lower() in nucleos_da_empresa:
+            ids.append(nucleos_da_empresa[str(nucleo).strip().lower()])
+        else:
+            faltando.append(str(nucleo))
+    if faltando:
+        raise ValueError(f"núcleo(s) não encontrado(s): {', '.join(faltando)}")
+    return ids
+
+
+# ----------------------------------------------------------------------
+# Planejamento
+# ----------------------------------------------------------------------
+
+def ordem_estavel(empresa_id):
+    return hashlib.md5(str(empresa_id).lower().encode('utf-8')).hexdigest()
+
+
+def ler_ondas(texto):
+    ondas = [float(p) for p in texto.split(',') if p.strip()]
+    if not ondas or any(b <= a for a, b in zip(ondas, ondas[1:])) or ondas[-1] > 100 or ondas[0] <= 0:
+        raise ValueError(f"ondas inválidas: {texto!r} (percentuais crescentes entre 0 e 100)")
+    if ondas[-1] != 100:
+        ondas.append(100.0)
+    return ondas
+
+
+def dividir_em_ondas(empresas, ondas):
+    """empresas (já em ordem estável) -> [[empresa, ...] por onda] com percentuais acumulados"""
+    resultado, inicio = [], 0
+    for percentual in ondas:
+        fim = min(len(empresas), math.ceil(len(empresas) * percentual / 100))
+        resultado.append(empresas[inicio:fim])
+        inicio = fim
+    return resultado
+
+
+class Empresa:
+    __slots__ = ('id', 'nome', 'fluxo_id', 'versao', 'marcador', 'parametros')
+
+    def __init__(self, linha, parametros):
+        self.id, self.nome, fluxo_id, self.versao, self.marcador = linha
+        self.id = str(self.id)
+        self.fluxo_id = str(fluxo_id) if fluxo_id else None
+        self.parametros = parametros_da_empresa(parametros, self.id, self.nome or '')
+
+    def em_dia(self, template):
+        return bool(self.marcador) \
+            and self.marcador.get('hash') == template.hash \
+            and self.marcador.get('parametros') == hash_objeto(self.parametros)
+
+
+def sondar(cursor, parametros, codigo, empresa_ids=None):
+    filtro, params = '', [codigo]
+    if empresa_ids:
+        filtro = 'WHERE e.id = ANY(%s::uuid[])'
+        params.append(list(empresa_ids))
+    cursor.execute(SQL_SONDA.format(filtro=filtro), params)
+    empresas = [Empresa(linha, parametros) for linha in cursor.fetchall()]
+    empresas.sort(key=lambda e: ordem_estavel(e.id))
+    return empresas
+
+
+def carregar_nucleos(cursor, empresas):
+    """{empresa_id: {nome_minusculo: id}} só das empresas com 'nucleos' nos parâmetros"""
+    alvo = [e.id for e in empresas if e.parametros['nucleos'] is not None]
+    if not alvo:
+        return {}
+    cursor.execute(SQL_NUCLEOS, (alvo,))
+    nucleos = {}
+    for empresa_id, nucleo_id, nome in cursor.fetchall():
+        nucleos.setdefault(str(empresa_id), {})[(nome or '').strip().lower()] = str(nucleo_id)
+    return nucleos
+
+
+def _bloqueantes(erros):
+    from conectcrm_ops.validador_dto import AVISO
+    return {(e['caminho'], e['regra']) for e in erros if e['nivel'] != AVISO}
+
+
+def preparar(empresas, template, nucleos, marca):
+    """
+    Renderiza as empresas pendentes e valida cada estrutura contra o
+    validador_dto: a renderização não pode introduzir erros que o template
+    não tem. Retorna (linhas [(empresa, estrutura)], falhas {empresa_id: motivo}).
+    """
+    from conectcrm_ops.validador_dto import validar_estrutura
+
+    base = _bloqueantes(validar_estrutura(template.estrutura))
+    linhas, falhas = [], {}
+    for empresa in empresas:
+        try:
+            nucleos_ids = None
+            if empresa.parametros['nucleos'] is not None:
+                nucleos_ids = resolver_nucleos(empresa.parametros['nucleos'], nucleos.get(empresa.id, {}))
+            estrutura = renderizar(template, empresa.parametros, marca, nucleos_ids)
+        except Exception as e:
+            falhas[empresa.id] = str(e)
+            continue
+        novos = _bloqueantes(validar_estrutura(estrutura)) - base
+        if novos:
+            falhas[empresa.id] = '; '.join(f'{caminho} ({regra})' for caminho, regra in sorted(novos)[:3])
+            continue
+        linhas.append((empresa, estrutura))
+    return linhas, falhas
+
+
+# ----------------------------------------------------------------------
+# Escrita
+# ----------------------------------------------------------------------
+
+def gravar_lote(conn, linhas, template, codigo, publicar=False):
+    """
+    Upsert de um lote em uma transação: COPY para a tabela temporária,
+    UPDATE dos fluxos existentes e INSERT dos que faltam.
+    Retorna (atualizados, inseridos) com os ids gravados.
+    """
+    from conectcrm_ops.db import copiar_para_tabela
+
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(SQL_TEMPORARIA)
+            copiar_para_tabela(
+                cursor, 'rollout_fluxos', ['empresa_id', 'fluxo_id', 'versao', 'estrutura'],
+                ((e.id, e.fluxo_id, e.versao, json_canonico(estrutura)) for e, estrutura in linhas),
+            )
+            cursor.execute(SQL_ATUALIZAR.format(
+                publicar=', publicado = true, published_at = NOW()' if publicar else ''))
+            atualizados = [str(linha[0]) for linha in cursor.fetchall()]
+
+            publicado = publicar or template.publicado
+            cursor.execute(SQL_INSERIR, (
+                template.nome, template.descricao, codigo, template.tipo,
+                template.ativo, publicado, publicado,
+            ))
+            inseridos = [str(linha[0]) for linha in cursor.fetchall()]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return atualizados, inseridos
+
+
+def executar(conn, template, parametros, codigo=CODIGO_PADRAO, marca=MARCA_PADRAO, ondas=None,
+             ate_onda=None, empresa_ids=None, publicar=False, pausa=0, historico=None, aplicar=True):
+    """
+    Roda (ou só planeja, com aplicar=False) as ondas do rollout.
+    Retorna um relatório por onda: empresas, em_dia, gravados, inseridos,
+    inalterados (conflito de versao ou estrutura idêntica) e falhas.
+    """
+    from conectcrm_ops.historico import capturar
+
+    ondas = ondas or ler_ondas(ONDAS_PADRAO)
+    with conn.cursor() as cursor:
+        empresas = sondar(cursor, parametros, codigo, empresa_ids)
+        nucleos = carregar_nucleos(cursor, empresas)
+    conn.rollback()
+
+    relatorio = []
+    for numero, grupo in enumerate(dividir_em_ondas(empresas, ondas), 1):
+        if ate_onda is not None and numero > ate_onda:
+            break
+        pendentes = [e for e in grupo if not e.em_dia(template)]
+        linhas, falhas = preparar(pendentes, template, nucleos, marca)
+        resumo = {
+            'onda': numero,
+            'percentual': ondas[numero - 1],
+            'empresas': len(grupo),
+            'em_dia': len(grupo) - len(pendentes),
+            'pendentes': len(linhas),
+            'atualizados': 0,
+            'inseridos': 0,
+            'inalterados': 0,
+            'falhas': falhas,
+            'segundos': 0.0,
+        }
+        relatorio.append(resumo)
+        if not aplicar or not linhas:
+            continue
+
+        inicio = time.perf_counter()
+        for i in range(0, len(linhas), LOTE):
+            lote = linhas[i:i + LOTE]
+            existentes = [e.fluxo_id for e, _ in lote if e.fluxo_id]
+            if historico is not None and existentes:
+                capturar(conn, historico, existentes)
+            atualizados, inseridos = gravar_lote(conn, lote, template, codigo, publicar)
+            if historico is not None and (atualizados or inseridos):
+                capturar(conn, historico, atualizados + inseridos)
+            resumo['atualizados'] += len(atualizados)
+            resumo['inseridos'] += len(inseridos)
+            resumo['inalterados'] += len(lote) - len(atualizados) - len(inseridos)
+        resumo['segundos'] = time.perf_counter() - inicio
+
+        if pausa and numero < len(ondas) and (ate_onda is None or numero < ate_onda):
+            print(f"⏸️  Onda {numero} gravada; aguardando {pausa}s antes da próxima...")
+            time.sleep(pausa)
+
+    return relatorio
+
+
+def imprimir_relatorio(relatorio, aplicar=True):
+    for onda in relatorio:
+        print(f"\n🌊 Onda {onda['onda']} (até {onda['percentual']:g}%): {onda['empresas']} empresa(s)")
+        print(f"   ✅ Já no template: {onda['em_dia']}")
+        if aplicar:
+            print(f"   📝 Atualizados: {onda['atualizados']}  ➕ Inseridos: {onda['inseridos']}  "
+                  f"⏭️  Inalterados: {onda['inalterados']}  ({onda['segundos']:.1f}s)")
+        else:
+            print(f"   📝 A gravar: {onda['pendentes']}")
+        for empresa_id, motivo in list(onda['falhas'].items())[:10]:
+            print(f"   ❌ {empresa_id}: {motivo}")
+        if len(onda['falhas']) > 10:
+            print(f"   ... e mais {len(onda['falhas']) - 10} empresa(s) com falha")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Rollout do fluxo padrão para todas as empresas')
+    parser.add_argument('--codigo', default=CODIGO_PADRAO, help='fluxos_triagem.codigo do fluxo gerido pelo rollout')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    for nome, ajuda in (('planejar', 'Mostra o que cada onda gravaria, sem gravar'),
+                        ('aplicar', 'Grava as ondas')):
+        p = sub.add_parser(nome, help=ajuda)
+        p.add_argument('template', help='JSON do fluxo padrão (ex.: fluxo-padrao-triagem-v3.json)')
+        p.add_argument('--parametros', help='JSON com parâmetros padrão e por empresa')
+        p.add_argument('--marca', default=MARCA_PADRAO, help='Texto do template trocado pelo nome da empresa')
+        p.add_argument('--ondas', default=ONDAS_PADRAO, help='Percentuais acumulados (padrão: %(default)s)')
+        p.add_argument('--ate-onda', type=int, help='Para depois desta onda (1 = só o canário)')
+        p.add_argument('--empresa', action='append', help='Limita a estas empresas (pode repetir)')
+        p.add_argument('--json', action='store_true', help='Relatório em JSON')
+        if nome == 'aplicar':
+            p.add_argument('--publicar', action='store_true', help='Marca os fluxos gravados como publicados')
+            p.add_argument('--pausa', type=float, default=0, help='Segundos de espera entre as ondas')
+            p.add_argument('--sem-historico', action='store_true', help='Não registra as versões no histórico em disco')
+
+    sub.add_parser('status', help='Empresas por hash de template')
+    args = parser.parse_args(argv)
+
+    from conectcrm_ops.db import conectar
+
+    conn = conectar()
+    try:
+        if args.comando == 'status':
+            with conn.cursor() as cursor:
+                cursor.execute(SQL_STATUS, (args.codigo,))
+                linhas = cursor.fetchall()
+                cursor.execute(SQL_SEM_FLUXO, (args.codigo,))
+                sem_fluxo = cursor.fetchone()[0]
+            print(f"📦 Fluxos com código '{args.codigo}':")
+            for hash_, nome, fluxos, empresas, publicados in linhas:
+                rotulo = f"{hash_[:12]} ({nome})" if hash_ else 'fora do rollout'
+                print(f"   {rotulo}: {empresas} empresa(s), {fluxos} fluxo(s), {publicados} publicado(s)")
+            print(f"   sem fluxo: {sem_fluxo} empresa(s)")
+            return 0
+
+        template = Template.ler(args.template)
+        parametros = ler_parametros(args.parametros)
+        aplicar = args.comando == 'aplicar'
+        historico = None
+        if aplicar and not args.sem_historico:
+            from conectcrm_ops.historico import HistoricoFluxos
+            historico = HistoricoFluxos()
+
+        print(f"📄 Template {template.arquivo} (hash {template.hash[:12]})")
+        relatorio = executar(
+            conn, template, parametros,
+            codigo=args.codigo,
+            marca=args.marca,
+            ondas=ler_ondas(args.ondas),
+            ate_onda=args.ate_onda,
+            empresa_ids=args.empresa,
+            publicar=aplicar and args.publicar,
+            pausa=args.pausa if aplicar else 0,
+            historico=historico,
+            aplicar=aplicar,
+        )
+    finally:
+        conn.close()
+
+    if args.json:
+        print(json.dumps(relatorio, ensure_ascii=False, indent=2))
+    else:
+        imprimir_relatorio(relatorio, aplicar)
+    return 1 if any(onda['falhas'] for onda in relatorio) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
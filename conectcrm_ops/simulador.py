@@ -0,0 +1,711 @@
+# -*- coding: utf-8 -*-
+"""
+Simulador offline de fluxos de triagem
+
+Executa estrutura.etapas sem banco e sem WhatsApp, seguindo as mesmas regras do
+FlowEngine/TriagemBotService: proximaEtapa, opcoes[].proximaEtapa, etapas
+condicionais (acaoSeVerdadeiro/acaoSeFalso), condicoes[], metadata.keywords,
+aguardarResposta=false e validacao das etapas de coleta.
+
+Cada etapa é compilada uma única vez (índice de opções, validador, condição),
+então milhares de conversas roteirizadas rodam por segundo.
+
+Uso:
+    python -m conectcrm_ops.simulador fluxo-padrao-triagem-v3.json roteiros.json
+    python -m conectcrm_ops.simulador fluxo.json roteiros.json --repeticoes 1000
+
+Formato do arquivo de roteiros (lista JSON):
+    [{
+        "nome": "novo cliente",
+        "contexto": {"contatoExiste": false, "telefone": "5511999999999"},
+        "nucleos": [{"id": "n1", "nome": "Suporte", "departamentos": [{"id": "d1", "nome": "N1"}]}],
+        "mensagens": ["João", "Silva", "ACME", "joao@acme.com", {"botao": "SIM"}],
+        "esperado": {"status": "em_andamento", "etapaFinal": "boas-vindas",
+                     "passaPor": ["salvar-novo-cliente"], "contexto": {"primeiroNome": "João"}}
+    }]
+
+"botao" é o id do botão tocado, como o webhook o repassa: o valor da opção, ou a
+posição (1, 2, ...) quando ela não tem valor.
+"""
+
+import argparse
+import functools
+import json
+import re
+import sys
+import time
+
+from conectcrm_ops.fluxos import carregar_estrutura, extrair_estrutura
+from conectcrm_ops.validacao import compilar_validador, normalizar_texto_menu
+
+EM_ANDAMENTO = 'em_andamento'
+FINALIZADA = 'finalizada'
+TRANSFERIDA = 'transferida'
+CANCELADA = 'cancelada'
+ERRO = 'erro'
+
+LIMITE_AUTO_AVANCO = 10
+TIPOS_COLETA = {'coleta_dados', 'input', 'coleta'}
+ETAPAS_CONFIRMACAO = {'confirmar-dados-cliente', 'confirmacao-dados', 'verificar-dados-atualizados'}
+CONFIRMACOES = {'sim', 'yes', 's', 'ok', 'correto', 'confirmo', 'confirmar', 'certo', '1', 'verdade'}
+NEGACOES = {'não', 'nao', 'no', 'n', 'errado', 'incorreto', 'corrigir', 'mudar', 'alterar', '0', 'falso'}
+MENSAGEM_CANCELAMENTO = '👋 Atendimento cancelado. Caso precise de ajuda novamente, é só mandar uma mensagem! Até logo.'
+
+VARIAVEL_REGEX = re.compile(r'\{\{([^{}]+)\}\}|\{([^{}]+)\}')
+
+
+class ErroFluxo(Exception):
+    """Situação em que o backend responderia 400 (BadRequestException)"""
+
+
+def renderizar_mensagem(mensagem, contexto):
+    """Mesma substituição de substituirVariaveisNaMensagem: {{var}} e {var}"""
+    if not mensagem or '{' not in mensagem:
+        return mensagem or ''
+
+    def trocar(match):
+        chave = match.group(1) if match.group(1) is not None else match.group(2)
+        valor = contexto.get(chave)
+        return match.group(0) if valor is None else str(valor)
+
+    return VARIAVEL_REGEX.sub(trocar, mensagem)
+
+
+def avaliar_condicao_etapa(operador, atual, esperado):
+    """Operadores de processarEtapaCondicional"""
+    if operador in ('diferente', '!=', '!=='):
+        return atual != esperado
+    if operador in ('maior', '>'):
+        return atual is not None and esperado is not None and atual > esperado
+    if operador in ('menor', '<'):
+        return atual is not None and esperado is not None and atual < esperado
+    if operador == 'existe':
+        return atual not in (None, '')
+    if operador == 'nao_existe':
+        return atual in (None, '')
+    return atual == esperado
+
+
+def avaliar_condicoes(condicoes, contexto):
+    """Operadores de avaliarCondicoes (condicoes[] em etapas de texto livre)"""
+    for condicao in condicoes:
+        valor = contexto.get(condicao.get('variavel'))
+        operador = condicao.get('operador')
+        esperado = condicao.get('valor')
+
+        if operador == 'igual':
+            ok = valor == esperado or str(valor) == str(esperado)
+        elif operador == 'diferente':
+            ok = not (valor == esperado or str(valor) == str(esperado))
+        elif operador == 'contem':
+            ok = str(esperado) in str(valor)
+        elif operador in ('maior', 'menor'):
+            try:
+                ok = float(valor) > float(esperado) if operador == 'maior' else float(valor) < float(esperado)
+            except (TypeError, ValueError):
+                ok = False
+        else:
+            ok = False
+
+        if ok:
+            return condicao.get('proximaEtapa')
+
+    return None
+
+
+def _valor_literal(texto):
+    if texto == 'true':
+        return True
+    if texto == 'false':
+        return False
+    if texto == 'null':
+        return None
+    try:
+        return float(texto) if '.' in texto else int(texto)
+    except ValueError:
+        pass
+    if len(texto) >= 2 and texto[0] == texto[-1] and texto[0] in ('"', "'"):
+        return texto[1:-1]
+    return texto
+
+
+@functools.lru_cache(maxsize=1024)
+def compilar_expressao(expressao):
+    """
+    Compila as expressões de proximaEtapaCondicional ("a === true && b !== null || c == 1")
+    em uma função contexto -> bool, com a mesma gramática de avaliarCondicao.
+    """
+    grupos = []
+    for grupo in (g.strip() for g in expressao.split('||')):
+        if not grupo:
+            continue
+        termos = []
+        for termo in (t.strip() for t in grupo.split('&&')):
+            if not termo:
+                continue
+            termo = termo.replace('contexto.', '')
+            for operador in ('===', '!==', '==', '!='):
+                if operador in termo:
+                    partes = [p.strip() for p in termo.split(operador)]
+                    break
+            else:
+                partes = None
+            if not partes or len(partes) != 2:
+                termos.append(None)
+                continue
+            negar = operador.startswith('!')
+            termos.append((partes[0], _valor_literal(partes[1]), negar))
+        grupos.append(termos)
+
+    def avaliar(contexto):
+        for termos in grupos:
+            if all(t is not None and ((contexto.get(t[0]) == t[1]) != t[2]) for t in termos):
+                return True
+        return False
+
+    return avaliar
+
+
+def criar_opcoes_nucleos(nucleos):
+    """Equivalente a criarOpcoesNucleos + opção de ajuda adicionada pelo FlowEngine"""
+    opcoes = []
+    for indice, nucleo in enumerate(nucleos):
+        departamentos = nucleo.get('departamentos') or []
+        atendentes = nucleo.get('atendentesIds') or []
+        nome = nucleo.get('nome') or ''
+        opcoes.append({
+            'valor': str(indice + 1),
+            'texto': nome,
+            'acao': 'proximo_passo',
+            'proximaEtapa': 'escolha-departamento' if departamentos else 'transferir-atendimento',
+            'salvarContexto': {
+                'areaTitulo': nome.lower(),
+                'destinoNucleoId': nucleo.get('id'),
+                'nucleoNome': nome,
+                '__mensagemFinal': nucleo.get('mensagemBoasVindas'),
+                '__departamentosDisponiveis': departamentos,
+                '__temDepartamentos': bool(departamentos),
+                '__nucleoTemAtendentes': bool(atendentes),
+                '__atendentesNucleoIds': atendentes,
+            },
+        })
+
+    opcoes.append({
+        'numero': 'ajuda',
+        'valor': 'ajuda',
+        'texto': '❓ Não entendi essas opções',
+        'acao': 'transferir_nucleo',
+        'proximaEtapa': 'transferir_atendimento',
+        # FlowEngine grava nucleoId: contexto.__nucleoGeralId (null sem núcleo geral)
+        'nucleoContextKey': '__nucleoGeralId',
+    })
+    return opcoes
+
+
+def criar_opcoes_departamentos(contexto, departamentos, proxima_etapa):
+    area = contexto.get('areaTitulo') or contexto.get('areaTituloOriginal') or 'atendimento'
+    return [
+        {
+            'valor': str(indice + 1),
+            'texto': departamento.get('nome'),
+            'acao': 'proximo_passo',
+            'proximaEtapa': proxima_etapa,
+            'salvarContexto': {
+                'destinoDepartamentoId': departamento.get('id'),
+                'departamentoNome': departamento.get('nome'),
+                'areaTitulo': f"{area} - {departamento.get('nome')}",
+                'proximaEtapaDepartamento': proxima_etapa,
+            },
+        }
+        for indice, departamento in enumerate(departamentos)
+    ]
+
+
+class IndiceOpcoes:
+    """Opções de menu indexadas pelas chaves que o bot aceita como resposta"""
+
+    __slots__ = ('opcoes', 'por_chave', 'por_numero')
+
+    def __init__(self, opcoes):
+        self.opcoes = opcoes
+        self.por_chave = {}
+        self.por_numero = {}
+
+        # A primeira opção que casa vence, como no Array.find do backend
+        for indice, opcao in enumerate(opcoes):
+            valor = str(opcao['valor']) if opcao.get('valor') is not None else str(indice + 1)
+            numerico = re.sub(r'\D', '', valor)
+            if numerico:
+                self.por_numero.setdefault(numerico, opcao)
+            for chave in [valor, opcao.get('texto')] + list(opcao.get('aliases') or []):
+                normalizada = normalizar_texto_menu(chave)
+                if normalizada:
+                    self.por_chave.setdefault(normalizada, opcao)
+
+    def __len__(self):
+        return len(self.opcoes)
+
+    def encontrar(self, resposta):
+        original = str(resposta).strip() if resposta is not None else ''
+        numerico = re.sub(r'\D', '', original)
+        if numerico and numerico in self.por_numero:
+            return self.por_numero[numerico]
+        return self.por_chave.get(normalizar_texto_menu(original))
+
+
+class EtapaCompilada:
+    """Etapa pré-processada: nada do JSON é percorrido de novo durante a simulação"""
+
+    __slots__ = (
+        'id', 'tipo', 'mensagem', 'proxima', 'auto_avanco', 'opcoes', 'variavel', 'coleta',
+        'validar', 'condicao', 'condicoes', 'keywords', 'transferencia', 'encerra',
+        'menu_nucleos', 'nucleos_menu', 'menu_departamentos', 'proxima_departamento',
+        'mensagem_cliente_existente',
+    )
+
+    def __init__(self, etapa_id, etapa, etapas):
+        metadata = etapa.get('metadata') if isinstance(etapa.get('metadata'), dict) else {}
+
+        self.id = etapa_id
+        self.tipo = etapa.get('tipo')
+        self.mensagem = etapa.get('mensagem') or ''
+        self.proxima = etapa.get('proximaEtapa') or None
+        self.auto_avanco = etapa.get('aguardarResposta') is False and bool(self.proxima)
+        self.opcoes = IndiceOpcoes([o for o in (etapa.get('opcoes') or []) if isinstance(o, dict)])
+        self.variavel = etapa.get('variavel')
+        self.coleta = (self.tipo in TIPOS_COLETA or etapa.get('coletaDados') is True) and bool(self.variavel)
+        self.validar = compilar_validador(etapa_id, etapa.get('validacao')) if self.coleta else None
+        self.condicoes = [c for c in (etapa.get('condicoes') or []) if isinstance(c, dict)]
+        self.keywords = {
+            str(k).lower().strip(): v for k, v in (metadata.get('keywords') or {}).items()
+        } if isinstance(metadata.get('keywords'), dict) else {}
+        self.transferencia = etapa_id == 'transferir-atendimento' or (
+            self.tipo == 'acao' and etapa.get('acao') == 'transferir'
+        )
+        self.encerra = bool(metadata.get('finalizarSessao'))
+        self.mensagem_cliente_existente = metadata.get('mensagemClienteExistente')
+
+        self.condicao = None
+        if self.tipo == 'condicional':
+            condicao = etapa.get('condicao') or {}
+            self.condicao = (
+                condicao.get('variavel'),
+                condicao.get('operador'),
+                condicao.get('valor'),
+                etapa.get('acaoSeVerdadeiro'),
+                etapa.get('acaoSeFalso'),
+            )
+
+        # Menus dinâmicos resolvidos em tempo de execução (mesmas regras do FlowEngine)
+        nucleos_menu = etapa.get('nucleosMenu')
+        self.nucleos_menu = set(nucleos_menu) if isinstance(nucleos_menu, list) and nucleos_menu else None
+        self.menu_nucleos = etapa_id == 'boas-vindas' and (
+            bool(self.nucleos_menu) or not self.opcoes or bool(etapa.get('usarNucleosDinamicos'))
+        )
+        self.menu_departamentos = etapa_id == 'escolha-departamento'
+        destino = etapa.get('proximaEtapaDepartamento') or metadata.get('proximaEtapaDepartamento')
+        destino = destino.strip() if isinstance(destino, str) and destino.strip() else 'transferir-atendimento'
+        if destino != 'transferir-atendimento' and destino not in etapas:
+            destino = 'transferir-atendimento'
+        self.proxima_departamento = destino
+
+
+class Sessao:
+    __slots__ = ('etapa_atual', 'etapa_anterior', 'contexto', 'status', 'historico',
+                 'visitadas', 'respostas', 'erro', 'opcoes_atuais')
+
+    def __init__(self, etapa_inicial, contexto=None):
+        self.etapa_atual = etapa_inicial
+        self.etapa_anterior = None
+        self.contexto = dict(contexto or {})
+        self.status = EM_ANDAMENTO
+        self.historico = []
+        self.visitadas = [etapa_inicial]
+        self.respostas = []
+        self.erro = None
+        self.opcoes_atuais = None
+
+    def avancar(self, proxima):
+        self.etapa_anterior = self.etapa_atual
+        self.etapa_atual = proxima
+        self.visitadas.append(proxima)
+
+
+class SimuladorFluxo:
+    """
+    Motor de execução de um fluxo compilado.
+
+    nucleos: lista no formato de findOpcoesParaBot usada no menu dinâmico de boas-vindas.
+    renderizar: quando False, não monta o texto das mensagens (mais rápido para CI).
+    """
+
+    def __init__(self, estrutura, nucleos=None, renderizar=True):
+        estrutura = extrair_estrutura(estrutura)
+        etapas = estrutura['etapas']
+        self.etapa_inicial = estrutura.get('etapaInicial')
+        self.etapas = {
+            etapa_id: EtapaCompilada(etapa_id, etapa, etapas)
+            for etapa_id, etapa in etapas.items() if isinstance(etapa, dict)
+        }
+        self.nucleos = nucleos or []
+        self.renderizar = renderizar
+        self.avisos = set()
+
+        if self.etapa_inicial not in self.etapas:
+            raise ErroFluxo(f'Etapa inicial "{self.etapa_inicial}" não encontrada no fluxo')
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    def iniciar(self, contexto=None, nucleos=None):
+        sessao = Sessao(self.etapa_inicial, contexto)
+        self._montar_resposta(sessao, nucleos)
+        return sessao
+
+    def responder(self, sessao, texto, nucleos=None):
+        if sessao.status != EM_ANDAMENTO:
+            raise ErroFluxo('Sessão já foi finalizada')
+
+        try:
+            self._processar_resposta(sessao, texto, nucleos)
+        except ErroFluxo as erro:
+            sessao.status = ERRO
+            sessao.erro = str(erro)
+        return sessao
+
+    def resolver_botao(self, sessao, botao_id):
+        """
+        Conteúdo que o webhook repassa ao bot quando o cliente toca o botão: o
+        button_reply.id, que é o valor da opção (ou a posição, sem valor)
+        """
+        opcoes = sessao.opcoes_atuais
+        if opcoes is not None:
+            for i, opcao in enumerate(opcoes.opcoes, 1):
+                conteudo = str(opcao['valor'] if opcao.get('valor') is not None else i)
+                if conteudo == str(botao_id):
+                    return conteudo
+        raise ErroFluxo(f'Botão "{botao_id}" não existe na etapa "{sessao.etapa_atual}"')
+
+    def executar_roteiro(self, roteiro):
+        nucleos = roteiro.get('nucleos')
+        sessao = Sessao(self.etapa_inicial, roteiro.get('contexto'))
+
+        try:
+            self._montar_resposta(sessao, nucleos)
+            for mensagem in roteiro.get('mensagens') or []:
+                if sessao.status != EM_ANDAMENTO:
+                    raise ErroFluxo(f'Mensagem enviada após término da sessão ({sessao.status})')
+                if isinstance(mensagem, dict) and 'botao' in mensagem:
+                    mensagem = self.resolver_botao(sessao, mensagem['botao'])
+                self._processar_resposta(sessao, mensagem, nucleos)
+        except ErroFluxo as erro:
+            sessao.status = ERRO
+            sessao.erro = str(erro)
+
+        return sessao, conferir_esperado(sessao, roteiro.get('esperado') or {})
+
+    # ------------------------------------------------------------------
+    # Construção de resposta (FlowEngine.buildResponse)
+    # ------------------------------------------------------------------
+
+    def _montar_resposta(self, sessao, nucleos=None):
+        for _ in range(LIMITE_AUTO_AVANCO):
+            etapa = self.etapas.get(sessao.etapa_atual)
+            if etapa is None:
+                raise ErroFluxo(f'Etapa "{sessao.etapa_atual}" não encontrada no fluxo')
+
+            proxima = self._montar_etapa(sessao, etapa, nucleos)
+            if proxima is None:
+                return
+            sessao.avancar(proxima)
+
+        raise ErroFluxo('Limite de auto avanço excedido ao montar resposta do fluxo')
+
+    def _montar_etapa(self, sessao, etapa, nucleos):
+        contexto = sessao.contexto
+        sessao.opcoes_atuais = None
+
+        if etapa.condicao is not None:
+            variavel, operador, esperado, se_verdadeiro, se_falso = etapa.condicao
+            if not variavel:
+                raise ErroFluxo('Condição sem campo "variavel" definido')
+            verdadeiro = avaliar_condicao_etapa(operador, contexto.get(variavel), esperado)
+            proxima = se_verdadeiro if verdadeiro else se_falso
+            if not proxima:
+                raise ErroFluxo(
+                    f'Etapa condicional sem ação definida para resultado {"verdadeiro" if verdadeiro else "falso"}'
+                )
+            self._emitir(sessao, etapa, etapa.mensagem or '🔍 Processando...')
+            return proxima
+
+        if etapa.transferencia:
+            sessao.status = TRANSFERIDA
+            self._emitir(sessao, etapa, etapa.mensagem)
+            return None
+
+        mensagem = etapa.mensagem
+        if (
+            etapa.id == 'boas-vindas'
+            and contexto.get('__clienteCadastrado') is True
+            and etapa.mensagem_cliente_existente
+            and (contexto.get('primeiroNome') or contexto.get('nome'))
+        ):
+            mensagem = etapa.mensagem_cliente_existente
+
+        opcoes = etapa.opcoes
+        if etapa.menu_nucleos:
+            nucleos_visiveis = nucleos if nucleos is not None else self.nucleos
+            if nucleos_visiveis and etapa.nucleos_menu:
+                # Só os núcleos escolhidos em nucleosMenu; nenhum deles visível = menu estático
+                nucleos_visiveis = [n for n in nucleos_visiveis if n.get('id') in etapa.nucleos_menu]
+            if nucleos_visiveis:
+                opcoes = IndiceOpcoes(criar_opcoes_nucleos(nucleos_visiveis))
+        elif etapa.menu_departamentos:
+            departamentos = contexto.get('__departamentosDisponiveis') or []
+            if not departamentos:
+                # FlowEngine.resolverMenuDepartamentos avança fixo para "coleta-nome"
+                return 'coleta-nome'
+            contexto['__proximaEtapaDepartamento'] = etapa.proxima_departamento
+            opcoes = IndiceOpcoes(criar_opcoes_departamentos(contexto, departamentos, etapa.proxima_departamento))
+
+        sessao.opcoes_atuais = opcoes if len(opcoes) else None
+        self._emitir(sessao, etapa, mensagem)
+
+        if etapa.encerra:
+            sessao.status = FINALIZADA
+            return None
+
+        if etapa.auto_avanco:
+            return etapa.proxima
+
+        return None
+
+    def _emitir(self, sessao, etapa, mensagem):
+        if self.renderizar:
+            sessao.respostas.append((etapa.id, renderizar_mensagem(mensagem, sessao.contexto)))
+        else:
+            sessao.respostas.append((etapa.id, None))
+
+    # ------------------------------------------------------------------
+    # Processamento de resposta (TriagemBotService.processarResposta)
+    # ------------------------------------------------------------------
+
+    def _processar_resposta(self, sessao, texto, nucleos=None):
+        texto = '' if texto is None else str(texto)
+        etapa = self.etapas.get(sessao.etapa_atual)
+
+        if etapa is None:
+            # Etapa removida do fluxo: o backend reinicia na etapa inicial
+            sessao.contexto['__motivoReinicio'] = 'etapa_inexistente'
+            sessao.avancar(self.etapa_inicial)
+            self._montar_resposta(sessao, nucleos)
+            return
+
+        sessao.historico.append((etapa.id, texto))
+
+        if etapa.keywords:
+            destino = etapa.keywords.get(texto.lower().strip())
+            if destino:
+                sessao.avancar(destino)
+                self._montar_resposta(sessao, nucleos)
+                return
+
+        if etapa.id in ETAPAS_CONFIRMACAO:
+            resposta = texto.lower().strip()
+            if resposta in CONFIRMACOES:
+                proxima = etapa.proxima or 'boas-vindas'
+            elif resposta in NEGACOES:
+                proxima = 'coleta-nome'
+            else:
+                self._emitir(sessao, etapa, '❌ Resposta inválida.')
+                return
+            sessao.avancar(proxima)
+            self._montar_resposta(sessao, nucleos)
+            return
+
+        opcoes = sessao.opcoes_atuais
+        if opcoes is not None and len(opcoes):
+            normalizada = normalizar_texto_menu(texto.strip())
+            if normalizada in ('sair', 'cancelar'):
+                self._finalizar(sessao, CANCELADA)
+                return
+
+            opcao = opcoes.encontrar(texto)
+            if opcao is None:
+                self._emitir(sessao, etapa, '❌ Opção inválida. Por favor, escolha uma das opções:')
+                return
+            self._executar_acao(sessao, etapa, opcao, texto, nucleos)
+            return
+
+        if etapa.condicoes:
+            proxima = avaliar_condicoes(etapa.condicoes, sessao.contexto)
+        else:
+            if normalizar_texto_menu(texto.strip()) in ('sair', 'cancelar'):
+                self._finalizar(sessao, CANCELADA)
+                return
+
+            if etapa.coleta:
+                validacao = etapa.validar(texto)
+                if not validacao['valido']:
+                    self._emitir(sessao, etapa, f"❌ {validacao['erro']}\n\nPor favor, tente novamente.")
+                    return
+                sessao.contexto[etapa.variavel] = validacao['valorNormalizado'] or texto
+
+            proxima = etapa.proxima
+
+        if not proxima:
+            self._finalizar(sessao, FINALIZADA)
+            return
+
+        sessao.avancar(proxima)
+        self._montar_resposta(sessao, nucleos)
+
+    def _executar_acao(self, sessao, etapa, opcao, resposta, nucleos):
+        contexto = sessao.contexto
+
+        for chave, valor in (opcao.get('salvarContexto') or {}).items():
+            if valor is None:
+                contexto.pop(chave, None)
+            elif valor == '{{resposta}}':
+                contexto[chave] = resposta
+            elif isinstance(valor, str) and valor.startswith('{{contexto.') and valor.endswith('}}'):
+                origem = valor[11:-2]
+                if origem in contexto:
+                    contexto[chave] = contexto[origem]
+            else:
+                contexto[chave] = valor
+
+        acao = opcao.get('acao')
+        if acao is None:
+            # Opções estáticas sem "acao" caem em "Ação desconhecida" no backend
+            self.avisos.add(f'{etapa.id}: opção "{opcao.get("texto")}" sem campo "acao"')
+
+        if acao == 'proximo_passo':
+            proxima = opcao.get('proximaEtapa')
+            for condicao in opcao.get('proximaEtapaCondicional') or []:
+                if compilar_expressao(condicao.get('se') or '')(contexto):
+                    proxima = condicao.get('entao')
+                    break
+            if not proxima:
+                raise ErroFluxo('Próxima etapa não definida')
+            sessao.avancar(proxima)
+            self._montar_resposta(sessao, nucleos)
+        elif acao == 'transferir_nucleo':
+            if not (opcao.get('nucleoId') or contexto.get(opcao.get('nucleoContextKey') or '')):
+                raise ErroFluxo('Núcleo não informado para transferência')
+            sessao.status = TRANSFERIDA
+        elif acao == 'transferir_atendente':
+            if not (opcao.get('atendenteId') or contexto.get(opcao.get('atendenteContextKey') or '')):
+                raise ErroFluxo('Atendente não informado para transferência')
+            sessao.status = TRANSFERIDA
+        elif acao == 'coletar_dado':
+            if opcao.get('variavel'):
+                contexto[opcao['variavel']] = resposta
+            if opcao.get('proximaEtapa'):
+                sessao.avancar(opcao['proximaEtapa'])
+                self._montar_resposta(sessao, nucleos)
+            else:
+                self._finalizar(sessao, FINALIZADA)
+        elif acao == 'enviar_mensagem':
+            self._emitir(sessao, etapa, opcao.get('mensagem') or '')
+            if opcao.get('proximaEtapa'):
+                sessao.avancar(opcao['proximaEtapa'])
+                self._montar_resposta(sessao, nucleos)
+        elif acao == 'finalizar':
+            self._finalizar(sessao, FINALIZADA)
+        else:
+            raise ErroFluxo('Ação desconhecida')
+
+    def _finalizar(self, sessao, status):
+        if status == CANCELADA:
+            sessao.respostas.append((sessao.etapa_atual, MENSAGEM_CANCELAMENTO))
+        sessao.status = status
+        sessao.opcoes_atuais = None
+
+
+def conferir_esperado(sessao, esperado):
+    """Lista de divergências entre a sessão simulada e o bloco "esperado" do roteiro"""
+    falhas = []
+
+    if 'status' in esperado and sessao.status != esperado['status']:
+        detalhe = f' ({sessao.erro})' if sessao.erro else ''
+        falhas.append(f'status: esperado {esperado["status"]}, obtido {sessao.status}{detalhe}')
+
+    if 'etapaFinal' in esperado and sessao.etapa_atual != esperado['etapaFinal']:
+        falhas.append(f'etapaFinal: esperado {esperado["etapaFinal"]}, obtido {sessao.etapa_atual}')
+
+    if esperado.get('passaPor'):
+        visitadas = set(sessao.visitadas)
+        for etapa_id in esperado['passaPor']:
+            if etapa_id not in visitadas:
+                falhas.append(f'passaPor: etapa {etapa_id} não foi visitada')
+
+    for etapa_id in esperado.get('naoPassaPor') or []:
+        if etapa_id in sessao.visitadas:
+            falhas.append(f'naoPassaPor: etapa {etapa_id} foi visitada')
+
+    for chave, valor in (esperado.get('contexto') or {}).items():
+        if sessao.contexto.get(chave) != valor:
+            falhas.append(f'contexto.{chave}: esperado {valor!r}, obtido {sessao.contexto.get(chave)!r}')
+
+    if esperado.get('mensagemContem'):
+        ultima = sessao.respostas[-1][1] if sessao.respostas else ''
+        if ultima is not None and esperado['mensagemContem'] not in ultima:
+            falhas.append(f'mensagemContem: "{esperado["mensagemContem"]}" ausente da última mensagem')
+
+    return falhas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Simula conversas roteirizadas contra um fluxo de triagem')
+    parser.add_argument('fluxo', help='JSON do fluxo (arquivo exportado ou estrutura)')
+    parser.add_argument('roteiros', help='JSON com a lista de roteiros')
+    parser.add_argument('--repeticoes', type=int, default=1, help='Repete cada roteiro N vezes (benchmark)')
+    parser.add_argument('--verbose', action='store_true', help='Mostra as mensagens do bot')
+    args = parser.parse_args(argv)
+
+    with open(args.roteiros, 'r', encoding='utf-8') as arquivo:
+        roteiros = json.load(arquivo)
+
+    simulador = SimuladorFluxo(carregar_estrutura(args.fluxo), renderizar=args.verbose or args.repeticoes == 1)
+
+    print(f"🤖 Simulando {len(roteiros)} roteiro(s) x {args.repeticoes} repetição(ões)...\n")
+
+    total_falhas = 0
+    inicio = time.perf_counter()
+
+    for roteiro in roteiros:
+        for _ in range(args.repeticoes - 1):
+            simulador.executar_roteiro(roteiro)
+        sessao, falhas = simulador.executar_roteiro(roteiro)
+
+        nome = roteiro.get('nome', '(sem nome)')
+        if falhas:
+            total_falhas += 1
+            print(f"❌ {nome}")
+            for falha in falhas:
+                print(f"   - {falha}")
+        else:
+            print(f"✅ {nome} → {sessao.status} em '{sessao.etapa_atual}'")
+
+        if args.verbose:
+            for etapa_id, mensagem in sessao.respostas:
+                print(f"   [{etapa_id}] {mensagem}")
+
+    duracao = time.perf_counter() - inicio
+    conversas = len(roteiros) * args.repeticoes
+
+    if simulador.avisos:
+        print("\n⚠️  Avisos:")
+        for aviso in sorted(simulador.avisos):
+            print(f"   - {aviso}")
+
+    print(f"\n📈 {conversas} conversa(s) em {duracao:.3f}s ({conversas / max(duracao, 1e-9):,.0f} conversas/s)")
+    print(f"🎯 {len(roteiros) - total_falhas}/{len(roteiros)} roteiro(s) conforme o esperado")
+
+    return 1 if total_falhas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
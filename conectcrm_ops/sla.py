@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+"""
+Perfil de duração e SLA das sessões de triagem (sessoes_triagem, incremental)
+
+Cada `atualizar` lê só as sessões com updated_at depois da execução anterior
+e acumula, por (fluxo, núcleo de destino, hora de início), histogramas de
+duração da triagem e de mensagens enviadas/recebidas (conectcrm_ops.histograma,
+memória limitada). Uma sessão entra nos histogramas quando o concluido_em
+dela cai na janela da execução, então nenhuma é contada duas vezes mesmo que
+seja atualizada depois (ex.: nota de satisfação).
+
+As sessões em andamento ficam no estado com a etapa atual e desde quando
+estão nela; as paradas na mesma etapa há mais de --limiar segundos são
+listadas como presas a cada execução (pensado para rodar a cada minuto).
+
+Uso:
+    python -m conectcrm_ops.sla atualizar --limiar 900
+    python -m conectcrm_ops.sla relatorio --por fluxo,hora --sla 300
+    python -m conectcrm_ops.sla relatorio --por nucleo --json
+
+Arquivo de estado: CONECTCRM_SLA_ESTADO (padrão: .sla-triagem.json)
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from conectcrm_ops.histograma import Histograma, formatar_duracao
+from conectcrm_ops.historico import gravar_atomico
+
+ESTADO_PADRAO = os.environ.get('CONECTCRM_SLA_ESTADO', '.sla-triagem.json')
+
+VERSAO_ESTADO = 1
+
+DIMENSOES = ('fluxo', 'nucleo', 'hora')
+METRICAS = ('duracao', 'enviadas', 'recebidas')
+PERCENTIS = (50, 90, 99)
+
+SEM_NUCLEO = '-'
+
+SQL_LIMITE = "SELECT LOCALTIMESTAMP - make_interval(secs => %s)"
+
+SQL_SESSOES = """
+    SELECT id::text, fluxo_id::text, nucleo_destino_id::text, status, etapa_atual,
+           iniciado_em, concluido_em, tempo_total_segundos,
+           total_mensagens_enviadas, total_mensagens_recebidas, updated_at
+    FROM sessoes_triagem
+    WHERE updated_at > %s::timestamp
+"""
+
+SQL_NOMES = """
+    SELECT 'fluxo', id::text, nome FROM fluxos_triagem WHERE id = ANY(%s::uuid[])
+    UNION ALL
+    SELECT 'nucleo', id::text, nome FROM nucleos_atendimento WHERE id = ANY(%s::uuid[])
+"""
+
+_EPOCA = datetime(1970, 1, 1)
+_UM_MS = timedelta(milliseconds=1)
+
+
+def _ms(quando):
+    return (quando.replace(tzinfo=None) - _EPOCA) // _UM_MS
+
+
+def _chave(fluxo_id, nucleo_id, hora):
+    return f'{fluxo_id}|{nucleo_id or SEM_NUCLEO}|{hora}'
+
+
+class EstadoSla:
+    """
+    histogramas["fluxo|nucleo|hora"] = {'duracao': Histograma (ms), 'enviadas': ..., 'recebidas': ...}
+    abertas[sessao_id] = [fluxo_id, nucleo_id, etapa, desde_ms, ultimo_ms]
+    """
+
+    def __init__(self):
+        self.marca = None
+        self.histogramas = {}
+        self.abertas = {}
+        self.nomes = {'fluxo': {}, 'nucleo': {}}
+
+    @classmethod
+    def carregar(cls, caminho):
+        estado = cls()
+        if not os.path.exists(caminho):
+            return estado
+        with open(caminho, 'r', encoding='utf-8') as f:
+            dados = json.load(f)
+        if dados.get('versao') != VERSAO_ESTADO:
+            raise ValueError(f'{caminho}: versão de estado {dados.get("versao")} não suportada '
+                             f'(apague o arquivo ou use --refazer)')
+        estado.marca = dados['marca']
+        estado.abertas = dados['abertas']
+        estado.nomes = dados['nomes']
+        estado.histogramas = {
+            chave: {m: Histograma.de_dict(h) for m, h in metricas.items()}
+            for chave, metricas in dados['histogramas'].items()
+        }
+        return estado
+
+    def salvar(self, caminho):
+        dados = {
+            'versao': VERSAO_ESTADO,
+            'marca': self.marca,
+            'nomes': self.nomes,
+            'abertas': self.abertas,
+            'histogramas': {
+                chave: {m: h.para_dict() for m, h in metricas.items()}
+                for chave, metricas in self.histogramas.items()
+            },
+        }
+        gravar_atomico(caminho, json.dumps(dados, ensure_ascii=False, separators=(',', ':')))
+
+    def processar(self, linhas, inicio, limite):
+        """
+        inicio/limite: janela (em ms) desta execução; inicio None na primeira.
+        Devolve quantas sessões concluídas entraram nos histogramas.
+        """
+        contadas = 0
+        for (sessao_id, fluxo_id, nucleo_id, status, etapa, iniciado, concluido, total_segundos,
+             enviadas, recebidas, atualizado) in linhas:
+            if status == 'em_andamento' or concluido is None:
+                atualizado = _ms(atualizado)
+                aberta = self.abertas.get(sessao_id)
+                if aberta is not None and aberta[2] == etapa:
+                    aberta[1] = nucleo_id
+                    aberta[4] = atualizado
+                else:
+                    self.abertas[sessao_id] = [fluxo_id, nucleo_id, etapa, atualizado, atualizado]
+                continue
+
+            self.abertas.pop(sessao_id, None)
+            fim = _ms(concluido)
+            if (inicio is not None and fim <= inicio) or fim > limite:
+                continue
+
+            if iniciado is not None:
+                duracao = fim - _ms(iniciado)
+            else:
+                duracao = (total_segundos or 0) * 1000
+
+            chave = _chave(fluxo_id, nucleo_id, iniciado.hour if iniciado else 0)
+            metricas = self.histogramas.get(chave)
+            if metricas is None:
+                metricas = self.histogramas[chave] = {m: Histograma() for m in METRICAS}
+            metricas['duracao'].registrar(duracao)
+            metricas['enviadas'].registrar(enviadas or 0)
+            metricas['recebidas'].registrar(recebidas or 0)
+            contadas += 1
+        return contadas
+
+    def presas(self, agora, limiar_ms):
+        """Sessões em andamento na mesma etapa há mais de limiar_ms, da mais antiga para a mais nova"""
+        resultado = [
+            {
+                'sessaoId': sessao_id,
+                'fluxoId': fluxo_id,
+                'nucleoId': nucleo_id,
+                'etapa': etapa,
+                'naEtapaMs': agora - desde,
+                'semAtividadeMs': agora - ultimo,
+            }
+            for sessao_id, (fluxo_id, nucleo_id, etapa, desde, ultimo) in self.abertas.items()
+            if agora - desde > limiar_ms
+        ]
+        resultado.sort(key=lambda p: -p['naEtapaMs'])
+        return resultado
+
+    def descartar_antigas(self, agora, maximo_ms):
+        """Tira do estado as sessões em andamento sem atividade há mais de maximo_ms"""
+        antigas = [s for s, aberta in self.abertas.items() if agora - aberta[4] > maximo_ms]
+        for sessao_id in antigas:
+            del self.abertas[sessao_id]
+        return len(antigas)
+
+
+# ----------------------------------------------------------------------
+# Relatório
+# ----------------------------------------------------------------------
+
+def agrupar(estado, por):
+    """Junta os histogramas pelas dimensões pedidas (subconjunto de DIMENSOES)"""
+    indices = [DIMENSOES.index(d) for d in por]
+    grupos = {}
+    for chave, metricas in estado.histogramas.items():
+        partes = chave.split('|')
+        grupo = tuple(partes[i] for i in indices)
+        destino = grupos.get(grupo)
+        if destino is None:
+            destino = grupos[grupo] = {m: Histograma() for m in METRICAS}
+        for m in METRICAS:
+            destino[m].juntar(metricas[m])
+    return grupos
+
+
+def _rotulo(estado, dimensao, valor):
+    if dimensao == 'hora':
+        return f'{int(valor):02d}h'
+    return estado.nomes[dimensao].get(valor, valor)
+
+
+def relatorio(estado, por, sla_ms=None):
+    linhas = []
+    for grupo, metricas in agrupar(estado, por).items():
+        duracao = metricas['duracao']
+        linha = {
+            'grupo': {d: _rotulo(estado, d, v) for d, v in zip(por, grupo)},
+            'sessoes': duracao.total,
+            'duracaoMs': {f'p{p}': v for p, v in duracao.percentis(PERCENTIS).items()},
+            'mensagensEnviadas': {f'p{p}': v for p, v in metricas['enviadas'].percentis(PERCENTIS).items()},
+            'mensagensRecebidas': {f'p{p}': v for p, v in metricas['recebidas'].percentis(PERCENTIS).items()},
+        }
+        if sla_ms is not None:
+            fora = duracao.contar_acima(sla_ms + 1)
+            linha['foraDoSla'] = fora
+            linha['taxaForaDoSla'] = fora / duracao.total if duracao.total else 0.0
+        linhas.append(linha)
+    linhas.sort(key=lambda l: tuple(l['grupo'].values()) if 'hora' in por else (-l['sessoes'],))
+    return linhas
+
+
+def imprimir_relatorio(linhas, por, sla_ms=None):
+    cabecalho = ' / '.join(por)
+    print(f"   {cabecalho[:40]:<40} {'sessões':>8} {'p50':>8} {'p90':>8} {'p99':>8} "
+          f"{'env p50/p99':>12} {'rec p50/p99':>12}" + (f" {'fora SLA':>9}" if sla_ms is not None else ''))
+    for linha in linhas:
+        rotulo = ' / '.join(str(v) for v in linha['grupo'].values())
+        duracao = linha['duracaoMs']
+        enviadas = linha['mensagensEnviadas']
+        recebidas = linha['mensagensRecebidas']
+        texto = (f"   {rotulo[:40]:<40} {linha['sessoes']:>8} {formatar_duracao(duracao['p50']):>8} "
+                 f"{formatar_duracao(duracao['p90']):>8} {formatar_duracao(duracao['p99']):>8} "
+                 f"{str(enviadas['p50']) + '/' + str(enviadas['p99']):>12} "
+                 f"{str(recebidas['p50']) + '/' + str(recebidas['p99']):>12}")
+        if sla_ms is not None:
+            texto += f" {linha['taxaForaDoSla']:>9.1%}"
+        print(texto)
+
+
+def imprimir_presas(estado, presas, limite=20):
+    if not presas:
+        print("✅ Nenhuma sessão presa")
+        return
+    print(f"⚠️  {len(presas)} sessão(ões) presa(s) na mesma etapa:")
+    for presa in presas[:limite]:
+        fluxo = estado.nomes['fluxo'].get(presa['fluxoId'], presa['fluxoId'])
+        print(f"   {presa['sessaoId']}  {fluxo} → {presa['etapa']}  "
+              f"há {formatar_duracao(presa['naEtapaMs'])} "
+              f"(sem atividade há {formatar_duracao(presa['semAtividadeMs'])})")
+    if len(presas) > limite:
+        print(f"   ... e mais {len(presas) - limite}")
+
+
+# ----------------------------------------------------------------------
+# Banco
+# ----------------------------------------------------------------------
+
+def atualizar(conn, estado, atraso=60, descartar_apos=7 * 86400):
+    from conectcrm_ops.db import ler_em_fluxo
+
+    with conn.cursor() as cursor:
+        cursor.execute(SQL_LIMITE, (atraso,))
+        limite = cursor.fetchone()[0]
+
+    inicio = _ms(datetime.fromisoformat(estado.marca)) if estado.marca else None
+    linhas = ler_em_fluxo(conn, SQL_SESSOES, (estado.marca or '-infinity',), itersize=5000)
+    contadas = estado.processar(linhas, inicio, _ms(limite))
+    descartadas = estado.descartar_antigas(_ms(limite), descartar_apos * 1000)
+    estado.marca = limite.isoformat()
+
+    fluxos = {chave.split('|')[0] for chave in estado.histogramas}
+    fluxos.update(aberta[0] for aberta in estado.abertas.values())
+    nucleos = {chave.split('|')[1] for chave in estado.histogramas} - {SEM_NUCLEO}
+    fluxos = [f for f in fluxos if f and f not in estado.nomes['fluxo']]
+    nucleos = [n for n in nucleos if n not in estado.nomes['nucleo']]
+    if fluxos or nucleos:
+        with conn.cursor() as cursor:
+            cursor.execute(SQL_NOMES, (fluxos, nucleos))
+            for tipo, id_, nome in cursor.fetchall():
+                estado.nomes[tipo][id_] = nome
+
+    conn.commit()
+    return _ms(limite), contadas, descartadas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Perfil de duração/SLA das sessões de triagem (incremental)')
+    parser.add_argument('--estado', default=ESTADO_PADRAO, help=f'Arquivo de estado (padrão: {ESTADO_PADRAO})')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p = sub.add_parser('atualizar', help='Lê as sessões alteradas desde a última execução')
+    p.add_argument('--atraso', type=int, default=60, help='Ignora os últimos N segundos (padrão: 60)')
+    p.add_argument('--limiar', type=int, default=900,
+                   help='Segundos na mesma etapa para considerar a sessão presa (padrão: 900)')
+    p.add_argument('--descartar-apos', type=int, default=7 * 86400,
+                   help='Esquece sessões em andamento sem atividade há N segundos (padrão: 7 dias)')
+    p.add_argument('--refazer', action='store_true', help='Descarta o estado e relê tudo')
+    p.add_argument('--json', action='store_true', help='Imprime as sessões presas em JSON')
+
+    p = sub.add_parser('relatorio', help='Percentis acumulados (não consulta o banco)')
+    p.add_argument('--por', default='fluxo,nucleo', help=f'Dimensões separadas por vírgula: {", ".join(DIMENSOES)}')
+    p.add_argument('--sla', type=int, help='SLA da triagem em segundos (mostra % acima dele)')
+    p.add_argument('--json', action='store_true')
+
+    args = parser.parse_args(argv)
+
+    if args.comando == 'relatorio':
+        por = [d.strip() for d in args.por.split(',') if d.strip()]
+        invalidas = [d for d in por if d not in DIMENSOES]
+        if invalidas:
+            parser.error(f'dimensão inválida: {", ".join(invalidas)}')
+        estado = EstadoSla.carregar(args.estado)
+        sla_ms = args.sla * 1000 if args.sla is not None else None
+        linhas = relatorio(estado, por, sla_ms)
+        if args.json:
+            print(json.dumps({'marca': estado.marca, 'linhas': linhas}, indent=2, ensure_ascii=False))
+        else:
+            print(f"📍 Até {estado.marca}")
+            imprimir_relatorio(linhas, por, sla_ms)
+        return 0
+
+    from conectcrm_ops.db import conectar
+
+    estado = EstadoSla() if args.refazer else EstadoSla.carregar(args.estado)
+    inicio = time.perf_counter()
+    conn = conectar()
+    try:
+        agora, contadas, descartadas = atualizar(conn, estado, args.atraso, args.descartar_apos)
+    finally:
+        conn.close()
+    estado.salvar(args.estado)
+
+    presas = estado.presas(agora, args.limiar * 1000)
+    if args.json:
+        print(json.dumps(presas, indent=2, ensure_ascii=False))
+    else:
+        print(f"✅ {contadas} sessão(ões) concluída(s) contabilizada(s) em {time.perf_counter() - inicio:.2f}s; "
+              f"{len(estado.abertas)} em andamento; {descartadas} descartada(s)")
+        imprimir_presas(estado, presas)
+    return 1 if presas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
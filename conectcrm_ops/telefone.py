@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""
+Normalização de telefones brasileiros para E.164 (+55 DDD número)
+
+Substitui os corrigir-numero-telefone.sql / corrigir-todos-numeros-brasil.sql:
+em vez de consertar números um a um, normaliza qualquer formato que aparece
+nos CSVs e no banco:
+
+    (11) 98888-8888      → +5511988888888
+    62 9668-9991         → +5562996689991   (celular antigo: ganha o 9)
+    556296689991         → +5562996689991
+    0 21 11 98888-8888   → +5511988888888   (prefixo 0 + operadora)
+    +55 (62) 3201-0000   → +556232010000    (fixo: sem 9)
+
+Regras: DDD precisa existir (lista da ANATEL); número nacional com 10
+dígitos cujo primeiro dígito do assinante é 6-9 é celular sem o 9; com 11
+dígitos o terceiro tem que ser 9. O que não se encaixa volta como None.
+
+normalizar_lote() usa NumPy quando disponível (matriz de dígitos, sem laço
+por número) e cai para o laço em Python puro sem ele.
+
+Uso:
+    python -m conectcrm_ops.telefone "(11) 98888-8888" "62 9668-9991"
+    python -m conectcrm_ops.telefone corrigir                       (simulação em todas as tabelas)
+    python -m conectcrm_ops.telefone corrigir --tabela contatos --aplicar
+"""
+
+import argparse
+import re
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy é opcional
+    np = None
+
+DDDS = frozenset({
+    11, 12, 13, 14, 15, 16, 17, 18, 19,
+    21, 22, 24, 27, 28,
+    31, 32, 33, 34, 35, 37, 38,
+    41, 42, 43, 44, 45, 46, 47, 48, 49,
+    51, 53, 54, 55,
+    61, 62, 63, 64, 65, 66, 67, 68, 69,
+    71, 73, 74, 75, 77, 79,
+    81, 82, 83, 84, 85, 86, 87, 88, 89,
+    91, 92, 93, 94, 95, 96, 97, 98, 99,
+})
+
+# 'e164' é o formato canônico; 'whatsapp' é o mesmo número sem o '+', como
+# chega no webhook da Meta e é gravado em sessoes_triagem/atendimento_tickets.
+FORMATOS = ('e164', 'whatsapp')
+
+NAO_DIGITO = re.compile(r'[^0-9]+')
+
+LARGURA = 20  # caracteres considerados por número no caminho NumPy
+
+
+def _digitos(telefone):
+    return NAO_DIGITO.sub('', telefone)
+
+
+def _nacional(d):
+    """Dígitos sem prefixos (00, 0 + operadora, 0 de tronco, 55) → DDD + número, ou None"""
+    if d.startswith('00'):
+        d = d[2:]
+    if d.startswith('0'):
+        if len(d) in (13, 14):      # 0 + operadora (2) + DDD + número
+            d = d[3:]
+        elif len(d) in (11, 12):    # 0 + DDD + número
+            d = d[1:]
+    if len(d) in (12, 13) and d.startswith('55'):
+        d = d[2:]
+
+    if len(d) not in (10, 11) or int(d[:2]) not in DDDS:
+        return None
+    if len(d) == 11:
+        return d if d[2] == '9' else None
+    if d[2] in '6789':
+        return f'{d[:2]}9{d[2:]}'
+    if d[2] in '2345':
+        return d
+    return None
+
+
+def normalizar(telefone, formato='e164'):
+    """Número em qualquer formato → '+55...' (ou '55...' com formato='whatsapp'); None se inválido"""
+    if not telefone:
+        return None
+    nacional = _nacional(_digitos(str(telefone)))
+    if nacional is None:
+        return None
+    return f'+55{nacional}' if formato == 'e164' else f'55{nacional}'
+
+
+# ----------------------------------------------------------------------
+# Lote (NumPy)
+# ----------------------------------------------------------------------
+
+if np is not None:
+    _DDD_VALIDO = np.zeros(100, dtype=bool)
+    _DDD_VALIDO[list(DDDS)] = True
+
+
+def _normalizar_numpy(textos, formato):
+    """textos: lista de str com no máximo LARGURA caracteres"""
+    n = len(textos)
+    texto = np.array(textos, dtype=f'U{LARGURA}')
+    valores = texto.view(np.uint32).reshape(n, LARGURA) - 48
+    eh_digito = valores < 10
+
+    # Compacta os dígitos à esquerda: posição de cada dígito = quantos vieram antes
+    posicoes = np.cumsum(eh_digito, axis=1, dtype=np.int8) - 1
+    achados = np.flatnonzero(eh_digito)
+    d = np.zeros(n * LARGURA, dtype=np.int8)
+    d[achados // LARGURA * LARGURA + posicoes.ravel()[achados]] = valores.ravel()[achados]
+    d = d.reshape(n, LARGURA)
+    tamanho = posicoes[:, -1].astype(np.int16) + 1
+
+    linhas = np.arange(n)
+
+    def digito(inicio, j):
+        return d[linhas, np.minimum(inicio + j, LARGURA - 1)]
+
+    # Prefixos viram um deslocamento por linha (mesma ordem de _nacional)
+    inicio = np.where((tamanho >= 2) & (d[:, 0] == 0) & (d[:, 1] == 0), 2, 0).astype(np.int16)
+    resto = tamanho - inicio
+    comeca_zero = (resto > 0) & (digito(inicio, 0) == 0)
+    inicio += np.where(comeca_zero & ((resto == 13) | (resto == 14)), 3,
+                       np.where(comeca_zero & ((resto == 11) | (resto == 12)), 1, 0)).astype(np.int16)
+    resto = tamanho - inicio
+    inicio += np.where(((resto == 12) | (resto == 13)) & (digito(inicio, 0) == 5) & (digito(inicio, 1) == 5),
+                       2, 0).astype(np.int16)
+    resto = tamanho - inicio
+
+    corpo = np.take_along_axis(d, np.minimum(inicio[:, None] + np.arange(11), LARGURA - 1), axis=1)
+    ddd = corpo[:, 0].astype(np.int16) * 10 + corpo[:, 1]
+    terceiro = corpo[:, 2]
+    valido = ((resto == 10) | (resto == 11)) & _DDD_VALIDO[ddd]
+    valido &= np.where(resto == 11, terceiro == 9, terceiro >= 2)
+
+    # insere o 9 depois do DDD nos celulares antigos
+    celular_antigo = (resto == 10) & (terceiro >= 6)
+    corpo[celular_antigo, 3:] = corpo[celular_antigo, 2:-1]
+    corpo[celular_antigo, 2] = 9
+    resto = resto + celular_antigo
+
+    prefixo = b'+55' if formato == 'e164' else b'55'
+    saida = np.zeros((n, len(prefixo) + 11), dtype=np.uint8)
+    saida[:, :len(prefixo)] = np.frombuffer(prefixo, dtype=np.uint8)
+    corpo = corpo.astype(np.uint8) + 48
+    corpo[:, 10][resto == 10] = 0
+    saida[:, len(prefixo):] = corpo
+
+    resultado = saida.view(f'S{saida.shape[1]}').ravel().astype(f'U{saida.shape[1]}').tolist()
+    for i in np.flatnonzero(~valido).tolist():
+        resultado[i] = None
+    return resultado
+
+
+def normalizar_lote(telefones, formato='e164'):
+    """Lista de números → lista de normalizados (None nos inválidos), na mesma ordem"""
+    telefones = list(telefones)
+    if np is None or len(telefones) < 256:
+        return [normalizar(t, formato) for t in telefones]
+    textos = [t if t.__class__ is str else ('' if t is None else str(t)) for t in telefones]
+    # textos maiores que LARGURA (raros) vão pelo caminho em Python
+    longos = np.flatnonzero(np.fromiter(map(len, textos), dtype=np.int32, count=len(textos)) > LARGURA).tolist()
+    for i in longos:
+        textos[i] = ''
+    resultado = _normalizar_numpy(textos, formato)
+    for i in longos:
+        resultado[i] = normalizar(telefones[i], formato)
+    return resultado
+
+
+# ----------------------------------------------------------------------
+# Correção em massa
+# ----------------------------------------------------------------------
+
+# tabela: (coluna, formato gravado)
+ALVOS = {
+    'contatos': ('telefone', 'e164'),
+    'leads': ('telefone', 'e164'),
+    'sessoes_triagem': ('contato_telefone', 'whatsapp'),
+    'atendimento_tickets': ('contato_telefone', 'whatsapp'),
+}
+
+SQL_LER = "SELECT id::text, {coluna} FROM {tabela} WHERE {coluna} IS NOT NULL AND {coluna} <> ''"
+
+SQL_CORRIGIR = """
+    UPDATE {tabela} AS t
+    SET {coluna} = v.novo
+    FROM (VALUES %s) AS v(id, antigo, novo)
+    WHERE t.id = v.id::uuid
+      AND t.{coluna} = v.antigo
+"""
+
+
+def corrigir_tabela(tabela, lote=5000, aplicar=False, exemplos=5):
+    """
+    Lê a tabela em fluxo e reescreve os números que mudam com a normalização,
+    um UPDATE + commit por lote (linhas alteradas no meio do caminho não são
+    sobrescritas: o UPDATE confere o valor antigo).
+    """
+    from psycopg2.extras import execute_values
+
+    from conectcrm_ops.db import conexao, ler_em_fluxo
+
+    coluna, formato = ALVOS[tabela]
+    totais = {'lidos': 0, 'corretos': 0, 'corrigidos': 0, 'invalidos': 0, 'amostras': [], 'invalidosAmostra': []}
+    sql_update = SQL_CORRIGIR.format(tabela=tabela, coluna=coluna)
+
+    def processar(bloco):
+        novos = normalizar_lote([valor for _, valor in bloco], formato)
+        mudancas = []
+        for (id_, antigo), novo in zip(bloco, novos):
+            if novo is None:
+                totais['invalidos'] += 1
+                if len(totais['invalidosAmostra']) < exemplos:
+                    totais['invalidosAmostra'].append(antigo)
+            elif novo == antigo:
+                totais['corretos'] += 1
+            else:
+                mudancas.append((id_, antigo, novo))
+                if len(totais['amostras']) < exemplos:
+                    totais['amostras'].append((antigo, novo))
+        totais['lidos'] += len(bloco)
+        if mudancas and aplicar:
+            with conexao() as escrita:
+                with escrita.cursor() as cursor:
+                    execute_values(cursor, sql_update, mudancas, page_size=len(mudancas))
+                    totais['corrigidos'] += cursor.rowcount
+        elif mudancas:
+            totais['corrigidos'] += len(mudancas)
+
+    with conexao() as leitura:
+        bloco = []
+        for linha in ler_em_fluxo(leitura, SQL_LER.format(tabela=tabela, coluna=coluna), itersize=lote):
+            bloco.append(linha)
+            if len(bloco) == lote:
+                processar(bloco)
+                bloco = []
+        if bloco:
+            processar(bloco)
+    return totais
+
+
+def _comando_corrigir(argv):
+    parser = argparse.ArgumentParser(prog='conectcrm_ops.telefone corrigir',
+                                     description='Reescreve telefones fora do padrão em lotes')
+    parser.add_argument('--tabela', action='append', choices=sorted(ALVOS),
+                        help='Tabela a corrigir (pode repetir; padrão: todas)')
+    parser.add_argument('--lote', type=int, default=5000)
+    parser.add_argument('--aplicar', action='store_true', help='Grava as correções (sem isso só simula)')
+    args = parser.parse_args(argv)
+
+    for tabela in args.tabela or sorted(ALVOS):
+        inicio = time.perf_counter()
+        totais = corrigir_tabela(tabela, args.lote, args.aplicar)
+        print(f"\n📞 {tabela}.{ALVOS[tabela][0]} ({ALVOS[tabela][1]}) — {time.perf_counter() - inicio:.1f}s")
+        print(f"   Lidos: {totais['lidos']}  |  Já corretos: {totais['corretos']}  |  "
+              f"{'Corrigidos' if args.aplicar else 'A corrigir'}: {totais['corrigidos']}  |  "
+              f"Inválidos (mantidos): {totais['invalidos']}")
+        for antigo, novo in totais['amostras']:
+            print(f"      {antigo!r:>24} → {novo}")
+        for antigo in totais['invalidosAmostra']:
+            print(f"      {antigo!r:>24} ✗")
+
+    if not args.aplicar:
+        print("\n🔎 Simulação: nada foi gravado (use --aplicar)")
+    return 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == 'corrigir':
+        return _comando_corrigir(argv[1:])
+
+    parser = argparse.ArgumentParser(description='Normaliza telefones brasileiros para E.164')
+    parser.add_argument('telefones', nargs='+', help="Números (ou 'corrigir' para a correção em massa)")
+    parser.add_argument('--formato', choices=FORMATOS, default='e164')
+    args = parser.parse_args(argv)
+
+    invalidos = 0
+    for telefone, normalizado in zip(args.telefones, normalizar_lote(args.telefones, args.formato)):
+        invalidos += normalizado is None
+        print(f"   {telefone!r:>24} → {normalizado or '❌ inválido'}")
+    return 1 if invalidos else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Validação de respostas de coleta de dados
+
+Porta em Python do ValidationUtil (backend/src/modules/triagem/utils/validation.util.ts)
+e da regra validarRespostaEtapa do TriagemBotService, para que as ferramentas
+offline aceitem e recusem exatamente as mesmas respostas que o bot.
+"""
+
+import re
+import unicodedata
+
+EMAIL_REGEX = re.compile(r'^[^\s@]+@[^\s@]+\.[^\s@]+$')
+NOME_REGEX = re.compile(r"^[a-záàâãéèêíïóôõöúçñA-ZÁÀÂÃÉÈÊÍÏÓÔÕÖÚÇÑ'\-\s]+$")
+PALAVRAS_MINUSCULAS = {'de', 'da', 'do', 'das', 'dos', 'e'}
+PALAVRAS_CANCELAMENTO = {'sair', 'cancelar', 'voltar', 'desistir', 'parar', 'cancel', 'exit', 'quit'}
+
+# Etapas com validação fixa no backend, independente do campo "validacao"
+VALIDACAO_POR_ETAPA = {
+    'coleta-email': 'email',
+    'coletar_email': 'email',
+    'coleta-nome': 'nome',
+    'coletar_primeiro_nome': 'nome',
+    'coleta-sobrenome': 'sobrenome',
+    'coletar_sobrenome': 'sobrenome',
+    'coleta-empresa': 'empresa',
+    'coletar_empresa': 'empresa',
+}
+
+
+def resultado(valido, erro=None, valor_normalizado=None):
+    return {'valido': valido, 'erro': erro, 'valorNormalizado': valor_normalizado}
+
+
+def normalizar_texto_menu(valor):
+    """Equivalente a normalizarTextoMenu (remove acentos, espaços extras e caixa)"""
+    if valor is None:
+        return ''
+
+    texto = unicodedata.normalize('NFD', str(valor))
+    texto = ''.join(c for c in texto if not ('̀' <= c <= 'ͯ'))
+    return ' '.join(texto.split()).lower()
+
+
+def normalizar_resposta(texto):
+    if not texto or not isinstance(texto, str):
+        return ''
+    return ' '.join(texto.split())
+
+
+def is_resposta_cancelamento(texto):
+    if not texto or not isinstance(texto, str):
+        return False
+    return texto.strip().lower() in PALAVRAS_CANCELAMENTO
+
+
+def validar_email(email):
+    if not email or not isinstance(email, str) or not email.strip():
+        return resultado(False, 'E-mail não pode estar vazio')
+
+    email = email.strip()
+
+    if not EMAIL_REGEX.match(email):
+        return resultado(False, 'Formato de e-mail inválido. Exemplo: seunome@empresa.com')
+
+    if len(email) > 254:
+        return resultado(False, 'E-mail muito longo (máximo 254 caracteres)')
+
+    local, dominio = email.split('@', 1)
+
+    if len(local) > 64:
+        return resultado(False, 'Parte local do e-mail muito longa (máximo 64 caracteres)')
+
+    if len(dominio) < 3:
+        return resultado(False, 'Domínio do e-mail inválido')
+
+    return resultado(True, valor_normalizado=email.lower())
+
+
+def capitalizar_nome(nome):
+    palavras = nome.lower().split(' ')
+    return ' '.join(
+        p if i > 0 and p in PALAVRAS_MINUSCULAS else p[:1].upper() + p[1:]
+        for i, p in enumerate(palavras)
+    )
+
+
+def validar_nome(nome, campo='Nome'):
+    if not nome or not isinstance(nome, str):
+        return resultado(False, f'{campo} não pode estar vazio')
+
+    nome = nome.strip()
+
+    if len(nome) < 2:
+        return resultado(False, f'{campo} deve ter pelo menos 2 caracteres')
+
+    if len(nome) > 100:
+        return resultado(False, f'{campo} muito longo (máximo 100 caracteres)')
+
+    if not NOME_REGEX.match(nome):
+        return resultado(False, f'{campo} deve conter apenas letras')
+
+    return resultado(True, valor_normalizado=capitalizar_nome(nome))
+
+
+def validar_empresa(empresa):
+    if not empresa or not isinstance(empresa, str):
+        return resultado(False, 'Nome da empresa não pode estar vazio')
+
+    empresa = empresa.strip()
+
+    if len(empresa) < 2:
+        return resultado(False, 'Nome da empresa deve ter pelo menos 2 caracteres')
+
+    if len(empresa) > 200:
+        return resultado(False, 'Nome da empresa muito longo (máximo 200 caracteres)')
+
+    return resultado(True, valor_normalizado=empresa)
+
+
+def validar_telefone(telefone):
+    if not telefone or not isinstance(telefone, str):
+        return resultado(False, 'Telefone não pode estar vazio')
+
+    digitos = re.sub(r'\D', '', telefone)
+
+    if len(digitos) not in (10, 11, 12, 13):
+        return resultado(False, 'Telefone deve ter 10 ou 11 dígitos (DDD + número)')
+
+    return resultado(True, valor_normalizado=digitos)
+
+
+def compilar_validador(etapa_id, validacao):
+    """
+    Monta uma função resposta -> resultado para a etapa, resolvendo uma única vez
+    quais regras se aplicam (mesma precedência de validarRespostaEtapa).
+    """
+    fixa = VALIDACAO_POR_ETAPA.get(etapa_id)
+    if fixa == 'email':
+        regra = validar_email
+    elif fixa == 'nome':
+        regra = lambda r: validar_nome(r, 'Nome')
+    elif fixa == 'sobrenome':
+        regra = lambda r: validar_nome(r, 'Sobrenome')
+    elif fixa == 'empresa':
+        regra = validar_empresa
+    else:
+        regra = _compilar_validacao_generica(validacao or {})
+
+    def validar(resposta):
+        if is_resposta_cancelamento(resposta):
+            return resultado(True, valor_normalizado=resposta)
+        return regra(resposta)
+
+    return validar
+
+
+def _compilar_validacao_generica(validacao):
+    tipo = validacao.get('tipo')
+    minimo = validacao.get('minimo', validacao.get('minLength'))
+    maximo = validacao.get('maximo', validacao.get('maxLength'))
+    mensagem_erro = validacao.get('mensagemErro')
+    padrao = None
+
+    if tipo == 'email':
+        return validar_email
+    if tipo == 'telefone':
+        return validar_telefone
+
+    if isinstance(validacao.get('regex'), str):
+        try:
+            padrao = re.compile(validacao['regex'])
+        except re.error:
+            padrao = None
+
+    verificar_tamanho = tipo in ('nome', 'text')
+
+    def validar(resposta):
+        if verificar_tamanho:
+            tamanho = len(resposta.strip())
+            if minimo and tamanho < minimo:
+                return resultado(False, mensagem_erro or f'Resposta deve ter pelo menos {minimo} caracteres')
+            if maximo and tamanho > maximo:
+                return resultado(False, mensagem_erro or f'Resposta deve ter no máximo {maximo} caracteres')
+
+        if padrao is not None and not padrao.search(resposta):
+            return resultado(False, mensagem_erro or 'Formato inválido')
+
+        return resultado(True, valor_normalizado=normalizar_resposta(resposta))
+
+    return validar
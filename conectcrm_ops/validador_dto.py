@@ -0,0 +1,483 @@
+# -*- coding: utf-8 -*-
+"""
+Validação do CreateFluxoDto (backend/src/modules/triagem/dto/create-fluxo.dto.ts)
+
+As regras de cada DTO são compiladas uma única vez em funções (closures) que
+percorrem o payload inteiro e devolvem o caminho exato de cada erro, com as
+mesmas mensagens do class-validator (as que voltam no erro 400).
+
+Níveis de erro:
+- dto:     o ValidationPipe rejeita o payload (400)
+- etapa:   EstruturaFluxoDto.etapas é só @IsObject, então o backend aceita,
+           mas EtapaDto/OpcaoMenuDto/CondicaoDto e as regras por tipo de etapa
+           (condicional, coleta, opções sem acao) quebram na execução do fluxo
+- aviso:   propriedade descartada em silêncio pelo whitelist do ValidationPipe
+
+Uso:
+    python -m conectcrm_ops.validador_dto payload.json outro.json
+    python -m conectcrm_ops.validador_dto --banco            (todos os fluxos gravados)
+"""
+
+import argparse
+import json
+import math
+import re
+import sys
+import time
+
+DTO = 'dto'
+ETAPA = 'etapa'
+AVISO = 'aviso'
+
+TIPOS_FLUXO = ['menu_opcoes', 'menu_simples', 'arvore_decisao', 'keyword_match', 'coleta_dados', 'condicional']
+TIPOS_ACAO = [
+    'criar_ticket', 'transferir_humano', 'enviar_mensagem', 'coletar_info', 'finalizar',
+    'proximo_passo', 'transferir_nucleo', 'transferir_atendente', 'coletar_dado',
+]
+PRIORIDADES = ['baixa', 'media', 'alta', 'urgente']
+OPERADORES_CONDICAO = ['igual', 'diferente', 'contem', 'maior', 'menor']
+
+# Operadores aceitos por processarEtapaCondicional (flow-engine.ts)
+OPERADORES_ETAPA_CONDICIONAL = {'igual', '==', '===', 'diferente', '!=', '!==', 'maior', '>', 'menor', '<',
+                                'existe', 'nao_existe'}
+TIPOS_COLETA = {'coleta_dados', 'input', 'coleta'}
+TIPOS_VALIDACAO = {'email', 'nome', 'text', 'texto', 'telefone', 'regex', 'cpf', 'cnpj', 'numero'}
+
+
+def _erro(erros, nivel, caminho, regra, mensagem):
+    erros.append({'nivel': nivel, 'caminho': caminho, 'regra': regra, 'mensagem': mensagem})
+
+
+def _juntar(base, campo):
+    return f'{base}.{campo}' if base else campo
+
+
+# ----------------------------------------------------------------------
+# Regras (cada fábrica devolve f(valor, campo, caminho, erros, nivel) -> valor)
+# ----------------------------------------------------------------------
+
+def is_string(each=False):
+    def regra(valor, campo, caminho, erros, nivel):
+        if each:
+            if isinstance(valor, list) and not all(isinstance(v, str) for v in valor):
+                _erro(erros, nivel, caminho, 'isString', f'each value in {campo} must be a string')
+        elif not isinstance(valor, str):
+            _erro(erros, nivel, caminho, 'isString', f'{campo} must be a string')
+        return valor
+    return regra
+
+
+def is_not_empty(mensagem=None):
+    def regra(valor, campo, caminho, erros, nivel):
+        if valor is None or valor == '':
+            _erro(erros, nivel, caminho, 'isNotEmpty', mensagem or f'{campo} should not be empty')
+        return valor
+    return regra
+
+
+def is_number(transformar=False):
+    def regra(valor, campo, caminho, erros, nivel):
+        if transformar:
+            # @Type(() => Number) com transform: true
+            if isinstance(valor, bool):
+                valor = int(valor)
+            elif isinstance(valor, str):
+                try:
+                    valor = float(valor) if valor.strip() else 0
+                except ValueError:
+                    valor = math.nan
+        if isinstance(valor, bool) or not isinstance(valor, (int, float)) or math.isnan(valor) or math.isinf(valor):
+            _erro(erros, nivel, caminho, 'isNumber',
+                  f'{campo} must be a number conforming to the specified constraints')
+        return valor
+    return regra
+
+
+def is_boolean():
+    def regra(valor, campo, caminho, erros, nivel):
+        if not isinstance(valor, bool):
+            _erro(erros, nivel, caminho, 'isBoolean', f'{campo} must be a boolean value')
+        return valor
+    return regra
+
+
+def is_array():
+    def regra(valor, campo, caminho, erros, nivel):
+        if not isinstance(valor, list):
+            _erro(erros, nivel, caminho, 'isArray', f'{campo} must be an array')
+        return valor
+    return regra
+
+
+def is_object():
+    def regra(valor, campo, caminho, erros, nivel):
+        if not isinstance(valor, dict):
+            _erro(erros, nivel, caminho, 'isObject', f'{campo} must be an object')
+        return valor
+    return regra
+
+
+def is_in(valores, nome_regra='isIn'):
+    permitidos = frozenset(valores)
+    lista = ', '.join(valores)
+
+    def regra(valor, campo, caminho, erros, nivel):
+        if not isinstance(valor, str) or valor not in permitidos:
+            _erro(erros, nivel, caminho, nome_regra, f'{campo} must be one of the following values: {lista}')
+        return valor
+    return regra
+
+
+def is_enum(valores):
+    return is_in(valores, 'isEnum')
+
+
+def aninhado(nome_classe, cada=False, nivel_aninhado=None):
+    """@ValidateNested; a classe é compilada na primeira chamada (permite referência circular)"""
+    compilado = []
+
+    def regra(valor, campo, caminho, erros, nivel):
+        if not compilado:
+            compilado.append(compilar_classe(nome_classe))
+        validar = compilado[0]
+        nivel_filho = nivel_aninhado or nivel
+        if cada:
+            if isinstance(valor, list):
+                for i, item in enumerate(valor):
+                    validar(item, f'{caminho}[{i}]', erros, nivel_filho)
+        else:
+            validar(valor, caminho, erros, nivel_filho)
+        return valor
+    return regra
+
+
+def registro_de(nome_classe, nivel_aninhado):
+    """Record<string, Classe>: valida cada valor do objeto"""
+    compilado = []
+
+    def regra(valor, campo, caminho, erros, nivel):
+        if not isinstance(valor, dict):
+            return valor
+        if not compilado:
+            compilado.append(compilar_classe(nome_classe))
+        validar = compilado[0]
+        for chave, item in valor.items():
+            validar(item, f'{caminho}.{chave}', erros, nivel_aninhado, chave)
+        return valor
+    return regra
+
+
+# ----------------------------------------------------------------------
+# Esquemas (mesma ordem dos decorators no .dto.ts)
+# ----------------------------------------------------------------------
+
+OPCIONAL = 'opcional'
+
+ESQUEMAS = {
+    'OpcaoMenuDto': {
+        'numero': [OPCIONAL, is_number(transformar=True)],
+        'valor': [OPCIONAL, is_string()],
+        'texto': [is_string(), is_not_empty()],
+        'descricao': [OPCIONAL, is_string()],
+        'acao': [OPCIONAL, is_enum(TIPOS_ACAO)],
+        'proximaEtapa': [OPCIONAL, is_string()],
+        'nucleoId': [OPCIONAL, is_string()],
+        'atendenteId': [OPCIONAL, is_string()],
+        'variavel': [OPCIONAL, is_string()],
+        'mensagem': [OPCIONAL, is_string()],
+        'icone': [OPCIONAL, is_string()],
+        'prioridade': [OPCIONAL, is_in(PRIORIDADES)],
+        'tags': [OPCIONAL, is_array(), is_string(each=True)],
+    },
+    'CondicaoDto': {
+        'variavel': [is_string(), is_not_empty()],
+        'operador': [is_in(OPERADORES_CONDICAO), is_not_empty()],
+        'valor': [is_string(), is_not_empty()],
+        'proximaEtapa': [is_string(), is_not_empty()],
+    },
+    'EtapaDto': {
+        'id': [is_string(), is_not_empty()],
+        'mensagem': [is_string(), is_not_empty()],
+        'opcoes': [OPCIONAL, is_array(), aninhado('OpcaoMenuDto', cada=True)],
+        'condicoes': [OPCIONAL, is_array(), aninhado('CondicaoDto', cada=True)],
+        'proximaEtapa': [OPCIONAL, is_string()],
+        'aguardarResposta': [OPCIONAL, is_boolean()],
+        'tipo': [OPCIONAL, is_string()],
+        'timeout': [OPCIONAL, is_number(transformar=True)],
+        'validacao': [OPCIONAL, is_object()],
+    },
+    'EstruturaFluxoDto': {
+        'etapaInicial': [is_string(), is_not_empty()],
+        'versao': [OPCIONAL, is_string()],
+        'etapas': [is_object(), is_not_empty(), registro_de('EtapaDto', ETAPA)],
+        'variaveis': [OPCIONAL, is_object()],
+    },
+    'CreateFluxoDto': {
+        'nome': [is_string(), is_not_empty('O nome do fluxo é obrigatório')],
+        'descricao': [OPCIONAL, is_string()],
+        'codigo': [OPCIONAL, is_string()],
+        'tipo': [is_enum(TIPOS_FLUXO), is_not_empty('O tipo do fluxo é obrigatório')],
+        'canais': [OPCIONAL, is_array(), is_string(each=True)],
+        'palavrasGatilho': [OPCIONAL, is_array(), is_string(each=True)],
+        'horarioAtivo': [OPCIONAL, is_object()],
+        'prioridade': [OPCIONAL, is_number()],
+        'ativo': [OPCIONAL, is_boolean()],
+        'estrutura': [is_object(), aninhado('EstruturaFluxoDto'), is_not_empty('A estrutura do fluxo é obrigatória')],
+        'permiteVoltar': [OPCIONAL, is_boolean()],
+        'permiteSair': [OPCIONAL, is_boolean()],
+        'salvarHistorico': [OPCIONAL, is_boolean()],
+        'tentarEntenderTextoLivre': [OPCIONAL, is_boolean()],
+        'tags': [OPCIONAL, is_array(), is_string(each=True)],
+        'versao': [OPCIONAL, is_number()],
+        'configuracoes': [OPCIONAL, is_object()],
+    },
+}
+
+# Classes em que o whitelist descarta propriedades não declaradas. Nas etapas
+# (Record sem @Type) os objetos continuam simples e nada é descartado.
+COM_WHITELIST = {'CreateFluxoDto', 'EstruturaFluxoDto'}
+
+
+# ----------------------------------------------------------------------
+# Regras por tipo de etapa (o que o FlowEngine/TriagemBotService exige)
+# ----------------------------------------------------------------------
+
+def _regras_etapa(etapa, caminho, erros, nivel, chave):
+    if chave is not None and isinstance(etapa.get('id'), str) and etapa['id'] != chave:
+        _erro(erros, nivel, _juntar(caminho, 'id'), 'idIgualChave',
+              f"id '{etapa['id']}' diferente da chave '{chave}' em etapas")
+
+    tipo = etapa.get('tipo')
+
+    if tipo == 'condicional':
+        condicao = etapa.get('condicao')
+        if not isinstance(condicao, dict):
+            _erro(erros, nivel, _juntar(caminho, 'condicao'), 'condicional',
+                  'Etapa condicional sem campo "condicao" definido')
+        else:
+            if not condicao.get('variavel'):
+                _erro(erros, nivel, _juntar(caminho, 'condicao.variavel'), 'condicional',
+                      'condicao.variavel should not be empty')
+            if condicao.get('operador') not in OPERADORES_ETAPA_CONDICIONAL:
+                _erro(erros, nivel, _juntar(caminho, 'condicao.operador'), 'condicional',
+                      f"operador desconhecido {condicao.get('operador')!r} (o backend trata como 'igual')")
+        for campo in ('acaoSeVerdadeiro', 'acaoSeFalso'):
+            if not isinstance(etapa.get(campo), str) or not etapa[campo]:
+                _erro(erros, nivel, _juntar(caminho, campo), 'condicional',
+                      f'Etapa condicional sem {campo} (a sessão para nesse resultado)')
+
+    if (tipo in TIPOS_COLETA or etapa.get('coletaDados') is True) and not etapa.get('variavel'):
+        _erro(erros, nivel, _juntar(caminho, 'variavel'), 'coleta',
+              'etapa de coleta sem variavel: a resposta não é validada nem salva no contexto')
+
+    validacao = etapa.get('validacao')
+    if isinstance(validacao, dict):
+        if validacao.get('tipo') is not None and validacao.get('tipo') not in TIPOS_VALIDACAO:
+            _erro(erros, nivel, _juntar(caminho, 'validacao.tipo'), 'validacao',
+                  f"tipo de validação desconhecido {validacao.get('tipo')!r}")
+        if 'regex' in validacao:
+            try:
+                re.compile(str(validacao['regex']))
+            except re.error as e:
+                _erro(erros, nivel, _juntar(caminho, 'validacao.regex'), 'validacao', f'regex inválida: {e}')
+
+    opcoes = etapa.get('opcoes')
+    if isinstance(opcoes, list):
+        for i, opcao in enumerate(opcoes):
+            if not isinstance(opcao, dict):
+                continue
+            caminho_opcao = f'{caminho}.opcoes[{i}]'
+            if opcao.get('acao') is None:
+                _erro(erros, nivel, _juntar(caminho_opcao, 'acao'), 'acao',
+                      'opção sem acao: o backend responde "Ação desconhecida"')
+            elif opcao['acao'] == 'proximo_passo' and not opcao.get('proximaEtapa'):
+                _erro(erros, nivel, _juntar(caminho_opcao, 'proximaEtapa'), 'acao',
+                      'acao proximo_passo sem proximaEtapa')
+
+
+REGRAS_EXTRAS = {'EtapaDto': _regras_etapa}
+
+
+# ----------------------------------------------------------------------
+# Compilação
+# ----------------------------------------------------------------------
+
+_COMPILADOS = {}
+
+
+def compilar_classe(nome_classe):
+    """Compila o esquema em uma função validar(obj, caminho, erros, nivel, chave=None)"""
+    if nome_classe in _COMPILADOS:
+        return _COMPILADOS[nome_classe]
+
+    campos = []
+    for campo, regras in ESQUEMAS[nome_classe].items():
+        opcional = OPCIONAL in regras
+        campos.append((campo, opcional, tuple(r for r in regras if r != OPCIONAL)))
+    campos = tuple(campos)
+    declarados = frozenset(ESQUEMAS[nome_classe])
+    whitelist = nome_classe in COM_WHITELIST
+    extra = REGRAS_EXTRAS.get(nome_classe)
+
+    def validar(obj, caminho, erros, nivel, chave=None):
+        if not isinstance(obj, dict):
+            _erro(erros, nivel, caminho or nome_classe, 'nestedValidation',
+                  f'nested property {caminho.rsplit(".", 1)[-1] or nome_classe} must be either object or array')
+            return
+
+        for campo, opcional, regras in campos:
+            valor = obj.get(campo)
+            if opcional and valor is None:
+                continue
+            caminho_campo = _juntar(caminho, campo)
+            for regra in regras:
+                valor = regra(valor, campo, caminho_campo, erros, nivel)
+
+        if whitelist:
+            for campo in obj:
+                if campo not in declarados:
+                    _erro(erros, AVISO, _juntar(caminho, campo), 'whitelist',
+                          f'{campo} não existe em {nome_classe} e é descartado pelo ValidationPipe')
+
+        if extra:
+            extra(obj, caminho, erros, nivel, chave)
+
+    _COMPILADOS[nome_classe] = validar
+    return validar
+
+
+def validar_fluxo(payload):
+    """Lista de erros de um payload de CreateFluxoDto (vazia se válido)"""
+    erros = []
+    compilar_classe('CreateFluxoDto')(payload, '', erros, DTO)
+    return erros
+
+
+def validar_estrutura(estrutura):
+    """Só a estrutura (EstruturaFluxoDto), com caminhos a partir de 'estrutura'"""
+    erros = []
+    compilar_classe('EstruturaFluxoDto')(estrutura, 'estrutura', erros, DTO)
+    return erros
+
+
+def validar_lote(payloads):
+    """[(nome, payload)] -> [(nome, erros)]"""
+    validar = compilar_classe('CreateFluxoDto')
+    resultado = []
+    for nome, payload in payloads:
+        erros = []
+        validar(payload, '', erros, DTO)
+        resultado.append((nome, erros))
+    return resultado
+
+
+def resumir(erros):
+    return {nivel: sum(1 for e in erros if e['nivel'] == nivel) for nivel in (DTO, ETAPA, AVISO)}
+
+
+def imprimir_erros(erros, prefixo='   '):
+    icones = {DTO: '❌', ETAPA: '🧩', AVISO: '⚠️ '}
+    for erro in erros:
+        print(f"{prefixo}{icones[erro['nivel']]} {erro['caminho']}: {erro['mensagem']}")
+
+
+# ----------------------------------------------------------------------
+# Fluxos gravados no banco
+# ----------------------------------------------------------------------
+
+SQL_FLUXOS_DTO = """
+    SELECT
+        id, nome, descricao, codigo, tipo, canais, palavras_gatilho, horario_ativo,
+        prioridade, ativo, estrutura, permite_voltar, permite_sair, salvar_historico,
+        tentar_entender_texto_livre
+    FROM fluxos_triagem
+    ORDER BY id
+"""
+
+
+def linha_para_payload(linha):
+    (fluxo_id, nome, descricao, codigo, tipo, canais, palavras, horario_ativo, prioridade,
+     ativo, estrutura, permite_voltar, permite_sair, salvar_historico, texto_livre) = linha
+    payload = {
+        'nome': nome,
+        'descricao': descricao,
+        'codigo': codigo,
+        'tipo': tipo,
+        'canais': canais,
+        'palavrasGatilho': palavras,
+        'horarioAtivo': horario_ativo,
+        'prioridade': prioridade,
+        'ativo': ativo,
+        'estrutura': json.loads(estrutura) if isinstance(estrutura, str) else estrutura,
+        'permiteVoltar': permite_voltar,
+        'permiteSair': permite_sair,
+        'salvarHistorico': salvar_historico,
+        'tentarEntenderTextoLivre': texto_livre,
+    }
+    return str(fluxo_id), payload
+
+
+def _ler_arquivos(caminhos):
+    for caminho in caminhos:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            dados = json.load(f)
+        if isinstance(dados, list):
+            for i, payload in enumerate(dados):
+                yield f'{caminho}[{i}]', payload
+        else:
+            yield caminho, dados
+
+
+def _ler_banco():
+    from conectcrm_ops.db import conectar
+
+    conn = conectar()
+    try:
+        with conn.cursor(name='validador_dto') as cursor:
+            cursor.itersize = 200
+            cursor.execute(SQL_FLUXOS_DTO)
+            for linha in cursor:
+                yield linha_para_payload(linha)
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Valida payloads de CreateFluxoDto com as regras do backend')
+    parser.add_argument('arquivos', nargs='*', help='JSON com um payload ou uma lista de payloads')
+    parser.add_argument('--banco', action='store_true', help='Valida todos os fluxos de fluxos_triagem')
+    parser.add_argument('--sem-avisos', action='store_true', help='Omite os avisos de whitelist')
+    parser.add_argument('--json', action='store_true', help='Imprime os erros em JSON')
+    args = parser.parse_args(argv)
+
+    if not args.arquivos and not args.banco:
+        parser.error('informe arquivos ou --banco')
+
+    payloads = _ler_banco() if args.banco else _ler_arquivos(args.arquivos)
+
+    inicio = time.perf_counter()
+    resultado = validar_lote(payloads)
+    duracao = time.perf_counter() - inicio
+
+    if args.sem_avisos:
+        resultado = [(nome, [e for e in erros if e['nivel'] != AVISO]) for nome, erros in resultado]
+
+    if args.json:
+        print(json.dumps({nome: erros for nome, erros in resultado}, indent=2, ensure_ascii=False))
+    else:
+        for nome, erros in resultado:
+            if not erros:
+                print(f"✅ {nome}")
+                continue
+            contagem = resumir(erros)
+            print(f"\n📋 {nome}: {contagem[DTO]} erro(s) de DTO, {contagem[ETAPA]} de etapa, {contagem[AVISO]} aviso(s)")
+            imprimir_erros(erros)
+
+        print(f"\n⏱️  {len(resultado)} fluxo(s) validado(s) em {duracao:.2f}s")
+
+    rejeitados = sum(1 for _, erros in resultado if any(e['nivel'] != AVISO for e in erros))
+    return 1 if rejeitados else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
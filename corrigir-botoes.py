@@ -5,16 +5,9 @@ Corrige estrutura de botões para formato correto
 Campo 'titulo' deve ser 'texto' para compatibilidade com BotOption
 """
 
-import psycopg2
-import json
-
-DB_CONFIG = {
-    'host': 'localhost',
-    'port': 5434,
-    'database': 'conectcrm_db',
-    'user': 'conectcrm',
-    'password': 'conectcrm123'
-}
+from conectcrm_ops.db import conectar
+from conectcrm_ops.historico import HistoricoFluxos
+from conectcrm_ops.patch import aplicar_patches
 
 FLOW_ID = 'ce74c2f3-b5d3-46dd-96f1-5f88339b9061'
 
@@ -43,35 +36,19 @@ OPCOES_CORRIGIDAS = [
 def main():
     try:
         print("🔌 Conectando ao PostgreSQL...")
-        conn = psycopg2.connect(**DB_CONFIG)
-        conn.set_client_encoding('UTF8')
-        cur = conn.cursor()
-        
-        # Buscar estrutura atual
-        print("📋 Buscando estrutura atual...")
-        cur.execute("""
-            SELECT estrutura FROM fluxos_triagem WHERE id = %s
-        """, (FLOW_ID,))
-        estrutura = cur.fetchone()[0]
+        conn = conectar()
         
-        # Corrigir opções
+        # Corrigir opções (só o caminho das opções é reescrito no banco)
         print("✏️ Corrigindo estrutura de botões...")
-        estrutura['etapas']['boas-vindas']['opcoes'] = OPCOES_CORRIGIDAS
-        
-        # Salvar
         print("💾 Salvando no banco...")
-        cur.execute("""
-            UPDATE fluxos_triagem 
-            SET estrutura = %s,
-                versao = versao + 1,
-                updated_at = NOW(),
-                published_at = NOW()
-            WHERE id = %s
-            RETURNING versao;
-        """, (json.dumps(estrutura, ensure_ascii=False), FLOW_ID))
+        versao = aplicar_patches(conn, [{
+            'fluxo_id': FLOW_ID,
+            'operacoes': [
+                {'op': 'replace', 'path': '/etapas/boas-vindas/opcoes', 'value': OPCOES_CORRIGIDAS},
+            ],
+        }], publicar=True, historico=HistoricoFluxos())[FLOW_ID]
         
-        versao = cur.fetchone()[0]
-        conn.commit()
+        cur = conn.cursor()
         
         print(f"\n✅ Botões corrigidos! Nova versão: {versao}")
         
@@ -3,16 +3,11 @@
 """
 Despublicar fluxo para permitir edição pela interface
 """
-import psycopg2
+from conectcrm_ops.db import conectar
+from conectcrm_ops.historico import HistoricoFluxos
 
 # Conectar ao banco
-conn = psycopg2.connect(
-    host="localhost",
-    port=5434,
-    database="conectcrm_db",
-    user="conectcrm",
-    password="conectcrm123"
-)
+conn = conectar()
 
 cur = conn.cursor()
 
@@ -27,14 +22,17 @@ cur.execute("""
         published_at = NULL,
         updated_at = NOW()
     WHERE id = %s
-    RETURNING nome, versao, publicado
+    RETURNING nome, versao, publicado, estrutura
 """, (fluxo_id,))
 
 row = cur.fetchone()
-nome, versao, publicado = row
+nome, versao, publicado, estrutura = row
 
 conn.commit()
 
+# Registrar no histórico de versões (a estrutura é deduplicada por etapa)
+HistoricoFluxos().registrar(fluxo_id, versao, estrutura, evento='despublicar', publicado=publicado)
+
 print(f"✅ Fluxo despublicado com sucesso!")
 print(f"   Nome: {nome}")
 print(f"   Versão: {versao}")
@@ -5,17 +5,9 @@ Fix UTF-8 encoding para Fluxo Padrão v3.1
 Insere corretamente emojis no PostgreSQL
 """
 
-import psycopg2
-import json
-
-# Configuração do banco
-DB_CONFIG = {
-    'host': 'localhost',
-    'port': 5434,
-    'database': 'conectcrm_db',
-    'user': 'conectcrm',
-    'password': 'conectcrm123'
-}
+from conectcrm_ops.db import conectar
+from conectcrm_ops.historico import HistoricoFluxos
+from conectcrm_ops.patch import aplicar_patches
 
 # Etapa boas-vindas com encoding correto
 BOAS_VINDAS_ETAPA = {
@@ -38,28 +30,18 @@ def main():
     try:
         # Conectar ao banco
         print("🔌 Conectando ao PostgreSQL...")
-        conn = psycopg2.connect(**DB_CONFIG)
-        conn.set_client_encoding('UTF8')
-        cur = conn.cursor()
+        conn = conectar()
         
         # Atualizar etapa boas-vindas
         print("📝 Atualizando etapa boas-vindas com encoding UTF-8...")
-        query = """
-        UPDATE fluxos_triagem 
-        SET estrutura = jsonb_set(
-            estrutura,
-            '{etapas,boas-vindas}',
-            %s::jsonb
-        ),
-        versao = versao + 1,
-        updated_at = NOW()
-        WHERE id = %s
-        RETURNING versao;
-        """
+        versao = aplicar_patches(conn, [{
+            'fluxo_id': FLOW_ID,
+            'operacoes': [
+                {'op': 'replace', 'path': '/etapas/boas-vindas', 'value': BOAS_VINDAS_ETAPA},
+            ],
+        }], historico=HistoricoFluxos())[FLOW_ID]
         
-        cur.execute(query, (json.dumps(BOAS_VINDAS_ETAPA, ensure_ascii=False), FLOW_ID))
-        versao = cur.fetchone()[0]
-        conn.commit()
+        cur = conn.cursor()
         
         print(f"✅ Fluxo atualizado com sucesso! Nova versão: {versao}")
         
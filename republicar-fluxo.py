@@ -4,17 +4,13 @@
 Republicar fluxo para forçar atualização do campo published_at
 sem alterar a estrutura
 """
-import psycopg2
 from datetime import datetime
 
+from conectcrm_ops.db import conectar
+from conectcrm_ops.historico import HistoricoFluxos
+
 # Conectar ao banco
-conn = psycopg2.connect(
-    host="localhost",
-    port=5434,
-    database="conectcrm_db",
-    user="conectcrm",
-    password="conectcrm123"
-)
+conn = conectar()
 
 cur = conn.cursor()
 
@@ -28,14 +24,17 @@ cur.execute("""
         published_at = NOW(),
         updated_at = NOW()
     WHERE id = %s
-    RETURNING versao, published_at AT TIME ZONE 'America/Sao_Paulo' as publicado
+    RETURNING versao, published_at AT TIME ZONE 'America/Sao_Paulo' as publicado, publicado AS status, estrutura
 """, (fluxo_id,))
 
 row = cur.fetchone()
-versao, publicado = row
+versao, publicado, status, estrutura = row
 
 conn.commit()
 
+# Registrar no histórico de versões (a estrutura é deduplicada por etapa)
+HistoricoFluxos().registrar(fluxo_id, versao, estrutura, evento='republicar', publicado=status)
+
 print(f"✅ Fluxo republicado com sucesso!")
 print(f"   Versão: {versao}")
 print(f"   Publicado: {publicado}")
@@ -6,16 +6,10 @@ Testa se os 3 núcleos agora aparecem no bot
 """
 
 import psycopg2
-import json
 from datetime import datetime
 
-DB_CONFIG = {
-    'host': 'localhost',
-    'port': 5434,
-    'database': 'conectcrm_db',
-    'user': 'conectcrm',
-    'password': 'conectcrm123'
-}
+from conectcrm_ops.db import conectar
+from conectcrm_ops.opcoes_bot import buscar_opcoes_para_bot
 
 EMPRESA_ID = 'f47ac10b-58cc-4372-a567-0e02b2c3d479'
 
@@ -24,69 +18,36 @@ print(f"🕒 Data/Hora: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
 print(f"📅 Dia da semana: {datetime.now().strftime('%A')}\n")
 
 try:
-    conn = psycopg2.connect(**DB_CONFIG)
+    conn = conectar()
     cursor = conn.cursor()
     
     print("✅ Conectado com sucesso!")
     print("=" * 100)
     
-    # Simular a query do nucleo.service.ts
+    # Simular a query do nucleo.service.ts (núcleos + departamentos em uma única consulta)
     print("\n📊 SIMULANDO QUERY findOpcoesParaBot...\n")
     
-    cursor.execute("""
-        SELECT 
-            n.id,
-            n.nome,
-            n.descricao,
-            n.cor,
-            n.icone,
-            n.prioridade,
-            n.horario_funcionamento
-        FROM nucleos_atendimento n
-        WHERE n.empresa_id = %s
-          AND n.ativo = true
-          AND n.visivel_no_bot = true
-        ORDER BY n.prioridade ASC, n.nome ASC
-    """, (EMPRESA_ID,))
-    
-    nucleos = cursor.fetchall()
+    nucleos = buscar_opcoes_para_bot(cursor, [EMPRESA_ID])[EMPRESA_ID]
     
     print(f"🔍 [NUCLEO DEBUG] Núcleos encontrados: {len(nucleos)}\n")
     
     resultado_final = []
     
     for nucleo in nucleos:
-        id, nome, descricao, cor, icone, prioridade, horario_funcionamento = nucleo
-        
-        print(f"🏢 NÚCLEO: {nome}")
-        print(f"   Prioridade: {prioridade}")
-        
-        # Buscar departamentos (como faz o código)
-        cursor.execute("""
-            SELECT 
-                id,
-                nome,
-                descricao,
-                cor,
-                icone
-            FROM departamentos
-            WHERE nucleo_id = %s
-              AND ativo = true
-              AND visivel_no_bot = true
-            ORDER BY ordem ASC, nome ASC
-        """, (id,))
+        print(f"🏢 NÚCLEO: {nucleo['nome']}")
+        print(f"   Prioridade: {nucleo['prioridade']}")
         
-        departamentos = cursor.fetchall()
+        departamentos = nucleo['departamentos']
         
         print(f"   📊 Departamentos: {len(departamentos)}")
         
         if departamentos:
             for dep in departamentos:
-                print(f"      - {dep[1]}")
+                print(f"      - {dep['nome']}")
             
             resultado_final.append({
-                'id': id,
-                'nome': nome,
+                'id': nucleo['id'],
+                'nome': nucleo['nome'],
                 'departamentos': len(departamentos)
             })
             print(f"   ✅ SERÁ EXIBIDO NO BOT")
@@ -3,32 +3,31 @@
 """
 Verificar estrutura dos botões Reply no fluxo de triagem
 """
-import psycopg2
-import json
+from conectcrm_ops.cache_fluxos import CacheFluxos
+from conectcrm_ops.db import conectar
+
+FLOW_ID = 'ce74c2f3-b5d3-46dd-96f1-5f88339b9061'
 
 # Conectar ao banco
-conn = psycopg2.connect(
-    host="localhost",
-    port=5434,
-    database="conectcrm_db",
-    user="conectcrm",
-    password="conectcrm123"
-)
+conn = conectar()
 
 cur = conn.cursor()
 
-# Buscar estrutura dos botões
+# A estrutura vem do cache local (sonda de id, versao e md5 da estrutura)
 cur.execute("""
     SELECT 
         versao,
-        published_at AT TIME ZONE 'America/Sao_Paulo' as publicado,
-        estrutura->'etapas'->'boas-vindas' as boas_vindas
+        published_at AT TIME ZONE 'America/Sao_Paulo' as publicado
     FROM fluxos_triagem 
-    WHERE id = 'ce74c2f3-b5d3-46dd-96f1-5f88339b9061'
-""")
+    WHERE id = %s
+""", (FLOW_ID,))
+
+versao, publicado = cur.fetchone()
 
-row = cur.fetchone()
-versao, publicado, boas_vindas = row
+cache = CacheFluxos()
+fluxo = cache.sincronizar(cur, [FLOW_ID], publicados=False)[FLOW_ID]
+boas_vindas = fluxo.etapa('boas-vindas')
+despedida = fluxo.etapa('despedida-cancelamento')
 
 print(f"✅ Fluxo encontrado!")
 print(f"   Versão: {versao}")
@@ -47,16 +46,6 @@ for i, opcao in enumerate(opcoes, 1):
     print(f"      Próxima Etapa: {opcao.get('proximaEtapa')}")
 
 # Verificar etapa de despedida
-cur.execute("""
-    SELECT 
-        estrutura->'etapas'->'despedida-cancelamento' as despedida
-    FROM fluxos_triagem 
-    WHERE id = 'ce74c2f3-b5d3-46dd-96f1-5f88339b9061'
-""")
-
-row = cur.fetchone()
-despedida = row[0] if row else None
-
 if despedida:
     print(f"\n✅ Etapa de despedida encontrada:")
     print(f"   Tipo: {despedida.get('tipo')}")
@@ -64,6 +53,7 @@ if despedida:
 else:
     print(f"\n⚠️  Etapa de despedida NÃO encontrada!")
 
+cache.fechar()
 cur.close()
 conn.close()
 
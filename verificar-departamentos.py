@@ -6,13 +6,7 @@ Script para verificar departamentos dos núcleos
 
 import psycopg2
 
-DB_CONFIG = {
-    'host': 'localhost',
-    'port': 5434,
-    'database': 'conectcrm_db',
-    'user': 'conectcrm',
-    'password': 'conectcrm123'
-}
+from conectcrm_ops.db import conectar
 
 NUCLEOS_IDS = {
     'Suporte Técnico': '22222222-3333-4444-5555-666666666661',
@@ -23,30 +17,35 @@ NUCLEOS_IDS = {
 print("🔗 Conectando ao banco de dados...")
 
 try:
-    conn = psycopg2.connect(**DB_CONFIG)
+    conn = conectar()
     cursor = conn.cursor()
     
     print("✅ Conectado com sucesso!\n")
     print("=" * 100)
     
+    # Buscar departamentos de todos os núcleos de uma vez
+    cursor.execute("""
+        SELECT 
+            nucleo_id,
+            id,
+            nome,
+            ativo,
+            visivel_no_bot,
+            ordem
+        FROM departamentos
+        WHERE nucleo_id = ANY(%s::uuid[])
+        ORDER BY ordem ASC, nome ASC
+    """, (list(NUCLEOS_IDS.values()),))
+    
+    departamentos_por_nucleo = {}
+    for nucleo_id, *departamento in cursor.fetchall():
+        departamentos_por_nucleo.setdefault(str(nucleo_id), []).append(departamento)
+    
     for nucleo_nome, nucleo_id in NUCLEOS_IDS.items():
         print(f"\n🏢 NÚCLEO: {nucleo_nome}")
         print(f"   ID: {nucleo_id}")
         
-        # Buscar departamentos do núcleo
-        cursor.execute("""
-            SELECT 
-                id,
-                nome,
-                ativo,
-                visivel_no_bot,
-                ordem
-            FROM departamentos
-            WHERE nucleo_id = %s
-            ORDER BY ordem ASC, nome ASC
-        """, (nucleo_id,))
-        
-        departamentos = cursor.fetchall()
+        departamentos = departamentos_por_nucleo.get(nucleo_id, [])
         
         if not departamentos:
             print(f"   ⚠️  NENHUM DEPARTAMENTO CADASTRADO!")
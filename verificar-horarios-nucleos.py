@@ -6,22 +6,17 @@ Script para verificar horários de funcionamento dos núcleos
 
 import psycopg2
 import json
-from datetime import datetime
+from datetime import datetime, timezone
 
-DB_CONFIG = {
-    'host': 'localhost',
-    'port': 5434,
-    'database': 'conectcrm_db',
-    'user': 'conectcrm',
-    'password': 'conectcrm123'
-}
+from conectcrm_ops.db import conectar
+from conectcrm_ops.horario import avisos_configuracao, verificar_disponibilidade
 
 EMPRESA_ID = 'f47ac10b-58cc-4372-a567-0e02b2c3d479'
 
 print("🔗 Conectando ao banco de dados...")
 
 try:
-    conn = psycopg2.connect(**DB_CONFIG)
+    conn = conectar()
     cursor = conn.cursor()
     
     print("✅ Conectado com sucesso!\n")
@@ -48,6 +43,8 @@ try:
         print(f"❌ Nenhum núcleo visível encontrado")
         exit(1)
     
+    agora = datetime.now(timezone.utc)
+
     print(f"📊 Núcleos ativos e visíveis: {len(nucleos)}")
     print(f"🕒 Data/Hora atual: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
     print(f"📅 Dia da semana: {datetime.now().strftime('%A')}\n")
@@ -68,7 +65,20 @@ try:
             except Exception as e:
                 print(f"   ⚠️  Erro ao ler horário: {e}")
         else:
-            print(f"   ⚠️  SEM horário de funcionamento configurado (pode causar invisibilidade!)")
+            print(f"   ℹ️  SEM horário de funcionamento configurado (o bot considera sempre aberto)")
+        
+        try:
+            disponibilidade = verificar_disponibilidade(horario_funcionamento, agora)
+            if disponibilidade['estaAberto']:
+                print(f"   ✅ ABERTO agora")
+            else:
+                print(f"   🔒 FECHADO agora: {disponibilidade['motivoFechado']}")
+                if disponibilidade['proximaAbertura']:
+                    print(f"      Próxima abertura: {disponibilidade['proximaAbertura'].strftime('%d/%m/%Y %H:%M')}")
+            for aviso in avisos_configuracao(horario_funcionamento):
+                print(f"   ⚠️  {aviso}")
+        except Exception as e:
+            print(f"   ⚠️  Erro ao avaliar horário: {e}")
         
         print("-" * 100)
     
@@ -77,7 +87,7 @@ try:
     print("   o problema pode ser:")
     print("   1. Horário de funcionamento está fora do horário atual")
     print("   2. Dia da semana não está configurado")
-    print("   3. horario_funcionamento está NULL ou inválido")
+    print("   3. horario_funcionamento está vazio ({}) ou usa chaves curtas (seg, ter, ...)")
     
 except psycopg2.Error as e:
     print(f"\n❌ Erro no banco de dados: {e}")
@@ -1,29 +1,20 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-import psycopg2
-import json
-
-DB_CONFIG = {
-    'host': 'localhost',
-    'port': 5434,
-    'database': 'conectcrm_db',
-    'user': 'conectcrm',
-    'password': 'conectcrm123'
-}
+from conectcrm_ops.cache_fluxos import CacheFluxos
+from conectcrm_ops.db import conectar
+from conectcrm_ops.mensagens import compilar
 
 FLOW_ID = 'ce74c2f3-b5d3-46dd-96f1-5f88339b9061'
 
 def main():
-    conn = psycopg2.connect(**DB_CONFIG)
-    conn.set_client_encoding('UTF8')
+    conn = conectar()
     cur = conn.cursor()
     
-    # Buscar mensagem cliente existente
-    cur.execute("""
-        SELECT estrutura->'etapas'->'boas-vindas'->'metadata'->>'mensagemClienteExistente' 
-        FROM fluxos_triagem WHERE id = %s
-    """, (FLOW_ID,))
-    mensagem = cur.fetchone()[0]
+    # Buscar mensagem cliente existente (estrutura via cache local por versão)
+    cache = CacheFluxos()
+    boas_vindas = cache.sincronizar(cur, [FLOW_ID], publicados=False)[FLOW_ID].etapa('boas-vindas')
+    mensagem = (boas_vindas.get('metadata') or {}).get('mensagemClienteExistente')
+    cache.fechar()
     
     print("📋 Mensagem Cliente Existente no banco:")
     print(mensagem)
@@ -36,6 +27,15 @@ def main():
     else:
         print("❓ Não encontrou primeiroNome na mensagem")
     
+    # Lint completo do template (blocos, chaves, sintaxe)
+    template = compilar(mensagem)
+    for problema in template.problemas:
+        icone = '❌' if problema['nivel'] == 'erro' else '⚠️ '
+        print(f"{icone} [{problema['codigo']}] {problema['mensagem']}")
+    
+    print("\n👁️  Prévia (como o backend envia) para primeiroNome = 'Maria':")
+    print(template.renderizar_backend({'primeiroNome': 'Maria'}))
+    
     cur.close()
     conn.close()
 
@@ -7,20 +7,14 @@ Mostra quais núcleos estão visíveis no bot
 
 import psycopg2
 
-DB_CONFIG = {
-    'host': 'localhost',
-    'port': 5434,
-    'database': 'conectcrm_db',
-    'user': 'conectcrm',
-    'password': 'conectcrm123'
-}
+from conectcrm_ops.db import conectar
 
 EMPRESA_ID = 'f47ac10b-58cc-4372-a567-0e02b2c3d479'
 
 print("🔗 Conectando ao banco de dados...")
 
 try:
-    conn = psycopg2.connect(**DB_CONFIG)
+    conn = conectar()
     cursor = conn.cursor()
     
     print("✅ Conectado com sucesso!\n")